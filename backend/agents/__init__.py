@@ -4,12 +4,14 @@ Modular Agent Roles for Intelligent Oilfield Insights Platform
 from .parser import QueryParser
 from .sql_agent import SQLAgent
 from .graph_agent import GraphAgent
+from .vector_agent import VectorAgent
 from .reasoning import ReasoningAgent
 
 __all__ = [
     "QueryParser",
     "SQLAgent",
     "GraphAgent",
+    "VectorAgent",
     "ReasoningAgent"
 ]
 
@@ -4,7 +4,12 @@ Handles multi-hop queries across asset hierarchies
 """
 import logging
 from typing import List, Dict, Any, Optional
-from database.connections import get_neo4j_driver
+from analytics.correlation import IncidentAnomalyCorrelator, correlate_records
+from assets.snapshot import asset_snapshot
+from assets.traversal import bounded_impact_traversal
+from database.connections import get_shared_neo4j_driver
+from database.statements import statements, MAX_IMPACT_HOPS
+from observability.metrics import mark_outcome
 
 logger = logging.getLogger(__name__)
 
@@ -28,57 +33,82 @@ class GraphAgent:
         """
         logger.info(f"Finding faulty equipment for {rig_name}")
         
-        cypher_query = """
-        MATCH (r:Rig {name: $rig_name})-[:HAS_WELL]->(w:Well)
-              -[:HAS_SENSOR]->(s:Sensor)
-        WHERE toLower(s.status) = 'faulty' OR s.last_reading_anomaly = true
-        RETURN r.name as rig, w.name as well, s.sensor_id as sensor,
-               s.sensor_type as type, s.last_reading as reading,
-               toUpper(s.status) as status
-        """
+        snapshot = asset_snapshot.current()
+        if snapshot is not None:
+            records = snapshot.faulty_equipment(rig_name)
+            logger.info(f"Found {len(records)} faulty equipment items (snapshot)")
+            mark_outcome("cache")
+            return records
         
         try:
-            driver = get_neo4j_driver()
+            driver = get_shared_neo4j_driver()
             with driver.session() as session:
-                result = session.run(cypher_query, rig_name=rig_name)
-                records = [dict(record) for record in result]
+                records = statements.run_cypher(session, "faulty_equipment", rig_name=rig_name)
                 logger.info(f"Found {len(records)} faulty equipment items")
-                driver.close()
                 return records
         except Exception as e:
             logger.error(f"Error finding faulty equipment: {str(e)}")
             return self._mock_faulty_equipment(rig_name)
     
-    def find_affected_assets(self, equipment_id: str, max_hops: int = 3) -> List[Dict[str, Any]]:
+    def find_affected_assets(
+        self,
+        equipment_id: str,
+        max_hops: int = 3,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
         """
         Find all assets affected by equipment failure (multi-hop traversal)
         
+        Follows the asset hierarchy upwards (equipment -> well -> rig ->
+        basin) one level per round trip, or from the in-process snapshot
+        when it is fresh. Each affected asset is returned
+        once, with its shortest path and hop count.
+        
         Args:
             equipment_id: ID of the failed equipment
             max_hops: Maximum number of hops to traverse
+            limit: Maximum number of assets to return
+            offset: Number of assets to skip (for paging)
             
         Returns:
             List of affected assets with paths
         """
+        max_hops = min(max(max_hops, 1), MAX_IMPACT_HOPS)
         logger.info(f"Finding assets affected by {equipment_id} (max {max_hops} hops)")
         
-        cypher_query = """
-        MATCH path = (e:Equipment {id: $equipment_id})-[*1..%d]-(affected)
-        WHERE affected:Rig OR affected:Well OR affected:Pump
-        RETURN affected.name as asset_name, 
-               labels(affected)[0] as asset_type,
-               length(path) as hops,
-               [node in nodes(path) | node.name] as path_nodes
-        ORDER BY hops ASC
-        """ % max_hops
+        snapshot = asset_snapshot.current()
+        if snapshot is not None:
+            records = snapshot.affected_assets(equipment_id, max_hops, limit, offset)
+            logger.info(f"Found {len(records)} affected assets (snapshot)")
+            mark_outcome("cache")
+            return records
         
         try:
-            driver = get_neo4j_driver()
+            driver = get_shared_neo4j_driver()
             with driver.session() as session:
-                result = session.run(cypher_query, equipment_id=equipment_id)
-                records = [dict(record) for record in result]
+                start = statements.run_cypher(session, "impact_start", equipment_id=equipment_id)
+                if not start:
+                    logger.info(f"Equipment {equipment_id} not found")
+                    return []
+                
+                def expand(frontier):
+                    rows = statements.run_cypher(session, "impact_parents", frontier=frontier)
+                    return [
+                        (r["child_id"], r["parent_id"], r["asset_type"], r["asset_name"])
+                        for r in rows
+                    ]
+                
+                page = bounded_impact_traversal(
+                    start[0]["node_id"],
+                    start[0]["asset_name"],
+                    expand,
+                    max_hops=max_hops,
+                    limit=limit,
+                    offset=offset
+                )
+                records = page["assets"]
                 logger.info(f"Found {len(records)} affected assets")
-                driver.close()
                 return records
         except Exception as e:
             logger.error(f"Error finding affected assets: {str(e)}")
@@ -96,58 +126,141 @@ class GraphAgent:
         """
         logger.info(f"Finding equipment in {basin} basin")
         
-        cypher_query = """
-        MATCH (b:Basin {name: $basin})-[:CONTAINS]->(r:Rig)
-              -[:HAS_WELL]->(w:Well)-[:HAS_SENSOR]->(s:Sensor)
-        RETURN r.name as rig, w.name as well, s.sensor_id as sensor,
-               s.sensor_type as type, s.status as status
-        """
+        snapshot = asset_snapshot.current()
+        if snapshot is not None:
+            records = snapshot.equipment_by_basin(basin)
+            logger.info(f"Found {len(records)} equipment items in {basin} (snapshot)")
+            mark_outcome("cache")
+            return records
         
         try:
-            driver = get_neo4j_driver()
+            driver = get_shared_neo4j_driver()
             with driver.session() as session:
-                result = session.run(cypher_query, basin=basin)
-                records = [dict(record) for record in result]
+                records = statements.run_cypher(session, "equipment_by_basin", basin=basin)
                 logger.info(f"Found {len(records)} equipment items in {basin}")
-                driver.close()
                 return records
         except Exception as e:
             logger.error(f"Error finding equipment by basin: {str(e)}")
             return self._mock_basin_equipment(basin)
     
-    def find_incident_equipment_correlation(self) -> List[Dict[str, Any]]:
+    def find_assets_in(self, asset_id: str, asset_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Roll-up: find all assets below an asset (e.g. all sensors in a basin)
+        
+        Args:
+            asset_id: Ancestor asset (basin, rig or well)
+            asset_type: Restrict to one type (e.g. "Sensor")
+            
+        Returns:
+            List of assets with type and depth below the ancestor
+        """
+        logger.info(f"Finding {asset_type or 'assets'} in {asset_id}")
+        
+        if asset_snapshot.current() is not None:
+            records = asset_snapshot.closure.descendants_of(asset_id, asset_type)
+            logger.info(f"Found {len(records)} assets in {asset_id} (closure index)")
+            mark_outcome("cache")
+            return records
+        
+        try:
+            driver = get_shared_neo4j_driver()
+            with driver.session() as session:
+                records = statements.run_cypher(
+                    session, "assets_below", asset_id=asset_id, asset_type=asset_type
+                )
+                logger.info(f"Found {len(records)} assets in {asset_id}")
+                return records
+        except Exception as e:
+            logger.error(f"Error finding assets in {asset_id}: {str(e)}")
+            return []
+    
+    def find_asset_ancestors(self, asset_id: str, asset_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Reverse lookup: find the assets above an asset (e.g. a sensor's basin)
+        
+        Args:
+            asset_id: Asset id (well, sensor or equipment)
+            asset_type: Restrict to one type (e.g. "Basin")
+            
+        Returns:
+            List of ancestors, nearest first
+        """
+        logger.info(f"Finding {asset_type or 'ancestors'} of {asset_id}")
+        
+        if asset_snapshot.current() is not None:
+            mark_outcome("cache")
+            return asset_snapshot.closure.ancestors_of(asset_id, asset_type)
+        
+        try:
+            driver = get_shared_neo4j_driver()
+            with driver.session() as session:
+                return statements.run_cypher(
+                    session, "assets_above", asset_id=asset_id, asset_type=asset_type
+                )
+        except Exception as e:
+            logger.error(f"Error finding ancestors of {asset_id}: {str(e)}")
+            return []
+    
+    def find_incident_equipment_correlation(
+        self,
+        lookback_hours: float = 168,
+        lookahead_hours: float = 24,
+        top_k: int = 100
+    ) -> List[Dict[str, Any]]:
         """
         Find correlations between safety incidents and equipment anomalies
         
+        Args:
+            lookback_hours: How long before an incident an anomaly still counts
+            lookahead_hours: How long after an incident an anomaly still counts
+            top_k: Maximum number of correlations to return
+            
         Returns:
-            List of correlated incidents and equipment
+            List of correlated incidents and equipment, best first
         """
-        logger.info("Finding incident-equipment correlations")
+        result = self.correlate_incidents_with_anomalies(lookback_hours, lookahead_hours, top_k)
+        return result["correlations"]
+    
+    def correlate_incidents_with_anomalies(
+        self,
+        lookback_hours: float = 168,
+        lookahead_hours: float = 24,
+        top_k: int = 100
+    ) -> Dict[str, Any]:
+        """
+        Rank incident/anomaly pairs on the same well within a time window
         
-        cypher_query = """
-        MATCH (i:Incident)-[:OCCURRED_AT]->(w:Well)-[:HAS_SENSOR]->(s:Sensor)
-        WHERE s.last_reading_anomaly = true
-        AND i.timestamp >= s.anomaly_detected_at - interval '24 hours'
-        RETURN i.incident_id as incident, i.severity as severity,
-               w.name as well, s.sensor_id as sensor, s.sensor_type as type,
-               i.timestamp as incident_time, s.anomaly_detected_at as anomaly_time
-        ORDER BY i.severity DESC
+        Incidents and anomaly events are fetched as two flat streams and
+        joined in process by the correlation engine, instead of pairing
+        every incident with every anomalous sensor inside Cypher.
+        
+        Args:
+            lookback_hours: How long before an incident an anomaly still counts
+            lookahead_hours: How long after an incident an anomaly still counts
+            top_k: Maximum number of correlations to return
+            
+        Returns:
+            Dictionary with ranked correlations, pair count and lag statistics
         """
+        logger.info("Finding incident-equipment correlations")
         
         try:
-            driver = get_neo4j_driver()
+            driver = get_shared_neo4j_driver()
             with driver.session() as session:
-                result = session.run(cypher_query)
-                records = [dict(record) for record in result]
-                logger.info(f"Found {len(records)} correlations")
-                driver.close()
-                return records
+                incidents = statements.run_cypher(session, "incident_events")
+                anomalies = statements.run_cypher(session, "anomaly_events")
+            
+            correlator = IncidentAnomalyCorrelator(lookback_hours, lookahead_hours, top_k)
+            result = correlate_records(incidents, anomalies, correlator)
+            logger.info(f"Found {result['total_pairs']} correlations")
+            return result
         except Exception as e:
             logger.error(f"Error finding correlations: {str(e)}")
-            return self._mock_correlations()
+            return {"correlations": self._mock_correlations(), "total_pairs": 1, "lag_stats": []}
     
     def _mock_faulty_equipment(self, rig_name: str) -> List[Dict[str, Any]]:
         """Return mock faulty equipment data"""
+        mark_outcome("mock")
         return [
             {
                 "rig": rig_name,
@@ -161,6 +274,7 @@ class GraphAgent:
     
     def _mock_affected_assets(self, equipment_id: str) -> List[Dict[str, Any]]:
         """Return mock affected assets data"""
+        mark_outcome("mock")
         return [
             {
                 "asset_name": "Rig Alpha",
@@ -172,6 +286,7 @@ class GraphAgent:
     
     def _mock_basin_equipment(self, basin: str) -> List[Dict[str, Any]]:
         """Return mock basin equipment data"""
+        mark_outcome("mock")
         return [
             {
                 "rig": "Rig Alpha",
@@ -184,6 +299,7 @@ class GraphAgent:
     
     def _mock_correlations(self) -> List[Dict[str, Any]]:
         """Return mock correlation data"""
+        mark_outcome("mock")
         return [
             {
                 "incident": "INC-2024-045",
@@ -192,7 +308,9 @@ class GraphAgent:
                 "sensor": "G-40",
                 "type": "Pressure Gauge",
                 "incident_time": "2024-12-20 14:30:00",
-                "anomaly_time": "2024-12-20 10:15:00"
+                "anomaly_time": "2024-12-20 10:15:00",
+                "lag_hours": 4.25,
+                "score": 2.9241
             }
         ]
 
@@ -83,7 +83,9 @@ class QueryParser:
             "wells": [],
             "sensors": [],
             "basins": [],
-            "time_periods": []
+            "time_periods": [],
+            "assets": [],
+            "incidents": []
         }
         
         # Extract rig names (e.g., "Rig Alpha", "Rig-12")
@@ -94,12 +96,26 @@ class QueryParser:
         well_pattern = r'Well\s+[A-Za-z0-9-]+'
         entities["wells"] = re.findall(well_pattern, query, re.IGNORECASE)
         
+        # Extract incident ids (e.g., "INC-2024-045")
+        incident_pattern = r'\bINC-\d+(?:-\d+)*\b'
+        entities["incidents"] = [i.upper() for i in re.findall(incident_pattern, query, re.IGNORECASE)]
+        
+        # Extract asset ids (e.g., "G-40", "PUMP-45", "W-12")
+        asset_pattern = r'\b[A-Z]{1,6}-\d+[A-Z0-9]*\b'
+        entities["assets"] = [
+            a for a in re.findall(asset_pattern, query)
+            if not a.startswith("INC-")
+        ]
+        
         # Extract basin names
         basin_keywords = ["Permian", "Eagle Ford", "Bakken", "Marcellus"]
         entities["basins"] = [b for b in basin_keywords if b.lower() in query.lower()]
         
         # Extract time periods
-        time_keywords = ["30-day", "weekly", "monthly", "daily", "last week", "last month"]
+        time_keywords = [
+            "30-day", "weekly", "monthly", "daily", "last week", "last month",
+            "last hour", "last 24 hours", "today"
+        ]
         entities["time_periods"] = [t for t in time_keywords if t.lower() in query.lower()]
         
         return entities
@@ -5,6 +5,8 @@ Combines data from multiple sources and generates coherent answers
 import logging
 from typing import List, Dict, Any, Optional
 
+from observability.tracing import span, set_attributes
+
 logger = logging.getLogger(__name__)
 
 class ReasoningAgent:
@@ -80,7 +82,13 @@ class ReasoningAgent:
         """
         
         try:
-            response = self.llm.invoke(prompt)
+            with span("llm invoke", **{"gen_ai.request.model": getattr(self.llm, "model_name", "unknown")}) as current:
+                response = self.llm.invoke(prompt)
+                usage = getattr(response, "usage_metadata", None) or {}
+                set_attributes(current, **{
+                    "gen_ai.usage.input_tokens": usage.get("input_tokens", 0),
+                    "gen_ai.usage.output_tokens": usage.get("output_tokens", 0)
+                })
             answer = response.content
             
             return {
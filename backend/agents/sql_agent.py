@@ -4,10 +4,16 @@ Handles time-series production data and telemetry queries
 """
 import logging
 from typing import List, Dict, Any, Optional
-from database.connections import get_postgres_connection
+from database.connections import get_pooled_postgres_connection
+from database.statements import statements
+from observability.metrics import mark_outcome
+from telemetry import live_telemetry
 
 logger = logging.getLogger(__name__)
 
+# Index the trends query is expected to use (see data/seed_sql.sql)
+PRODUCTION_TRENDS_INDEX = "idx_production_rig_timestamp"
+
 class SQLAgent:
     """
     Executes SQL queries against PostgreSQL production database
@@ -16,47 +22,88 @@ class SQLAgent:
     def __init__(self):
         self.connection = None
     
-    def query_production_trends(self, rig_name: str, days: int = 30) -> List[Dict[str, Any]]:
+    def query_production_trends(
+        self,
+        rig_name: str,
+        days: int = 30,
+        window_hours: int = 30,
+        hours: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
         Query production trends for a specific rig
         
+        The moving average is computed per well over a time window
+        (RANGE), not over a fixed number of rows, so gaps in telemetry
+        do not stretch the window. Only the requested interval plus
+        `window_hours` of lookback is read; the lookback rows seed the
+        average and are dropped before returning. Recent intervals are
+        answered from the live telemetry buffers when they hold the whole
+        interval and lookback for every well of the rig.
+        
         Args:
             rig_name: Name of the rig
             days: Number of days to analyze
+            window_hours: Width of the moving-average window in hours
+            hours: Number of hours to analyze (overrides days)
             
         Returns:
-            List of production records with moving averages
+            List of production records with per-well moving averages
         """
-        logger.info(f"Querying production trends for {rig_name} over {days} days")
+        hours = hours or days * 24
+        logger.info(f"Querying production trends for {rig_name} over {hours} hours")
         
-        query = """
-        SELECT 
-            timestamp, 
-            production_rate, 
-            AVG(production_rate) OVER (
-                ORDER BY timestamp 
-                ROWS BETWEEN 30 PRECEDING AND CURRENT ROW
-            ) as moving_avg,
-            pressure,
-            temperature
-        FROM production_data
-        WHERE rig_name = %s
-        ORDER BY timestamp DESC
-        LIMIT %s;
-        """
+        live = live_telemetry.production_trends(rig_name, hours, window_hours)
+        if live is not None:
+            mark_outcome("live")
+            logger.info(f"Served {len(live)} production records from live telemetry")
+            return live
         
         try:
-            with get_postgres_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute(query, (rig_name, days * 24))  # Assuming hourly data
-                    results = cur.fetchall()
-                    logger.info(f"Retrieved {len(results)} production records")
-                    return results
+            with get_pooled_postgres_connection() as conn:
+                results = statements.execute_sql(
+                    conn, "production_trends", (rig_name, hours, window_hours)
+                )
+                logger.info(f"Retrieved {len(results)} production records")
+                return results
         except Exception as e:
             logger.error(f"Error querying production trends: {str(e)}")
             # Return mock data for development
             return self._mock_production_data(rig_name, days)
     
+    def explain_production_trends(
+        self,
+        rig_name: str,
+        days: int = 30,
+        window_hours: int = 30
+    ) -> Dict[str, Any]:
+        """
+        EXPLAIN the production trends query and check its access path
+        
+        The expected plan is an Index Scan (or Bitmap Index Scan) on
+        idx_production_rig_timestamp bounded by rig_name and the
+        lookback-extended timestamp range, followed by a Sort on
+        (well_name, timestamp) feeding the WindowAgg. On tiny tables the
+        planner may still prefer a Seq Scan; run ANALYZE first.
+        
+        Args:
+            rig_name: Name of the rig
+            days: Number of days to analyze
+            window_hours: Width of the moving-average window in hours
+            
+        Returns:
+            Dictionary with the plan lines and whether the index is used
+        """
+        with get_pooled_postgres_connection() as conn:
+            plan = statements.explain_sql(
+                conn, "production_trends", (rig_name, days * 24, window_hours)
+            )
+        
+        uses_index = any(PRODUCTION_TRENDS_INDEX in line for line in plan)
+        if not uses_index:
+            logger.warning(f"Production trends plan does not use {PRODUCTION_TRENDS_INDEX}")
+        
+        return {"plan": plan, "uses_index": uses_index}
+    
     def query_wells_below_average(self, basin: str, days: int = 30) -> List[Dict[str, Any]]:
         """
         Find wells producing below their moving average
@@ -70,39 +117,40 @@ class SQLAgent:
         """
         logger.info(f"Querying underperforming wells in {basin}")
         
-        query = """
-        WITH well_averages AS (
-            SELECT 
-                well_name,
-                AVG(production_rate) as avg_rate,
-                production_rate as current_rate,
-                timestamp
-            FROM production_data
-            WHERE basin = %s
-            AND timestamp >= NOW() - INTERVAL '%s days'
-            GROUP BY well_name, production_rate, timestamp
-        )
-        SELECT 
-            well_name,
-            current_rate,
-            avg_rate,
-            ((current_rate - avg_rate) / avg_rate * 100) as deviation_pct
-        FROM well_averages
-        WHERE current_rate < avg_rate
-        ORDER BY deviation_pct ASC;
-        """
-        
         try:
-            with get_postgres_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute(query, (basin, days))
-                    results = cur.fetchall()
-                    logger.info(f"Found {len(results)} underperforming wells")
-                    return results
+            with get_pooled_postgres_connection() as conn:
+                results = statements.execute_sql(conn, "wells_below_average", (basin, days))
+                logger.info(f"Found {len(results)} underperforming wells")
+                return results
         except Exception as e:
             logger.error(f"Error querying underperforming wells: {str(e)}")
             return self._mock_underperforming_wells(basin)
     
+    def query_production_rollup(self, ancestor: str, days: int = 30) -> List[Dict[str, Any]]:
+        """
+        Production per well for every well below a basin or rig
+        
+        Joins production data with the asset_closure table, so the
+        hierarchy roll-up is a range scan instead of a graph traversal.
+        
+        Args:
+            ancestor: Basin or rig name
+            days: Number of days to aggregate
+            
+        Returns:
+            List of wells with average and total production
+        """
+        logger.info(f"Querying production roll-up for {ancestor} over {days} days")
+        
+        try:
+            with get_pooled_postgres_connection() as conn:
+                results = statements.execute_sql(conn, "production_rollup", (ancestor, days))
+                logger.info(f"Retrieved roll-up for {len(results)} wells")
+                return results
+        except Exception as e:
+            logger.error(f"Error querying production roll-up: {str(e)}")
+            return []
+    
     def query_maintenance_overdue(self) -> List[Dict[str, Any]]:
         """
         Query equipment with overdue maintenance
@@ -112,34 +160,22 @@ class SQLAgent:
         """
         logger.info("Querying overdue maintenance")
         
-        query = """
-        SELECT 
-            equipment_id,
-            equipment_type,
-            last_maintenance_date,
-            next_maintenance_due,
-            EXTRACT(DAY FROM (NOW() - next_maintenance_due)) as days_overdue
-        FROM maintenance_schedule
-        WHERE next_maintenance_due < NOW()
-        ORDER BY days_overdue DESC;
-        """
-        
         try:
-            with get_postgres_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute(query)
-                    results = cur.fetchall()
-                    logger.info(f"Found {len(results)} overdue maintenance items")
-                    return results
+            with get_pooled_postgres_connection() as conn:
+                results = statements.execute_sql(conn, "maintenance_overdue")
+                logger.info(f"Found {len(results)} overdue maintenance items")
+                return results
         except Exception as e:
             logger.error(f"Error querying overdue maintenance: {str(e)}")
             return self._mock_maintenance_data()
     
     def _mock_production_data(self, rig_name: str, days: int) -> List[Dict[str, Any]]:
         """Return mock production data for development"""
+        mark_outcome("mock")
         return [
             {
                 "timestamp": "2024-12-30 10:00:00",
+                "well_name": "Well W-12",
                 "production_rate": 850.5,
                 "moving_avg": 1000.0,
                 "pressure": 2500,
@@ -147,6 +183,7 @@ class SQLAgent:
             },
             {
                 "timestamp": "2024-12-29 10:00:00",
+                "well_name": "Well W-12",
                 "production_rate": 900.0,
                 "moving_avg": 1000.0,
                 "pressure": 2550,
@@ -156,6 +193,7 @@ class SQLAgent:
     
     def _mock_underperforming_wells(self, basin: str) -> List[Dict[str, Any]]:
         """Return mock underperforming wells data"""
+        mark_outcome("mock")
         return [
             {
                 "well_name": "Well W-12",
@@ -167,6 +205,7 @@ class SQLAgent:
     
     def _mock_maintenance_data(self) -> List[Dict[str, Any]]:
         """Return mock maintenance data"""
+        mark_outcome("mock")
         return [
             {
                 "equipment_id": "PUMP-45",
@@ -0,0 +1,277 @@
+"""
+Vector Agent - Qdrant HSE Report Search
+Semantic search over chunked safety reports with asset and date filters,
+optionally fused with BM25 over reports and incidents
+"""
+import os
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from database.connections import get_shared_qdrant_client
+from observability.metrics import mark_outcome
+from retrieval.collection import HSE_COLLECTION, build_report_filter
+from retrieval.embeddings import get_text_embedder
+from retrieval.hybrid import lexical_index, reciprocal_rank_fusion, id_boosts
+from retrieval.local_store import get_local_vector_store
+
+try:
+    from qdrant_client import models
+except ImportError:
+    models = None
+
+logger = logging.getLogger(__name__)
+
+# Chunks fetched per requested report, so several chunks of one report do
+# not crowd out other reports after de-duplication
+CHUNK_OVERFETCH = 3
+
+SNIPPET_CHARS = 300
+
+# Weight of the lexical ranking in fusion when the query names asset or
+# incident ids, which embeddings match poorly
+LEXICAL_ID_WEIGHT = 2.0
+
+
+class VectorAgent:
+    """
+    Searches HSE reports in Qdrant, or in the local memory-mapped store
+    when Qdrant is unreachable or VECTOR_BACKEND=local
+    """
+
+    def __init__(self, client=None, embedder=None, collection: str = HSE_COLLECTION,
+                 local_store=None, backend: Optional[str] = None, lexical=None):
+        self.client = client
+        self.embedder = embedder
+        self.collection = collection
+        self.local_store = local_store
+        self.lexical = lexical or lexical_index
+        if backend is None:
+            # A store passed in without a client is meant to be used directly
+            explicit_local = local_store is not None and client is None
+            backend = "local" if explicit_local else os.getenv("VECTOR_BACKEND", "qdrant")
+        self.backend = backend
+
+    def search_reports(
+        self,
+        query: str,
+        wells: Optional[List[str]] = None,
+        rigs: Optional[List[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the reports most relevant to a question
+
+        Args:
+            query: Natural language question
+            wells: Only reports about these wells
+            rigs: Only reports about these rigs
+            since: Only reports on or after this date
+            until: Only reports on or before this date
+            limit: Number of reports to return
+
+        Returns:
+            Ranked report snippets with report_id, title, well, rig,
+            report_date, snippet and score
+        """
+        return self.search_batch([{
+            "query": query, "wells": wells, "rigs": rigs,
+            "since": since, "until": until, "limit": limit
+        }])[0]
+
+    def search_batch(self, searches: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Run several report searches in one embedding call and one Qdrant request
+
+        Args:
+            searches: Dicts with query and optionally wells, rigs, since,
+                until and limit (as in search_reports)
+
+        Returns:
+            One ranked list of report snippets per search
+        """
+        logger.info(f"Searching HSE reports for {len(searches)} queries")
+
+        try:
+            embedder = self.embedder or get_text_embedder()
+            vectors = embedder.embed_queries([s["query"] for s in searches])
+            if self.backend != "local":
+                try:
+                    results = self._search_qdrant(searches, vectors)
+                    logger.info(f"Found {[len(r) for r in results]} reports")
+                    return results
+                except Exception as e:
+                    if self._local() is None:
+                        raise
+                    logger.warning(f"Qdrant search failed: {str(e)}. Using local vector store.")
+            store = self._local()
+            if store is None:
+                raise RuntimeError("Local vector store is not configured (LOCAL_VECTOR_STORE_PATH)")
+            hits = store.search_batch(
+                vectors,
+                filters=searches,
+                limits=[s.get("limit", 5) * CHUNK_OVERFETCH for s in searches]
+            )
+            results = [self._rank_reports(h, s.get("limit", 5)) for s, h in zip(searches, hits)]
+            logger.info(f"Found {[len(r) for r in results]} reports (local store)")
+            return results
+        except Exception as e:
+            logger.error(f"Error searching HSE reports: {str(e)}")
+            return [self._mock_hse_reports(s) for s in searches]
+
+    def search_hybrid(
+        self,
+        query: str,
+        ids: Optional[List[str]] = None,
+        wells: Optional[List[str]] = None,
+        rigs: Optional[List[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Find reports and incidents by fusing vector and BM25 rankings
+
+        Falls back to search_reports while the lexical index is not loaded.
+
+        Args:
+            query: Natural language question
+            ids: Asset and incident ids recognized in the question; they
+                are boosted in BM25 and give its ranking more weight
+            wells, rigs, since, until, limit: As in search_reports
+
+        Returns:
+            Ranked reports and incidents as in search_reports, each with a
+            kind ("report" or "incident") and the fused score
+        """
+        index = self.lexical.current()
+        vector_hits = self.search_reports(query, wells, rigs, since, until, limit * CHUNK_OVERFETCH)
+        if index is None:
+            return [{**hit, "kind": "report"} for hit in vector_hits[:limit]]
+
+        lexical_keys = index.search(
+            query,
+            limit * CHUNK_OVERFETCH,
+            boost_terms=id_boosts(ids or []),
+            wells=wells,
+            rigs=rigs,
+            since=since,
+            until=until
+        )
+        lexical_hits = self._lexical_hits(lexical_keys, limit * CHUNK_OVERFETCH)
+        logger.info(f"Fusing {len(vector_hits)} vector and {len(lexical_hits)} lexical hits")
+
+        hits = {hit["report_id"]: {**hit, "kind": "report"} for hit in vector_hits}
+        for hit in lexical_hits:
+            hits.setdefault(hit["report_id"], hit)
+        fused = reciprocal_rank_fusion(
+            [[h["report_id"] for h in vector_hits], [h["report_id"] for h in lexical_hits]],
+            weights=[1.0, LEXICAL_ID_WEIGHT if ids else 1.0]
+        )
+        return [{**hits[key], "score": round(score, 4)} for key, score in fused[:limit]]
+
+    def _lexical_hits(self, keys: List[tuple], limit: int) -> List[Dict[str, Any]]:
+        """Incident payloads and best chunk per report for BM25 hits, in rank order"""
+        chunk_ids = [key for key, _ in keys if self.lexical.incident(key) is None]
+        payloads = {}
+        if chunk_ids:
+            try:
+                client = self.client or get_shared_qdrant_client()
+                points = client.retrieve(collection_name=self.collection, ids=chunk_ids, with_payload=True)
+                payloads = {str(p.id): p.payload or {} for p in points}
+            except Exception as e:
+                logger.warning(f"Report chunks for lexical hits not fetched: {str(e)}")
+
+        hits: Dict[str, Dict[str, Any]] = {}
+        for key, score in keys:
+            incident = self.lexical.incident(key)
+            if incident is not None:
+                hit = {**incident, "kind": "incident"}
+            elif key in payloads:
+                payload = payloads[key]
+                hit = {
+                    "report_id": payload.get("report_id", key),
+                    "title": payload.get("title"),
+                    "well": payload.get("well"),
+                    "rig": payload.get("rig"),
+                    "report_date": payload.get("report_date"),
+                    "snippet": _snippet(payload.get("text", "")),
+                    "kind": "report"
+                }
+            else:
+                continue
+            if hit["report_id"] not in hits:
+                hits[hit["report_id"]] = {**hit, "score": round(score, 4)}
+            if len(hits) == limit:
+                break
+        return list(hits.values())
+
+    def _search_qdrant(self, searches: List[Dict[str, Any]], vectors) -> List[List[Dict[str, Any]]]:
+        client = self.client or get_shared_qdrant_client()
+        requests = [
+            models.QueryRequest(
+                query=vector.tolist(),
+                filter=build_report_filter(s.get("wells"), s.get("rigs"), s.get("since"), s.get("until")),
+                limit=s.get("limit", 5) * CHUNK_OVERFETCH,
+                with_payload=True
+            )
+            for s, vector in zip(searches, vectors)
+        ]
+        responses = client.query_batch_points(collection_name=self.collection, requests=requests)
+        return [
+            self._rank_reports(response.points, s.get("limit", 5))
+            for s, response in zip(searches, responses)
+        ]
+
+    def _local(self):
+        if self.local_store is None:
+            self.local_store = get_local_vector_store()
+        return self.local_store
+
+    def _rank_reports(self, points, limit: int) -> List[Dict[str, Any]]:
+        """Best-scoring chunk per report, highest score first"""
+        reports: Dict[str, Dict[str, Any]] = {}
+        for point in points:
+            payload = point.payload or {}
+            report_id = payload.get("report_id", str(point.id))
+            if report_id in reports:
+                continue
+            reports[report_id] = {
+                "report_id": report_id,
+                "title": payload.get("title"),
+                "well": payload.get("well"),
+                "rig": payload.get("rig"),
+                "report_date": payload.get("report_date"),
+                "snippet": _snippet(payload.get("text", "")),
+                "score": round(float(point.score), 4)
+            }
+            if len(reports) == limit:
+                break
+        return list(reports.values())
+
+    def _mock_hse_reports(self, search: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Mock data for testing without database"""
+        mark_outcome("mock")
+        rigs = search.get("rigs") or ["Rig Alpha"]
+        wells = search.get("wells") or ["Well W-12"]
+        return [
+            {
+                "report_id": "HSE-2024-117",
+                "title": "Pressure release during pump maintenance",
+                "well": wells[0],
+                "rig": rigs[0],
+                "report_date": "2024-12-28T14:30:00Z",
+                "snippet": "Pressure sensor P-101 reported readings above the operating envelope "
+                           "before the pump seal failed; the crew isolated the line and no injuries occurred.",
+                "score": 0.8123
+            }
+        ][:search.get("limit", 5)]
+
+
+def _snippet(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) <= SNIPPET_CHARS:
+        return text
+    return text[:SNIPPET_CHARS].rsplit(" ", 1)[0] + " ..."
@@ -0,0 +1,14 @@
+"""
+Vectorized analytics over oilfield events and time series
+"""
+from .correlation import IncidentAnomalyCorrelator, correlate_records
+from .downsample import DOWNSAMPLE_MODES, downsample_rows, lttb_indices, minmax_indices
+
+__all__ = [
+    "IncidentAnomalyCorrelator",
+    "correlate_records",
+    "DOWNSAMPLE_MODES",
+    "downsample_rows",
+    "lttb_indices",
+    "minmax_indices"
+]
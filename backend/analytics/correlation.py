@@ -0,0 +1,259 @@
+"""
+Incident / Anomaly Correlation Engine
+Temporal interval join between incidents and sensor anomalies per well
+"""
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_WEIGHTS = {"CRITICAL": 4.0, "HIGH": 3.0, "MEDIUM": 2.0, "LOW": 1.0}
+
+# Lag histogram resolution used for median / p90 estimates
+LAG_BIN_SECONDS = 900
+
+
+class IncidentAnomalyCorrelator:
+    """
+    Matches incidents with sensor anomalies on the same well within a window
+
+    Events are encoded as (well, time) keys in a single sorted int64 array,
+    so finding the anomalies of one incident is two binary searches instead
+    of a scan. Incidents are processed in chunks; only the top-k pairs by
+    score are kept, and lag statistics per anomaly group are accumulated
+    in fixed-size histograms, so memory does not grow with the number of
+    matched pairs.
+    """
+
+    def __init__(
+        self,
+        lookback_hours: float = 168,
+        lookahead_hours: float = 24,
+        top_k: int = 100,
+        chunk_size: int = 100000
+    ):
+        """
+        Args:
+            lookback_hours: How long before an incident an anomaly still counts
+            lookahead_hours: How long after an incident an anomaly still counts
+            top_k: Number of ranked pairs to return
+            chunk_size: Incidents processed per vectorized batch
+        """
+        self.lookback = int(lookback_hours * 3600)
+        self.lookahead = int(lookahead_hours * 3600)
+        self.top_k = top_k
+        self.chunk_size = chunk_size
+
+    def correlate(
+        self,
+        incident_wells: np.ndarray,
+        incident_times: np.ndarray,
+        anomaly_wells: np.ndarray,
+        anomaly_times: np.ndarray,
+        anomaly_groups: Optional[np.ndarray] = None,
+        incident_weights: Optional[np.ndarray] = None
+    ) -> Dict[str, Any]:
+        """
+        Join incidents and anomalies on well and time window
+
+        Args:
+            incident_wells: Integer well codes per incident
+            incident_times: Epoch seconds per incident
+            anomaly_wells: Integer well codes per anomaly (same coding)
+            anomaly_times: Epoch seconds per anomaly
+            anomaly_groups: Integer group per anomaly for lag statistics
+                (e.g. sensor type); defaults to a single group
+            incident_weights: Ranking weight per incident (e.g. severity)
+
+        Returns:
+            Dictionary with top-k pair indices, lags and scores, the total
+            number of matched pairs, and lag statistics per group
+        """
+        incident_wells = np.asarray(incident_wells, dtype=np.int64)
+        incident_times = np.asarray(incident_times, dtype=np.int64)
+        anomaly_wells = np.asarray(anomaly_wells, dtype=np.int64)
+        anomaly_times = np.asarray(anomaly_times, dtype=np.int64)
+        if anomaly_groups is None:
+            anomaly_groups = np.zeros(len(anomaly_times), dtype=np.int64)
+        anomaly_groups = np.asarray(anomaly_groups, dtype=np.int64)
+        if incident_weights is None:
+            incident_weights = np.ones(len(incident_times))
+        incident_weights = np.asarray(incident_weights, dtype=np.float64)
+
+        groups = int(anomaly_groups.max()) + 1 if len(anomaly_groups) else 0
+        bins = (self.lookback + self.lookahead) // LAG_BIN_SECONDS + 1
+        stats = _LagStats(groups, bins, self.lookahead)
+        empty = {
+            "incident_index": np.empty(0, dtype=np.int64),
+            "anomaly_index": np.empty(0, dtype=np.int64),
+            "lag_seconds": np.empty(0, dtype=np.int64),
+            "score": np.empty(0),
+            "total_pairs": 0,
+            "lag_stats": stats.summary()
+        }
+        if not len(incident_times) or not len(anomaly_times):
+            return empty
+
+        # One sortable key per event: well in the high bits, time offset below
+        origin = min(incident_times.min(), anomaly_times.min()) - self.lookback - self.lookahead
+        shift = np.int64(1) << 34  # ~544 years of seconds
+        order = np.argsort(anomaly_wells * shift + (anomaly_times - origin), kind="stable")
+        keys = (anomaly_wells * shift + (anomaly_times - origin))[order]
+
+        best_idx = [np.empty(0, dtype=np.int64)] * 3
+        best_score = np.empty(0)
+        total = 0
+
+        for start in range(0, len(incident_times), self.chunk_size):
+            inc = np.arange(start, min(start + self.chunk_size, len(incident_times)))
+            base = incident_wells[inc] * shift + (incident_times[inc] - origin)
+            lo = np.searchsorted(keys, base - self.lookback, side="left")
+            hi = np.searchsorted(keys, base + self.lookahead, side="right")
+            counts = hi - lo
+            n = int(counts.sum())
+            if n == 0:
+                continue
+            total += n
+
+            # Expand (incident, anomaly) pairs without a Python loop
+            pair_inc = np.repeat(inc, counts)
+            offsets = np.arange(n) - np.repeat(np.cumsum(counts) - counts, counts)
+            pair_anom = order[np.repeat(lo, counts) + offsets]
+            lag = incident_times[pair_inc] - anomaly_times[pair_anom]
+
+            side = np.where(lag >= 0, max(self.lookback, 1), max(self.lookahead, 1))
+            score = incident_weights[pair_inc] * (1.0 - np.abs(lag) / side)
+            stats.add(anomaly_groups[pair_anom], lag)
+
+            best_idx, best_score = _merge_top_k(
+                best_idx, best_score, (pair_inc, pair_anom, lag), score, self.top_k
+            )
+
+        ranked = np.argsort(-best_score, kind="stable")
+        return {
+            "incident_index": best_idx[0][ranked],
+            "anomaly_index": best_idx[1][ranked],
+            "lag_seconds": best_idx[2][ranked],
+            "score": best_score[ranked],
+            "total_pairs": total,
+            "lag_stats": stats.summary()
+        }
+
+
+class _LagStats:
+    """Per-group count, mean, min/max and histogram of lags"""
+
+    def __init__(self, groups: int, bins: int, lookahead: int):
+        self.lookahead = lookahead
+        self.count = np.zeros(groups, dtype=np.int64)
+        self.total = np.zeros(groups)
+        self.low = np.full(groups, np.iinfo(np.int64).max)
+        self.high = np.full(groups, np.iinfo(np.int64).min)
+        self.hist = np.zeros((groups, bins), dtype=np.int64)
+
+    def add(self, groups: np.ndarray, lags: np.ndarray) -> None:
+        self.count += np.bincount(groups, minlength=len(self.count))
+        self.total += np.bincount(groups, weights=lags, minlength=len(self.count))
+        np.minimum.at(self.low, groups, lags)
+        np.maximum.at(self.high, groups, lags)
+        width = self.hist.shape[1]
+        bins = np.clip((lags + self.lookahead) // LAG_BIN_SECONDS, 0, width - 1)
+        flat = np.bincount(groups * width + bins, minlength=self.hist.size)
+        self.hist += flat.reshape(self.hist.shape)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        rows = []
+        for g in np.nonzero(self.count)[0]:
+            cumulative = np.cumsum(self.hist[g])
+            n = self.count[g]
+
+            def quantile(q):
+                b = int(np.searchsorted(cumulative, q * n))
+                return ((b + 0.5) * LAG_BIN_SECONDS - self.lookahead) / 3600
+
+            rows.append({
+                "group": int(g),
+                "pairs": int(n),
+                "mean_lag_hours": round(self.total[g] / n / 3600, 2),
+                "median_lag_hours": round(quantile(0.5), 2),
+                "p90_lag_hours": round(quantile(0.9), 2),
+                "min_lag_hours": round(self.low[g] / 3600, 2),
+                "max_lag_hours": round(self.high[g] / 3600, 2)
+            })
+        return rows
+
+
+def _merge_top_k(best_idx, best_score, idx, score, k) -> Tuple[List[np.ndarray], np.ndarray]:
+    idx = [np.concatenate([b, i]) for b, i in zip(best_idx, idx)]
+    score = np.concatenate([best_score, score])
+    if len(score) > k:
+        keep = np.argpartition(-score, k - 1)[:k]
+        idx = [i[keep] for i in idx]
+        score = score[keep]
+    return idx, score
+
+
+def correlate_records(
+    incidents: List[Dict[str, Any]],
+    anomalies: List[Dict[str, Any]],
+    correlator: Optional[IncidentAnomalyCorrelator] = None
+) -> Dict[str, Any]:
+    """
+    Correlate incident and anomaly records (as returned by GraphAgent)
+
+    Args:
+        incidents: Dicts with incident, severity, well, incident_time and
+            incident_epoch (epoch seconds)
+        anomalies: Dicts with sensor, type, well, anomaly_time and
+            anomaly_epoch (epoch seconds)
+        correlator: Engine to use; a default one is created if omitted
+
+    Returns:
+        Dictionary with ranked correlations and lag statistics per sensor type
+    """
+    correlator = correlator or IncidentAnomalyCorrelator()
+    wells: Dict[str, int] = {}
+    types: Dict[str, int] = {}
+
+    def code(table: Dict[str, int], value: Any) -> int:
+        return table.setdefault(value, len(table))
+
+    result = correlator.correlate(
+        np.array([code(wells, i["well"]) for i in incidents], dtype=np.int64),
+        np.array([i["incident_epoch"] for i in incidents], dtype=np.int64),
+        np.array([code(wells, a["well"]) for a in anomalies], dtype=np.int64),
+        np.array([a["anomaly_epoch"] for a in anomalies], dtype=np.int64),
+        np.array([code(types, a.get("type")) for a in anomalies], dtype=np.int64),
+        np.array([SEVERITY_WEIGHTS.get(str(i.get("severity")).upper(), 1.0) for i in incidents])
+    )
+
+    type_names = {v: k for k, v in types.items()}
+    correlations = []
+    for i, a, lag, score in zip(
+        result["incident_index"], result["anomaly_index"], result["lag_seconds"], result["score"]
+    ):
+        incident = incidents[i]
+        anomaly = anomalies[a]
+        correlations.append({
+            "incident": incident["incident"],
+            "severity": incident.get("severity"),
+            "well": incident["well"],
+            "sensor": anomaly["sensor"],
+            "type": anomaly.get("type"),
+            "incident_time": incident["incident_time"],
+            "anomaly_time": anomaly["anomaly_time"],
+            "lag_hours": round(int(lag) / 3600, 2),
+            "score": round(float(score), 4)
+        })
+
+    lag_stats = [
+        {"type": type_names[row.pop("group")], **row}
+        for row in result["lag_stats"]
+    ]
+    return {
+        "correlations": correlations,
+        "total_pairs": result["total_pairs"],
+        "lag_stats": lag_stats
+    }
@@ -0,0 +1,224 @@
+"""
+Time Series Downsampling
+Chart-sized production series that keep the shape of the full data
+
+Two modes pick a subset of the original points (rows are returned as they
+are, never averaged):
+
+    lttb    Largest-Triangle-Three-Buckets: the first and last points plus
+            one point per bucket, the one spanning the largest triangle with
+            the point kept before it and the mean of the next bucket. Close
+            to what the eye sees on a line chart at `points` points.
+    minmax  The lowest and highest point of every bucket of equal time span
+            (two per pixel column of a chart `points` / 2 wide), plus the
+            first and last points. Every drop and spike of the full series
+            survives.
+
+Rows are grouped into series by well or sensor and each series is reduced
+to at most `points` rows, so a chart gets the same resolution per line.
+Series that are already short enough are kept whole, which also makes
+downsampling an already downsampled payload a no-op.
+"""
+import warnings
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+DOWNSAMPLE_MODES = ("lttb", "minmax")
+
+# Columns recognized in result rows, in order of preference
+TIME_COLUMNS = ("timestamp", "time", "date")
+VALUE_COLUMNS = ("production_rate", "value", "avg_production")
+SERIES_COLUMNS = ("well_name", "sensor_id", "well", "rig_name")
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, offsets: np.ndarray, points: int) -> np.ndarray:
+    """
+    LTTB selection over several series at once
+
+    Buckets are processed in order (each choice depends on the point kept
+    in the previous bucket), with every series handled in the same numpy
+    operation, so the Python loop runs `points` times whatever the number
+    of series.
+
+    Args:
+        x: Concatenated x values, ascending within each series
+        y: Concatenated y values (NaN points are only kept as bucket ends)
+        offsets: Start of every series in x and y, plus the total length
+        points: Points to keep per series (at least 3)
+
+    Returns:
+        Sorted indices into x and y of the kept points
+    """
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    long = lengths > points
+    kept = [np.arange(s, s + n) for s, n in zip(starts[~long], lengths[~long])]
+    if long.any():
+        kept.append(_lttb_long(x, y, starts[long], lengths[long], points).ravel())
+    return np.sort(np.concatenate(kept)) if kept else np.zeros(0, dtype=np.int64)
+
+
+def _lttb_long(x: np.ndarray, y: np.ndarray, starts: np.ndarray, lengths: np.ndarray, points: int) -> np.ndarray:
+    buckets = points - 2
+    every = (lengths - 2) / buckets
+    # Bucket j of a series covers local indices [edges[j], edges[j + 1])
+    edges = (np.floor(np.arange(buckets + 1)[None, :] * every[:, None]) + 1).astype(np.int64)
+    edges[:, -1] = lengths - 1
+    bounds = starts[:, None] + edges
+
+    # Mean of every bucket (and of the last point, the "next bucket" of the last one), NaNs skipped
+    finite = ~np.isnan(y)
+    cx = np.concatenate(([0.0], np.cumsum(np.where(finite, x, 0.0))))
+    cy = np.concatenate(([0.0], np.cumsum(np.where(finite, y, 0.0))))
+    cn = np.concatenate(([0], np.cumsum(finite)))
+    last = (starts + lengths - 1)[:, None]
+    lo = np.concatenate((bounds[:, 1:-1], last), axis=1)
+    hi = np.concatenate((bounds[:, 2:], last + 1), axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        count = cn[hi] - cn[lo]
+        mean_x = (cx[hi] - cx[lo]) / count
+        mean_y = (cy[hi] - cy[lo]) / count
+
+    series = np.arange(len(starts))
+    width = int((bounds[:, 1:] - bounds[:, :-1]).max())
+    columns = np.arange(width)
+    kept = np.empty((len(starts), points), dtype=np.int64)
+    kept[:, 0], kept[:, -1] = starts, last[:, 0]
+    a = starts
+    for j in range(buckets):
+        size = bounds[:, j + 1] - bounds[:, j]
+        valid = columns[None, :] < size[:, None]
+        candidates = np.where(valid, bounds[:, j, None] + columns, bounds[:, j, None])
+        ax, ay = x[a, None], y[a, None]
+        bx, by = x[candidates], y[candidates]
+        area = np.abs((ax - mean_x[:, j, None]) * (by - ay) - (ax - bx) * (mean_y[:, j, None] - ay))
+        area = np.where(valid & ~np.isnan(area), area, -1.0)
+        a = candidates[series, area.argmax(axis=1)]
+        kept[:, j + 1] = a
+    return kept
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, offsets: np.ndarray, points: int) -> np.ndarray:
+    """
+    Min/max-per-bucket selection over several series at once
+
+    Each series' time range is cut into (points - 2) // 2 buckets of equal
+    span; a bucket keeps its lowest and highest point, empty buckets keep
+    nothing. Fully vectorized: points are already ordered by series and
+    time, so buckets are contiguous runs reduced with `reduceat`.
+
+    Args:
+        x: Concatenated x values, ascending within each series
+        y: Concatenated y values (NaN points are only kept as series ends)
+        offsets: Start of every series in x and y, plus the total length
+        points: Points to keep per series (at least 3)
+
+    Returns:
+        Sorted indices into x and y of the kept points
+    """
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    buckets = max((points - 2) // 2, 1)
+    series = np.repeat(np.arange(len(starts)), lengths)
+    first, last = x[starts], x[offsets[1:] - 1]
+    span = (last - first)[series]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        position = np.where(span > 0, (x - first[series]) / span, 0.0)
+    bucket = np.minimum((position * buckets).astype(np.int64), buckets - 1)
+
+    # A run starts at every new series or bucket; short series keep every point
+    new = ~np.repeat(lengths > points, lengths)
+    new[0] = True
+    new[1:] |= (series[1:] != series[:-1]) | (bucket[1:] != bucket[:-1])
+    runs = np.flatnonzero(new)
+    run = np.cumsum(new) - 1
+
+    finite = ~np.isnan(y)
+    kept = [starts, offsets[1:] - 1]
+    for key, reduce in ((np.where(finite, y, np.inf), np.minimum), (np.where(finite, y, -np.inf), np.maximum)):
+        extreme = reduce.reduceat(key, runs)
+        hits = np.flatnonzero(key == extreme[run])
+        # First point of each run that reaches the extreme
+        kept.append(hits[np.concatenate(([True], run[hits][1:] != run[hits][:-1]))])
+    return np.unique(np.concatenate(kept))
+
+
+SELECTORS = {"lttb": lttb_indices, "minmax": minmax_indices}
+
+
+def downsample_rows(rows: List[Dict[str, Any]], points: int, mode: str = "lttb",
+                    time_column: Optional[str] = None, value_column: Optional[str] = None,
+                    series_column: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Reduce every series in a list of result rows to at most `points` rows
+
+    Columns not given are recognized from the first row (TIME_COLUMNS,
+    VALUE_COLUMNS, SERIES_COLUMNS); without a series column all rows are
+    one series. Kept rows stay in their original order.
+
+    Args:
+        rows: Result rows (dicts), in any order
+        points: Rows to keep per series (at least 3)
+        mode: "lttb" or "minmax"
+        time_column: x column (datetimes, ISO strings or numbers)
+        value_column: y column (numbers, None for missing)
+        series_column: Column that tells the series apart
+
+    Returns:
+        (rows, summary); summary is None when the rows are not a time series
+        or nothing had to be dropped
+    """
+    if len(rows) <= points or not isinstance(rows[0], dict):
+        return rows, None
+    first = rows[0]
+    time_column = time_column or next((c for c in TIME_COLUMNS if c in first), None)
+    value_column = value_column or next((c for c in VALUE_COLUMNS if c in first), None)
+    series_column = series_column or next((c for c in SERIES_COLUMNS if c in first), None)
+    if time_column is None or value_column is None:
+        return rows, None
+
+    x = _seconds([row.get(time_column) for row in rows])
+    try:
+        y = np.array([row.get(value_column) for row in rows], dtype=float)
+    except (TypeError, ValueError):
+        return rows, None
+    if x is None or np.isnan(x).any():
+        return rows, None
+
+    if series_column:
+        keys = [row.get(series_column) for row in rows]
+        codes = {key: i for i, key in enumerate(dict.fromkeys(keys))}
+        series = np.fromiter(map(codes.__getitem__, keys), dtype=np.int64, count=len(rows))
+    else:
+        series = np.zeros(len(rows), dtype=np.int64)
+    order = np.lexsort((x, series))
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(series))))
+    kept = np.sort(order[SELECTORS[mode](x[order], y[order], offsets, points)])
+    if len(kept) == len(rows):
+        return rows, None
+    summary = {"mode": mode, "points": points, "series": len(offsets) - 1,
+               "rows": len(rows), "returned": len(kept)}
+    return [rows[i] for i in kept.tolist()], summary
+
+
+def _seconds(values: List[Any]) -> Optional[np.ndarray]:
+    """Timestamps as float seconds (NaN where missing), None when not recognized"""
+    sample = next((v for v in values if v is not None), None)
+    if isinstance(sample, datetime):
+        # Faster than numpy's conversion for timezone-aware values
+        return np.array([v.timestamp() if v is not None else np.nan for v in values])
+    if isinstance(sample, str):
+        try:
+            with warnings.catch_warnings():
+                # numpy warns about (and applies) UTC offsets in ISO strings
+                warnings.simplefilter("ignore")
+                stamps = np.array(values, dtype="datetime64[us]")
+        except ValueError:
+            return None
+        seconds = stamps.astype(np.int64) / 1e6
+        seconds[np.isnat(stamps)] = np.nan
+        return seconds
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):
+        return None
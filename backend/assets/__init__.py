@@ -0,0 +1,12 @@
+"""
+In-process asset hierarchy structures
+"""
+from .snapshot import AssetSnapshot, AssetSnapshotManager, asset_snapshot
+from .traversal import bounded_impact_traversal
+
+__all__ = [
+    "AssetSnapshot",
+    "AssetSnapshotManager",
+    "asset_snapshot",
+    "bounded_impact_traversal"
+]
@@ -0,0 +1,326 @@
+"""
+Asset Closure Index
+Materialized ancestor/descendant pairs for O(1) roll-ups and reverse lookups
+"""
+import logging
+import threading
+from collections import deque
+from typing import List, Dict, Any, Optional, Set, Tuple, Iterable
+
+logger = logging.getLogger(__name__)
+
+# (label, asset id): names are only unique within a label
+AssetKey = Tuple[str, Any]
+
+
+class ClosureIndex:
+    """
+    Closure table over the asset hierarchy (a DAG keyed by label and asset id)
+
+    Every (ancestor, descendant) pair is stored with its shortest depth, in
+    both directions. Descendants are bucketed by type, so "all sensors in
+    the Permian" is a single dictionary lookup, and "which basin owns G-40"
+    scans at most the depth of the hierarchy. An asset can have several
+    parents (shared equipment); inserts, re-parenting and removals
+    recompute only the affected asset and what lies below it, and record
+    which descendants changed, so the Postgres copy can be patched
+    incrementally.
+    """
+
+    def __init__(self):
+        self.parents: Dict[AssetKey, Set[AssetKey]] = {}
+        self.children: Dict[AssetKey, Set[AssetKey]] = {}
+        self.ancestors: Dict[AssetKey, Dict[AssetKey, int]] = {}
+        self.descendants: Dict[AssetKey, Dict[str, Dict[AssetKey, int]]] = {}
+        # Asset id -> keys, for lookups that do not name the label
+        self.by_id: Dict[Any, Set[AssetKey]] = {}
+        self._dirty: Set[AssetKey] = set()
+        self._removed: Set[AssetKey] = set()
+        self._full_sync = True
+        # Readers run on request threads while the snapshot refresher mutates
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def __contains__(self, key: AssetKey) -> bool:
+        return key in self.parents
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "ClosureIndex":
+        """Build the index from an AssetSnapshot"""
+        index = cls()
+        keys = {}
+        for i in range(len(snapshot)):
+            asset_id = snapshot.asset_id(i)
+            if asset_id is not None:
+                keys[i] = (snapshot.label(i), asset_id)
+                index._add(keys[i])
+        for i, key in keys.items():
+            for p in snapshot.parents(i).tolist():
+                parent = keys.get(p)
+                if parent is not None:
+                    index.parents[key].add(parent)
+                    index.children[parent].add(key)
+        index._recompute(index.parents)
+        index._full_sync = True
+        return index
+
+    def keys_of(self, asset_id: Any, label: Optional[str] = None) -> List[AssetKey]:
+        """Keys of the assets with this id (one per label that uses it)"""
+        if label is not None:
+            return [(label, asset_id)] if (label, asset_id) in self.parents else []
+        return list(self.by_id.get(asset_id, ()))
+
+    def descendants_of(self, asset_id: Any, asset_type: Optional[str] = None,
+                       label: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Roll-up: every asset below `asset_id`, optionally of one type
+
+        Args:
+            asset_id: Ancestor asset id (e.g. "Permian")
+            asset_type: Restrict to one label (e.g. "Sensor")
+            label: Label of the ancestor, when the id alone is ambiguous
+
+        Returns:
+            Rows with asset_id, asset_type and depth
+        """
+        with self._lock:
+            found: Dict[AssetKey, int] = {}
+            for anchor in self.keys_of(asset_id, label):
+                buckets = self.descendants[anchor]
+                for t in ([asset_type] if asset_type else list(buckets)):
+                    for d, depth in buckets.get(t, {}).items():
+                        found[d] = min(depth, found.get(d, depth))
+            return [{"asset_id": d[1], "asset_type": d[0], "depth": depth} for d, depth in found.items()]
+
+    def ancestors_of(self, asset_id: Any, asset_type: Optional[str] = None,
+                     label: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Reverse lookup: every asset above `asset_id`, nearest first
+
+        Args:
+            asset_id: Descendant asset id (e.g. "G-40")
+            asset_type: Restrict to one label (e.g. "Basin")
+            label: Label of the descendant, when the id alone is ambiguous
+
+        Returns:
+            Rows with asset_id, asset_type and depth
+        """
+        with self._lock:
+            found: Dict[AssetKey, int] = {}
+            for anchor in self.keys_of(asset_id, label):
+                for a, depth in self.ancestors[anchor].items():
+                    if asset_type is None or a[0] == asset_type:
+                        found[a] = min(depth, found.get(a, depth))
+            rows = [{"asset_id": a[1], "asset_type": a[0], "depth": depth} for a, depth in found.items()]
+            return sorted(rows, key=lambda row: row["depth"])
+
+    def insert(self, key: AssetKey, parents: Iterable[AssetKey] = ()) -> None:
+        """Add an asset under `parents`; an existing asset is re-parented instead"""
+        with self._lock:
+            parents = set(parents)
+            missing = [p for p in parents if p not in self.parents]
+            if missing:
+                raise KeyError(f"Unknown parent asset: {missing[0]}")
+            if key not in self.parents:
+                self._add(key)
+                self._dirty.add(key)
+            self.set_parents(key, parents)
+
+    def set_parents(self, key: AssetKey, parents: Iterable[AssetKey]) -> None:
+        """Replace the parents of an asset; its whole subtree follows"""
+        with self._lock:
+            parents = set(parents)
+            if self.parents[key] == parents:
+                return
+            for p in parents:
+                if p not in self.parents:
+                    raise KeyError(f"Unknown parent asset: {p}")
+                if p == key or key in self.ancestors[p]:
+                    raise ValueError(f"Placing {key} under {p} would create a cycle")
+            for p in self.parents[key] - parents:
+                self.children[p].discard(key)
+            for p in parents - self.parents[key]:
+                self.children[p].add(key)
+            self.parents[key] = parents
+            self._recompute(self._subtree(key))
+
+    def add_parent(self, key: AssetKey, parent: AssetKey) -> None:
+        """Link an asset under one more parent (e.g. shared equipment)"""
+        with self._lock:
+            self.set_parents(key, self.parents[key] | {parent})
+
+    def remove_parent(self, key: AssetKey, parent: AssetKey) -> None:
+        """Unlink an asset from one of its parents"""
+        with self._lock:
+            self.set_parents(key, self.parents[key] - {parent})
+
+    def move(self, key: AssetKey, new_parent: Optional[AssetKey]) -> None:
+        """Re-parent an asset under a single parent (or none)"""
+        self.set_parents(key, [new_parent] if new_parent is not None else [])
+
+    def remove(self, key: AssetKey) -> None:
+        """
+        Remove an asset and the descendants that hang only below it
+
+        Descendants that still have a parent outside the removed part stay,
+        with their closure recomputed.
+        """
+        with self._lock:
+            if key not in self.parents:
+                return
+            subtree = self._subtree(key)
+            removed = {key}
+            for s in self._topological(subtree):
+                if s != key and self.parents[s] <= removed:
+                    removed.add(s)
+            for r in removed:
+                for p in self.parents[r] - removed:
+                    self.children[p].discard(r)
+                for c in self.children[r] - removed:
+                    self.parents[c].discard(r)
+                for a in self.ancestors[r]:
+                    if a not in removed:
+                        self.descendants[a].get(r[0], {}).pop(r, None)
+            for r in removed:
+                del self.parents[r], self.children[r], self.ancestors[r], self.descendants[r]
+                ids = self.by_id[r[1]]
+                ids.discard(r)
+                if not ids:
+                    del self.by_id[r[1]]
+                self._dirty.discard(r)
+                self._removed.add(r)
+            self._recompute(subtree - removed)
+
+    def take_changes(self) -> Tuple[bool, Set[AssetKey], Set[AssetKey]]:
+        """
+        Return and reset pending changes for the persisted copy
+
+        Returns:
+            (full, changed descendant keys, removed keys); when `full` is
+            true the persisted copy should be replaced entirely
+        """
+        with self._lock:
+            changes = (self._full_sync, self._dirty, self._removed)
+            self._full_sync = False
+            self._dirty = set()
+            self._removed = set()
+            return changes
+
+    def rows_for(self, descendants: Iterable[AssetKey]) -> List[Tuple[Any, str, Any, str, int]]:
+        """(ancestor_id, ancestor_type, descendant_id, descendant_type, depth) rows"""
+        with self._lock:
+            return [
+                (a[1], a[0], s[1], s[0], depth)
+                for s in descendants
+                if s in self.parents
+                for a, depth in self.ancestors[s].items()
+            ]
+
+    def _add(self, key: AssetKey) -> None:
+        self.parents[key] = set()
+        self.children[key] = set()
+        self.ancestors[key] = {}
+        self.descendants[key] = {}
+        self.by_id.setdefault(key[1], set()).add(key)
+        self._removed.discard(key)
+
+    def _subtree(self, key: AssetKey) -> Set[AssetKey]:
+        """The asset plus all its descendants"""
+        below = {key}
+        for bucket in self.descendants[key].values():
+            below.update(bucket)
+        return below
+
+    def _topological(self, keys: Set[AssetKey]) -> List[AssetKey]:
+        """`keys` ordered parents first (Kahn); members of a cycle are left out"""
+        waiting = {k: len(self.parents[k] & keys) for k in keys}
+        ready = deque(k for k, count in waiting.items() if count == 0)
+        order = []
+        while ready:
+            k = ready.popleft()
+            order.append(k)
+            for c in self.children[k]:
+                if c in waiting:
+                    waiting[c] -= 1
+                    if waiting[c] == 0:
+                        ready.append(c)
+        if len(order) < len(keys):
+            logger.warning(f"Asset hierarchy has a cycle through {len(keys) - len(order)} assets; left out of the closure")
+        return order
+
+    def _recompute(self, keys) -> None:
+        """
+        Recompute the ancestors of `keys`, which must include everything
+        below them; assets outside `keys` are unaffected by construction
+        """
+        for s in self._topological(set(keys)):
+            above: Dict[AssetKey, int] = {}
+            for p in self.parents[s]:
+                above[p] = 1
+            for p in self.parents[s]:
+                for a, depth in self.ancestors[p].items():
+                    if depth + 1 < above.get(a, depth + 2):
+                        above[a] = depth + 1
+            previous = self.ancestors[s]
+            if above == previous:
+                continue
+            for a in previous:
+                # Ancestors just removed have no buckets left
+                if a not in above and a in self.descendants:
+                    self.descendants[a][s[0]].pop(s, None)
+            for a, depth in above.items():
+                self.descendants[a].setdefault(s[0], {})[s] = depth
+            self.ancestors[s] = above
+            self._dirty.add(s)
+
+
+def sync_closure_to_postgres(index: ClosureIndex, conn) -> int:
+    """
+    Write pending closure changes to the asset_closure table
+
+    Args:
+        index: Closure index with pending changes
+        conn: PostgreSQL connection
+
+    Returns:
+        Number of rows written
+    """
+    from psycopg2.extras import execute_values
+
+    full, dirty, removed = index.take_changes()
+    try:
+        with conn.cursor() as cur:
+            if full:
+                cur.execute("TRUNCATE asset_closure")
+                rows = index.rows_for(list(index.parents))
+            else:
+                stale = list(dirty | removed)
+                if stale:
+                    cur.execute(
+                        "DELETE FROM asset_closure c "
+                        "USING unnest(%s::text[], %s::text[]) AS s(descendant_type, descendant_id) "
+                        "WHERE c.descendant_type = s.descendant_type AND c.descendant_id = s.descendant_id",
+                        ([s[0] for s in stale], [str(s[1]) for s in stale])
+                    )
+                rows = index.rows_for(dirty)
+            if rows:
+                execute_values(
+                    cur,
+                    "INSERT INTO asset_closure "
+                    "(ancestor_id, ancestor_type, descendant_id, descendant_type, depth) VALUES %s",
+                    rows,
+                    page_size=1000
+                )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        # Keep the changes pending so the next sync retries them
+        with index._lock:
+            index._full_sync = index._full_sync or full
+            index._dirty |= dirty
+            index._removed |= removed
+        raise
+    logger.info(f"Synced {len(rows)} asset closure rows to PostgreSQL (full={full})")
+    return len(rows)
@@ -0,0 +1,572 @@
+"""
+Shared Asset Snapshot
+Versioned, memory-mapped asset snapshot shared by every worker on a host
+
+With SHARED_STATE_DIR set (a tmpfs such as /dev/shm/oilfield, so the files
+never touch disk), one worker per host - whichever holds the lock file -
+loads the snapshot from Neo4j and publishes every change as a new version
+directory of flat files:
+
+    meta.json                           version, node and edge counts, data_at
+    labels.i8                           label code per node
+    child_offsets.i64, child_targets.i32, parent_offsets.i64, parent_targets.i32
+    node_ids.bin + node_id_offsets.i64  node id of node i at byte range i
+    props.bin + props_offsets.i64       pickled property dict of node i
+    hot_<property>.bin (+ offsets)      JSON value of a HOT_PROPERTIES entry
+    node_hashes.u64 + node_rows.i32     sorted hashes of node ids -> node
+    key_hashes.u64 + key_rows.i32       sorted hashes of (label, key) -> node
+    node_keys.bin, key_keys.bin (+ offsets)   the hashed values, in hash order
+
+The CURRENT file names the live version and the time of the leader's last
+refresh; it is replaced atomically, so a swap is one rename. The other
+workers map the files of the current version read-only (mmap, viewed as
+numpy arrays and memoryviews): all workers read the same pages, nothing is
+copied into a worker, and lookups binary-search the hash arrays instead of
+building dictionaries. The properties rows are built from (names,
+statuses, sensor types) are read from their hot columns; whole property
+dicts are unpickled on demand and kept in a small per-version LRU
+(SHARED_PROPS_CACHE_SIZE). A worker still reading a version that has been
+replaced keeps its mapping until it moves on (an unlinked file stays valid
+while mapped); the leader deletes versions older than the previous one.
+
+Property patches a worker applies after writing to Neo4j (the anomaly
+write-back's sensor flags) are appended to `patches.jsonl` as well, and
+every worker applies the new lines on each poll, so a flag reaches all
+workers within SHARED_STATE_POLL_SECONDS instead of waiting for the
+leader's next refresh and publish. A version records the time its data
+was read (data_at); patches appended after that are applied again on
+top of it, older ones are already in it and are dropped by the leader.
+
+If the leader exits, its lock is released and the next worker to poll
+takes over with a full load. Properties are stored pickled, so the
+directories must be private to the service user: they are created with
+mode 0700 and refused when another user owns them or can write to them.
+"""
+import os
+import mmap
+import json
+import time
+import stat
+import fcntl
+import pickle
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHARED_FORMAT_VERSION = 2
+
+# Properties stored in columns of their own, readable without unpickling the node's dict
+HOT_PROPERTIES = ("name", "id", "sensor_id", "sensor_type", "status", "last_reading_anomaly")
+# Hot column value of a property that is not a JSON scalar: read the dict instead
+_NOT_HOT = b"?"
+
+
+def _encode(value: Any) -> bytes:
+    """Bytes identifying a node id or (label, key), the same in every process"""
+    return value.encode() if isinstance(value, str) else repr(value).encode()
+
+
+def _hash(encoded: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "little")
+
+
+def private_directory(path: str) -> str:
+    """
+    Create a directory for shared state, or check an existing one
+
+    Every worker trusts the files in it, so it must belong to this user
+    and be closed to everyone else.
+
+    Raises:
+        PermissionError: Not a directory (symlinks included) owned by the
+            current user with no group or other permissions
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.geteuid() or info.st_mode & 0o077:
+        raise PermissionError(
+            f"{path} must be a directory owned by uid {os.geteuid()} with mode 0700 "
+            f"(uid {info.st_uid}, mode {oct(stat.S_IMODE(info.st_mode))})"
+        )
+    return path
+
+
+class _Blobs:
+    """Read-only sequence of byte strings stored back to back with an offsets array"""
+
+    def __init__(self, data: memoryview, offsets: memoryview):
+        self.data = data
+        # Python ints straight from the mapping, without numpy scalar overhead
+        self.offsets = offsets.cast("q") if len(offsets) else offsets
+
+    def __len__(self) -> int:
+        return max(len(self.offsets) - 1, 0)
+
+    def raw(self, i: int) -> bytes:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+
+class SharedNodeIds(_Blobs):
+    """Node ids of a mapped snapshot (decoded on access)"""
+
+    def __getitem__(self, i: int) -> str:
+        return self.raw(i).decode()
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+
+class SharedProps(_Blobs):
+    """
+    Property dicts of a mapped snapshot
+
+    `get` reads HOT_PROPERTIES from their columns; whole dicts are
+    unpickled on access and the last `cache_size` of them kept, so callers
+    must replace rather than mutate them. Assignments stay in this worker:
+    patches go to a local overlay, which is dropped with the version when
+    the next one is mapped.
+    """
+
+    def __init__(self, data: memoryview, offsets: memoryview, hot: Optional[Dict[str, _Blobs]] = None,
+                 cache_size: int = 4096):
+        super().__init__(data, offsets)
+        self.overlay: Dict[int, Dict[str, Any]] = {}
+        self.hot = hot or {}
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        patched = self.overlay.get(i)
+        if patched is not None:
+            return patched
+        with self._lock:
+            props = self._cache.get(i)
+            if props is not None:
+                self._cache.move_to_end(i)
+                return props
+        props = pickle.loads(self.raw(i))
+        with self._lock:
+            self._cache[i] = props
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return props
+
+    def __setitem__(self, i: int, props: Dict[str, Any]) -> None:
+        self.overlay[i] = props
+
+    def get(self, i: int, name: str, default: Any = None) -> Any:
+        """One property of node i, from its hot column when it has one"""
+        column = self.hot.get(name)
+        if column is not None and i not in self.overlay:
+            raw = column.raw(i)
+            if not raw:
+                return default
+            if raw != _NOT_HOT:
+                return json.loads(raw)
+        return self[i].get(name, default)
+
+
+def _hot_value(props: Dict[str, Any], name: str) -> bytes:
+    """Hot column entry: empty when missing, JSON for scalars, _NOT_HOT otherwise"""
+    if name not in props:
+        return b""
+    value = props[name]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return json.dumps(value).encode()
+    return _NOT_HOT
+
+
+class SharedIndex:
+    """
+    Dictionary-like lookup over sorted 64-bit hashes
+
+    A hash match is confirmed against the stored key bytes, so a collision
+    is a miss rather than a wrong node.
+    """
+
+    def __init__(self, hashes: np.ndarray, rows: np.ndarray, keys: _Blobs):
+        self.hashes = hashes
+        self.rows = rows
+        self.keys = keys
+
+    def get(self, key: Any, default: Optional[int] = None) -> Optional[int]:
+        encoded = _encode(key)
+        h = _hash(encoded)
+        pos = int(self.hashes.searchsorted(np.uint64(h)))
+        while pos < len(self.hashes) and int(self.hashes[pos]) == h:
+            if self.keys.raw(pos) == encoded:
+                return int(self.rows[pos])
+            pos += 1
+        return default
+
+    def __getitem__(self, key: Any) -> int:
+        row = self.get(key)
+        if row is None:
+            raise KeyError(key)
+        return row
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+def write_snapshot(snapshot, path: str, version: int, data_at: float = 0.0) -> None:
+    """
+    Write an AssetSnapshot as the flat files of one version directory
+
+    Args:
+        snapshot: Snapshot to write (any AssetSnapshot, mapped or not)
+        path: Directory to create
+        version: Version number recorded in meta.json
+        data_at: Epoch seconds at which the snapshot's data was read
+    """
+    from assets.snapshot import HIERARCHY_LABELS, KEY_PROPERTIES
+
+    os.makedirs(path, mode=0o700)
+
+    def save(name: str, array: np.ndarray) -> None:
+        array.tofile(os.path.join(path, name))
+
+    def save_blobs(name: str, blobs: List[bytes]) -> None:
+        offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in blobs], out=offsets[1:])
+        with open(os.path.join(path, f"{name}.bin"), "wb") as f:
+            f.write(b"".join(blobs))
+        save(f"{name}_offsets.i64", offsets)
+
+    def save_index(name: str, encoded: List[bytes], rows: np.ndarray) -> None:
+        hashes = np.fromiter((_hash(e) for e in encoded), dtype=np.uint64, count=len(encoded))
+        order = np.argsort(hashes, kind="stable")
+        save(f"{name}_hashes.u64", hashes[order])
+        save(f"{name}_rows.i32", rows[order].astype(np.int32))
+        save_blobs(f"{name}_keys", [encoded[i] for i in order.tolist()])
+
+    count = len(snapshot)
+    node_ids = [_encode(node_id) for node_id in snapshot.node_ids]
+    props = [snapshot.props[i] for i in range(count)]
+    save_blobs("node_ids", node_ids)
+    save_blobs("props", [pickle.dumps(p, protocol=pickle.HIGHEST_PROTOCOL) for p in props])
+    for name in HOT_PROPERTIES:
+        save_blobs(f"hot_{name}", [_hot_value(p, name) for p in props])
+    save("labels.i8", np.asarray(snapshot.labels, dtype=np.int8))
+    save("child_offsets.i64", np.asarray(snapshot.child_offsets, dtype=np.int64))
+    save("child_targets.i32", np.asarray(snapshot.child_targets, dtype=np.int32))
+    save("parent_offsets.i64", np.asarray(snapshot.parent_offsets, dtype=np.int64))
+    save("parent_targets.i32", np.asarray(snapshot.parent_targets, dtype=np.int32))
+
+    save_index("node", node_ids, np.arange(count))
+    keys, rows = [], []
+    for i, p in enumerate(props):
+        label = HIERARCHY_LABELS[snapshot.labels[i]]
+        key = p.get(KEY_PROPERTIES[label])
+        if key is not None:
+            keys.append(_encode((label, key)))
+            rows.append(i)
+    save_index("key", keys, np.asarray(rows, dtype=np.int64))
+
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"format": SHARED_FORMAT_VERSION, "version": version, "nodes": count,
+                   "edges": int(snapshot.edge_count), "data_at": data_at}, f)
+
+
+def open_snapshot(path: str):
+    """
+    Map the files of one version directory as an AssetSnapshot
+
+    Returns:
+        AssetSnapshot whose arrays, ids and properties are read from the
+        mapped files
+    """
+    from assets.snapshot import AssetSnapshot
+
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != SHARED_FORMAT_VERSION:
+        raise ValueError(f"Unsupported shared snapshot format {meta.get('format')} in {path}")
+
+    def view(name: str) -> memoryview:
+        with open(os.path.join(path, name), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def array(name: str, dtype) -> np.ndarray:
+        return np.frombuffer(view(name), dtype=dtype)
+
+    def blobs(name: str, cls=_Blobs):
+        return cls(view(f"{name}.bin"), view(f"{name}_offsets.i64"))
+
+    return AssetSnapshot.from_columns(
+        node_ids=blobs("node_ids", SharedNodeIds),
+        index=SharedIndex(array("node_hashes.u64", np.uint64), array("node_rows.i32", np.int32), blobs("node_keys")),
+        labels=array("labels.i8", np.int8),
+        props=SharedProps(view("props.bin"), view("props_offsets.i64"),
+                          {name: blobs(f"hot_{name}") for name in HOT_PROPERTIES},
+                          int(os.getenv("SHARED_PROPS_CACHE_SIZE", "4096"))),
+        keys=SharedIndex(array("key_hashes.u64", np.uint64), array("key_rows.i32", np.int32), blobs("key_keys")),
+        child_offsets=array("child_offsets.i64", np.int64),
+        child_targets=array("child_targets.i32", np.int32),
+        parent_offsets=array("parent_offsets.i64", np.int64),
+        parent_targets=array("parent_targets.i32", np.int32)
+    )
+
+
+class SnapshotClosure:
+    """
+    Closure lookups answered from a snapshot's CSR arrays
+
+    Workers that map a shared snapshot use this instead of building their
+    own ClosureIndex. The hierarchy is a few levels deep, so a roll-up is a
+    handful of vectorized breadth-first frontier expansions; shared
+    equipment is reached through all of its parents and reported at its
+    shortest depth. Signatures, rows and ordering follow ClosureIndex
+    (descendants grouped by type, ancestors nearest first).
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def _anchors(self, asset_id: Any, label: Optional[str] = None) -> List[int]:
+        """Nodes with this id (one per label that uses it)"""
+        from assets.snapshot import HIERARCHY_LABELS
+
+        found = (self.snapshot.lookup(l, asset_id) for l in ([label] if label is not None else HIERARCHY_LABELS))
+        return [i for i in found if i is not None]
+
+    def __contains__(self, key) -> bool:
+        label, asset_id = key
+        return self.snapshot.lookup(label, asset_id) is not None
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def _walk(self, anchors: List[int], offsets: np.ndarray, targets: np.ndarray) -> Dict[int, int]:
+        """Node -> shortest depth of everything reachable from the anchors"""
+        seen = np.zeros(len(self.snapshot), dtype=bool)
+        found = {}
+        frontier = np.asarray(anchors, dtype=np.int64)
+        depth = 0
+        while len(frontier):
+            depth += 1
+            starts = offsets[frontier]
+            counts = offsets[frontier + 1] - starts
+            total = int(counts.sum())
+            if not total:
+                break
+            positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+            frontier = np.unique(np.asarray(targets[positions], dtype=np.int64))
+            frontier = frontier[~seen[frontier]]
+            seen[frontier] = True
+            for i in frontier.tolist():
+                found[i] = depth
+        return found
+
+    def descendants_of(self, asset_id: Any, asset_type: Optional[str] = None,
+                       label: Optional[str] = None) -> List[Dict[str, Any]]:
+        snapshot = self.snapshot
+        below = self._walk(self._anchors(asset_id, label), snapshot.child_offsets, snapshot.child_targets)
+        found = {}
+        for i, depth in below.items():
+            t = snapshot.label(i)
+            if asset_type is None or t == asset_type:
+                child = snapshot.asset_id(i)
+                if child is not None:
+                    found.setdefault(t, {})[child] = depth
+        return [
+            {"asset_id": d, "asset_type": t, "depth": dist}
+            for t, bucket in found.items()
+            for d, dist in bucket.items()
+        ]
+
+    def ancestors_of(self, asset_id: Any, asset_type: Optional[str] = None,
+                     label: Optional[str] = None) -> List[Dict[str, Any]]:
+        snapshot = self.snapshot
+        above = self._walk(self._anchors(asset_id, label), snapshot.parent_offsets, snapshot.parent_targets)
+        rows = []
+        for i, depth in above.items():
+            t = snapshot.label(i)
+            if asset_type is None or t == asset_type:
+                ancestor = snapshot.asset_id(i)
+                if ancestor is not None:
+                    rows.append({"asset_id": ancestor, "asset_type": t, "depth": depth})
+        return sorted(rows, key=lambda row: row["depth"])
+
+
+def _patch_default(value):
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _patch_hook(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "$datetime" in obj:
+        return datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+class PatchLog:
+    """
+    Append-only log of property patches shared by the workers of a host
+
+    Lines are appended under an flock on a separate lock file, so the
+    leader can compact the log (replace it) without losing an append.
+    Readers keep their offset and start over when the file was replaced.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock_path = path + ".lock"
+        self._inode: Optional[int] = None
+        self._offset = 0
+
+    def append(self, label: str, updates: Dict[Any, Dict[str, Any]]) -> None:
+        """Record patches: key property value -> properties to set on nodes of `label`"""
+        line = json.dumps({"at": time.time(), "label": label, "updates": list(updates.items())},
+                          default=_patch_default) + "\n"
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def read(self, reset: bool = False) -> List[Dict[str, Any]]:
+        """
+        Entries appended since the last read (all of them with reset=True)
+
+        Returns:
+            Dicts with at (epoch seconds), label and updates ((key, props) pairs)
+        """
+        try:
+            with open(self.path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if reset or inode != self._inode or os.fstat(f.fileno()).st_size < self._offset:
+                    self._inode, self._offset = inode, 0
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            self._inode, self._offset = None, 0
+            return []
+        # A line still being appended is read next time
+        data = data[:data.rfind(b"\n") + 1]
+        self._offset += len(data)
+        entries = []
+        for line in data.splitlines():
+            try:
+                entries.append(json.loads(line, object_hook=_patch_hook))
+            except ValueError as e:
+                logger.warning(f"Skipping unreadable line of {self.path}: {str(e)}")
+        return entries
+
+    def compact(self, before: float) -> None:
+        """Drop entries older than `before` (epoch seconds)"""
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.path, "rb") as f:
+                    lines = f.readlines()
+            except FileNotFoundError:
+                return
+            keep = []
+            for line in lines:
+                try:
+                    if json.loads(line)["at"] >= before:
+                        keep.append(line)
+                except (ValueError, KeyError, TypeError):
+                    continue
+            if len(keep) == len(lines):
+                return
+            temp = f"{self.path}.{os.getpid()}"
+            with open(temp, "wb") as f:
+                f.writelines(keep)
+            os.replace(temp, self.path)
+
+
+class SharedSnapshotStore:
+    """
+    Publishing and following of snapshot versions in SHARED_STATE_DIR
+
+    Leadership is an exclusive, non-blocking flock on `leader.lock`, held
+    for the life of the process.
+    """
+
+    def __init__(self, root: str):
+        self.root = private_directory(os.path.join(private_directory(root), "asset_snapshot"))
+        self.patches = PatchLog(os.path.join(self.root, "patches.jsonl"))
+        self._lock_file = None
+
+    @property
+    def leader(self) -> bool:
+        return self._lock_file is not None
+
+    def try_lead(self) -> bool:
+        """Take leadership if no other worker holds it"""
+        if self._lock_file is not None:
+            return True
+        f = open(os.path.join(self.root, "leader.lock"), "a+")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._lock_file = f
+        logger.info(f"Asset snapshot leader for this host (pid {os.getpid()})")
+        return True
+
+    def release(self) -> None:
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def current(self) -> Optional[Dict[str, Any]]:
+        """The CURRENT pointer: version and refreshed_at (epoch seconds), or None"""
+        try:
+            with open(os.path.join(self.root, "CURRENT"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def publish(self, snapshot, data_at: float = 0.0) -> int:
+        """Write the snapshot as the next version and make it current (leader only)"""
+        pointer = self.current()
+        version = (pointer["version"] if pointer else 0) + 1
+        path = self._path(version)
+        building = f"{path}.building-{os.getpid()}"
+        shutil.rmtree(building, ignore_errors=True)
+        write_snapshot(snapshot, building, version, data_at)
+        os.rename(building, path)
+        self.heartbeat(version)
+        self._prune(version)
+        return version
+
+    def heartbeat(self, version: int) -> None:
+        """Point CURRENT at a version, stamped with the time of this refresh"""
+        temp = os.path.join(self.root, f"CURRENT.{os.getpid()}")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "refreshed_at": time.time()}, f)
+        os.replace(temp, os.path.join(self.root, "CURRENT"))
+
+    def open(self, version: int) -> Tuple[Any, Dict[str, Any]]:
+        """(mapped snapshot, meta.json) of a version"""
+        path = self._path(version)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        return open_snapshot(path), meta
+
+    def _path(self, version: int) -> str:
+        return os.path.join(self.root, f"v{version:08d}")
+
+    def _prune(self, version: int) -> None:
+        # Keep the previous version for workers that have not moved on yet
+        for name in os.listdir(self.root):
+            if name.startswith("v") and name[1:9].isdigit() and int(name[1:9]) < version - 1:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
@@ -0,0 +1,521 @@
+"""
+Asset Hierarchy Snapshot
+In-process, array-backed copy of the Basin -> Rig -> Well -> Sensor/Equipment
+graph so hot GraphAgent lookups avoid a Neo4j round trip
+"""
+import os
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+import numpy as np
+
+from assets.closure import ClosureIndex, sync_closure_to_postgres
+from assets.shared import HOT_PROPERTIES, SharedProps, SharedSnapshotStore, SnapshotClosure
+from assets.traversal import bounded_impact_traversal
+from database.connections import get_shared_neo4j_driver, get_pooled_postgres_connection
+from database.statements import statements
+
+logger = logging.getLogger(__name__)
+
+HIERARCHY_LABELS = ["Basin", "Rig", "Well", "Sensor", "Equipment"]
+HIERARCHY_RELATIONSHIPS = ["CONTAINS", "HAS_WELL", "HAS_SENSOR", "HAS_EQUIPMENT"]
+
+# Property that identifies a node of each label
+KEY_PROPERTIES = {
+    "Basin": "name",
+    "Rig": "name",
+    "Well": "name",
+    "Sensor": "sensor_id",
+    "Equipment": "id"
+}
+
+
+def _label_code(label: str) -> int:
+    return HIERARCHY_LABELS.index(label)
+
+
+def _build_csr(sources: np.ndarray, targets: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Compressed sparse row adjacency: neighbours of i are targets[offsets[i]:offsets[i + 1]]"""
+    order = np.argsort(sources, kind="stable")
+    offsets = np.zeros(size + 1, dtype=np.int32)
+    np.cumsum(np.bincount(sources, minlength=size), out=offsets[1:])
+    return offsets, targets[order].astype(np.int32)
+
+
+class AssetSnapshot:
+    """
+    Immutable structure of the asset hierarchy with per-node properties
+
+    Nodes are dense integers. Child and parent adjacency are stored as CSR
+    arrays, so a hop is a slice rather than a dictionary walk. Properties
+    can be patched in place; structural changes build a new snapshot.
+    """
+
+    def __init__(self, nodes: List[Dict[str, Any]], edges: List[Tuple[str, str, str]]):
+        """
+        Args:
+            nodes: Dicts with node_id, label and props
+            edges: (parent_node_id, rel_type, child_node_id) tuples
+        """
+        self.node_ids: List[str] = [n["node_id"] for n in nodes]
+        self.index: Dict[str, int] = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.labels = np.array([_label_code(n["label"]) for n in nodes], dtype=np.int8)
+        self.props: List[Dict[str, Any]] = [dict(n["props"]) for n in nodes]
+        self.keys: Dict[Tuple[str, Any], int] = {}
+        for i, n in enumerate(nodes):
+            key = n["props"].get(KEY_PROPERTIES[n["label"]])
+            if key is not None:
+                self.keys[(n["label"], key)] = i
+
+        known = [(p, c) for p, _, c in edges if p in self.index and c in self.index]
+        parents = np.array([self.index[p] for p, _ in known], dtype=np.int32)
+        children = np.array([self.index[c] for _, c in known], dtype=np.int32)
+        size = len(self.node_ids)
+        self.child_offsets, self.child_targets = _build_csr(parents, children, size)
+        self.parent_offsets, self.parent_targets = _build_csr(children, parents, size)
+        self.edge_count = len(known)
+
+    @classmethod
+    def from_columns(cls, node_ids, index, labels, props, keys, child_offsets, child_targets,
+                     parent_offsets, parent_targets) -> "AssetSnapshot":
+        """Snapshot over prebuilt columns, such as the mapped files of assets.shared"""
+        snapshot = cls.__new__(cls)
+        snapshot.node_ids, snapshot.index, snapshot.labels = node_ids, index, labels
+        snapshot.props, snapshot.keys = props, keys
+        snapshot.child_offsets, snapshot.child_targets = child_offsets, child_targets
+        snapshot.parent_offsets, snapshot.parent_targets = parent_offsets, parent_targets
+        snapshot.edge_count = len(child_targets)
+        return snapshot
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def lookup(self, label: str, key: Any) -> Optional[int]:
+        """Dense index of a node by label and key property"""
+        return self.keys.get((label, key))
+
+    def children(self, i: int, label: Optional[str] = None) -> np.ndarray:
+        """Child node indices, optionally restricted to one label"""
+        nodes = self.child_targets[self.child_offsets[i]:self.child_offsets[i + 1]]
+        if label is not None:
+            nodes = nodes[self.labels[nodes] == _label_code(label)]
+        return nodes
+
+    def parents(self, i: int) -> np.ndarray:
+        """Parent node indices"""
+        return self.parent_targets[self.parent_offsets[i]:self.parent_offsets[i + 1]]
+
+    def label(self, i: int) -> str:
+        return HIERARCHY_LABELS[self.labels[i]]
+
+    def prop(self, i: int, name: str, default: Any = None) -> Any:
+        """One property of a node (mapped snapshots read hot properties without the whole dict)"""
+        if isinstance(self.props, SharedProps):
+            return self.props.get(i, name, default)
+        return self.props[i].get(name, default)
+
+    def asset_id(self, i: int) -> Any:
+        """Key property of a node (name, sensor_id or id depending on label)"""
+        return self.prop(i, KEY_PROPERTIES[self.label(i)])
+
+    def display_name(self, i: int) -> Any:
+        return self.prop(i, "name", self.prop(i, "id", self.prop(i, "sensor_id")))
+
+    def faulty_equipment(self, rig_name: str) -> List[Dict[str, Any]]:
+        """Same rows as the faulty_equipment Cypher statement"""
+        rig = self.lookup("Rig", rig_name)
+        if rig is None:
+            return []
+        rows = []
+        for well in self.children(rig, "Well"):
+            for sensor in self.children(well, "Sensor"):
+                status = self.prop(sensor, "status")
+                if (status or "").lower() != "faulty" and self.prop(sensor, "last_reading_anomaly") is not True:
+                    continue
+                rows.append({
+                    "rig": rig_name,
+                    "well": self.prop(well, "name"),
+                    "sensor": self.prop(sensor, "sensor_id"),
+                    "type": self.prop(sensor, "sensor_type"),
+                    "reading": self.prop(sensor, "last_reading"),
+                    "status": status.upper() if status is not None else None
+                })
+        return rows
+
+    def equipment_by_basin(self, basin: str) -> List[Dict[str, Any]]:
+        """Same rows as the equipment_by_basin Cypher statement"""
+        node = self.lookup("Basin", basin)
+        if node is None:
+            return []
+        rows = []
+        for rig in self.children(node, "Rig"):
+            for well in self.children(rig, "Well"):
+                for sensor in self.children(well, "Sensor"):
+                    rows.append({
+                        "rig": self.prop(rig, "name"),
+                        "well": self.prop(well, "name"),
+                        "sensor": self.prop(sensor, "sensor_id"),
+                        "type": self.prop(sensor, "sensor_type"),
+                        "status": self.prop(sensor, "status")
+                    })
+        return rows
+
+    def affected_assets(
+        self,
+        equipment_id: str,
+        max_hops: int = 3,
+        limit: int = 100,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Same rows as GraphAgent.find_affected_assets"""
+        start = self.lookup("Equipment", equipment_id)
+        if start is None:
+            return []
+
+        def expand(frontier):
+            return [
+                (child, int(parent), self.label(parent), self.display_name(parent))
+                for child in frontier
+                for parent in self.parents(child)
+            ]
+
+        page = bounded_impact_traversal(
+            start, equipment_id, expand, max_hops=max_hops, limit=limit, offset=offset
+        )
+        return page["assets"]
+
+
+class AssetSnapshotManager:
+    """
+    Loads the asset snapshot from Neo4j and keeps it fresh
+
+    Refreshes are incremental: only nodes and relationships whose
+    `updated_at` is newer than the last watermark are fetched. Property
+    changes on known nodes are patched in place; new nodes or
+    relationships trigger a rebuild from the merged data. Deletions leave
+    no timestamp, so a full reload also runs every `full_reload_seconds`.
+    
+    The hierarchy is a DAG: shared equipment can hang below several
+    wells. Relationships are kept per (parent, type, child), and when a
+    child's relationships change its complete parent set is read again,
+    so a move (the loader deletes the old relationship) removes the old
+    parent without touching other ones. The closure index gets the same
+    parent sets and is mirrored to the asset_closure table for SQL joins.
+
+    With SHARED_STATE_DIR set, only the worker leading the host does the
+    above and publishes each change (assets.shared); the other workers map
+    the published version every SHARED_STATE_POLL_SECONDS and answer
+    closure lookups from its arrays. Structural changes and changes to
+    HOT_PROPERTIES (status, flags) are published at once; other
+    property-only changes are coalesced into at most one new version per
+    SHARED_STATE_REPUBLISH_SECONDS, the other refreshes only heartbeat.
+    Patches from patch_properties also go to the shared patch log, which
+    every worker (the leader included) applies every poll, so a flag the
+    anomaly write-back has just written is seen host-wide within
+    SHARED_STATE_POLL_SECONDS.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: Optional[float] = None,
+        max_age_seconds: Optional[float] = None,
+        full_reload_seconds: Optional[float] = None
+    ):
+        self.refresh_seconds = refresh_seconds or float(os.getenv("ASSET_SNAPSHOT_REFRESH_SECONDS", "30"))
+        self.max_age_seconds = max_age_seconds or float(os.getenv("ASSET_SNAPSHOT_MAX_AGE_SECONDS", "120"))
+        self.full_reload_seconds = full_reload_seconds or float(os.getenv("ASSET_SNAPSHOT_FULL_RELOAD_SECONDS", "900"))
+        self.snapshot: Optional[AssetSnapshot] = None
+        self.watermark = None
+        self.refreshed_at = 0.0
+        self.full_loaded_at = 0.0
+        self.closure = ClosureIndex()
+        self.sync_closure = os.getenv("ASSET_CLOSURE_SYNC_POSTGRES", "true").lower() == "true"
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+        # (parent node id, relationship type, child node id)
+        self._edges: Set[Tuple[str, str, str]] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.shared: Optional[SharedSnapshotStore] = None
+        self.version = 0
+        self.poll_seconds = float(os.getenv("SHARED_STATE_POLL_SECONDS", "1.0"))
+        self.republish_seconds = float(os.getenv("SHARED_STATE_REPUBLISH_SECONDS", "120"))
+        self.published_at = 0.0
+        # Property changes not in the published version yet
+        self._unpublished = False
+        # Epoch seconds at which the current snapshot's data was read; shared
+        # patches appended after that are applied on top of it
+        self.data_at = 0.0
+        self._published_data_at = 0.0
+        self._refresh_started = 0.0
+
+    @property
+    def following(self) -> bool:
+        """True when this worker maps snapshots published by another one"""
+        return self.shared is not None and not self.shared.leader
+
+    def current(self) -> Optional[AssetSnapshot]:
+        """The snapshot if it was refreshed recently enough, else None"""
+        if self.snapshot is None:
+            return None
+        if time.monotonic() - self.refreshed_at > self.max_age_seconds:
+            return None
+        return self.snapshot
+
+    def load(self) -> None:
+        """Full load of all hierarchy nodes and relationships"""
+        with self._lock:
+            data_at = time.time()
+            driver = get_shared_neo4j_driver()
+            with driver.session() as session:
+                watermark = statements.run_cypher(session, "snapshot_clock")[0]["now"]
+                nodes = statements.run_cypher(session, "snapshot_nodes", since=None)
+                edges = statements.run_cypher(session, "snapshot_relationships", since=None)
+            self._nodes = {n["node_id"]: n for n in nodes}
+            self._edges = {(e["parent_id"], e["rel_type"], e["child_id"]) for e in edges}
+            self._rebuild()
+            self.closure = ClosureIndex.from_snapshot(self.snapshot)
+            self.watermark = watermark
+            self.data_at = data_at
+            self.full_loaded_at = self.refreshed_at = time.monotonic()
+            logger.info(f"Asset snapshot loaded: {len(self.snapshot)} nodes, {self.snapshot.edge_count} relationships")
+            self._publish(structural=True)
+        self._apply_shared_patches(reset=True)
+        self._sync_closure()
+
+    def refresh(self) -> None:
+        """Apply changes made since the last watermark"""
+        if self.snapshot is None or time.monotonic() - self.full_loaded_at > self.full_reload_seconds:
+            self.load()
+            return
+
+        with self._lock:
+            data_at = time.time()
+            driver = get_shared_neo4j_driver()
+            with driver.session() as session:
+                watermark = statements.run_cypher(session, "snapshot_clock")[0]["now"]
+                nodes = statements.run_cypher(session, "snapshot_nodes", since=self.watermark)
+                edges = statements.run_cypher(session, "snapshot_relationships", since=self.watermark)
+                children = sorted({e["child_id"] for e in edges})
+                current = statements.run_cypher(session, "snapshot_parents", children=children) if children else []
+
+            structural = False
+            rebuild_closure = False
+            hot = False
+            for n in nodes:
+                previous = self._nodes.get(n["node_id"])
+                self._nodes[n["node_id"]] = n
+                if previous is None:
+                    structural = True
+                    key = _asset_key(n)
+                    if key is not None and key not in self.closure:
+                        self.closure.insert(key)
+                elif _asset_key(previous) != _asset_key(n):
+                    structural = rebuild_closure = True
+                elif any(previous["props"].get(h) != n["props"].get(h) for h in HOT_PROPERTIES):
+                    hot = True
+
+            # Replace the relationships of every child that has changed ones
+            # with its current parent set; parents not returned are gone
+            touched = set(children)
+            stale = {e for e in self._edges if e[2] in touched}
+            fresh = {(e["parent_id"], e["rel_type"], e["child_id"]) for e in current}
+            if stale != fresh:
+                structural = True
+                self._edges = (self._edges - stale) | fresh
+                parents = {child_id: set() for child_id in touched}
+                for parent_id, _, child_id in fresh:
+                    parents[child_id].add(parent_id)
+                for child_id, parent_ids in parents.items():
+                    child = self._nodes.get(child_id)
+                    key = _asset_key(child) if child is not None else None
+                    if key is None:
+                        continue
+                    parent_keys = [_asset_key(self._nodes[p]) for p in parent_ids if p in self._nodes]
+                    try:
+                        self.closure.insert(key, [k for k in parent_keys if k is not None])
+                    except (KeyError, ValueError) as ex:
+                        logger.warning(f"Closure update failed, rebuilding: {str(ex)}")
+                        rebuild_closure = True
+            
+            if structural:
+                self._rebuild()
+            else:
+                for n in nodes:
+                    self.snapshot.props[self.snapshot.index[n["node_id"]]] = dict(n["props"])
+            if rebuild_closure:
+                self.closure = ClosureIndex.from_snapshot(self.snapshot)
+            
+            self.watermark = watermark
+            self.data_at = data_at
+            self.refreshed_at = time.monotonic()
+            if nodes or edges:
+                logger.info(f"Asset snapshot refreshed: {len(nodes)} nodes, {len(edges)} relationships changed")
+            self._publish(structural=structural or hot, props_changed=bool(nodes))
+        # Values read from Neo4j may predate patches appended during the refresh
+        if nodes:
+            self._apply_shared_patches(reset=True)
+        self._sync_closure()
+    
+    def patch_properties(self, label: str, updates: Dict[Any, Dict[str, Any]]) -> int:
+        """
+        Apply property changes this process has just written to Neo4j
+
+        The next refresh reads the same values back, so patching only saves
+        the wait for it. With SHARED_STATE_DIR set the patches also go to the
+        shared patch log for the other workers.
+
+        Args:
+            label: Node label
+            updates: Key property value -> properties to set
+
+        Returns:
+            Number of nodes patched in this worker
+        """
+        patched = self._patch(label, updates)
+        if self.shared is not None:
+            try:
+                self.shared.patches.append(label, updates)
+            except (OSError, TypeError) as e:
+                logger.warning(f"Asset patches not shared with other workers: {str(e)}")
+        return patched
+
+    def _patch(self, label: str, updates: Dict[Any, Dict[str, Any]]) -> int:
+        patched = 0
+        with self._lock:
+            snapshot = self.snapshot
+            if snapshot is None:
+                return 0
+            for key, props in updates.items():
+                i = snapshot.lookup(label, key)
+                if i is None:
+                    continue
+                # Replaced rather than mutated, for readers holding the old dict
+                snapshot.props[i] = {**snapshot.props[i], **props}
+                node = self._nodes.get(snapshot.node_ids[i])
+                if node is not None:
+                    self._nodes[node["node_id"]] = {**node, "props": {**node["props"], **props}}
+                patched += 1
+        return patched
+
+    def follow(self) -> bool:
+        """
+        Map the version the leader published last, if it is newer
+
+        Returns:
+            True when a published version is mapped
+        """
+        pointer = self.shared.current()
+        if pointer is None:
+            return False
+        if pointer["version"] != self.version:
+            snapshot, meta = self.shared.open(pointer["version"])
+            with self._lock:
+                self.snapshot = snapshot
+                self.closure = SnapshotClosure(snapshot)
+                self.version = pointer["version"]
+                self.data_at = meta.get("data_at", 0.0)
+            logger.info(f"Asset snapshot v{self.version} mapped: {len(snapshot)} nodes")
+            self._apply_shared_patches(reset=True)
+        else:
+            self._apply_shared_patches()
+        # Fresh as of the leader's last refresh, not of this poll
+        self.refreshed_at = time.monotonic() - max(time.time() - pointer["refreshed_at"], 0.0)
+        return True
+
+    def start(self) -> None:
+        """Load now and keep refreshing in a background thread"""
+        shared_dir = os.getenv("SHARED_STATE_DIR")
+        if shared_dir:
+            try:
+                self.shared = SharedSnapshotStore(shared_dir)
+                self.shared.try_lead()
+            except OSError as e:
+                logger.warning(f"Asset snapshot not shared between workers: {str(e)}")
+                self.shared = None
+        try:
+            if self.following:
+                self.follow()
+            else:
+                self.load()
+        except Exception as e:
+            logger.warning(f"Asset snapshot not loaded, using Neo4j directly: {str(e)}")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="asset-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self.shared is not None:
+            self.shared.release()
+
+    def _run(self) -> None:
+        # Shared: every worker polls for patches and versions, the leader refreshes when due
+        while not self._stop.wait(self.poll_seconds if self.shared is not None else self.refresh_seconds):
+            try:
+                if self.following and self.shared.try_lead():
+                    # The leader is gone: take over with a load of our own
+                    self.version = 0
+                    self.load()
+                elif self.following:
+                    self.follow()
+                elif self.shared is not None and time.monotonic() - self._refresh_started < self.refresh_seconds:
+                    self._apply_shared_patches()
+                else:
+                    self._refresh_started = time.monotonic()
+                    self.refresh()
+            except Exception as e:
+                logger.warning(f"Asset snapshot refresh failed: {str(e)}")
+
+    def _apply_shared_patches(self, reset: bool = False) -> None:
+        """Apply patch log entries newer than the snapshot's data (all of them again with reset=True)"""
+        if self.shared is None or self.snapshot is None:
+            return
+        for entry in self.shared.patches.read(reset):
+            if entry["at"] >= self.data_at:
+                self._patch(entry["label"], dict(entry["updates"]))
+
+    def _publish(self, structural: bool, props_changed: bool = False) -> None:
+        # Caller holds the lock
+        if self.shared is None or not self.shared.leader:
+            return
+        self._unpublished = self._unpublished or props_changed
+        due = self._unpublished and time.monotonic() - self.published_at >= self.republish_seconds
+        try:
+            if structural or due or not self.version:
+                self.version = self.shared.publish(self.snapshot, self.data_at)
+                self.published_at = time.monotonic()
+                self._unpublished = False
+                # Followers of the previous version still apply patches newer than its data
+                self.shared.patches.compact(self._published_data_at)
+                self._published_data_at = self.data_at
+            else:
+                self.shared.heartbeat(self.version)
+        except Exception as e:
+            logger.warning(f"Asset snapshot not published to {self.shared.root}: {str(e)}")
+
+    def _rebuild(self) -> None:
+        self.snapshot = AssetSnapshot(list(self._nodes.values()), list(self._edges))
+
+    def _sync_closure(self) -> None:
+        if not self.sync_closure:
+            return
+        try:
+            with get_pooled_postgres_connection() as conn:
+                sync_closure_to_postgres(self.closure, conn)
+        except Exception as e:
+            logger.warning(f"Asset closure not synced to PostgreSQL: {str(e)}")
+
+
+def _asset_key(node: Dict[str, Any]) -> Optional[Tuple[str, Any]]:
+    """Closure key (label, asset id) of a node, None without a key property"""
+    asset_id = node["props"].get(KEY_PROPERTIES[node["label"]])
+    return (node["label"], asset_id) if asset_id is not None else None
+
+
+asset_snapshot = AssetSnapshotManager()
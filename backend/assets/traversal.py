@@ -0,0 +1,77 @@
+"""
+Asset Graph Traversal
+Bounded breadth-first impact traversal shared by Neo4j and snapshot lookups
+"""
+from typing import List, Dict, Any, Callable, Iterable, Tuple
+
+# (child_id, parent_id, asset_type, asset_name) rows for one frontier
+ExpandFn = Callable[[List[Any]], Iterable[Tuple[Any, Any, str, str]]]
+
+
+def bounded_impact_traversal(
+    start_id: Any,
+    start_name: str,
+    expand: ExpandFn,
+    max_hops: int = 3,
+    limit: int = 100,
+    offset: int = 0
+) -> Dict[str, Any]:
+    """
+    Breadth-first, level-by-level traversal from a failed asset
+    
+    Each node is visited once, so the first time an asset is reached is
+    along a shortest path and the work is bounded by the number of nodes,
+    not the number of paths. Expansion stops as soon as the requested page
+    is complete and at least one more asset has been found, so `has_more`
+    is true only when an asset beyond the page really exists: a frontier
+    whose nodes have no further parents ends the loop with nothing found.
+    
+    Args:
+        start_id: Node id of the failed asset
+        start_name: Display name of the failed asset
+        expand: Returns parent edges for a list of frontier node ids
+        max_hops: Maximum number of hops to traverse
+        limit: Maximum number of assets to return
+        offset: Number of assets to skip (for paging)
+        
+    Returns:
+        Dictionary with the page of assets and whether more exist
+    """
+    parents: Dict[Any, Any] = {start_id: None}
+    names: Dict[Any, str] = {start_id: start_name}
+    found: List[Dict[str, Any]] = []
+    frontier = [start_id]
+    hops = 0
+    wanted = offset + limit
+    
+    while frontier and hops < max_hops and len(found) <= wanted:
+        hops += 1
+        level = []
+        next_frontier = []
+        for child_id, parent_id, asset_type, asset_name in expand(frontier):
+            if parent_id in parents:
+                continue
+            parents[parent_id] = child_id
+            names[parent_id] = asset_name
+            next_frontier.append(parent_id)
+            level.append((asset_type or "", asset_name or "", parent_id))
+        
+        # Stable order within a level so pages do not shift between calls
+        for asset_type, asset_name, node_id in sorted(level, key=lambda item: item[:2]):
+            path = []
+            cursor = node_id
+            while cursor is not None:
+                path.append(names[cursor])
+                cursor = parents[cursor]
+            found.append({
+                "asset_name": asset_name,
+                "asset_type": asset_type,
+                "hops": hops,
+                "path_nodes": path[::-1]
+            })
+        frontier = next_frontier
+    
+    return {
+        "assets": found[offset:wanted],
+        "has_more": len(found) > wanted
+    }
@@ -0,0 +1,3 @@
+"""
+Performance benchmarks for the Intelligent Oilfield Insights Platform
+"""
@@ -0,0 +1,72 @@
+"""
+Incident / Anomaly Correlation Benchmark
+Runs the interval-join engine on synthetic event streams and checks it
+against a brute-force join on a small sample
+
+Run from the backend directory:
+    python -m benchmarks.bench_correlation --incidents 1000000 --anomalies 5000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from analytics.correlation import IncidentAnomalyCorrelator
+
+YEAR_SECONDS = 365 * 24 * 3600
+
+
+def synthetic_events(incidents: int, anomalies: int, wells: int, years: float, seed: int = 3):
+    rng = np.random.default_rng(seed)
+    start = 1_600_000_000
+    span = int(years * YEAR_SECONDS)
+    return (
+        rng.integers(0, wells, incidents),
+        start + rng.integers(0, span, incidents),
+        rng.integers(0, wells, anomalies),
+        start + rng.integers(0, span, anomalies),
+        rng.integers(0, 8, anomalies),
+        rng.choice([1.0, 2.0, 3.0, 4.0], incidents)
+    )
+
+
+def brute_force_pairs(events, lookback: int, lookahead: int) -> int:
+    inc_w, inc_t, an_w, an_t = events[:4]
+    total = 0
+    for w, t in zip(inc_w, inc_t):
+        lag = t - an_t
+        total += int(np.count_nonzero((an_w == w) & (lag <= lookback) & (lag >= -lookahead)))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--incidents", type=int, default=1000000)
+    parser.add_argument("--anomalies", type=int, default=5000000)
+    parser.add_argument("--wells", type=int, default=20000)
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--lookback-hours", type=float, default=168)
+    parser.add_argument("--lookahead-hours", type=float, default=24)
+    args = parser.parse_args()
+
+    correlator = IncidentAnomalyCorrelator(args.lookback_hours, args.lookahead_hours)
+
+    sample = synthetic_events(2000, 20000, 50, args.years)
+    expected = brute_force_pairs(sample, correlator.lookback, correlator.lookahead)
+    got = correlator.correlate(*sample)["total_pairs"]
+    assert got == expected, f"pair count mismatch: {got} != {expected}"
+    print(f"Sample check: {got} pairs match brute force")
+
+    events = synthetic_events(args.incidents, args.anomalies, args.wells, args.years)
+    t0 = time.perf_counter()
+    result = correlator.correlate(*events)
+    elapsed = time.perf_counter() - t0
+
+    print(f"Events: {args.incidents} incidents, {args.anomalies} anomalies, {args.wells} wells")
+    print(f"Matched pairs: {result['total_pairs']}, top score {result['score'][0]:.3f}")
+    print(f"Elapsed: {elapsed:.2f} s "
+          f"({(args.incidents + args.anomalies) / elapsed / 1e6:.2f} M events/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Impact Traversal Benchmark
+Compares undirected path enumeration (the old find_affected_assets Cypher)
+with the bounded level-by-level traversal on a synthetic asset graph
+
+Run from the backend directory:
+    python -m benchmarks.bench_impact_traversal --nodes 100000
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from assets.traversal import bounded_impact_traversal
+
+
+def build_asset_graph(nodes: int, shared_fraction: float = 0.1, seed: int = 7):
+    """
+    Build a Basin -> Rig -> Well -> Sensor/Equipment hierarchy with about
+    `nodes` nodes. A fraction of equipment (manifolds, shared pumps) hangs
+    off two wells, so the graph is a DAG rather than a tree.
+    """
+    rng = random.Random(seed)
+    info: Dict[int, Tuple[str, str]] = {}
+    parents: Dict[int, List[int]] = defaultdict(list)
+    neighbours: Dict[int, List[int]] = defaultdict(list)
+    equipment: List[int] = []
+
+    def add(node_type: str, name: str, parent: int = None) -> int:
+        node_id = len(info)
+        info[node_id] = (node_type, name)
+        if parent is not None:
+            link(node_id, parent)
+        return node_id
+
+    def link(child: int, parent: int) -> None:
+        parents[child].append(parent)
+        neighbours[child].append(parent)
+        neighbours[parent].append(child)
+
+    basins = max(nodes // 5000, 1)
+    rigs_per_basin = 50
+    wells_per_rig = 10
+    leaves_per_well = max((nodes // (basins * rigs_per_basin * wells_per_rig)) - 1, 1)
+
+    wells = []
+    for b in range(basins):
+        basin = add("Basin", f"Basin {b}")
+        for r in range(rigs_per_basin):
+            rig = add("Rig", f"Rig {b}-{r}", basin)
+            for w in range(wells_per_rig):
+                wells.append(add("Well", f"Well {b}-{r}-{w}", rig))
+
+    for well in wells:
+        for k in range(leaves_per_well):
+            if k % 2:
+                add("Sensor", f"S-{len(info)}", well)
+            else:
+                equipment.append(add("Equipment", f"EQ-{len(info)}", well))
+
+    for eq in rng.sample(equipment, int(len(equipment) * shared_fraction)):
+        link(eq, rng.choice(wells))
+
+    return info, parents, neighbours, equipment
+
+
+def enumerate_paths(start: int, neighbours, max_hops: int, cap: int) -> int:
+    """Count undirected paths of length 1..max_hops, as `-[*1..N]-` does"""
+    count = 0
+    stack = [(start, 0, {start})]
+    while stack:
+        node, depth, seen = stack.pop()
+        if depth == max_hops:
+            continue
+        for nxt in neighbours[node]:
+            if nxt in seen:
+                continue
+            count += 1
+            if count >= cap:
+                return count
+            stack.append((nxt, depth + 1, seen | {nxt}))
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-hops", type=int, default=3)
+    parser.add_argument("--path-cap", type=int, default=1000000)
+    args = parser.parse_args()
+
+    info, parents, neighbours, equipment = build_asset_graph(args.nodes)
+    print(f"Graph: {len(info)} nodes, {sum(len(p) for p in parents.values())} relationships")
+
+    def expand(frontier):
+        return [
+            (child, parent, info[parent][0], info[parent][1])
+            for child in frontier
+            for parent in parents[child]
+        ]
+
+    starts = random.Random(11).sample(equipment, min(args.queries, len(equipment)))
+
+    t0 = time.perf_counter()
+    results = 0
+    for eq in starts:
+        page = bounded_impact_traversal(eq, info[eq][1], expand, max_hops=args.max_hops)
+        results += len(page["assets"])
+    bfs_ms = (time.perf_counter() - t0) * 1000 / len(starts)
+
+    naive_starts = starts[:max(len(starts) // 20, 1)]
+    t0 = time.perf_counter()
+    paths = 0
+    for eq in naive_starts:
+        paths += enumerate_paths(eq, neighbours, args.max_hops, args.path_cap)
+    naive_ms = (time.perf_counter() - t0) * 1000 / len(naive_starts)
+
+    print(f"Bounded traversal: {bfs_ms:.3f} ms/query, "
+          f"{results / len(starts):.1f} distinct assets/query")
+    print(f"Path enumeration:  {naive_ms:.3f} ms/query, "
+          f"{paths / len(naive_starts):.1f} paths/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Fake-Backed API Server
+Runs the FastAPI app with every store replaced by the in-process fakes
+
+Background services that need real data (schema bootstrap, asset snapshot,
+lexical index, tracing) are switched off and the LLM is never called, so
+the server's latency is the application's own plus the configured store
+latency.
+
+Run from the backend directory:
+    python -m benchmarks.fake_server --port 8001 --postgres-ms 4 --neo4j-ms 6
+"""
+import os
+import argparse
+
+from benchmarks.fakes import DEFAULT_LATENCY
+
+
+def add_latency_arguments(parser: argparse.ArgumentParser) -> None:
+    for store, seconds in DEFAULT_LATENCY.items():
+        parser.add_argument(f"--{store}-ms", type=float, default=seconds * 1000,
+                            help=f"{store} latency per call in milliseconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency jitter as a fraction of the delay")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def latency_from(args) -> dict:
+    return {store: getattr(args, f"{store}_ms") / 1000 for store in DEFAULT_LATENCY}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+    # Per-request INFO logs would dominate the timings
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    os.environ.update(
+        GRAPH_SCHEMA_BOOTSTRAP="false",
+        ASSET_SNAPSHOT_ENABLED="false",
+        LEXICAL_INDEX_ENABLED="false",
+        TRACING_ENABLED="false"
+    )
+    os.environ.pop("OPENAI_API_KEY", None)
+
+    from benchmarks.fakes import FakeStores
+    stores = FakeStores(latency=latency_from(args), jitter=args.jitter, seed=args.seed)
+    stores.install()
+
+    import uvicorn
+    from main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
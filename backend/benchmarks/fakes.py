@@ -0,0 +1,472 @@
+"""
+In-Process Store Fakes
+Deterministic stand-ins for PostgreSQL, Neo4j, Qdrant and MinIO with
+configurable latency, for benchmarks that must not depend on live services
+
+All four serve one synthetic oilfield (rigs, wells, sensors, hourly
+production, HSE reports) generated from a seed, so the same seed always
+gives the same rows. PostgreSQL and Neo4j answer registry statements by
+name with rows shaped like the real queries'; Qdrant is the real client in
+local in-memory mode, loaded from the fake MinIO bucket by the normal
+document indexer. Each call sleeps for the store's latency first.
+
+    stores = FakeStores(latency={"postgres": 0.004, "neo4j": 0.006})
+    stores.install()   # agents now talk to the fakes
+"""
+import io
+import re
+import sys
+import time
+import random
+import hashlib
+import importlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional
+
+from database.statements import statements
+
+# Fixed clock so generated rows do not depend on when the benchmark runs
+EPOCH = datetime(2024, 12, 31, tzinfo=timezone.utc)
+
+DEFAULT_LATENCY = {"postgres": 0.004, "neo4j": 0.006, "qdrant": 0.003, "minio": 0.01}
+
+RIG_NAMES = ["Alpha", "Bravo", "Charlie", "Delta", "Echo", "Foxtrot", "Golf", "Hotel"]
+BASINS = ["Permian", "Eagle Ford", "Bakken", "Marcellus"]
+SENSOR_TYPES = ["pressure", "temperature", "flow", "vibration"]
+
+# Modules that import the connection getters by name, and the getters each uses
+PATCH_TARGETS = {
+    "database.connections": ("get_pooled_postgres_connection", "get_shared_neo4j_driver",
+                             "get_shared_qdrant_client", "get_minio_client"),
+    "agents.sql_agent": ("get_pooled_postgres_connection",),
+    "agents.graph_agent": ("get_shared_neo4j_driver",),
+    "agents.vector_agent": ("get_shared_qdrant_client",),
+    "assets.snapshot": ("get_shared_neo4j_driver", "get_pooled_postgres_connection"),
+    "retrieval.hybrid": ("get_shared_neo4j_driver", "get_shared_qdrant_client"),
+    "ingestion.documents": ("get_minio_client", "get_shared_qdrant_client"),
+    "ingestion.graph_loader": ("get_shared_neo4j_driver", "get_pooled_postgres_connection"),
+    "database.graph_schema": ("get_shared_neo4j_driver",),
+    "telemetry.writer": ("get_pooled_postgres_connection",),
+    "telemetry.anomaly": ("get_shared_neo4j_driver",)
+}
+
+
+class Latency:
+    """Fixed per-call delay with optional seeded jitter (a fraction of the delay)"""
+
+    def __init__(self, seconds: float, jitter: float = 0.0, seed: int = 0):
+        self.seconds = seconds
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        delay = self.seconds
+        if self.jitter:
+            with self._lock:
+                delay *= 1 + self.jitter * (2 * self._rng.random() - 1)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Oilfield:
+    """The synthetic asset hierarchy and readings all fakes serve"""
+
+    def __init__(self, rigs: int = 8, wells_per_rig: int = 4, sensors_per_well: int = 4,
+                 reports: int = 200, seed: int = 42):
+        self.seed = seed
+        self.reports = reports
+        self.rigs = []
+        for r in range(rigs):
+            name = f"Rig {RIG_NAMES[r % len(RIG_NAMES)]}" + (f"-{r // len(RIG_NAMES)}" if r >= len(RIG_NAMES) else "")
+            wells = [f"W-{r * wells_per_rig + w + 1}" for w in range(wells_per_rig)]
+            self.rigs.append({"name": name, "basin": BASINS[r % len(BASINS)], "wells": wells})
+        self.sensors = {
+            well: [f"{SENSOR_TYPES[s][0].upper()}-{i * sensors_per_well + s + 1}" for s in range(sensors_per_well)]
+            for i, well in enumerate(w for rig in self.rigs for w in rig["wells"])
+        }
+        self._production: Dict[tuple, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def rng(self, *key) -> random.Random:
+        digest = hashlib.blake2b(repr((self.seed,) + key).encode(), digest_size=8).digest()
+        return random.Random(int.from_bytes(digest, "big"))
+
+    def rig(self, name: str) -> Optional[Dict[str, Any]]:
+        name = name.lower()
+        return next((r for r in self.rigs if r["name"].lower() == name), None)
+
+    def production(self, rig_name: str, hours: int) -> List[Dict[str, Any]]:
+        """Hourly readings for every well of a rig, newest first (cached)"""
+        key = (rig_name.lower(), hours)
+        rows = self._production.get(key)
+        if rows is None:
+            rig = self.rig(rig_name)
+            rows = []
+            for well in (rig["wells"] if rig else []):
+                rng = self.rng("production", well)
+                base = rng.uniform(600, 1400)
+                window = []
+                for h in range(hours):
+                    rate = round(base * (1 - 0.0004 * h) + rng.gauss(0, 40), 2)
+                    window = (window + [rate])[-30:]
+                    rows.append({
+                        "timestamp": EPOCH - timedelta(hours=hours - h),
+                        "well_name": f"Well {well}",
+                        "production_rate": rate,
+                        "moving_avg": round(sum(window) / len(window), 2),
+                        "pressure": round(rng.uniform(2200, 2800), 1),
+                        "temperature": round(rng.uniform(160, 200), 1)
+                    })
+            rows.sort(key=lambda r: (r["timestamp"], r["well_name"]), reverse=True)
+            with self._lock:
+                self._production[key] = rows
+        return rows
+
+    def sensor_status(self, sensor: str) -> str:
+        roll = self.rng("status", sensor).random()
+        return "faulty" if roll < 0.15 else "warning" if roll < 0.3 else "operational"
+
+    def report_text(self, i: int) -> Dict[str, Any]:
+        rng = self.rng("report", i)
+        rig = self.rigs[i % len(self.rigs)]
+        well = rng.choice(rig["wells"])
+        sensor = rng.choice(self.sensors[well])
+        incident = f"INC-2024-{i + 1:03d}"
+        finding = rng.choice([
+            "pressure spike on the wellhead gauge", "gas detector alarm during tripping",
+            "hydraulic leak at the choke manifold", "dropped object near the rotary table",
+            "vibration above limit on the mud pump", "H2S reading above threshold"
+        ])
+        body = " ".join(
+            f"During operations on Well {well} at {rig['name']} the crew recorded a {finding} "
+            f"involving sensor {sensor}. Incident {incident} was raised and the area was made safe. "
+            f"Root cause review found {rng.choice(['worn seals', 'calibration drift', 'procedural gap', 'corrosion'])}."
+            for _ in range(rng.randint(2, 6))
+        )
+        return {
+            "key": f"2024/{incident}.txt",
+            "title": f"{incident} {finding}",
+            "well": f"Well {well}",
+            "rig": rig["name"],
+            "report_date": (EPOCH - timedelta(days=rng.randint(0, 365))).isoformat(),
+            "report_id": incident,
+            "body": body.encode()
+        }
+
+
+class FakePostgres:
+    """Pool of fake connections answering registry SQL statements"""
+
+    def __init__(self, oilfield: Oilfield, latency: Latency, pool_size: int = 10):
+        self.oilfield = oilfield
+        self.latency = latency
+        self._pool = threading.BoundedSemaphore(pool_size)
+        self._idle = [_FakePGConnection(self) for _ in range(pool_size)]
+        self._lock = threading.Lock()
+        # Rows received by COPY ... FROM STDIN, by table
+        self.copied: Dict[str, int] = {}
+
+    @contextmanager
+    def connection(self):
+        """Drop-in for get_pooled_postgres_connection"""
+        with self._pool:
+            with self._lock:
+                conn = self._idle.pop()
+            try:
+                yield conn
+            finally:
+                with self._lock:
+                    self._idle.append(conn)
+
+    def rows(self, name: str, params) -> List[Dict[str, Any]]:
+        field = self.oilfield
+        if name == "production_trends":
+            return field.production(params[0], int(params[1]))
+        if name == "wells_below_average":
+            basin = params[0].lower()
+            rows = []
+            for rig in field.rigs:
+                if rig["basin"].lower() != basin:
+                    continue
+                for well in rig["wells"]:
+                    rng = field.rng("below", well)
+                    avg = rng.uniform(600, 1200)
+                    current = avg * rng.uniform(0.6, 1.1)
+                    if current < avg:
+                        rows.append({"well_name": f"Well {well}", "current_rate": round(current, 2),
+                                     "avg_rate": round(avg, 2), "deviation_pct": round((current - avg) / avg * 100, 2)})
+            return sorted(rows, key=lambda r: r["deviation_pct"])
+        if name == "maintenance_overdue":
+            rows = []
+            for i in range(len(field.rigs) * 3):
+                rng = field.rng("maintenance", i)
+                overdue = rng.randint(1, 60)
+                rows.append({
+                    "equipment_id": f"PUMP-{i + 1}",
+                    "equipment_type": rng.choice(["Pump", "Compressor", "Separator"]),
+                    "last_maintenance_date": EPOCH - timedelta(days=overdue + 90),
+                    "next_maintenance_due": EPOCH - timedelta(days=overdue),
+                    "days_overdue": overdue
+                })
+            return sorted(rows, key=lambda r: -r["days_overdue"])
+        if name == "production_rollup":
+            ancestor = params[0].lower()
+            rigs = [r for r in field.rigs if ancestor in (r["name"].lower(), r["basin"].lower())]
+            rows = []
+            for rig in rigs:
+                depth = 1 if rig["name"].lower() == ancestor else 2
+                for well in rig["wells"]:
+                    rng = field.rng("rollup", well)
+                    avg = rng.uniform(600, 1200)
+                    rows.append({"well_name": well, "depth": depth, "avg_rate": round(avg, 2),
+                                 "total_rate": round(avg * int(params[1]) * 24, 2), "last_reading": EPOCH})
+            return sorted(rows, key=lambda r: r["avg_rate"])
+        return []
+
+
+class _FakePGConnection:
+    def __init__(self, server: FakePostgres):
+        self.server = server
+        self.prepared_statements = set()
+        self.closed = 0
+
+    def cursor(self):
+        return _FakeCursor(self.server)
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+
+class _FakeCursor:
+    _EXECUTE = re.compile(r"^(EXPLAIN\s+(?:\([^)]*\)\s+)?)?EXECUTE\s+([a-z][a-z0-9_]*)")
+
+    def __init__(self, server: FakePostgres):
+        self.server = server
+        self._rows: List[Dict[str, Any]] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql: str, params=()) -> None:
+        self.server.latency.wait()
+        match = self._EXECUTE.match(sql)
+        if match is None:
+            self._rows = []
+        elif match.group(1):
+            self._rows = [{"QUERY PLAN": f"Fake plan for {match.group(2)}"}]
+        else:
+            self._rows = self.server.rows(match.group(2), params)
+
+    def fetchall(self) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._rows]
+
+    def copy_expert(self, sql: str, file) -> None:
+        self.server.latency.wait()
+        table = sql.split()[1]
+        rows = sum(1 for line in file if line.strip())
+        with self.server._lock:
+            self.server.copied[table] = self.server.copied.get(table, 0) + rows
+
+
+class FakeNeo4j:
+    """Driver whose sessions answer registry Cypher statements"""
+
+    def __init__(self, oilfield: Oilfield, latency: Latency):
+        self.oilfield = oilfield
+        self.latency = latency
+        self._names = {statements.cypher_text(name): name for name in statements.cypher_names()}
+
+    def session(self, **kwargs) -> "_FakeSession":
+        return _FakeSession(self)
+
+    def close(self) -> None:
+        pass
+
+    def records(self, text: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        field = self.oilfield
+        name = self._names.get(text.strip())
+        if name == "faulty_equipment":
+            rig = field.rig(params["rig_name"])
+            rows = []
+            for well in (rig["wells"] if rig else []):
+                for sensor in field.sensors[well]:
+                    status = field.sensor_status(sensor)
+                    if status == "faulty":
+                        rows.append({"rig": rig["name"], "well": f"Well {well}", "sensor": sensor,
+                                     "type": SENSOR_TYPES["PTFV".index(sensor[0])], "status": "FAULTY",
+                                     "reading": round(field.rng("reading", sensor).uniform(0, 3000), 1)})
+            return rows
+        if name == "equipment_by_basin":
+            return [
+                {"rig": rig["name"], "well": f"Well {well}", "sensor": sensor,
+                 "type": SENSOR_TYPES["PTFV".index(sensor[0])], "status": field.sensor_status(sensor)}
+                for rig in field.rigs if rig["basin"].lower() == params["basin"].lower()
+                for well in rig["wells"] for sensor in field.sensors[well]
+            ]
+        if name == "snapshot_clock":
+            return [{"now": EPOCH}]
+        return []
+
+
+class _FakeSession:
+    def __init__(self, driver: FakeNeo4j):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, text: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> List[Dict[str, Any]]:
+        self.driver.latency.wait()
+        return self.driver.records(text, {**(params or {}), **kwargs})
+
+    def close(self) -> None:
+        pass
+
+
+class FakeMinio:
+    """Bucket of generated HSE reports with the MinIO calls the indexer uses"""
+
+    def __init__(self, oilfield: Oilfield, latency: Latency):
+        self.oilfield = oilfield
+        self.latency = latency
+        self._objects = {}
+        for i in range(oilfield.reports):
+            report = oilfield.report_text(i)
+            self._objects[report["key"]] = report
+
+    def list_objects(self, bucket: str, prefix: Optional[str] = None, recursive: bool = False):
+        self.latency.wait()
+        for key in sorted(self._objects):
+            if prefix and not key.startswith(prefix):
+                continue
+            report = self._objects[key]
+            yield SimpleNamespace(
+                object_name=key,
+                etag=hashlib.md5(report["body"]).hexdigest(),
+                last_modified=datetime.fromisoformat(report["report_date"]),
+                size=len(report["body"])
+            )
+
+    def get_object(self, bucket: str, key: str) -> "_FakeObject":
+        self.latency.wait()
+        return _FakeObject(self._objects[key])
+
+
+class _FakeObject:
+    def __init__(self, report: Dict[str, Any]):
+        self.headers = {
+            "x-amz-meta-well": report["well"],
+            "x-amz-meta-rig": report["rig"],
+            "x-amz-meta-report-date": report["report_date"],
+            "x-amz-meta-title": report["title"],
+            "x-amz-meta-report-id": report["report_id"]
+        }
+        self._data = io.BytesIO(report["body"])
+
+    def stream(self, amt: int = 64 * 1024):
+        while True:
+            block = self._data.read(amt)
+            if not block:
+                return
+            yield block
+
+    def read(self) -> bytes:
+        return self._data.read()
+
+    def close(self) -> None:
+        pass
+
+    def release_conn(self) -> None:
+        pass
+
+
+class _Delayed:
+    """Proxy that waits for the store latency before every method call"""
+
+    def __init__(self, target, latency: Latency):
+        self._target = target
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._latency.wait()
+            return attr(*args, **kwargs)
+        return call
+
+
+class FakeStores:
+    """
+    The four fakes over one synthetic oilfield
+
+    Args:
+        latency: Seconds per call by store ("postgres", "neo4j", "qdrant", "minio")
+        jitter: Latency jitter as a fraction of the delay
+        seed: Seed for data and jitter
+        rigs: Number of rigs (wells, sensors and reports scale with it)
+        reports: HSE reports in the bucket
+    """
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None, jitter: float = 0.0,
+                 seed: int = 42, rigs: int = 8, reports: int = 200):
+        latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.oilfield = Oilfield(rigs=rigs, reports=reports, seed=seed)
+        self.postgres = FakePostgres(self.oilfield, Latency(latency["postgres"], jitter, seed))
+        self.neo4j = FakeNeo4j(self.oilfield, Latency(latency["neo4j"], jitter, seed + 1))
+        self.minio = FakeMinio(self.oilfield, Latency(latency["minio"], jitter, seed + 2))
+        self._qdrant_latency = Latency(latency["qdrant"], jitter, seed + 3)
+        self.qdrant = None
+        self._saved: Dict[tuple, Any] = {}
+
+    def load_reports(self) -> Dict[str, Any]:
+        """Index the fake bucket into an in-memory Qdrant with the real indexer"""
+        from qdrant_client import QdrantClient
+        from ingestion.documents import DocumentIngestor
+
+        client = QdrantClient(":memory:")
+        with tempfile.TemporaryDirectory() as tmp:
+            ingestor = DocumentIngestor("hse-reports", f"{tmp}/checkpoint.jsonl", workers=1,
+                                      minio_client=self.minio, qdrant_client=client)
+            report = ingestor.run()
+        self.qdrant = _Delayed(client, self._qdrant_latency)
+        return report
+
+    def install(self) -> None:
+        """Point every module's connection getters at the fakes"""
+        if self.qdrant is None:
+            self.load_reports()
+        getters = {
+            "get_pooled_postgres_connection": self.postgres.connection,
+            "get_shared_neo4j_driver": lambda: self.neo4j,
+            "get_shared_qdrant_client": lambda: self.qdrant,
+            "get_minio_client": lambda: self.minio
+        }
+        for module_name, names in PATCH_TARGETS.items():
+            # Imported here, so a module first imported later still sees the fakes
+            module = importlib.import_module(module_name)
+            for name in names:
+                if hasattr(module, name):
+                    self._saved[(module_name, name)] = getattr(module, name)
+                    setattr(module, name, getters[name])
+
+    def uninstall(self) -> None:
+        for (module_name, name), value in self._saved.items():
+            setattr(sys.modules[module_name], name, value)
+        self._saved.clear()
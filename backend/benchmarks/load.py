@@ -0,0 +1,181 @@
+"""
+/api/query Load Test
+Closed-loop clients at rising concurrency, reporting latency percentiles
+and throughput per level
+
+Without --url the API is started in a subprocess on the in-process store
+fakes (benchmarks.fake_server), so the client threads do not compete with
+the server for the GIL.
+
+Run from the backend directory:
+    python -m benchmarks.load --levels 1,4,16 --duration 10
+    python -m benchmarks.load --url http://localhost:8000
+"""
+import sys
+import time
+import socket
+import argparse
+import itertools
+import subprocess
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+from benchmarks.fake_server import add_latency_arguments, latency_from
+from benchmarks.micro import QUERIES
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+def run_level(url: str, concurrency: int, duration: float, queries: Sequence[str]) -> Dict[str, Any]:
+    """
+    Keep `concurrency` requests in flight for `duration` seconds
+
+    Returns:
+        Request and error counts, throughput and latency percentiles (ms)
+    """
+    latencies: List[List[float]] = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    start_barrier = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def client(i: int) -> None:
+        mix = itertools.cycle(queries[i % len(queries):] + queries[:i % len(queries)])
+        with httpx.Client(base_url=url, timeout=60) as http:
+            start_barrier.wait()
+            while time.perf_counter() < deadline[0]:
+                started = time.perf_counter()
+                try:
+                    response = http.post("/api/query", json={"query": next(mix)})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies[i].append(time.perf_counter() - started)
+                else:
+                    errors[i] += 1
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    started = time.perf_counter()
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = np.array([s for per_client in latencies for s in per_client]) * 1000
+    result = {
+        "concurrency": concurrency,
+        "requests": int(samples.size),
+        "errors": sum(errors),
+        "throughput_rps": round(samples.size / elapsed, 2)
+    }
+    if samples.size:
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        result.update(p50_ms=round(p50, 2), p95_ms=round(p95, 2), p99_ms=round(p99, 2),
+                      max_ms=round(float(samples.max()), 2))
+    return result
+
+
+def run_load(url: Optional[str], levels: Sequence[int], duration: float,
+             latency: Optional[Dict[str, float]] = None, jitter: float = 0.0, seed: int = 42,
+             queries: Sequence[str] = QUERIES) -> List[Dict[str, Any]]:
+    """
+    Run every concurrency level against `url`, or against a fake-backed server
+
+    Args:
+        url: Base URL of a running API, or None to start the fake server
+        levels: Concurrency levels in order
+        duration: Seconds per level
+        latency: Store latencies in seconds for the fake server
+        jitter: Latency jitter for the fake server
+        seed: Data seed for the fake server
+    """
+    with api_server(url, latency, jitter, seed) as url:
+        # Warm caches and the connection pool before the first measured level
+        run_level(url, max(levels), min(duration, 2.0), queries)
+        results = []
+        for concurrency in levels:
+            result = run_level(url, concurrency, duration, queries)
+            print(_format(result), flush=True)
+            results.append(result)
+        return results
+
+
+@contextmanager
+def api_server(url: Optional[str], latency: Optional[Dict[str, float]] = None, jitter: float = 0.0,
+               seed: int = 42):
+    """
+    Yield the base URL of a ready API: `url` itself, or a fake-backed
+    server started in a subprocess for the duration of the block
+    """
+    if httpx is None:
+        raise ImportError("httpx not installed. Run: pip install httpx")
+
+    server = None
+    if url is None:
+        port = _free_port()
+        command = [sys.executable, "-m", "benchmarks.fake_server", "--port", str(port),
+                   "--seed", str(seed), "--jitter", str(jitter)]
+        for store, seconds in (latency or {}).items():
+            command += [f"--{store}-ms", str(seconds * 1000)]
+        server = subprocess.Popen(command)
+        url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(url, server)
+        yield url
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, server: Optional[subprocess.Popen], timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Fake server exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"API at {url} not ready after {timeout}s")
+
+
+def _format(result: Dict[str, Any]) -> str:
+    if not result["requests"]:
+        return f"c={result['concurrency']:<4d} no successful requests ({result['errors']} errors)"
+    return (f"c={result['concurrency']:<4d} {result['throughput_rps']:8.1f} req/s  "
+            f"p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms  "
+            f"errors {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="base URL of a running API (default: start a fake-backed server)")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+
+    run_load(args.url, [int(c) for c in args.levels.split(",")], args.duration,
+             latency=latency_from(args), jitter=args.jitter, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
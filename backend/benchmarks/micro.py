@@ -0,0 +1,185 @@
+"""
+Microbenchmarks
+Query parsing, rule-based synthesis and response serialization on the
+payloads the in-process fakes produce, telemetry ingestion and chart
+downsampling
+
+Run from the backend directory:
+    python -m benchmarks.micro
+"""
+import gc
+import os
+import json
+import time
+import argparse
+import statistics
+from typing import Callable, Dict, Any
+
+# Query mix shared with the load test: one per intent, with and without entities
+QUERIES = [
+    "Show production trends for Rig Alpha over the last month",
+    "What is the production rate of Well W-3?",
+    "Any safety incidents on Well W-3 at Rig Alpha?",
+    "Summarize incident INC-2024-007 and the gas detector alarm",
+    "Which equipment at Rig Bravo needs maintenance?",
+    "How is Rig Charlie connected to the sensors on Well W-10?",
+    "Give me an overview of the Permian basin"
+]
+
+
+def measure(fn: Callable[[], Any], number: int, repeat: int) -> Dict[str, float]:
+    """
+    Time `repeat` batches of `number` calls (after one warm-up batch)
+
+    Returns:
+        Median and best per-call time in microseconds
+    """
+    fn()
+    per_call = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            per_call.append((time.perf_counter() - started) / number * 1e6)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {"median_us": round(statistics.median(per_call), 3), "min_us": round(min(per_call), 3)}
+
+
+def serializer():
+    """The model path for /api/query (the fallback, and the default before query_response): validate, dump to JSON"""
+    from pydantic import TypeAdapter
+    from main import QueryResponse, ReasoningStep
+
+    adapter = TypeAdapter(QueryResponse)
+
+    def serialize(result: Dict[str, Any]) -> bytes:
+        response = QueryResponse(
+            answer=result["answer"],
+            reasoning_trace=[ReasoningStep(**step) for step in result["reasoning_trace"]],
+            graph_path=result.get("graph_path"),
+            confidence=result["confidence"],
+            data=result.get("data")
+        )
+        content = adapter.dump_python(adapter.validate_python(response, from_attributes=True), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+    return serialize
+
+
+def renderer():
+    """The /api/query path in use: envelope checks, `data` encoded with orjson"""
+    from query_response import render_query_response
+
+    def render(result: Dict[str, Any]) -> bytes:
+        return render_query_response(result, stream=False).body
+    return render
+
+
+def telemetry_message(wells: int = 100, readings: int = 100) -> bytes:
+    """One streamed message: `readings` per well for `wells` wells, 3 values each"""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    ts = (time.time() - readings + np.arange(readings)).round(3).tolist()
+    message = {"wells": [
+        {"well": f"Well B-{w}", "rig": f"Rig {w % 10}", "basin": "Permian", "ts": ts,
+         "production_rate": rng.uniform(400, 1200, readings).round(2).tolist(),
+         "pressure": rng.uniform(2200, 2800, readings).round(1).tolist(),
+         "temperature": rng.uniform(160, 200, readings).round(1).tolist()}
+        for w in range(wells)
+    ]}
+    return json.dumps(message).encode()
+
+
+def run_micro(stores=None, quick: bool = False) -> Dict[str, Dict[str, float]]:
+    """
+    Run every microbenchmark
+
+    Args:
+        stores: Installed FakeStores; zero-latency fakes are created if None
+        quick: Fewer repetitions (for smoke runs)
+
+    Returns:
+        Timings by benchmark name
+    """
+    from benchmarks.fakes import FakeStores
+    from agents import QueryParser, ReasoningAgent
+
+    if stores is None:
+        stores = FakeStores(latency={"postgres": 0, "neo4j": 0, "qdrant": 0, "minio": 0})
+        stores.install()
+    from graph_engine import process_query
+
+    repeat = 3 if quick else 7
+    parser = QueryParser()
+    reasoning = ReasoningAgent()
+    production = process_query(QUERIES[0])
+    safety = process_query(QUERIES[2])
+    serialize = serializer()
+    render = renderer()
+
+    results = {}
+    results["parser.parse"] = measure(lambda: [parser.parse(q) for q in QUERIES], 50 if quick else 200, repeat)
+    for name, result in (("production", production), ("safety", safety)):
+        data = result["data"]
+        results[f"reasoning.rule_based_synthesis.{name}"] = measure(
+            lambda: reasoning._rule_based_synthesis(
+                result["answer"], data["sql_results"], data["graph_results"], data["vector_results"]
+            ),
+            20 if quick else 100, repeat
+        )
+        results[f"response.serialize.{name}"] = measure(lambda: serialize(result), 3 if quick else 10, repeat)
+        results[f"response.serialize.{name}"]["bytes"] = len(serialize(result))
+        results[f"response.render.{name}"] = measure(lambda: render(result), 3 if quick else 10, repeat)
+        results[f"response.render.{name}"]["bytes"] = len(render(result))
+
+    import numpy as np
+    from telemetry.buffers import TelemetryStore, WELL_FIELDS
+    from telemetry.writer import _csv
+
+    # Buffering (JSON decode, validation, ring append) and the writer's COPY formatting
+    store = TelemetryStore()
+    message = telemetry_message()
+    blocks = [
+        (np.asarray(b["ts"]), b["rig"], b["well"], b["basin"], np.column_stack([b[f] for f in WELL_FIELDS]))
+        for b in json.loads(message)["wells"]
+    ]
+    readings = sum(len(block[0]) for block in blocks)
+    results["telemetry.ingest"] = measure(lambda: store.ingest_json(message), 3 if quick else 10, repeat)
+    results["telemetry.copy_csv"] = measure(lambda: _csv(blocks), 3 if quick else 10, repeat)
+    for name in ("telemetry.ingest", "telemetry.copy_csv"):
+        results[name]["readings_per_s"] = round(readings / results[name]["median_us"] * 1e6)
+
+    from analytics.downsample import downsample_rows
+
+    # A year of hourly production for 20 wells, newest first like production_trends, to 800 points per well
+    rng = np.random.default_rng(0)
+    hours = np.arange(8760)[::-1]
+    rows = [
+        {"timestamp": 1.7e9 + 3600.0 * h, "well_name": f"Well B-{w}", "production_rate": rate}
+        for h in hours.tolist() for w, rate in enumerate(rng.uniform(400, 1200, 20).round(2).tolist())
+    ]
+    for mode in ("lttb", "minmax"):
+        name = f"downsample.{mode}"
+        results[name] = measure(lambda: downsample_rows(rows, 800, mode), 1 if quick else 3, repeat)
+        results[name]["rows_per_s"] = round(len(rows) / results[name]["median_us"] * 1e6)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--quick", action="store_true")
+    args = parser.parse_args()
+    # Per-request INFO logs would dominate the timings
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    for name, timing in run_micro(quick=args.quick).items():
+        print(f"{name:45s} {timing['median_us']:12.1f} us (best {timing['min_us']:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Query Replay
+Re-issue captured /api/query traffic and compare latency and answers with
+the capture
+
+Reads a capture log written with QUERY_CAPTURE_ENABLED=true
+(observability.capture) and sends each query again. With --speed 1 the
+original arrival times are kept (open loop: a slow server does not slow
+the arrivals), --speed 4 compresses the same schedule four times, and
+--speed 0 sends back to back from --concurrency clients. Without --url
+the replay targets a fake-backed server (benchmarks.fake_server), so it
+needs no databases; latencies are then those of the application over the
+configured store latencies, and answers come from the fake data.
+
+The report puts captured and replayed latency side by side (overall, per
+intent and per stage) and lists answers that changed, most different
+first. It is written as JSON; the exit status is 1 when requests that
+succeeded in the capture fail in the replay.
+
+Run from the backend directory:
+    python -m benchmarks.replay logs/query_capture.jsonl --speed 2
+    python -m benchmarks.replay capture.jsonl --url http://staging:8000 --speed 0 --concurrency 8
+"""
+import os
+import sys
+import json
+import time
+import difflib
+import argparse
+import threading
+from itertools import islice
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from benchmarks.fake_server import add_latency_arguments, latency_from
+from benchmarks.load import api_server
+from observability.capture import read_capture
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+def replay(url: str, entries: List[Dict[str, Any]], speed: float, concurrency: int,
+           max_in_flight: int) -> List[Dict[str, Any]]:
+    """
+    Send every captured query to `url`
+
+    Args:
+        url: Base URL of the API under test
+        entries: Captured records, oldest first
+        speed: Schedule compression (1 = original pacing, 0 = back to back)
+        concurrency: Clients for back-to-back replay
+        max_in_flight: Requests outstanding at once in a paced replay;
+            arrivals beyond it wait and show up as schedule lag
+
+    Returns:
+        One outcome per entry, in capture order
+    """
+    # One client shared by all threads: creating a client per thread costs
+    # more CPU than the requests at replay rates
+    limits = httpx.Limits(max_connections=max(max_in_flight, concurrency),
+                          max_keepalive_connections=max(max_in_flight, concurrency))
+    http = httpx.Client(base_url=url, timeout=120, limits=limits)
+    outcomes: List[Optional[Dict[str, Any]]] = [None] * len(entries)
+
+    def send(i: int, due: Optional[float]) -> None:
+        sent = time.perf_counter()
+        outcome = {"lag_ms": round((sent - due) * 1000, 2) if due is not None else 0.0}
+        try:
+            response = http.post("/api/query", json={"query": entries[i]["query"]})
+            outcome["status"] = response.status_code
+            outcome["client_ms"] = round((time.perf_counter() - sent) * 1000, 2)
+            # Compare server time with server time; the round trip is reported separately
+            outcome["ms"] = _server_ms(response) or outcome["client_ms"]
+            if response.status_code == 200:
+                outcome.update(_summarize(response.json()))
+        except Exception as e:
+            # Transport errors, but also a 200 whose body is not the expected JSON
+            elapsed = round((time.perf_counter() - sent) * 1000, 2)
+            outcome.update(status=0, ms=elapsed, client_ms=elapsed, error=str(e))
+        outcomes[i] = outcome
+
+    try:
+        if speed > 0:
+            first = entries[0]["ts"]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+                for i, entry in enumerate(entries):
+                    due = started + (entry["ts"] - first) / speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    pool.submit(send, i, due)
+        else:
+            cursor = iter(range(len(entries)))
+            cursor_lock = threading.Lock()
+
+            def client() -> None:
+                while True:
+                    with cursor_lock:
+                        i = next(cursor, None)
+                    if i is None:
+                        return
+                    send(i, None)
+
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for _ in range(concurrency):
+                    pool.submit(client)
+    finally:
+        http.close()
+    return outcomes
+
+
+def _server_ms(response) -> Optional[float]:
+    """Duration from the `Server-Timing: app;dur=...` header set by /api/query"""
+    for metric in response.headers.get("server-timing", "").split(","):
+        name, _, params = metric.strip().partition(";")
+        if name == "app" and params.startswith("dur="):
+            try:
+                return float(params[4:])
+            except ValueError:
+                return None
+    return None
+
+
+def _summarize(body: Dict[str, Any]) -> Dict[str, Any]:
+    """The parts of a response the report compares"""
+    trace = body.get("reasoning_trace") or []
+    intent = "unknown"
+    for step in trace:
+        if step.get("agent") == "Parser" and (step.get("result") or "").startswith("Intent: "):
+            intent = step["result"][len("Intent: "):]
+    data = body.get("data") or {}
+    return {
+        "intent": intent,
+        "answer": body.get("answer") or "",
+        "confidence": body.get("confidence"),
+        "stages": [{"agent": step["agent"], "ms": step.get("duration_ms")} for step in trace],
+        "rows": {store.split("_")[0]: len(data.get(store) or []) for store in
+                 ("sql_results", "graph_results", "vector_results")}
+    }
+
+
+def build_report(entries: List[Dict[str, Any]], outcomes: List[Dict[str, Any]],
+                 max_diffs: int) -> Dict[str, Any]:
+    """
+    Compare the replay with the capture
+
+    Returns:
+        Latency percentiles (overall, per intent, per stage), answer
+        comparison counts and the most changed answers
+    """
+    captured_ms, replayed_ms, client_ms, lag_ms = [], [], [], []
+    by_intent = defaultdict(lambda: ([], []))
+    by_stage = defaultdict(lambda: ([], []))
+    answers = {"identical": 0, "changed": 0, "intent_changed": 0, "failed": 0, "compared": 0}
+    similarities, changes = [], []
+
+    for entry, outcome in zip(entries, outcomes):
+        lag_ms.append(outcome["lag_ms"])
+        if outcome["status"] != 200:
+            if entry["status"] == 200:
+                answers["failed"] += 1
+            continue
+        if entry["status"] != 200:
+            continue
+        captured_ms.append(entry["ms"])
+        replayed_ms.append(outcome["ms"])
+        client_ms.append(outcome["client_ms"])
+        intent = entry.get("intent", "unknown")
+        by_intent[intent][0].append(entry["ms"])
+        by_intent[intent][1].append(outcome["ms"])
+        for index, stages in enumerate((entry.get("stages", []), outcome["stages"])):
+            for stage in stages:
+                if stage.get("ms") is not None:
+                    by_stage[stage["agent"]][index].append(stage["ms"])
+
+        before = entry.get("answer", "")
+        after = outcome["answer"]
+        if entry.get("answer_truncated"):
+            after = after[:len(before)]
+        answers["compared"] += 1
+        if outcome["intent"] != intent:
+            answers["intent_changed"] += 1
+        if before == after:
+            answers["identical"] += 1
+            similarities.append(1.0)
+            continue
+        answers["changed"] += 1
+        similarity = difflib.SequenceMatcher(None, before, after, autojunk=False).ratio()
+        similarities.append(similarity)
+        changes.append({
+            "query": entry["query"],
+            "similarity": round(similarity, 3),
+            "intent": [intent, outcome["intent"]],
+            "confidence": [entry.get("confidence"), outcome["confidence"]],
+            "rows": [entry.get("rows"), outcome["rows"]],
+            "diff": list(difflib.unified_diff(
+                _sentences(before), _sentences(after), "captured", "replayed", lineterm="", n=1
+            ))
+        })
+
+    answers["mean_similarity"] = round(float(np.mean(similarities)), 3) if similarities else None
+    changes.sort(key=lambda change: change["similarity"])
+    return {
+        "requests": len(entries),
+        "latency": {"captured": _percentiles(captured_ms), "replayed": _percentiles(replayed_ms),
+                    "replayed_round_trip": _percentiles(client_ms)},
+        "by_intent": {
+            intent: {"count": len(before), "captured": _percentiles(before), "replayed": _percentiles(after)}
+            for intent, (before, after) in sorted(by_intent.items())
+        },
+        "by_stage": {
+            agent: {"captured": _percentiles(before), "replayed": _percentiles(after)}
+            for agent, (before, after) in sorted(by_stage.items())
+        },
+        "schedule_lag_ms": _percentiles(lag_ms),
+        "answers": answers,
+        "changes": changes[:max_diffs]
+    }
+
+
+def _sentences(text: str) -> List[str]:
+    return [line for line in text.replace(". ", ".\n").splitlines() if line.strip()]
+
+
+def _percentiles(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": len(values), "p50_ms": round(float(p50), 2), "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2), "max_ms": round(float(max(values)), 2)}
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    def row(name: str, before: Dict[str, Any], after: Dict[str, Any]) -> str:
+        if not before.get("count") or not after.get("count"):
+            return f"  {name:28s} {before.get('count', 0):6d} captured / {after.get('count', 0)} replayed"
+        return (f"  {name:28s} p50 {before['p50_ms']:9.2f} -> {after['p50_ms']:9.2f} ms   "
+                f"p95 {before['p95_ms']:9.2f} -> {after['p95_ms']:9.2f} ms   n={after['count']}")
+
+    print(f"Replayed {report['requests']} requests")
+    print(row("all", report["latency"]["captured"], report["latency"]["replayed"]))
+    round_trip = report["latency"]["replayed_round_trip"]
+    if round_trip.get("count"):
+        print(f"  {'round trip (client)':28s} p50 {round_trip['p50_ms']:9.2f} ms   p95 {round_trip['p95_ms']:9.2f} ms")
+    print("By intent")
+    for intent, latency in report["by_intent"].items():
+        print(row(intent, latency["captured"], latency["replayed"]))
+    print("By stage")
+    for agent, latency in report["by_stage"].items():
+        print(row(agent, latency["captured"], latency["replayed"]))
+    lag = report["schedule_lag_ms"]
+    if lag.get("count") and lag["p99_ms"] > 100:
+        print(f"  schedule lag p99 {lag['p99_ms']:.0f} ms: the replayer could not keep the pace "
+              f"(raise --max-in-flight or lower --speed)")
+    answers = report["answers"]
+    print(f"Answers: {answers['identical']} identical, {answers['changed']} changed "
+          f"(mean similarity {answers['mean_similarity']}), {answers['intent_changed']} with another intent, "
+          f"{answers['failed']} failed")
+    for change in report["changes"][:5]:
+        print(f"  [{change['similarity']:.2f}] {change['query']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("capture", help="capture log (.jsonl or .jsonl.gz)")
+    parser.add_argument("--url", help="base URL of the API under test (default: start a fake-backed server)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="schedule compression: 1 keeps the original pacing, 0 sends back to back")
+    parser.add_argument("--concurrency", type=int, default=4, help="clients for --speed 0")
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--limit", type=int, help="replay only the first N captured requests")
+    parser.add_argument("--max-diffs", type=int, default=50, help="changed answers kept in the report")
+    parser.add_argument("--report", default="benchmarks/results/replay.json")
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+    # Per-request INFO logs would dominate the timings
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    entries = list(islice(read_capture(args.capture), args.limit))
+    if not entries:
+        print(f"No captured requests in {args.capture}")
+        sys.exit(1)
+    entries.sort(key=lambda entry: entry["ts"])
+
+    with api_server(args.url, latency_from(args), args.jitter, args.seed) as url:
+        # One untimed request per distinct query warms imports and caches, so the
+        # first seconds of the schedule do not queue behind a cold start
+        warmup = list({entry["query"]: entry for entry in entries[:200]}.values())
+        replay(url, warmup, 0, args.concurrency, args.max_in_flight)
+        outcomes = replay(url, entries, args.speed, args.concurrency, args.max_in_flight)
+
+    report = build_report(entries, outcomes, args.max_diffs)
+    report["config"] = {
+        "capture": args.capture,
+        "url": args.url,
+        "speed": args.speed,
+        "concurrency": args.concurrency if args.speed <= 0 else None,
+        "latency_ms": None if args.url else
+        {store: seconds * 1000 for store, seconds in latency_from(args).items()}
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print_report(report)
+    print(f"Report written to {args.report}")
+    if report["answers"]["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
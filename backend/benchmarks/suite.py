@@ -0,0 +1,153 @@
+"""
+Benchmark Suite
+Microbenchmarks plus the /api/query load test, saved as JSON and compared
+against a baseline run
+
+Every result is flattened into named metrics with a direction ("lower" or
+"higher" is better). A metric regresses when it is worse than the
+baseline by more than the tolerance; any regression, or any failed
+request in the load test, makes the run exit with status 1. Baselines are
+machine-specific: record one on the machine that runs the comparison.
+
+Run from the backend directory:
+    python -m benchmarks.suite --output benchmarks/results/latest.json \\
+        --baseline benchmarks/results/baseline.json
+    python -m benchmarks.suite --quick --skip-load
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from typing import List, Dict, Any
+
+from benchmarks.fake_server import add_latency_arguments, latency_from
+
+# Load-test metrics are noisier than microbenchmarks
+DEFAULT_TOLERANCE = {"micro": 0.15, "load": 0.25}
+
+
+def collect(micro: Dict[str, Dict[str, float]], load: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Flatten benchmark results into {name: {value, unit, better}}"""
+    metrics = {}
+    for name, timing in micro.items():
+        metrics[f"micro.{name}"] = {"value": timing["median_us"], "unit": "us", "better": "lower"}
+    for level in load:
+        prefix = f"load.c{level['concurrency']}"
+        metrics[f"{prefix}.throughput_rps"] = {"value": level["throughput_rps"], "unit": "req/s", "better": "higher"}
+        for percentile in ("p50_ms", "p95_ms", "p99_ms"):
+            if percentile in level:
+                metrics[f"{prefix}.{percentile}"] = {"value": level[percentile], "unit": "ms", "better": "lower"}
+    return metrics
+
+
+def compare(current: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: Dict[str, float]) -> List[Dict[str, Any]]:
+    """
+    Compare metrics present in both runs
+
+    Returns:
+        One row per metric with the change and whether it regressed
+    """
+    rows = []
+    for name, metric in current.items():
+        base = baseline.get(name)
+        if base is None or not base["value"]:
+            continue
+        change = (metric["value"] - base["value"]) / base["value"]
+        worse = change if metric["better"] == "lower" else -change
+        allowed = tolerance[name.split(".", 1)[0]]
+        rows.append({
+            "metric": name,
+            "baseline": base["value"],
+            "current": metric["value"],
+            "unit": metric["unit"],
+            "change_pct": round(change * 100, 1),
+            "regressed": worse > allowed
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", default="benchmarks/results/latest.json")
+    parser.add_argument("--baseline", help="earlier results to compare against (skipped if missing)")
+    parser.add_argument("--micro-tolerance", type=float, default=DEFAULT_TOLERANCE["micro"])
+    parser.add_argument("--load-tolerance", type=float, default=DEFAULT_TOLERANCE["load"])
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions and shorter load levels")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--url", help="load-test a running API instead of a fake-backed server")
+    parser.add_argument("--levels", default="1,2,4,8,16")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per load level")
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+    # Per-request INFO logs would dominate the timings
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from benchmarks.micro import run_micro
+    from benchmarks.load import run_load
+
+    print("Microbenchmarks", flush=True)
+    micro = run_micro(quick=args.quick)
+    for name, timing in micro.items():
+        print(f"  {name:45s} {timing['median_us']:12.1f} us", flush=True)
+
+    load = []
+    if not args.skip_load:
+        print("Load test", flush=True)
+        load = run_load(args.url, [int(c) for c in args.levels.split(",")],
+                        2.0 if args.quick else args.duration,
+                        latency=latency_from(args), jitter=args.jitter, seed=args.seed)
+
+    failed_requests = sum(level["errors"] for level in load)
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "config": {
+            "quick": args.quick,
+            "url": args.url,
+            "levels": args.levels,
+            "duration": args.duration,
+            "latency_ms": {store: seconds * 1000 for store, seconds in latency_from(args).items()},
+            "jitter": args.jitter,
+            "seed": args.seed
+        },
+        "micro": micro,
+        "load": load,
+        "metrics": collect(micro, load)
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(results["metrics"], baseline["metrics"],
+                       {"micro": args.micro_tolerance, "load": args.load_tolerance})
+        print(f"Compared with {args.baseline}")
+        for row in rows:
+            flag = "REGRESSED" if row["regressed"] else ""
+            print(f"  {row['metric']:45s} {row['baseline']:12.2f} -> {row['current']:12.2f} {row['unit']:6s} "
+                  f"{row['change_pct']:+7.1f}% {flag}")
+        regressions = [row for row in rows if row["regressed"]]
+    elif args.baseline:
+        print(f"No baseline at {args.baseline}; copy {args.output} there to create one")
+
+    if failed_requests:
+        print(f"FAILED: {failed_requests} requests failed during the load test")
+    if regressions:
+        print(f"FAILED: {len(regressions)} metrics regressed beyond tolerance")
+    if failed_requests or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
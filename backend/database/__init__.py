@@ -3,15 +3,21 @@ Database connections and models
 """
 from .connections import (
     get_postgres_connection,
+    get_pooled_postgres_connection,
     get_neo4j_driver,
+    get_shared_neo4j_driver,
     get_qdrant_client,
+    get_shared_qdrant_client,
     get_minio_client
 )
 
 __all__ = [
     "get_postgres_connection",
+    "get_pooled_postgres_connection",
     "get_neo4j_driver",
+    "get_shared_neo4j_driver",
     "get_qdrant_client",
+    "get_shared_qdrant_client",
     "get_minio_client"
 ]
 
@@ -3,15 +3,19 @@ Database connection managers for PostgreSQL, Neo4j, Qdrant, and MinIO
 """
 import os
 import logging
+import threading
 from typing import Optional
 from contextlib import contextmanager
 
 # Database imports
 try:
     import psycopg2
+    import psycopg2.pool
+    from psycopg2.extensions import connection as _PGConnection
     from psycopg2.extras import RealDictCursor
 except ImportError:
     psycopg2 = None
+    _PGConnection = object
 
 try:
     from neo4j import GraphDatabase
@@ -30,6 +34,35 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+_pool_lock = threading.Lock()
+_postgres_pool = None
+_neo4j_driver = None
+_qdrant_client = None
+
+
+class PreparedStatementConnection(_PGConnection):
+    """
+    psycopg2 connection that remembers which named statements have been
+    PREPAREd on it, so the statement registry prepares each one only once
+    per server session
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+
+def _postgres_connect_kwargs():
+    return dict(
+        host=os.getenv("POSTGRES_HOST", "localhost"),
+        port=os.getenv("POSTGRES_PORT", "5432"),
+        database=os.getenv("POSTGRES_DB", "oilfield_production"),
+        user=os.getenv("POSTGRES_USER", "oilfield_user"),
+        password=os.getenv("POSTGRES_PASSWORD", "oilfield_pass"),
+        cursor_factory=RealDictCursor,
+        connection_factory=PreparedStatementConnection
+    )
+
 # PostgreSQL Connection
 @contextmanager
 def get_postgres_connection():
@@ -41,14 +74,7 @@ def get_postgres_connection():
     
     conn = None
     try:
-        conn = psycopg2.connect(
-            host=os.getenv("POSTGRES_HOST", "localhost"),
-            port=os.getenv("POSTGRES_PORT", "5432"),
-            database=os.getenv("POSTGRES_DB", "oilfield_production"),
-            user=os.getenv("POSTGRES_USER", "oilfield_user"),
-            password=os.getenv("POSTGRES_PASSWORD", "oilfield_pass"),
-            cursor_factory=RealDictCursor
-        )
+        conn = psycopg2.connect(**_postgres_connect_kwargs())
         logger.info("PostgreSQL connection established")
         yield conn
     except Exception as e:
@@ -59,6 +85,55 @@ def get_postgres_connection():
             conn.close()
             logger.info("PostgreSQL connection closed")
 
+def get_postgres_pool():
+    """
+    Get the process-wide PostgreSQL connection pool, creating it on first use
+    """
+    global _postgres_pool
+    
+    if psycopg2 is None:
+        raise ImportError("psycopg2 not installed. Run: pip install psycopg2-binary")
+    
+    if _postgres_pool is None:
+        with _pool_lock:
+            if _postgres_pool is None:
+                _postgres_pool = psycopg2.pool.ThreadedConnectionPool(
+                    int(os.getenv("POSTGRES_POOL_MIN", "1")),
+                    int(os.getenv("POSTGRES_POOL_MAX", "10")),
+                    **_postgres_connect_kwargs()
+                )
+                logger.info("PostgreSQL connection pool created")
+    return _postgres_pool
+
+# Pooled PostgreSQL Connection
+@contextmanager
+def get_pooled_postgres_connection():
+    """
+    Borrow a PostgreSQL connection from the pool
+    
+    Connections are long-lived, so statements prepared on them stay
+    prepared across requests. Broken connections are discarded.
+    """
+    pool = get_postgres_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    except Exception as e:
+        logger.error(f"PostgreSQL pooled connection error: {str(e)}")
+        raise
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+
+def postgres_pool_stats() -> Optional[dict]:
+    """
+    Connections in use and idle in the shared pool, or None if no pool
+    has been created yet (never creates one)
+    """
+    pool = _postgres_pool
+    if pool is None:
+        return None
+    return {"in_use": len(pool._used), "idle": len(pool._pool), "max": pool.maxconn}
+
 # Neo4j Connection
 def get_neo4j_driver():
     """
@@ -81,6 +156,22 @@ def get_neo4j_driver():
         logger.error(f"Neo4j connection error: {str(e)}")
         raise
 
+# Shared Neo4j Driver
+def get_shared_neo4j_driver():
+    """
+    Get the process-wide Neo4j driver
+    
+    The driver owns a connection pool, so it is created once and reused;
+    callers must not close it.
+    """
+    global _neo4j_driver
+    
+    if _neo4j_driver is None:
+        with _pool_lock:
+            if _neo4j_driver is None:
+                _neo4j_driver = get_neo4j_driver()
+    return _neo4j_driver
+
 # Qdrant Connection
 def get_qdrant_client():
     """
@@ -100,6 +191,22 @@ def get_qdrant_client():
         logger.error(f"Qdrant connection error: {str(e)}")
         raise
 
+# Shared Qdrant Client
+def get_shared_qdrant_client():
+    """
+    Get the process-wide Qdrant client
+    
+    The client keeps its HTTP connection pool alive between searches, so it
+    is created once and reused; callers must not close it.
+    """
+    global _qdrant_client
+    
+    if _qdrant_client is None:
+        with _pool_lock:
+            if _qdrant_client is None:
+                _qdrant_client = get_qdrant_client()
+    return _qdrant_client
+
 # MinIO Connection
 def get_minio_client():
     """
@@ -0,0 +1,191 @@
+"""
+Neo4j Graph Schema Manager
+Versioned, idempotent constraints and indexes for every lookup key the
+agents use
+
+Run from the backend directory:
+    python -m database.graph_schema            # apply pending migrations
+    python -m database.graph_schema --report   # EXPLAIN every agent statement
+"""
+import re
+import json
+import logging
+import argparse
+from typing import List, Dict, Any, Optional, Tuple
+
+from database.connections import get_shared_neo4j_driver
+from database.statements import statements
+
+logger = logging.getLogger(__name__)
+
+# (version, description, statements). Every statement must be idempotent so
+# a partially applied migration can simply be re-run.
+GRAPH_SCHEMA_MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Uniqueness constraints on asset and incident keys", [
+        # Plain indexes from the original seed would block the constraints
+        "DROP INDEX rig_name_idx IF EXISTS",
+        "DROP INDEX basin_name_idx IF EXISTS",
+        "DROP INDEX well_name_idx IF EXISTS",
+        "DROP INDEX sensor_id_idx IF EXISTS",
+        "DROP INDEX equipment_id_idx IF EXISTS",
+        "DROP INDEX incident_id_idx IF EXISTS",
+        "CREATE CONSTRAINT basin_name_unique IF NOT EXISTS FOR (b:Basin) REQUIRE b.name IS UNIQUE",
+        "CREATE CONSTRAINT rig_name_unique IF NOT EXISTS FOR (r:Rig) REQUIRE r.name IS UNIQUE",
+        "CREATE CONSTRAINT well_name_unique IF NOT EXISTS FOR (w:Well) REQUIRE w.name IS UNIQUE",
+        "CREATE CONSTRAINT sensor_id_unique IF NOT EXISTS FOR (s:Sensor) REQUIRE s.sensor_id IS UNIQUE",
+        "CREATE CONSTRAINT equipment_id_unique IF NOT EXISTS FOR (e:Equipment) REQUIRE e.id IS UNIQUE",
+        "CREATE CONSTRAINT incident_id_unique IF NOT EXISTS FOR (i:Incident) REQUIRE i.incident_id IS UNIQUE"
+    ]),
+    (2, "Range indexes for sensor state and event timestamps", [
+        "CREATE RANGE INDEX sensor_status_idx IF NOT EXISTS FOR (s:Sensor) ON (s.status)",
+        "CREATE RANGE INDEX sensor_anomaly_idx IF NOT EXISTS FOR (s:Sensor) ON (s.last_reading_anomaly)",
+        "CREATE RANGE INDEX sensor_anomaly_time_idx IF NOT EXISTS FOR (s:Sensor) ON (s.anomaly_detected_at)",
+        "CREATE RANGE INDEX incident_time_idx IF NOT EXISTS FOR (i:Incident) ON (i.timestamp)"
+    ]),
+    (3, "Text index for sensor status lookups", [
+        "CREATE TEXT INDEX sensor_status_text_idx IF NOT EXISTS FOR (s:Sensor) ON (s.status)"
+    ]),
+    (4, "Incident candidates raised by the telemetry anomaly detector", [
+        "CREATE CONSTRAINT incident_candidate_id_unique IF NOT EXISTS "
+        "FOR (c:IncidentCandidate) REQUIRE c.candidate_id IS UNIQUE",
+        "CREATE RANGE INDEX incident_candidate_time_idx IF NOT EXISTS FOR (c:IncidentCandidate) ON (c.detected_at)"
+    ])
+]
+
+_PARAM_PATTERN = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)")
+_INDEX_TARGET = re.compile(r":([A-Za-z_]+)\(([A-Za-z_, ]+)\)")
+
+# Placeholder values so EXPLAIN can plan statements without real inputs
+_EXPLAIN_PARAMS = {"frontier": [], "since": None, "rows": []}
+
+
+class GraphSchemaManager:
+    """
+    Applies graph schema migrations and reports their effect on query plans
+
+    The applied version is stored on a single (:_GraphSchema) node. Schema
+    statements run in their own auto-commit transactions, since Neo4j does
+    not allow schema and data changes in one transaction.
+    """
+
+    def __init__(self, driver=None):
+        self.driver = driver or get_shared_neo4j_driver()
+
+    @property
+    def target_version(self) -> int:
+        return GRAPH_SCHEMA_MIGRATIONS[-1][0]
+
+    def current_version(self) -> int:
+        """Schema version recorded in the graph (0 if never applied)"""
+        with self.driver.session() as session:
+            record = session.run(
+                "MATCH (v:_GraphSchema {name: 'oilfield'}) RETURN v.version as version"
+            ).single()
+            return record["version"] if record else 0
+
+    def apply(self) -> List[int]:
+        """
+        Apply pending migrations in order
+
+        Returns:
+            Versions that were applied
+        """
+        current = self.current_version()
+        applied = []
+        with self.driver.session() as session:
+            for version, description, commands in GRAPH_SCHEMA_MIGRATIONS:
+                if version <= current:
+                    continue
+                logger.info(f"Applying graph schema v{version}: {description}")
+                for command in commands:
+                    session.run(command).consume()
+                session.run(
+                    "MERGE (v:_GraphSchema {name: 'oilfield'}) "
+                    "SET v.version = $version, v.applied_at = datetime()",
+                    version=version
+                ).consume()
+                applied.append(version)
+            if applied:
+                session.run("CALL db.awaitIndexes(300)").consume()
+        logger.info(f"Graph schema at v{max([current] + applied)}")
+        return applied
+
+    def bootstrap(self) -> Dict[str, Any]:
+        """
+        Apply pending migrations, capturing plans before and after
+
+        Returns:
+            Dictionary with applied versions and, when anything changed,
+            the per-statement index usage before and after
+        """
+        pending = self.current_version() < self.target_version
+        before = self.report() if pending else None
+        applied = self.apply()
+        result: Dict[str, Any] = {"applied": applied, "version": self.current_version()}
+        if applied:
+            after = self.report()
+            result["improved"] = {
+                name: {"before": before[name], "after": after[name]}
+                for name in after
+                if after[name]["indexes"] != before[name]["indexes"]
+            }
+        return result
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """
+        EXPLAIN every registered Cypher statement and list the indexes used
+
+        Returns:
+            Mapping of statement name to plan operators and index targets
+        """
+        report = {}
+        with self.driver.session() as session:
+            for name in statements.cypher_names():
+                text = statements.cypher_text(name)
+                params = {
+                    p: _EXPLAIN_PARAMS.get(p, "") for p in set(_PARAM_PATTERN.findall(text))
+                }
+                plan = session.run("EXPLAIN " + text, params).consume().plan
+                report[name] = _summarize_plan(plan)
+        return report
+
+
+def _summarize_plan(plan: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Collect operator names and Label(property) targets of index operators"""
+    operators: List[str] = []
+    indexes: List[str] = []
+    stack = [plan] if plan else []
+    while stack:
+        node = stack.pop()
+        operator = node.get("operatorType", "").split("@")[0]
+        operators.append(operator)
+        if "Index" in operator:
+            args = node.get("args") or node.get("arguments") or {}
+            for label, props in _INDEX_TARGET.findall(str(args.get("Details", ""))):
+                indexes.append(f"{label}({props.replace(' ', '')})")
+        stack.extend(node.get("children", []))
+    return {
+        "operators": operators,
+        "indexes": sorted(set(indexes)),
+        "label_scans": sum(1 for op in operators if op in ("NodeByLabelScan", "AllNodesScan"))
+    }
+
+
+def bootstrap_graph_schema() -> Dict[str, Any]:
+    """Apply pending graph schema migrations (used at application startup)"""
+    return GraphSchemaManager().bootstrap()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the Neo4j graph schema")
+    parser.add_argument("--report", action="store_true", help="only EXPLAIN agent statements")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    manager = GraphSchemaManager()
+    result = manager.report() if args.report else manager.bootstrap()
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Slow Statement Log
+Registry statements slower than a threshold, with their plans
+
+StatementRegistry reports every execution; those over SLOW_STATEMENT_MS
+are kept in a ring buffer with their parameters, and a background worker
+re-runs them under EXPLAIN (ANALYZE, BUFFERS) or Cypher PROFILE to attach
+the actual plan. Capturing a plan executes the statement again, so each
+statement is explained at most once per SLOW_STATEMENT_EXPLAIN_COOLDOWN_SECONDS
+and the capture queue is bounded; records beyond that keep only the timing.
+Statements registered as writes get a plain EXPLAIN (the estimated plan)
+instead: running them again would apply their changes a second time.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Longest list or string parameter kept verbatim in a record
+MAX_PARAM_ITEMS = 20
+MAX_PARAM_CHARS = 200
+
+
+class SlowStatementLog:
+    """
+    Ring buffer of slow statement executions
+
+    Settings: SLOW_STATEMENT_MS (threshold, 0 disables), SLOW_STATEMENT_LOG_SIZE,
+    SLOW_STATEMENT_EXPLAIN (capture plans, default true) and
+    SLOW_STATEMENT_EXPLAIN_COOLDOWN_SECONDS.
+    """
+
+    def __init__(self):
+        self.threshold = float(os.getenv("SLOW_STATEMENT_MS", "500")) / 1000
+        self.explain = os.getenv("SLOW_STATEMENT_EXPLAIN", "true").lower() == "true"
+        self.cooldown = float(os.getenv("SLOW_STATEMENT_EXPLAIN_COOLDOWN_SECONDS", "300"))
+        self.max_pending = 4
+        self.records = deque(maxlen=int(os.getenv("SLOW_STATEMENT_LOG_SIZE", "200")))
+        self._explained_at: Dict[tuple, float] = {}
+        self._pending = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def observe(self, store: str, name: str, params, seconds: float, rows: int) -> None:
+        """
+        Record an execution if it was slow (called by StatementRegistry)
+
+        Args:
+            store: "sql" or "cypher"
+            name: Registered statement name
+            params: Positional SQL parameters or Cypher parameter dict
+            seconds: Execution time including fetching rows
+            rows: Number of rows returned
+        """
+        if self.threshold <= 0 or seconds < self.threshold:
+            return
+
+        now = time.time()
+        record = {
+            "id": 0,
+            "store": store,
+            "statement": name,
+            "params": _loggable(params),
+            "duration_ms": round(seconds * 1000, 2),
+            "rows": rows,
+            "recorded_at": now,
+            "plan_status": "skipped",
+            "plan_kind": None,
+            "plan": None
+        }
+        capture = False
+        with self._lock:
+            self._sequence += 1
+            record["id"] = self._sequence
+            if self.explain and now - self._explained_at.get((store, name), 0.0) >= self.cooldown:
+                if self._pending < self.max_pending:
+                    self._explained_at[(store, name)] = now
+                    self._pending += 1
+                    record["plan_status"] = "pending"
+                    capture = True
+            self.records.append(record)
+        logger.warning(f"Slow {store} statement {name}: {record['duration_ms']}ms, {rows} rows")
+
+        if capture:
+            self._worker().submit(self._capture, record, store, name, params)
+
+    def recent(self, store: Optional[str] = None, statement: Optional[str] = None,
+               limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent records first, optionally for one store or statement"""
+        with self._lock:
+            records = [dict(r) for r in reversed(self.records)
+                       if (store is None or r["store"] == store)
+                       and (statement is None or r["statement"] == statement)]
+        return records[:limit]
+
+    def _worker(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow_explain")
+        return self._executor
+
+    def _capture(self, record: Dict[str, Any], store: str, name: str, params) -> None:
+        from database.statements import statements
+
+        # Never execute a write again just to see its plan
+        actual = not statements.is_write(store, name)
+        try:
+            plan = _explain_sql(name, params, actual) if store == "sql" else _profile_cypher(name, params, actual)
+            status = "captured"
+        except Exception as e:
+            logger.warning(f"Plan capture for {store} statement {name} failed: {str(e)}")
+            plan, status = None, f"failed: {str(e)}"
+        with self._lock:
+            record["plan"] = plan
+            record["plan_kind"] = "actual" if actual else "estimated"
+            record["plan_status"] = status
+            self._pending -= 1
+
+
+def _explain_sql(name: str, params, actual: bool = True) -> List[str]:
+    from database.connections import get_pooled_postgres_connection
+    from database.statements import statements
+
+    with get_pooled_postgres_connection() as conn:
+        try:
+            return statements.explain_sql(conn, name, params, "(ANALYZE, BUFFERS)" if actual else "")
+        finally:
+            conn.rollback()
+
+
+def _profile_cypher(name: str, params, actual: bool = True) -> Dict[str, Any]:
+    from database.connections import get_shared_neo4j_driver
+    from database.statements import statements
+
+    with get_shared_neo4j_driver().session() as session:
+        result = session.run(("PROFILE " if actual else "EXPLAIN ") + statements.cypher_text(name), params)
+        summary = result.consume()
+    return _compact_profile(summary.profile if actual else summary.plan)
+
+
+def _compact_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep operator, rows, db hits and identifiers of a PROFILE (or EXPLAIN) tree"""
+    args = profile.get("args", {})
+    return {
+        "operator": profile.get("operatorType"),
+        "rows": profile.get("rows"),
+        "db_hits": profile.get("dbHits"),
+        "details": args.get("Details"),
+        "identifiers": profile.get("identifiers"),
+        "children": [_compact_profile(child) for child in profile.get("children", [])]
+    }
+
+
+def _loggable(value):
+    """Parameters made JSON-friendly, with long lists and strings cut short"""
+    if isinstance(value, dict):
+        return {k: _loggable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_loggable(v) for v in value[:MAX_PARAM_ITEMS]]
+        if len(value) > MAX_PARAM_ITEMS:
+            items.append(f"... {len(value) - MAX_PARAM_ITEMS} more")
+        return items
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = str(value)
+    return text if len(text) <= MAX_PARAM_CHARS else text[:MAX_PARAM_CHARS] + "..."
+
+
+slow_statements = SlowStatementLog()
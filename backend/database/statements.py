@@ -0,0 +1,466 @@
+"""
+Prepared Statement Registry
+Named, parameterized SQL and Cypher statements shared by all agents
+"""
+import re
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Sequence, Set, Tuple
+
+from observability.tracing import span, set_attributes
+from database.slow_statements import slow_statements
+
+logger = logging.getLogger(__name__)
+
+# Highest traversal depth accepted by impact analysis
+MAX_IMPACT_HOPS = 6
+
+_NAME_PATTERN = re.compile(r"^[a-z][a-z0-9_]*$")
+
+
+class StatementRegistry:
+    """
+    Central registry of named statements for PostgreSQL and Neo4j
+
+    SQL statements use $1..$n placeholders and are PREPAREd once per pooled
+    connection, then run with EXECUTE. Cypher statements use $name
+    parameters and always send identical text, so Neo4j can serve them
+    from its query plan cache; whether it does is only visible on the
+    server, so for Cypher the registry reports the server's time to first
+    record (result_available_after, which includes planning) instead of a
+    hit rate. Executions slower than SLOW_STATEMENT_MS go to the slow
+    statement log; statements registered with write=True are only
+    EXPLAINed there, never executed a second time.
+    """
+
+    def __init__(self):
+        self._sql: Dict[str, str] = {}
+        self._cypher: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._sql_stats: Dict[str, Dict[str, int]] = {}
+        self._cypher_stats: Dict[str, Dict[str, int]] = {}
+        # (store, name) of statements that modify data
+        self._writes: Set[Tuple[str, str]] = set()
+
+    def register_sql(self, name: str, text: str, write: bool = False) -> None:
+        """Register a SQL statement under a unique name (write=True if it modifies data)"""
+        self._check_name(name, self._sql)
+        self._sql[name] = text.strip().rstrip(";")
+        self._sql_stats[name] = {"executions": 0, "prepares": 0}
+        if write:
+            self._writes.add(("sql", name))
+
+    def register_cypher(self, name: str, text: str, write: bool = False) -> None:
+        """Register a Cypher statement under a unique name (write=True if it modifies data)"""
+        self._check_name(name, self._cypher)
+        self._cypher[name] = text.strip()
+        self._cypher_stats[name] = {"executions": 0, "timed": 0, "available_after_ms": 0}
+        if write:
+            self._writes.add(("cypher", name))
+
+    def is_write(self, store: str, name: str) -> bool:
+        """True for statements registered with write=True ("sql" or "cypher" store)"""
+        return (store, name) in self._writes
+
+    def sql_text(self, name: str) -> str:
+        """Return the text of a registered SQL statement"""
+        return self._sql[name]
+
+    def cypher_text(self, name: str) -> str:
+        """Return the text of a registered Cypher statement"""
+        return self._cypher[name]
+
+    def sql_names(self) -> List[str]:
+        """Names of all registered SQL statements"""
+        return list(self._sql)
+
+    def cypher_names(self) -> List[str]:
+        """Names of all registered Cypher statements"""
+        return list(self._cypher)
+
+    def execute_sql(self, conn, name: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """
+        Execute a registered SQL statement on a connection
+
+        Args:
+            conn: Connection from get_pooled_postgres_connection
+            name: Registered statement name
+            params: Positional parameters for $1..$n
+
+        Returns:
+            Fetched rows
+        """
+        with span(f"sql {name}", **{"db.system": "postgresql", "db.statement.name": name}) as current:
+            started = time.perf_counter()
+            with conn.cursor() as cur:
+                self._ensure_prepared(conn, cur, name)
+                cur.execute(self._execute_text(name, params), tuple(params))
+                rows = cur.fetchall()
+            slow_statements.observe("sql", name, params, time.perf_counter() - started, len(rows))
+            set_attributes(current, **{"db.rows": len(rows)})
+            return rows
+
+    def explain_sql(self, conn, name: str, params: Sequence[Any] = (), options: str = "") -> List[str]:
+        """
+        EXPLAIN a registered SQL statement as it is actually executed
+
+        Args:
+            conn: Connection from get_pooled_postgres_connection
+            name: Registered statement name
+            params: Positional parameters for $1..$n
+            options: EXPLAIN options, e.g. "(ANALYZE, BUFFERS)"
+
+        Returns:
+            Plan lines
+        """
+        with conn.cursor() as cur:
+            self._ensure_prepared(conn, cur, name, count=False)
+            explain = f"EXPLAIN {options} " if options else "EXPLAIN "
+            cur.execute(explain + self._execute_text(name, params), tuple(params))
+            return [row["QUERY PLAN"] for row in cur.fetchall()]
+
+    def run_cypher(self, session, name: str, **params) -> List[Dict[str, Any]]:
+        """
+        Run a registered Cypher statement in a session
+
+        Args:
+            session: Neo4j session
+            name: Registered statement name
+            **params: Cypher parameters
+
+        Returns:
+            Records as dictionaries
+        """
+        text = self._cypher[name]
+        with span(f"cypher {name}", **{"db.system": "neo4j", "db.statement.name": name}) as current:
+            started = time.perf_counter()
+            result = session.run(text, params)
+            records = [dict(record) for record in result]
+            slow_statements.observe("cypher", name, params, time.perf_counter() - started, len(records))
+            set_attributes(current, **{"db.rows": len(records)})
+        available_after = self._available_after(result)
+        with self._lock:
+            stats = self._cypher_stats[name]
+            stats["executions"] += 1
+            if available_after is not None:
+                stats["timed"] += 1
+                stats["available_after_ms"] += available_after
+        return records
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return execution counts per statement, with plan reuse where known
+
+        For SQL the hit rate counts EXECUTEs on a connection where the
+        statement was already prepared. For Cypher, avg_available_after_ms
+        is the server's mean time to first record; a rise without a change
+        in data points at replanning (plan cache evictions).
+        """
+        with self._lock:
+            sql = {
+                name: {
+                    **s,
+                    "hit_rate": self._hit_rate(s["executions"], s["prepares"])
+                }
+                for name, s in self._sql_stats.items()
+            }
+            cypher = {
+                name: {
+                    "executions": s["executions"],
+                    "avg_available_after_ms": round(s["available_after_ms"] / s["timed"], 2) if s["timed"] else None
+                }
+                for name, s in self._cypher_stats.items()
+            }
+        return {"sql": sql, "cypher": cypher}
+
+    def _ensure_prepared(self, conn, cur, name: str, count: bool = True) -> None:
+        prepared = conn.prepared_statements
+        with self._lock:
+            stats = self._sql_stats[name]
+            if count:
+                stats["executions"] += 1
+            if name in prepared:
+                return
+            stats["prepares"] += 1
+        cur.execute(f"PREPARE {name} AS {self._sql[name]}")
+        prepared.add(name)
+        logger.debug(f"Prepared statement {name} on connection {id(conn)}")
+
+    @staticmethod
+    def _execute_text(name: str, params: Sequence[Any]) -> str:
+        if not params:
+            return f"EXECUTE {name}"
+        return f"EXECUTE {name} ({', '.join(['%s'] * len(params))})"
+
+    @staticmethod
+    def _available_after(result) -> Any:
+        """result_available_after (ms) from the summary of a consumed result, if the driver reports it"""
+        try:
+            return result.consume().result_available_after
+        except Exception:
+            return None
+
+    @staticmethod
+    def _hit_rate(executions: int, misses: int) -> float:
+        if executions == 0:
+            return 0.0
+        return round(max(executions - misses, 0) / executions, 4)
+
+    @staticmethod
+    def _check_name(name: str, existing: Dict[str, str]) -> None:
+        if not _NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid statement name: {name}")
+        if name in existing:
+            raise ValueError(f"Statement already registered: {name}")
+
+
+statements = StatementRegistry()
+
+# ---------------------------------------------------------------------------
+# SQL statements
+# ---------------------------------------------------------------------------
+
+# Per-well, time-based moving average. The inner WHERE bounds the scan to
+# the requested interval plus one window of lookback so the first rows of
+# the interval get a fully seeded average; the outer WHERE then drops the
+# lookback rows after the window has been computed.
+# $1 rig_name, $2 hours, $3 window_hours
+statements.register_sql("production_trends", """
+WITH windowed AS (
+    SELECT
+        timestamp,
+        well_name,
+        production_rate,
+        AVG(production_rate) OVER (
+            PARTITION BY well_name
+            ORDER BY timestamp
+            RANGE BETWEEN make_interval(hours => $3) PRECEDING
+                      AND CURRENT ROW
+        ) as moving_avg,
+        pressure,
+        temperature
+    FROM production_data
+    WHERE rig_name = $1
+    AND timestamp >= NOW() - make_interval(hours => $2)
+                           - make_interval(hours => $3)
+)
+SELECT timestamp, well_name, production_rate, moving_avg, pressure, temperature
+FROM windowed
+WHERE timestamp >= NOW() - make_interval(hours => $2)
+ORDER BY timestamp DESC, well_name
+""")
+
+# $1 basin, $2 days
+statements.register_sql("wells_below_average", """
+WITH well_averages AS (
+    SELECT
+        well_name,
+        AVG(production_rate) as avg_rate,
+        production_rate as current_rate,
+        timestamp
+    FROM production_data
+    WHERE basin = $1
+    AND timestamp >= NOW() - make_interval(days => $2)
+    GROUP BY well_name, production_rate, timestamp
+)
+SELECT
+    well_name,
+    current_rate,
+    avg_rate,
+    ((current_rate - avg_rate) / avg_rate * 100) as deviation_pct
+FROM well_averages
+WHERE current_rate < avg_rate
+ORDER BY deviation_pct ASC
+""")
+
+statements.register_sql("maintenance_overdue", """
+SELECT
+    equipment_id,
+    equipment_type,
+    last_maintenance_date,
+    next_maintenance_due,
+    EXTRACT(DAY FROM (NOW() - next_maintenance_due)) as days_overdue
+FROM maintenance_schedule
+WHERE next_maintenance_due < NOW()
+ORDER BY days_overdue DESC
+""")
+
+# Production roll-up over the asset closure table: every well below an
+# ancestor (basin or rig) in one range scan of the closure primary key.
+# $1 ancestor_id, $2 days
+statements.register_sql("production_rollup", """
+SELECT
+    c.descendant_id as well_name,
+    c.depth,
+    AVG(pd.production_rate) as avg_rate,
+    SUM(pd.production_rate) as total_rate,
+    MAX(pd.timestamp) as last_reading
+FROM asset_closure c
+JOIN production_data pd ON pd.well_name = c.descendant_id
+WHERE c.ancestor_id = $1
+AND c.descendant_type = 'Well'
+AND pd.timestamp >= NOW() - make_interval(days => $2)
+GROUP BY c.descendant_id, c.depth
+ORDER BY avg_rate ASC
+""")
+
+# ---------------------------------------------------------------------------
+# Cypher statements
+# ---------------------------------------------------------------------------
+
+statements.register_cypher("faulty_equipment", """
+MATCH (r:Rig {name: $rig_name})-[:HAS_WELL]->(w:Well)
+      -[:HAS_SENSOR]->(s:Sensor)
+WHERE toLower(s.status) = 'faulty' OR s.last_reading_anomaly = true
+RETURN r.name as rig, w.name as well, s.sensor_id as sensor,
+       s.sensor_type as type, s.last_reading as reading,
+       toUpper(s.status) as status
+""")
+
+statements.register_cypher("equipment_by_basin", """
+MATCH (b:Basin {name: $basin})-[:CONTAINS]->(r:Rig)
+      -[:HAS_WELL]->(w:Well)-[:HAS_SENSOR]->(s:Sensor)
+RETURN r.name as rig, w.name as well, s.sensor_id as sensor,
+       s.sensor_type as type, s.status as status
+""")
+
+# Event streams for the incident/anomaly correlation engine
+statements.register_cypher("incident_events", """
+MATCH (i:Incident)-[:OCCURRED_AT]->(w:Well)
+WHERE i.timestamp IS NOT NULL
+RETURN i.incident_id as incident, i.severity as severity, w.name as well,
+       i.timestamp as incident_time, i.timestamp.epochSeconds as incident_epoch
+""")
+
+# Incident text for the lexical index. $since is null for a full load,
+# otherwise the previous watermark (as for the asset snapshot).
+statements.register_cypher("lexical_incidents", """
+MATCH (i:Incident)
+WHERE $since IS NULL OR i.updated_at > $since
+OPTIONAL MATCH (i)-[:OCCURRED_AT]->(w:Well)
+OPTIONAL MATCH (r:Rig)-[:HAS_WELL]->(w)
+OPTIONAL MATCH (i)-[:RELATED_TO]->(a)
+RETURN i.incident_id as incident_id, i.severity as severity,
+       i.description as description, toString(i.timestamp) as timestamp,
+       w.name as well, r.name as rig,
+       collect(coalesce(a.id, a.sensor_id, a.name)) as related
+""")
+
+statements.register_cypher("anomaly_events", """
+MATCH (w:Well)-[:HAS_SENSOR]->(s:Sensor)
+WHERE s.anomaly_detected_at IS NOT NULL
+RETURN s.sensor_id as sensor, s.sensor_type as type, w.name as well,
+       s.anomaly_detected_at as anomaly_time,
+       s.anomaly_detected_at.epochSeconds as anomaly_epoch
+""")
+
+# Flag transitions from the telemetry anomaly detector. A cleared flag keeps
+# the last detection time, which the correlation engine uses as the event.
+statements.register_cypher("sensor_anomaly_flags", write=True, text="""
+UNWIND $rows AS row
+MATCH (s:Sensor {sensor_id: row.sensor})
+SET s.last_reading_anomaly = row.anomaly,
+    s.last_reading = row.reading,
+    s.anomaly_detected_at = CASE WHEN row.anomaly THEN datetime(row.detected_at)
+                                 ELSE s.anomaly_detected_at END,
+    s.updated_at = datetime()
+""")
+
+statements.register_cypher("incident_candidates", write=True, text="""
+UNWIND $rows AS row
+MATCH (s:Sensor {sensor_id: row.sensor})
+MERGE (c:IncidentCandidate {candidate_id: row.id})
+ON CREATE SET c.status = 'OPEN'
+SET c.severity = row.severity, c.rule = row.rule, c.score = row.score,
+    c.reading = row.reading, c.detected_at = datetime(row.detected_at),
+    c.updated_at = datetime()
+MERGE (c)-[:RELATED_TO]->(s)
+WITH c, s
+MATCH (w:Well)-[:HAS_SENSOR]->(s)
+MERGE (c)-[:OCCURRED_AT]->(w)
+""")
+
+# Impact traversal runs level by level from the client: one round trip per
+# hop with the current frontier as a parameter. Only hierarchy relationships
+# are followed, against their direction (child -> parent), so a failure
+# propagates up to the well, rig and basin that depend on the equipment.
+statements.register_cypher("impact_start", """
+MATCH (e:Equipment {id: $equipment_id})
+RETURN elementId(e) as node_id, e.id as asset_name
+""")
+
+statements.register_cypher("impact_parents", """
+UNWIND $frontier AS child_id
+MATCH (child)<-[:HAS_EQUIPMENT|HAS_SENSOR|HAS_WELL|CONTAINS]-(parent)
+WHERE elementId(child) = child_id
+RETURN child_id, elementId(parent) as parent_id,
+       labels(parent)[0] as asset_type,
+       coalesce(parent.name, parent.id, parent.sensor_id) as asset_name
+""")
+
+# Asset snapshot loading. $since is null for a full load, otherwise the
+# previous watermark; writers stamp nodes and relationships with updated_at.
+statements.register_cypher("snapshot_clock", """
+RETURN datetime() as now
+""")
+
+statements.register_cypher("snapshot_nodes", """
+MATCH (n)
+WHERE (n:Basin OR n:Rig OR n:Well OR n:Sensor OR n:Equipment)
+AND ($since IS NULL OR n.updated_at > $since)
+RETURN elementId(n) as node_id,
+       head([l IN labels(n) WHERE l IN ['Basin', 'Rig', 'Well', 'Sensor', 'Equipment']]) as label,
+       properties(n) as props
+""")
+
+statements.register_cypher("snapshot_relationships", """
+MATCH (a)-[r:CONTAINS|HAS_WELL|HAS_SENSOR|HAS_EQUIPMENT]->(b)
+WHERE $since IS NULL OR r.updated_at > $since
+RETURN elementId(a) as parent_id, type(r) as rel_type, elementId(b) as child_id
+""")
+
+# Complete parent set of children whose relationships changed, so a parent
+# that is no longer returned can be dropped from the snapshot
+statements.register_cypher("snapshot_parents", """
+UNWIND $children AS child_id
+MATCH (a)-[r:CONTAINS|HAS_WELL|HAS_SENSOR|HAS_EQUIPMENT]->(b)
+WHERE elementId(b) = child_id
+RETURN elementId(a) as parent_id, type(r) as rel_type, elementId(b) as child_id
+""")
+
+# Closure fallbacks when the in-process snapshot is not fresh. The anchor is
+# found with one labelled lookup per hierarchy label, so every branch is a
+# unique-index seek (graph_schema constraints) rather than a scan of all
+# nodes; an id used by several labels anchors each of them.
+_ASSET_ANCHOR = """
+CALL {
+    MATCH (n:Basin {name: $asset_id}) RETURN n
+    UNION
+    MATCH (n:Rig {name: $asset_id}) RETURN n
+    UNION
+    MATCH (n:Well {name: $asset_id}) RETURN n
+    UNION
+    MATCH (n:Sensor {sensor_id: $asset_id}) RETURN n
+    UNION
+    MATCH (n:Equipment {id: $asset_id}) RETURN n
+}"""
+
+statements.register_cypher("assets_below", _ASSET_ANCHOR + """
+WITH n AS a
+MATCH p = (a)-[:CONTAINS|HAS_WELL|HAS_SENSOR|HAS_EQUIPMENT*1..4]->(d)
+WHERE $asset_type IS NULL OR $asset_type IN labels(d)
+RETURN coalesce(d.name, d.id, d.sensor_id) as asset_id,
+       head([l IN labels(d) WHERE l IN ['Basin', 'Rig', 'Well', 'Sensor', 'Equipment']]) as asset_type,
+       min(length(p)) as depth
+""")
+
+statements.register_cypher("assets_above", _ASSET_ANCHOR + """
+WITH n AS d
+MATCH p = (a)-[:CONTAINS|HAS_WELL|HAS_SENSOR|HAS_EQUIPMENT*1..4]->(d)
+WHERE $asset_type IS NULL OR $asset_type IN labels(a)
+RETURN coalesce(a.name, a.id, a.sensor_id) as asset_id,
+       head([l IN labels(a) WHERE l IN ['Basin', 'Rig', 'Well', 'Sensor', 'Equipment']]) as asset_type,
+       min(length(p)) as depth
+ORDER BY depth ASC
+""")
@@ -2,8 +2,13 @@
 LangGraph State Machine for Agent Orchestration
 Implements the stateful reasoning loop for multi-agent coordination
 """
+import os
+import time
 import logging
-from typing import TypedDict, List, Annotated, Dict, Any
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta, timezone
+from typing import TypedDict, List, Annotated, Dict, Any, Optional
 import operator
 
 logger = logging.getLogger(__name__)
@@ -16,7 +21,68 @@ except ImportError:
     logger.warning("LangGraph not available. Using simplified orchestration.")
     LANGGRAPH_AVAILABLE = False
 
-from agents import QueryParser, SQLAgent, GraphAgent, ReasoningAgent
+from agents import QueryParser, SQLAgent, GraphAgent, VectorAgent, ReasoningAgent
+from observability.metrics import Stage
+
+# Shared by all requests; retrievers mostly wait on I/O
+_retrieval_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RETRIEVAL_WORKERS", "8")),
+    thread_name_prefix="retriever"
+)
+
+# How long a request waits for all of its retrievers together; a retriever
+# still running then is reported as timed out and contributes no results
+RETRIEVAL_TIMEOUT_SECONDS = float(os.getenv("RETRIEVAL_TIMEOUT_SECONDS", "10"))
+
+# Parser time-period entities -> how far back to search reports
+PERIOD_DAYS = {
+    "last hour": 1 / 24,
+    "last 24 hours": 1,
+    "today": 1,
+    "daily": 1,
+    "weekly": 7,
+    "last week": 7,
+    "30-day": 30,
+    "monthly": 30,
+    "last month": 30
+}
+
+# Recent periods -> hours of production trends; these are short enough to
+# be served from live telemetry buffers, and their moving-average window
+# is capped at the period length
+TREND_HOURS = {
+    "last hour": 1,
+    "last 24 hours": 24,
+    "today": 24
+}
+
+def _timed(stage: Stage, fetch):
+    """Run a retriever inside its stage, in the worker thread"""
+    with stage:
+        return fetch()
+
+def _trace_step(trace: List[Dict[str, Any]], agent: str, action: str, result: str,
+                stage: Stage, milliseconds: Optional[float] = None) -> None:
+    trace.append({
+        "step": len(trace) + 1,
+        "agent": agent,
+        "action": action,
+        "result": result,
+        "duration_ms": stage.milliseconds if milliseconds is None else milliseconds,
+        "outcome": stage.outcome
+    })
+
+def _trend_hours(time_periods: List[str]) -> Optional[int]:
+    """Hours of the shortest recent period mentioned in the query"""
+    hours = [TREND_HOURS[p.lower()] for p in time_periods if p.lower() in TREND_HOURS]
+    return min(hours) if hours else None
+
+def _period_start(time_periods: List[str]) -> Optional[datetime]:
+    """Start of the longest time period mentioned in the query"""
+    days = [PERIOD_DAYS[p.lower()] for p in time_periods if p.lower() in PERIOD_DAYS]
+    if not days:
+        return None
+    return datetime.now(timezone.utc) - timedelta(days=max(days))
 
 class AgentState(TypedDict):
     """State shared across all agents"""
@@ -40,6 +106,7 @@ class OilfieldOrchestrator:
         self.parser = QueryParser()
         self.sql_agent = SQLAgent()
         self.graph_agent = GraphAgent()
+        self.vector_agent = VectorAgent()
         self.reasoning_agent = ReasoningAgent()
         
         if LANGGRAPH_AVAILABLE:
@@ -66,60 +133,90 @@ class OilfieldOrchestrator:
     
     def _process_sequential(self, query: str) -> Dict[str, Any]:
         """
-        Process query using sequential agent execution (fallback)
+        Process query without LangGraph (fallback): the planned retrievers
+        run concurrently, then the reasoning agent synthesizes
         """
         reasoning_trace = []
         
         # Step 1: Parse query
-        parse_result = self.parser.parse(query)
-        reasoning_trace.append({
-            "step": 1,
-            "agent": "Parser",
-            "action": "Query decomposition",
-            "result": f"Intent: {parse_result['intent']}"
-        })
+        with Stage("parse", "Parser") as stage:
+            parse_result = self.parser.parse(query)
+            intent = stage.intent = parse_result["intent"]
+        _trace_step(reasoning_trace, "Parser", "Query decomposition", f"Intent: {intent}", stage)
         
-        sql_results = []
-        graph_results = []
+        entities = parse_result["entities"]
+        retrievals = []
         
         # Step 2: Execute SQL queries if needed
-        if "sql_retriever" in parse_result["plan"]:
-            if parse_result["entities"].get("rigs"):
-                rig_name = parse_result["entities"]["rigs"][0]
-                sql_results = self.sql_agent.query_production_trends(rig_name)
-                reasoning_trace.append({
-                    "step": len(reasoning_trace) + 1,
-                    "agent": "SQL",
-                    "action": f"Queried production trends for {rig_name}",
-                    "result": f"Retrieved {len(sql_results)} records"
-                })
+        if "sql_retriever" in parse_result["plan"] and entities.get("rigs"):
+            rig_name = entities["rigs"][0]
+            hours = _trend_hours(entities.get("time_periods", []))
+            window = {} if hours is None else {"hours": hours, "window_hours": min(hours, 30)}
+            retrievals.append((
+                "SQL", f"Queried production trends for {rig_name}", "Retrieved {count} records",
+                lambda: self.sql_agent.query_production_trends(rig_name, **window)
+            ))
         
         # Step 3: Execute Graph queries if needed
-        if "graph_retriever" in parse_result["plan"]:
-            if parse_result["entities"].get("rigs"):
-                rig_name = parse_result["entities"]["rigs"][0]
-                graph_results = self.graph_agent.find_faulty_equipment(rig_name)
-                reasoning_trace.append({
-                    "step": len(reasoning_trace) + 1,
-                    "agent": "Graph",
-                    "action": f"Searched for faulty equipment at {rig_name}",
-                    "result": f"Found {len(graph_results)} items"
-                })
+        if "graph_retriever" in parse_result["plan"] and entities.get("rigs"):
+            rig_name = entities["rigs"][0]
+            retrievals.append((
+                "Graph", f"Searched for faulty equipment at {rig_name}", "Found {count} items",
+                lambda: self.graph_agent.find_faulty_equipment(rig_name)
+            ))
+        
+        # Step 3b: Search HSE reports if needed
+        if "vector_retriever" in parse_result["plan"]:
+            since = _period_start(entities.get("time_periods", []))
+            retrievals.append((
+                "Vector", "Searched HSE reports", "Found {count} reports",
+                lambda: self.vector_agent.search_hybrid(
+                    query,
+                    ids=entities.get("assets", []) + entities.get("incidents", []),
+                    wells=entities.get("wells"),
+                    rigs=entities.get("rigs"),
+                    since=since
+                )
+            ))
+        
+        # Retrievers are independent, so they run concurrently; each runs in
+        # a copy of this context so its spans join the request's trace
+        started = time.perf_counter()
+        deadline = time.monotonic() + RETRIEVAL_TIMEOUT_SECONDS
+        stages = [Stage("retrieval", agent, intent) for agent, _, _, _ in retrievals]
+        futures = [
+            _retrieval_pool.submit(contextvars.copy_context().run, _timed, stage, fetch)
+            for stage, (_, _, _, fetch) in zip(stages, retrievals)
+        ]
+        results = {"SQL": [], "Graph": [], "Vector": []}
+        for (agent, action, summary, _), stage, future in zip(retrievals, stages, futures):
+            try:
+                results[agent] = future.result(timeout=max(deadline - time.monotonic(), 0.0))
+                _trace_step(reasoning_trace, agent, action, summary.format(count=len(results[agent])), stage)
+            except FutureTimeout:
+                stage.timed_out()
+                logger.warning(f"{agent} retriever timed out after {RETRIEVAL_TIMEOUT_SECONDS}s")
+                _trace_step(
+                    reasoning_trace, agent, action, f"Timed out after {RETRIEVAL_TIMEOUT_SECONDS:g}s", stage,
+                    milliseconds=round((time.perf_counter() - started) * 1000, 2)
+                )
+        sql_results = results["SQL"]
+        graph_results = results["Graph"]
+        vector_results = results["Vector"]
         
         # Step 4: Synthesize results
-        synthesis = self.reasoning_agent.synthesize(
-            query=query,
-            sql_results=sql_results,
-            graph_results=graph_results
+        with Stage("synthesis", "Reasoning", intent) as stage:
+            synthesis = self.reasoning_agent.synthesize(
+                query=query,
+                sql_results=sql_results,
+                graph_results=graph_results,
+                vector_results=vector_results
+            )
+        _trace_step(
+            reasoning_trace, "Reasoning", "Synthesized final answer",
+            f"Confidence: {synthesis['confidence']}", stage
         )
         
-        reasoning_trace.append({
-            "step": len(reasoning_trace) + 1,
-            "agent": "Reasoning",
-            "action": "Synthesized final answer",
-            "result": f"Confidence: {synthesis['confidence']}"
-        })
-        
         # Extract graph path if available
         graph_path = None
         if graph_results:
@@ -131,12 +228,16 @@ class OilfieldOrchestrator:
         
         return {
             "answer": synthesis["answer"],
+            "intent": intent,
+            "plan": parse_result["plan"],
+            "entities": entities,
             "reasoning_trace": reasoning_trace,
             "graph_path": graph_path,
             "confidence": synthesis["confidence"],
             "data": {
                 "sql_results": sql_results,
-                "graph_results": graph_results
+                "graph_results": graph_results,
+                "vector_results": vector_results
             }
         }
     
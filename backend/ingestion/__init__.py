@@ -0,0 +1,3 @@
+"""
+Bulk and streaming ingestion into the platform's stores
+"""
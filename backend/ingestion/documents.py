@@ -0,0 +1,338 @@
+"""
+Document Ingestion Pipeline
+Streams HSE reports and operator notes from MinIO into the Qdrant report index
+
+Object metadata (x-amz-meta-well, -rig, -report-date, -title, -report-id)
+becomes the chunk payload; report_date defaults to the object's
+last-modified time and title to its file name.
+
+Run from the backend directory:
+    python -m ingestion.documents --bucket hse-reports
+    python -m ingestion.documents --bucket hse-reports --prefix 2024/ --full
+"""
+import os
+import json
+import time
+import uuid
+import codecs
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+from database.connections import get_minio_client, get_shared_qdrant_client
+from retrieval.collection import HSE_COLLECTION, ensure_hse_collection
+from retrieval.embeddings import TextEmbedder
+
+try:
+    from qdrant_client import models
+except ImportError:
+    models = None
+
+logger = logging.getLogger(__name__)
+
+TEXT_SUFFIXES = (".txt", ".md", ".csv", ".log", ".json")
+
+CHUNK_WORDS = 200
+CHUNK_OVERLAP = 40
+READ_BYTES = 64 * 1024
+
+
+def stream_chunks(
+    data: Iterable[bytes],
+    chunk_words: int = CHUNK_WORDS,
+    overlap: int = CHUNK_OVERLAP
+) -> Iterator[str]:
+    """
+    Split a byte stream into overlapping word windows
+
+    Only the current window is held in memory, never the whole document.
+
+    Args:
+        data: UTF-8 byte blocks (block boundaries may split words or characters)
+        chunk_words: Words per chunk
+        overlap: Words repeated at the start of the next chunk
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    words: List[str] = []
+    fresh = 0  # words not yet emitted in any chunk
+    carry = ""
+    for block in data:
+        text = carry + decoder.decode(block)
+        parts = text.split()
+        carry = parts.pop() if parts and not text[-1].isspace() else ""
+        words.extend(parts)
+        fresh += len(parts)
+        while len(words) >= chunk_words:
+            yield " ".join(words[:chunk_words])
+            words = words[chunk_words - overlap:]
+            fresh = len(words) - overlap
+    tail = (carry + decoder.decode(b"", final=True)).split()
+    words.extend(tail)
+    fresh += len(tail)
+    if fresh > 0:
+        yield " ".join(words)
+
+
+class IngestCheckpoint:
+    """
+    Append-only log of ingested objects (key -> ETag)
+
+    An object is logged only after all of its chunks are in Qdrant, so a
+    crashed run resumes by re-ingesting exactly the objects that were not
+    logged. The log is compacted at the end of every run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.etags: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line after a crash
+                    if entry.get("etag") is None:
+                        self.etags.pop(entry["key"], None)
+                    else:
+                        self.etags[entry["key"]] = entry["etag"]
+        self._log = open(path, "a", encoding="utf-8")
+
+    def mark(self, key: str, etag: Optional[str]) -> None:
+        """Record an ingested object (or a removed one, with etag None)"""
+        if etag is None:
+            self.etags.pop(key, None)
+        else:
+            self.etags[key] = etag
+        self._log.write(json.dumps({"key": key, "etag": etag}) + "\n")
+
+    def flush(self) -> None:
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+    def compact(self) -> None:
+        self._log.close()
+        temp = self.path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            for key, etag in self.etags.items():
+                f.write(json.dumps({"key": key, "etag": etag}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+        self._log = open(self.path, "a", encoding="utf-8")
+
+    def close(self) -> None:
+        self._log.close()
+
+
+# One embedder per worker process, created by the pool initializer
+_worker_embedder: Optional[TextEmbedder] = None
+
+
+def _init_worker() -> None:
+    global _worker_embedder
+    _worker_embedder = TextEmbedder(cache_size=0, threads=1)
+
+
+def _embed_batch(texts: List[str]):
+    return _worker_embedder.embed_documents(texts)
+
+
+class DocumentIngestor:
+    """
+    Incremental MinIO -> Qdrant indexing of text documents
+
+    Objects whose ETag matches the checkpoint are skipped without being
+    downloaded. Changed objects are streamed and chunked in this process.
+    Chunk batches are embedded in a process pool; a bounded number of
+    batches is kept in flight, so memory stays flat however large the
+    bucket is. Point ids are derived from (bucket, key, chunk), so
+    re-ingesting an object overwrites its points.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        checkpoint_path: str,
+        workers: int = 4,
+        batch_size: int = 256,
+        minio_client=None,
+        qdrant_client=None,
+        collection: str = HSE_COLLECTION
+    ):
+        """
+        Args:
+            bucket: MinIO bucket to index
+            checkpoint_path: File for the ingestion log
+            workers: Embedding processes
+            batch_size: Chunks per embedding call and Qdrant upsert
+        """
+        self.bucket = bucket
+        self.checkpoint = IngestCheckpoint(checkpoint_path)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.minio = minio_client or get_minio_client()
+        self.qdrant = qdrant_client or get_shared_qdrant_client()
+        self.collection = collection
+
+    def run(self, prefix: str = "", full: bool = False) -> Dict[str, Any]:
+        """
+        Index new and changed objects under a prefix
+
+        Args:
+            prefix: Object key prefix
+            full: Ignore the checkpoint and re-index everything
+
+        Returns:
+            Counts of documents, chunks, skipped and removed objects and
+            throughput
+        """
+        started = time.perf_counter()
+        counts = {"documents": 0, "chunks": 0, "skipped": 0, "removed": 0, "unsupported": 0}
+
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        try:
+            dimension = pool.submit(_embed_batch, ["dimension probe"]).result().shape[1]
+            ensure_hse_collection(self.qdrant, dimension, self.collection)
+
+            seen = set()
+            in_flight: deque = deque()
+            pending: Dict[str, int] = {}  # key -> chunks not yet upserted
+            finished: Dict[str, str] = {}  # fully streamed key -> etag
+            batch: List[Dict[str, Any]] = []
+
+            def submit():
+                in_flight.append((pool.submit(_embed_batch, [c["text"] for c in batch]), list(batch)))
+                batch.clear()
+                while len(in_flight) > self.workers * 2:
+                    self._drain_one(in_flight, pending, finished)
+
+            for obj in self.minio.list_objects(self.bucket, prefix=prefix or None, recursive=True):
+                key = obj.object_name
+                seen.add(key)
+                if not key.lower().endswith(TEXT_SUFFIXES):
+                    counts["unsupported"] += 1
+                    continue
+                previous = self.checkpoint.etags.get(key)
+                if not full and previous == obj.etag:
+                    counts["skipped"] += 1
+                    continue
+                if previous is not None:
+                    self._delete_points(key)
+
+                counts["documents"] += 1
+                pending[key] = 0
+                for chunk in self._read_chunks(obj):
+                    batch.append(chunk)
+                    pending[key] += 1
+                    counts["chunks"] += 1
+                    if len(batch) >= self.batch_size:
+                        submit()
+                finished[key] = obj.etag
+                self._complete(key, pending, finished)
+
+            if batch:
+                submit()
+            while in_flight:
+                self._drain_one(in_flight, pending, finished)
+
+            # Objects deleted from the bucket since the last run
+            for key in [k for k in self.checkpoint.etags if k.startswith(prefix) and k not in seen]:
+                self._delete_points(key)
+                self.checkpoint.mark(key, None)
+                counts["removed"] += 1
+            self.checkpoint.flush()
+            self.checkpoint.compact()
+        finally:
+            pool.shutdown()
+            self.checkpoint.close()
+
+        seconds = time.perf_counter() - started
+        report = {
+            **counts,
+            "seconds": round(seconds, 2),
+            "documents_per_second": round(counts["documents"] / seconds, 1),
+            "chunks_per_second": round(counts["chunks"] / seconds, 1)
+        }
+        logger.info(f"Document ingestion complete: {report}")
+        return report
+
+    def _read_chunks(self, obj) -> Iterator[Dict[str, Any]]:
+        """Stream one object and yield chunk payloads"""
+        response = self.minio.get_object(self.bucket, obj.object_name)
+        try:
+            headers = response.headers
+            name = obj.object_name.rsplit("/", 1)[-1]
+            base = {
+                "report_id": headers.get("x-amz-meta-report-id") or obj.object_name,
+                "title": headers.get("x-amz-meta-title") or name.rsplit(".", 1)[0],
+                "well": headers.get("x-amz-meta-well"),
+                "rig": headers.get("x-amz-meta-rig"),
+                "report_date": headers.get("x-amz-meta-report-date") or (
+                    obj.last_modified.isoformat() if obj.last_modified else None
+                ),
+                "source": obj.object_name,
+                "etag": obj.etag
+            }
+            for i, text in enumerate(stream_chunks(response.stream(READ_BYTES))):
+                yield {**base, "chunk": i, "text": text}
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _drain_one(self, in_flight: deque, pending: Dict[str, int], finished: Dict[str, str]) -> None:
+        """Upsert the oldest embedded batch and checkpoint completed objects"""
+        future, chunks = in_flight.popleft()
+        vectors = future.result()
+        indexed_at = time.time()
+        self.qdrant.upsert(
+            collection_name=self.collection,
+            points=[
+                models.PointStruct(
+                    id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"{self.bucket}/{c['source']}#{c['chunk']}")),
+                    vector=vector.tolist(),
+                    payload={**c, "indexed_at": indexed_at}
+                )
+                for c, vector in zip(chunks, vectors)
+            ],
+            wait=True
+        )
+        for key in {c["source"] for c in chunks}:
+            pending[key] -= sum(1 for c in chunks if c["source"] == key)
+            self._complete(key, pending, finished)
+        self.checkpoint.flush()
+
+    def _complete(self, key: str, pending: Dict[str, int], finished: Dict[str, str]) -> None:
+        if key in finished and pending.get(key) == 0:
+            self.checkpoint.mark(key, finished.pop(key))
+            del pending[key]
+
+    def _delete_points(self, key: str) -> None:
+        self.qdrant.delete(
+            collection_name=self.collection,
+            points_selector=models.FilterSelector(filter=models.Filter(must=[
+                models.FieldCondition(key="source", match=models.MatchValue(value=key))
+            ]))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index MinIO documents into Qdrant")
+    parser.add_argument("--bucket", default=os.getenv("MINIO_BUCKET", "hse-reports"))
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--checkpoint", default=os.getenv("DOCUMENT_INGEST_CHECKPOINT", "document_ingest.jsonl"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--full", action="store_true", help="re-index every object")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    ingestor = DocumentIngestor(args.bucket, args.checkpoint, args.workers, args.batch_size)
+    report = ingestor.run(prefix=args.prefix, full=args.full)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
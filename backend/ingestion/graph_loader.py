@@ -0,0 +1,303 @@
+"""
+Bulk Asset Graph Loader
+Change-aware upsert of asset master data into Neo4j with batched UNWIND
+
+Assets CSV columns:        label, key, <property columns...>
+Relationships CSV columns: parent_key, rel_type, child_key
+
+Run from the backend directory:
+    python -m ingestion.graph_loader --assets assets.csv --relationships rels.csv
+    python -m ingestion.graph_loader --pg-assets asset_register --pg-relationships asset_relationships
+"""
+import re
+import csv
+import json
+import time
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterable, Set
+
+from assets.snapshot import KEY_PROPERTIES
+from database.connections import get_shared_neo4j_driver, get_pooled_postgres_connection
+from database.statements import statements
+
+logger = logging.getLogger(__name__)
+
+# Hierarchy relationship -> (parent label, child label). The hierarchy is a
+# DAG: a child can have several parents of one type (equipment shared by
+# wells), so the register's parent set per child is synced, and a move is
+# the old link removed plus the new one merged.
+HIERARCHY = {
+    "CONTAINS": ("Basin", "Rig"),
+    "HAS_WELL": ("Rig", "Well"),
+    "HAS_SENSOR": ("Well", "Sensor"),
+    "HAS_EQUIPMENT": ("Well", "Equipment")
+}
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+
+for _label, _key in KEY_PROPERTIES.items():
+    statements.register_cypher(f"sync_hashes_{_label.lower()}", f"""
+MATCH (n:{_label})
+RETURN n.{_key} as key, n.sync_hash as hash
+""")
+    statements.register_cypher(f"sync_upsert_{_label.lower()}", write=True, text=f"""
+UNWIND $rows AS row
+MERGE (n:{_label} {{{_key}: row.key}})
+SET n += row.props, n.sync_hash = row.hash, n.updated_at = datetime()
+""")
+
+for _rel, (_parent, _child) in HIERARCHY.items():
+    statements.register_cypher(f"sync_parents_{_rel.lower()}", f"""
+MATCH (p:{_parent})-[:{_rel}]->(c:{_child})
+RETURN c.{KEY_PROPERTIES[_child]} as child, p.{KEY_PROPERTIES[_parent]} as parent
+""")
+    statements.register_cypher(f"sync_link_{_rel.lower()}", write=True, text=f"""
+UNWIND $rows AS row
+MATCH (p:{_parent} {{{KEY_PROPERTIES[_parent]}: row.parent}})
+MATCH (c:{_child} {{{KEY_PROPERTIES[_child]}: row.child}})
+MERGE (p)-[r:{_rel}]->(c)
+SET r.updated_at = datetime()
+""")
+    # A deleted link leaves no updated_at, so the child's remaining links are
+    # stamped: the incremental snapshot refresh then re-reads its parent set
+    statements.register_cypher(f"sync_unlink_{_rel.lower()}", write=True, text=f"""
+UNWIND $rows AS row
+MATCH (p:{_parent} {{{KEY_PROPERTIES[_parent]}: row.parent}})-[o:{_rel}]->(c:{_child} {{{KEY_PROPERTIES[_child]}: row.child}})
+DELETE o
+WITH DISTINCT c
+OPTIONAL MATCH (c)<-[r:CONTAINS|HAS_WELL|HAS_SENSOR|HAS_EQUIPMENT]-()
+SET r.updated_at = datetime()
+""")
+
+
+def _coerce(value: Any) -> Any:
+    """Turn CSV strings into numbers and booleans where they clearly are"""
+    if not isinstance(value, str):
+        return value
+    lowered = value.strip().lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _record_hash(props: Dict[str, Any]) -> str:
+    payload = json.dumps(props, sort_keys=True, default=str).encode()
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def read_csv_assets(path: str) -> List[Dict[str, Any]]:
+    """Read assets (label, key, properties...) from a CSV file"""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            {
+                "label": row.pop("label"),
+                "key": row.pop("key"),
+                "props": {k: _coerce(v) for k, v in row.items() if v not in (None, "")}
+            }
+            for row in csv.DictReader(f)
+        ]
+
+
+def read_csv_relationships(path: str) -> List[Dict[str, Any]]:
+    """Read relationships (parent_key, rel_type, child_key) from a CSV file"""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            {"parent": row["parent_key"], "rel_type": row["rel_type"], "child": row["child_key"]}
+            for row in csv.DictReader(f)
+        ]
+
+
+def read_postgres_assets(table: str) -> List[Dict[str, Any]]:
+    """Read assets from a table with label, asset_key and properties (jsonb) columns"""
+    if not _IDENTIFIER.match(table):
+        raise ValueError(f"Invalid table name: {table}")
+    with get_pooled_postgres_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT label, asset_key, properties FROM {table}")
+            return [
+                {"label": r["label"], "key": r["asset_key"], "props": r["properties"] or {}}
+                for r in cur.fetchall()
+            ]
+
+
+def read_postgres_relationships(table: str) -> List[Dict[str, Any]]:
+    """Read relationships from a table with parent_key, rel_type and child_key columns"""
+    if not _IDENTIFIER.match(table):
+        raise ValueError(f"Invalid table name: {table}")
+    with get_pooled_postgres_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT parent_key, rel_type, child_key FROM {table}")
+            return [
+                {"parent": r["parent_key"], "rel_type": r["rel_type"], "child": r["child_key"]}
+                for r in cur.fetchall()
+            ]
+
+
+class GraphBulkLoader:
+    """
+    Upserts asset nodes and hierarchy relationships into Neo4j
+
+    Only records that differ from what is already in the graph are written:
+    nodes carry a hash of their properties, and each child's parent set is
+    compared with its current one (links missing from the register are
+    deleted, new ones merged). Writes go out as UNWIND batches in
+    parallel; node batches are disjoint by key, and relationship batches
+    are grouped by parent so no two concurrent batches lock the same node.
+    """
+
+    def __init__(self, batch_size: int = 5000, workers: int = 4, driver=None):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.driver = driver or get_shared_neo4j_driver()
+
+    def load(self, assets: Iterable[Dict[str, Any]], relationships: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Sync assets and relationships into the graph
+
+        Args:
+            assets: Dicts with label, key and props
+            relationships: Dicts with parent, rel_type and child keys
+
+        Returns:
+            Counts of written and unchanged records and throughput
+        """
+        t0 = time.perf_counter()
+        nodes_written, nodes_unchanged = self._load_nodes(assets)
+        t1 = time.perf_counter()
+        rels_written, rels_unchanged = self._load_relationships(relationships)
+        t2 = time.perf_counter()
+
+        report = {
+            "nodes_written": nodes_written,
+            "nodes_unchanged": nodes_unchanged,
+            "relationships_written": rels_written,
+            "relationships_unchanged": rels_unchanged,
+            "node_seconds": round(t1 - t0, 3),
+            "relationship_seconds": round(t2 - t1, 3),
+            "nodes_per_second": round(nodes_written / (t1 - t0), 1) if nodes_written else 0.0,
+            "relationships_per_second": round(rels_written / (t2 - t1), 1) if rels_written else 0.0
+        }
+        logger.info(f"Graph sync complete: {report}")
+        return report
+
+    def _load_nodes(self, assets: Iterable[Dict[str, Any]]):
+        by_label: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for asset in assets:
+            if asset["label"] not in KEY_PROPERTIES:
+                raise ValueError(f"Unknown asset label: {asset['label']}")
+            props = dict(asset["props"])
+            props.pop(KEY_PROPERTIES[asset["label"]], None)
+            by_label.setdefault(asset["label"], {})[asset["key"]] = {
+                "key": asset["key"],
+                "props": props,
+                "hash": _record_hash(props)
+            }
+
+        written = unchanged = 0
+        for label, rows in by_label.items():
+            existing = {
+                r["key"]: r["hash"]
+                for r in self._read(f"sync_hashes_{label.lower()}")
+            }
+            changed = [row for key, row in rows.items() if existing.get(key) != row["hash"]]
+            unchanged += len(rows) - len(changed)
+            written += len(changed)
+            self._write_batches(f"sync_upsert_{label.lower()}", self._chunks(changed))
+        return written, unchanged
+
+    def _load_relationships(self, relationships: Iterable[Dict[str, Any]]):
+        by_type: Dict[str, Dict[str, Set[str]]] = {}
+        for rel in relationships:
+            if rel["rel_type"] not in HIERARCHY:
+                raise ValueError(f"Unknown hierarchy relationship: {rel['rel_type']}")
+            by_type.setdefault(rel["rel_type"], {}).setdefault(rel["child"], set()).add(rel["parent"])
+
+        written = unchanged = 0
+        for rel_type, parents in by_type.items():
+            existing: Dict[str, Set[str]] = {}
+            for r in self._read(f"sync_parents_{rel_type.lower()}"):
+                existing.setdefault(r["child"], set()).add(r["parent"])
+            added: Dict[str, List[Dict[str, str]]] = {}
+            removed: Dict[str, List[Dict[str, str]]] = {}
+            # Only children in the register are synced; their parent sets are complete
+            for child, wanted in parents.items():
+                current = existing.get(child, set())
+                unchanged += len(wanted & current)
+                for parent in sorted(wanted - current):
+                    added.setdefault(parent, []).append({"parent": parent, "child": child})
+                for parent in sorted(current - wanted):
+                    removed.setdefault(parent, []).append({"parent": parent, "child": child})
+            written += sum(map(len, added.values())) + sum(map(len, removed.values()))
+            self._write_batches(f"sync_unlink_{rel_type.lower()}", self._parent_batches(removed))
+            self._write_batches(f"sync_link_{rel_type.lower()}", self._parent_batches(added))
+        return written, unchanged
+
+    def _chunks(self, rows: List[Dict[str, Any]]):
+        for start in range(0, len(rows), self.batch_size):
+            yield rows[start:start + self.batch_size]
+
+    def _parent_batches(self, by_parent: Dict[str, List[Dict[str, str]]]):
+        """Batches of about batch_size rows that never split one parent's children"""
+        batch: List[Dict[str, str]] = []
+        for rows in by_parent.values():
+            if batch and len(batch) + len(rows) > self.batch_size:
+                yield batch
+                batch = []
+            batch.extend(rows)
+        if batch:
+            yield batch
+
+    def _read(self, name: str) -> List[Dict[str, Any]]:
+        with self.driver.session() as session:
+            return statements.run_cypher(session, name)
+
+    def _write_batches(self, name: str, batches) -> None:
+        text = statements.cypher_text(name)
+
+        def write(rows):
+            with self.driver.session() as session:
+                session.execute_write(lambda tx: tx.run(text, rows=rows).consume())
+            return len(rows)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for count in pool.map(write, batches):
+                logger.debug(f"{name}: wrote batch of {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk sync asset master data into Neo4j")
+    parser.add_argument("--assets", help="assets CSV file")
+    parser.add_argument("--relationships", help="relationships CSV file")
+    parser.add_argument("--pg-assets", help="PostgreSQL assets table")
+    parser.add_argument("--pg-relationships", help="PostgreSQL relationships table")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    assets: List[Dict[str, Any]] = []
+    relationships: List[Dict[str, Any]] = []
+    if args.assets:
+        assets += read_csv_assets(args.assets)
+    if args.pg_assets:
+        assets += read_postgres_assets(args.pg_assets)
+    if args.relationships:
+        relationships += read_csv_relationships(args.relationships)
+    if args.pg_relationships:
+        relationships += read_postgres_relationships(args.pg_relationships)
+
+    report = GraphBulkLoader(args.batch_size, args.workers).load(assets, relationships)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,601 @@
+"""
+Synthetic Oilfield Dataset Generator
+Production-scale, internally consistent data for PostgreSQL and Neo4j
+
+Generates basins, rigs, wells, sensors and equipment, years of hourly
+production telemetry per well (Arps hyperbolic decline, staggered first
+production, shut-ins, noise), injected sensor anomalies, the incidents
+raised for some of them, and maintenance records. The same names and ids
+are used everywhere, so SQL results join to graph nodes.
+
+Output directory layout:
+    postgres/production_data/part-*.csv   telemetry, one part per well shard
+    postgres/{maintenance_schedule,incidents,asset_closure}.csv
+    postgres/load.sql                      psql script (\\copy every file)
+    neo4j/assets.csv, neo4j/relationships.csv
+                                           asset master data for ingestion.graph_loader
+    neo4j/events.cypher                    batched UNWIND for incidents and anomaly
+                                           state (after the assets are loaded)
+    manifest.json                          parameters and row counts
+
+Telemetry parts are written in parallel by worker processes; every well
+draws from its own seeded generator, so output does not depend on the
+number of workers. Telemetry ends at the current hour (UTC) by default, so
+the statements that look back from NOW() find the data and maintenance
+status is computed against today; pass --end (and --seed) for
+reproducible output.
+
+Run from the backend directory:
+    python -m ingestion.synthetic --out ../data/synthetic --wells 20000 --sensors 200000 --years 3
+Then load:
+    cd ../data/synthetic/postgres && psql -f load.sql
+    python -m ingestion.graph_loader --assets ../data/synthetic/neo4j/assets.csv \\
+        --relationships ../data/synthetic/neo4j/relationships.csv
+    cypher-shell -f ../data/synthetic/neo4j/events.cypher
+"""
+import os
+import csv
+import json
+import math
+import zlib
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASIN_NAMES = [
+    "Permian", "Eagle Ford", "Bakken", "Marcellus", "Haynesville", "Anadarko", "Utica",
+    "Powder River", "San Juan", "Uinta", "Denver-Julesburg", "Williston"
+]
+
+# Sensor type -> (id prefix, telemetry column it mirrors)
+SENSOR_TYPES = {
+    "Pressure Gauge": ("G", "pressure"),
+    "Temperature Sensor": ("T", "temperature"),
+    "Flow Meter": ("F", "production_rate"),
+    "Vibration Sensor": ("V", None)
+}
+
+EQUIPMENT_TYPES = {"Pump": "PUMP", "Control Valve": "VALVE", "Compressor": "COMP", "Separator": "SEP"}
+
+# Anomaly kind -> (sensor type that detects it, telemetry column, multiplier range)
+ANOMALY_KINDS = {
+    "pressure_spike": ("Pressure Gauge", "pressure", (1.3, 1.8)),
+    "pressure_drop": ("Pressure Gauge", "pressure", (0.35, 0.6)),
+    "flow_loss": ("Flow Meter", "production_rate", (0.2, 0.5)),
+    "temperature_excursion": ("Temperature Sensor", "temperature", (1.15, 1.3)),
+    "vibration": ("Vibration Sensor", None, (1.0, 1.0))
+}
+
+PRODUCTION_COLUMNS = ["timestamp", "rig_name", "well_name", "basin", "production_rate", "pressure", "temperature"]
+MAINTENANCE_COLUMNS = ["equipment_id", "equipment_type", "last_maintenance_date", "next_maintenance_due", "status"]
+INCIDENT_COLUMNS = ["incident_id", "severity", "description", "location", "timestamp"]
+CLOSURE_COLUMNS = ["ancestor_id", "ancestor_type", "descendant_id", "descendant_type", "depth"]
+
+# Rows per UNWIND statement in events.cypher
+CYPHER_BATCH = 1000
+
+
+def build_assets(basins: int, rigs: int, wells: int, sensors: int, equipment_per_well: int,
+                 seed: int) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    The asset hierarchy: every rig in one basin, every well on one rig,
+    at least one sensor per well
+
+    Returns:
+        Lists of basin, rig, well, sensor and equipment dictionaries
+    """
+    rng = np.random.default_rng([seed, 0])
+    basin_rows = [
+        {
+            "name": BASIN_NAMES[i] if i < len(BASIN_NAMES) else f"Basin B-{i + 1}",
+            "location": f"Region {i % 17 + 1}",
+            "area_sqkm": int(rng.integers(20_000, 250_000))
+        }
+        for i in range(basins)
+    ]
+    # Skewed sizes: a few large basins and rigs, many small ones
+    rig_basin = np.sort(rng.choice(basins, rigs, p=_zipf_weights(basins, rng)))
+    rig_rows = [
+        {
+            "name": f"Rig R-{i + 1}",
+            "basin": basin_rows[b]["name"],
+            "type": "Workover" if rng.random() < 0.2 else "Drilling",
+            "status": "MAINTENANCE" if rng.random() < 0.05 else "OPERATIONAL",
+            "capacity": int(rng.integers(20, 60)) * 100
+        }
+        for i, b in enumerate(rig_basin)
+    ]
+    well_rig = np.sort(rng.choice(rigs, wells, p=_zipf_weights(rigs, rng, 0.6)))
+    well_rows = [
+        {
+            "index": i,
+            "name": f"Well W-{i + 1}",
+            "rig": rig_rows[r]["name"],
+            "basin": rig_rows[r]["basin"],
+            "depth_ft": int(rng.integers(40, 160)) * 100,
+            "sensors": [],
+            "equipment": []
+        }
+        for i, r in enumerate(well_rig)
+    ]
+
+    sensor_well = np.concatenate([np.arange(wells), rng.integers(0, wells, max(sensors - wells, 0))])
+    sensor_well.sort()
+    type_names = list(SENSOR_TYPES)
+    sensor_rows = []
+    for i, w in enumerate(sensor_well[:max(sensors, wells)]):
+        # Each well gets a pressure gauge first, then a mix
+        sensor_type = type_names[0] if not well_rows[w]["sensors"] else type_names[int(rng.integers(0, len(type_names)))]
+        sensor = {
+            "sensor_id": f"{SENSOR_TYPES[sensor_type][0]}-{i + 1}",
+            "sensor_type": sensor_type,
+            "well": well_rows[w]["name"],
+            "well_index": int(w),
+            "status": "OPERATIONAL",
+            "last_reading_anomaly": False
+        }
+        well_rows[w]["sensors"].append(sensor)
+        sensor_rows.append(sensor)
+
+    equipment_rows = []
+    kinds = list(EQUIPMENT_TYPES)
+    for well in well_rows:
+        for _ in range(equipment_per_well):
+            equipment_type = kinds[int(rng.integers(0, len(kinds)))]
+            item = {
+                "id": f"{EQUIPMENT_TYPES[equipment_type]}-{len(equipment_rows) + 1}",
+                "type": equipment_type,
+                "well": well["name"],
+                "status": "OPERATIONAL"
+            }
+            well["equipment"].append(item)
+            equipment_rows.append(item)
+
+    return {"basins": basin_rows, "rigs": rig_rows, "wells": well_rows,
+            "sensors": sensor_rows, "equipment": equipment_rows}
+
+
+def plan_anomalies(assets: Dict[str, List[Dict[str, Any]]], hours: int, per_well_year: float,
+                   seed: int) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Anomaly windows per well, each detected by one of the well's sensors
+
+    Returns:
+        Well index -> anomalies (kind, sensor, start hour, duration, factor)
+    """
+    rng = np.random.default_rng([seed, 1])
+    counts = rng.poisson(per_well_year * hours / 8760, len(assets["wells"]))
+    plans: Dict[int, List[Dict[str, Any]]] = {}
+    kinds = list(ANOMALY_KINDS)
+    for well, count in zip(assets["wells"], counts):
+        events = []
+        for _ in range(count):
+            kind = kinds[int(rng.integers(0, len(kinds)))]
+            sensor_type, column, (low, high) = ANOMALY_KINDS[kind]
+            candidates = [s for s in well["sensors"] if s["sensor_type"] == sensor_type]
+            if not candidates:
+                continue
+            duration = int(rng.integers(2, 49))
+            events.append({
+                "kind": kind,
+                "column": column,
+                "sensor": candidates[int(rng.integers(0, len(candidates)))]["sensor_id"],
+                "start": int(rng.integers(0, max(hours - duration, 1))),
+                "hours": duration,
+                "factor": float(rng.uniform(low, high))
+            })
+        if events:
+            plans[well["index"]] = sorted(events, key=lambda e: e["start"])
+    return plans
+
+
+def well_telemetry(well_index: int, hours: int, seed: int, anomalies: List[Dict[str, Any]]):
+    """
+    Hourly rate, pressure and temperature for one well
+
+    Rate follows an Arps hyperbolic decline from a random first-production
+    hour; shut-ins drop it to zero while pressure builds back up. Anomaly
+    windows scale their column by the planned factor.
+
+    Returns:
+        (first hour, rate, pressure, temperature, shut-in mask) arrays from the first hour
+    """
+    rng = np.random.default_rng([seed, 2, well_index])
+    # A third of the wells produce from before the window; the rest come online during it
+    start = 0 if rng.random() < 0.35 else int(rng.integers(0, max(hours - 24, 1)))
+    n = hours - start
+    t_years = (np.arange(n) + (rng.uniform(0, 3) * 8760 if start == 0 else 0)) / 8760
+
+    qi = rng.lognormal(math.log(900), 0.45)
+    di = rng.uniform(0.6, 1.8)
+    b = rng.uniform(0.4, 1.2)
+    decline = (1 + b * di * t_years) ** (-1 / b)
+    rate = qi * decline * rng.lognormal(0, 0.04, n) * (1 + 0.02 * np.sin(np.arange(n) * 2 * np.pi / 24))
+
+    reservoir = rng.uniform(2600, 4200)
+    pressure = reservoir * (0.45 + 0.35 * decline) + rng.normal(0, 15, n)
+    temperature = rng.uniform(150, 200) + 6 * decline + rng.normal(0, 1.2, n)
+
+    shut_in = np.zeros(n, dtype=bool)
+    for _ in range(rng.poisson(2 * n / 8760)):
+        s = int(rng.integers(0, n))
+        length = int(rng.integers(6, 96))
+        shut_in[s:s + length] = True
+        # Pressure builds toward reservoir pressure while shut in
+        build = 1 - np.exp(-np.arange(min(length, n - s)) / 12)
+        pressure[s:s + length] += (reservoir - pressure[s:s + length]) * 0.7 * build
+    rate[shut_in] = 0.0
+
+    columns = {"production_rate": rate, "pressure": pressure, "temperature": temperature}
+    for a in anomalies:
+        if a["column"] is None:
+            continue
+        lo, hi = max(a["start"] - start, 0), max(a["start"] + a["hours"] - start, 0)
+        columns[a["column"]][lo:hi] *= a["factor"]
+    return start, rate, pressure, temperature, shut_in
+
+
+def _write_production_part(path: str, wells: List[Dict[str, Any]], anomalies: Dict[int, List[Dict[str, Any]]],
+                           start: datetime, hours: int, seed: int) -> Tuple[str, int, Dict[int, Dict[str, Any]]]:
+    """Worker: write one telemetry part; returns its row count and each well's final state"""
+    stamps = np.datetime64(start, "s") + np.arange(hours) * np.timedelta64(3600, "s")
+    stamps = [s.replace("T", " ") for s in np.datetime_as_string(stamps, unit="s").tolist()]
+    rows = 0
+    final = {}
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(PRODUCTION_COLUMNS) + "\n")
+        for well in wells:
+            first, rate, pressure, temperature, shut_in = well_telemetry(
+                well["index"], hours, seed, anomalies.get(well["index"], [])
+            )
+            prefix = f"{well['rig']},{well['name']},{well['basin']}"
+            f.writelines(
+                f"{ts},{prefix},{q:.2f},{p:.2f},{c:.2f}\n"
+                for ts, q, p, c in zip(stamps[first:], rate.tolist(), pressure.tolist(), temperature.tolist())
+            )
+            rows += len(rate)
+            final[well["index"]] = {
+                "first_hour": first,
+                "rate": round(float(rate[-1]), 2),
+                "pressure": round(float(pressure[-1]), 2),
+                "temperature": round(float(temperature[-1]), 2),
+                "shut_in": bool(shut_in[-1]),
+                "peak_rate": float(rate.max()) if len(rate) else 0.0
+            }
+    return path, rows, final
+
+
+def build_incidents(assets, anomalies, start: datetime, hours: int, incident_fraction: float,
+                    seed: int) -> List[Dict[str, Any]]:
+    """Incidents raised a few hours after a share of the anomalies"""
+    rng = np.random.default_rng([seed, 3])
+    wells = assets["wells"]
+    incidents = []
+    for well_index, events in sorted(anomalies.items()):
+        well = wells[well_index]
+        for a in events:
+            if rng.random() >= incident_fraction:
+                continue
+            raised = start + timedelta(hours=a["start"] + int(rng.integers(1, 12)))
+            magnitude = abs(a["factor"] - 1)
+            severity = "HIGH" if magnitude > 0.5 else "MEDIUM" if magnitude > 0.25 else "LOW"
+            incidents.append({
+                "timestamp": raised,
+                "severity": severity,
+                "description": f"{a['kind'].replace('_', ' ').capitalize()} detected by {a['sensor']} at {well['name']}",
+                "location": f"{well['rig']}, {well['name']}",
+                "well": well["name"],
+                "sensor": a["sensor"],
+                "equipment": well["equipment"][0]["id"] if well["equipment"] and rng.random() < 0.3 else None
+            })
+    incidents.sort(key=lambda i: i["timestamp"])
+    sequence: Dict[int, int] = {}
+    for incident in incidents:
+        year = incident["timestamp"].year
+        sequence[year] = sequence.get(year, 0) + 1
+        incident["incident_id"] = f"INC-{year}-{sequence[year]:05d}"
+    return incidents
+
+
+def mark_sensor_state(assets, anomalies, start: datetime, hours: int) -> None:
+    """Latest anomaly per sensor; sensors with one in the last 30 days are FAULTY or WARNING"""
+    sensors = {s["sensor_id"]: s for s in assets["sensors"]}
+    for events in anomalies.values():
+        for a in events:
+            sensor = sensors[a["sensor"]]
+            detected = start + timedelta(hours=a["start"])
+            if sensor.get("anomaly_detected_at") is None or detected > sensor["anomaly_detected_at"]:
+                sensor["anomaly_detected_at"] = detected
+                sensor["anomaly_kind"] = a["kind"]
+                recent = a["start"] + a["hours"] >= hours - 30 * 24
+                sensor["last_reading_anomaly"] = recent
+                sensor["status"] = ("FAULTY" if abs(a["factor"] - 1) > 0.4 else "WARNING") if recent else "OPERATIONAL"
+
+
+def build_maintenance(assets, end: datetime, seed: int) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng([seed, 4])
+    rows = []
+    for item in assets["equipment"]:
+        interval = int(rng.choice([30, 60, 90, 180]))
+        last = end.date() - timedelta(days=int(rng.integers(0, interval * 1.5)))
+        due = last + timedelta(days=interval)
+        item["last_maintenance"] = last.isoformat()
+        if due < end.date():
+            item["status"] = "MAINTENANCE_DUE"
+        rows.append({
+            "equipment_id": item["id"],
+            "equipment_type": item["type"],
+            "last_maintenance_date": last.isoformat(),
+            "next_maintenance_due": due.isoformat(),
+            "status": "OVERDUE" if due < end.date() else "SCHEDULED"
+        })
+    return rows
+
+
+def closure_rows(assets):
+    """(ancestor, descendant) pairs of the hierarchy, as the asset snapshot maintains them"""
+    rigs = {r["name"]: r for r in assets["rigs"]}
+    for rig in assets["rigs"]:
+        yield (rig["basin"], "Basin", rig["name"], "Rig", 1)
+    for well in assets["wells"]:
+        yield (well["rig"], "Rig", well["name"], "Well", 1)
+        yield (rigs[well["rig"]]["basin"], "Basin", well["name"], "Well", 2)
+        children = [(s["sensor_id"], "Sensor") for s in well["sensors"]]
+        children += [(e["id"], "Equipment") for e in well["equipment"]]
+        for child, child_type in children:
+            yield (well["name"], "Well", child, child_type, 1)
+            yield (well["rig"], "Rig", child, child_type, 2)
+            yield (well["basin"], "Basin", child, child_type, 3)
+
+
+def write_graph_assets(out: str, assets, final: Dict[int, Dict[str, Any]], start: datetime) -> Dict[str, int]:
+    """Assets and hierarchy in the ingestion.graph_loader CSV format"""
+    columns = ["label", "key", "location", "area_sqkm", "type", "status", "capacity", "depth_ft",
+               "daily_target", "first_production", "sensor_type", "last_reading", "last_maintenance"]
+    with open(os.path.join(out, "assets.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        for basin in assets["basins"]:
+            writer.writerow({"label": "Basin", "key": basin["name"], **basin})
+        for rig in assets["rigs"]:
+            writer.writerow({"label": "Rig", "key": rig["name"], **rig})
+        for well in assets["wells"]:
+            state = final[well["index"]]
+            target = round(state["peak_rate"] * 0.9, -1)
+            status = ("SHUT_IN" if state["shut_in"] else
+                      "UNDERPERFORMING" if state["rate"] < 0.5 * target else "PRODUCING")
+            writer.writerow({
+                "label": "Well", "key": well["name"], "depth_ft": well["depth_ft"], "status": status,
+                "daily_target": target,
+                "first_production": (start + timedelta(hours=state["first_hour"])).date().isoformat()
+            })
+        for sensor in assets["sensors"]:
+            column = SENSOR_TYPES[sensor["sensor_type"]][1]
+            state = final[sensor["well_index"]]
+            writer.writerow({
+                "label": "Sensor", "key": sensor["sensor_id"], "sensor_type": sensor["sensor_type"],
+                "status": sensor["status"],
+                "last_reading": state[{"production_rate": "rate"}.get(column, column)] if column else
+                round(2 + (sensor["status"] != "OPERATIONAL") * 40 + (zlib.crc32(sensor["sensor_id"].encode()) % 100) / 50, 2)
+            })
+        for item in assets["equipment"]:
+            writer.writerow({"label": "Equipment", "key": item["id"], **item})
+
+    relationships = 0
+    with open(os.path.join(out, "relationships.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["parent_key", "rel_type", "child_key"])
+        for rig in assets["rigs"]:
+            writer.writerow([rig["basin"], "CONTAINS", rig["name"]])
+        for well in assets["wells"]:
+            writer.writerow([well["rig"], "HAS_WELL", well["name"]])
+            writer.writerows([well["name"], "HAS_SENSOR", s["sensor_id"]] for s in well["sensors"])
+            writer.writerows([well["name"], "HAS_EQUIPMENT", e["id"]] for e in well["equipment"])
+            relationships += 1 + len(well["sensors"]) + len(well["equipment"])
+    return {"assets": sum(len(assets[k]) for k in ("basins", "rigs", "wells", "sensors", "equipment")),
+            "relationships": relationships + len(assets["rigs"])}
+
+
+def write_graph_events(path: str, assets, incidents: List[Dict[str, Any]]) -> int:
+    """Incidents, their links and sensor anomaly state as batched UNWIND statements"""
+    statements = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("// Generated by ingestion.synthetic; run after the asset graph is loaded\n")
+        rows = [{"id": i["incident_id"], "severity": i["severity"], "description": i["description"],
+                 "ts": i["timestamp"].isoformat(), "well": i["well"]} for i in incidents]
+        statements += _write_unwind(f, rows, """
+MERGE (i:Incident {incident_id: row.id})
+SET i.severity = row.severity, i.description = row.description,
+    i.timestamp = datetime(row.ts), i.updated_at = datetime()
+WITH i, row
+MATCH (w:Well {name: row.well})
+MERGE (i)-[r:OCCURRED_AT]->(w)
+SET r.updated_at = datetime()""")
+        rows = [{"id": i["incident_id"], "sensor": i["sensor"]} for i in incidents]
+        statements += _write_unwind(f, rows, """
+MATCH (i:Incident {incident_id: row.id})
+MATCH (s:Sensor {sensor_id: row.sensor})
+MERGE (i)-[:RELATED_TO]->(s)""")
+        rows = [{"id": i["incident_id"], "equipment": i["equipment"]} for i in incidents if i["equipment"]]
+        statements += _write_unwind(f, rows, """
+MATCH (i:Incident {incident_id: row.id})
+MATCH (e:Equipment {id: row.equipment})
+MERGE (i)-[:RELATED_TO]->(e)""")
+        rows = [{"sensor": s["sensor_id"], "at": s["anomaly_detected_at"].isoformat(),
+                 "flag": s["last_reading_anomaly"]}
+                for s in assets["sensors"] if s.get("anomaly_detected_at") is not None]
+        statements += _write_unwind(f, rows, """
+MATCH (s:Sensor {sensor_id: row.sensor})
+SET s.anomaly_detected_at = datetime(row.at), s.last_reading_anomaly = row.flag,
+    s.updated_at = datetime()""")
+    return statements
+
+
+def _write_unwind(f, rows: List[Dict[str, Any]], body: str) -> int:
+    count = 0
+    for i in range(0, len(rows), CYPHER_BATCH):
+        batch = ", ".join(_cypher_map(row) for row in rows[i:i + CYPHER_BATCH])
+        f.write(f"UNWIND [{batch}] AS row{body};\n")
+        count += 1
+    return count
+
+
+def _cypher_map(row: Dict[str, Any]) -> str:
+    # JSON string escapes (\" \\ \uXXXX) are valid in Cypher string literals
+    items = [f"{k}: {json.dumps(v) if not isinstance(v, bool) else str(v).lower()}" for k, v in row.items()]
+    return "{" + ", ".join(items) + "}"
+
+
+def _write_csv(path: str, columns: List[str], rows) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([row[c] for c in columns] if isinstance(row, dict) else row)
+            count += 1
+    return count
+
+
+def _write_load_script(out: str, parts: List[str]) -> None:
+    copy = "\\copy {table} ({columns}) FROM '{path}' WITH (FORMAT csv, HEADER true)\n"
+    with open(os.path.join(out, "load.sql"), "w", encoding="utf-8") as f:
+        f.write("-- Generated by ingestion.synthetic; run from this directory: psql -f load.sql\n")
+        f.write("\\set ON_ERROR_STOP on\nBEGIN;\n")
+        for path in parts:
+            f.write(copy.format(table="production_data", columns=", ".join(PRODUCTION_COLUMNS),
+                                path=os.path.relpath(path, out)))
+        for table, columns in (("maintenance_schedule", MAINTENANCE_COLUMNS), ("incidents", INCIDENT_COLUMNS),
+                               ("asset_closure", CLOSURE_COLUMNS)):
+            f.write(copy.format(table=table, columns=", ".join(columns), path=f"{table}.csv"))
+        f.write("COMMIT;\n")
+        f.write("ANALYZE production_data;\nANALYZE maintenance_schedule;\nANALYZE incidents;\nANALYZE asset_closure;\n")
+
+
+def _zipf_weights(n: int, rng, exponent: float = 0.8) -> np.ndarray:
+    weights = 1 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def generate(out: str, basins: int, rigs: int, wells: int, sensors: int, equipment_per_well: int,
+             years: float, end: datetime, anomalies_per_well_year: float, incident_fraction: float,
+             workers: int, seed: int) -> Dict[str, Any]:
+    """
+    Write the full dataset under `out`
+
+    Returns:
+        The manifest (parameters, row counts, seconds)
+    """
+    started = time.perf_counter()
+    pg_dir = os.path.join(out, "postgres")
+    graph_dir = os.path.join(out, "neo4j")
+    parts_dir = os.path.join(pg_dir, "production_data")
+    for directory in (pg_dir, graph_dir, parts_dir):
+        os.makedirs(directory, exist_ok=True)
+
+    hours = int(years * 8760)
+    start = end - timedelta(hours=hours)
+    assets = build_assets(basins, rigs, wells, sensors, equipment_per_well, seed)
+    anomalies = plan_anomalies(assets, hours, anomalies_per_well_year, seed)
+    logger.info(f"Assets: {len(assets['wells'])} wells, {len(assets['sensors'])} sensors; "
+                f"{sum(len(a) for a in anomalies.values())} anomalies over {hours} hours")
+
+    # Shards of about two million rows keep parts a manageable size
+    wells_per_part = max(1, min(2_000_000 // max(hours, 1), math.ceil(wells / max(workers, 1))))
+    shards = [assets["wells"][i:i + wells_per_part] for i in range(0, wells, wells_per_part)]
+    counts: Dict[str, int] = {}
+    final: Dict[int, Dict[str, Any]] = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                _write_production_part, os.path.join(parts_dir, f"part-{i:05d}.csv"), shard,
+                {w["index"]: anomalies[w["index"]] for w in shard if w["index"] in anomalies},
+                start, hours, seed
+            )
+            for i, shard in enumerate(shards)
+        ]
+
+        # Everything that does not need the telemetry is written meanwhile
+        incidents = build_incidents(assets, anomalies, start, hours, incident_fraction, seed)
+        mark_sensor_state(assets, anomalies, start, hours)
+        maintenance = build_maintenance(assets, end, seed)
+        counts["maintenance_schedule"] = _write_csv(os.path.join(pg_dir, "maintenance_schedule.csv"),
+                                                    MAINTENANCE_COLUMNS, maintenance)
+        counts["incidents"] = _write_csv(
+            os.path.join(pg_dir, "incidents.csv"), INCIDENT_COLUMNS,
+            ({**i, "timestamp": i["timestamp"].strftime("%Y-%m-%d %H:%M:%S")} for i in incidents)
+        )
+        counts["asset_closure"] = _write_csv(os.path.join(pg_dir, "asset_closure.csv"), CLOSURE_COLUMNS,
+                                             closure_rows(assets))
+        counts["cypher_statements"] = write_graph_events(os.path.join(graph_dir, "events.cypher"), assets, incidents)
+
+        parts = []
+        counts["production_data"] = 0
+        for future in futures:
+            path, rows, states = future.result()
+            parts.append(path)
+            counts["production_data"] += rows
+            final.update(states)
+
+    counts.update(write_graph_assets(graph_dir, assets, final, start))
+    _write_load_script(pg_dir, parts)
+
+    manifest = {
+        "parameters": {
+            "basins": basins, "rigs": rigs, "wells": wells, "sensors": len(assets["sensors"]),
+            "equipment_per_well": equipment_per_well, "years": years,
+            "start": start.isoformat(), "end": end.isoformat(),
+            "anomalies_per_well_year": anomalies_per_well_year, "incident_fraction": incident_fraction,
+            "seed": seed
+        },
+        "counts": {**counts, "anomalies": sum(len(a) for a in anomalies.values()),
+                   "production_parts": len(parts)},
+        "seconds": round(time.perf_counter() - started, 1)
+    }
+    with open(os.path.join(out, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Synthetic dataset written to {out}: {manifest['counts']} in {manifest['seconds']}s")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic oilfield dataset")
+    parser.add_argument("--out", default="../data/synthetic")
+    parser.add_argument("--basins", type=int, default=12)
+    parser.add_argument("--rigs", type=int, default=200)
+    parser.add_argument("--wells", type=int, default=2000)
+    parser.add_argument("--sensors", type=int, default=10000, help="total sensors (at least one per well)")
+    parser.add_argument("--equipment-per-well", type=int, default=2)
+    parser.add_argument("--years", type=float, default=1.0, help="hourly telemetry history")
+    parser.add_argument("--end", help="last telemetry hour, e.g. 2024-12-31T00:00:00 (default: the current UTC hour)")
+    parser.add_argument("--anomalies-per-well-year", type=float, default=2.0)
+    parser.add_argument("--incident-fraction", type=float, default=0.3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.rigs < args.basins or args.wells < args.rigs:
+        parser.error("need at least one rig per basin and one well per rig")
+    if args.end:
+        end = datetime.fromisoformat(args.end)
+    else:
+        end = datetime.now(timezone.utc).replace(tzinfo=None, minute=0, second=0, microsecond=0)
+    manifest = generate(
+        args.out, args.basins, args.rigs, args.wells, args.sensors, args.equipment_per_well,
+        args.years, end, args.anomalies_per_well_year,
+        args.incident_fraction, args.workers, args.seed
+    )
+    print(json.dumps(manifest["counts"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
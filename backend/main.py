@@ -1,14 +1,30 @@
 """
 FastAPI Entry Point for Intelligent Oilfield Insights Platform
 """
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+from contextlib import nullcontext
+import hmac
 import logging
 import os
+import time
 from dotenv import load_dotenv
 
+from observability.metrics import metrics, RequestTimer, Stage
+from observability.gauges import collect_runtime_gauges
+from observability.tracing import TracingMiddleware, configure_tracing, shutdown_tracing
+from observability.profiler import profiler, ProfilerBusy
+from observability.capture import query_capture
+from query_response import render_query_response
+from query_payload import PayloadOptions, PayloadError, result_cache
+from telemetry import live_telemetry, telemetry_writer, TelemetryError, anomaly_detector, anomaly_writeback
+from telemetry.buffers import MAX_MESSAGE_BYTES
+
 # Load environment variables
 load_dotenv()
 
@@ -19,11 +35,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+metrics.register_collector(collect_runtime_gauges)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background services"""
+    configure_tracing()
+    if os.getenv("GRAPH_SCHEMA_BOOTSTRAP", "true").lower() == "true":
+        try:
+            from database.graph_schema import bootstrap_graph_schema
+            schema = bootstrap_graph_schema()
+            logger.info(f"Graph schema v{schema['version']}, applied {schema['applied']}")
+        except Exception as e:
+            logger.warning(f"Graph schema bootstrap skipped: {str(e)}")
+    snapshot_enabled = os.getenv("ASSET_SNAPSHOT_ENABLED", "true").lower() == "true"
+    if snapshot_enabled:
+        from assets.snapshot import asset_snapshot
+        asset_snapshot.start()
+    lexical_enabled = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() == "true"
+    if lexical_enabled:
+        from retrieval.hybrid import lexical_index
+        lexical_index.start()
+    result_cache.configure()
+    query_capture.start()
+    telemetry_writer.start()
+    anomaly_writeback.start()
+    yield
+    anomaly_writeback.stop()
+    telemetry_writer.stop()
+    query_capture.stop()
+    if snapshot_enabled:
+        asset_snapshot.stop()
+    if lexical_enabled:
+        lexical_index.stop()
+    shutdown_tracing()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Intelligent Oilfield Insights Platform",
     description="Enterprise-Grade Agentic RAG system for Oil & Gas data unification",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -35,15 +87,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress responses for clients that accept gzip (inside the timer, so it is timed)
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "1024")),
+    compresslevel=int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+)
+
+# Request latency histogram (includes response serialization)
+app.add_middleware(RequestTimer)
+
+# Server span per request (outermost, so it covers everything above)
+app.add_middleware(TracingMiddleware)
+
 # Pydantic models
 class QueryRequest(BaseModel):
     query: str
-    
+    # Optional payload shaping (see query_payload); omitted means the full data payload
+    sections: Optional[List[str]] = None
+    columns: Optional[Dict[str, List[str]]] = None
+    page_size: Optional[int] = None
+    cursor: Optional[str] = None
+    max_points: Optional[int] = None
+    downsample: Optional[str] = None
+
 class ReasoningStep(BaseModel):
     step: int
     agent: str
     action: str
     result: Optional[str] = None
+    duration_ms: Optional[float] = None
+    outcome: Optional[str] = None
 
 class QueryResponse(BaseModel):
     answer: str
@@ -72,36 +146,97 @@ async def root():
         "health": "/health"
     }
 
+def _require_admin(http_request: Request) -> None:
+    """Reject requests without the X-Admin-Token matching ADMIN_TOKEN"""
+    expected = os.getenv("ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin access is disabled (ADMIN_TOKEN not set)")
+    supplied = http_request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(supplied.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def _profile_scope(http_request: Request, query: str):
+    """Profile this request if it asks for it with X-Profile or ?profile=true"""
+    flag = http_request.headers.get("x-profile") or http_request.query_params.get("profile")
+    if flag is None or flag.lower() not in ("1", "true"):
+        return nullcontext()
+    _require_admin(http_request)
+    try:
+        return profiler.profile(query[:80])
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
 # Main query endpoint
 @app.post("/api/query", response_model=QueryResponse)
-async def process_query(request: QueryRequest):
+async def process_query(request: QueryRequest, http_request: Request):
     """
     Process natural language query and return insights
+
+    The response is serialized from the orchestrator result directly (see
+    query_response); results it cannot vouch for go through QueryResponse.
+
+    `sections`, `columns`, `page_size` and `cursor` cut the data payload
+    down (see query_payload); a cursor request returns the next page of one
+    section, from the cached result when it is still held. `max_points`
+    downsamples time series (production per well, sensor readings) to that
+    many rows per series with `downsample` "lttb" or "minmax".
+
+    Admins can run a single request under the sampling profiler by sending
+    `X-Profile: true` with their token; the profile id comes back in
+    `X-Profile-Id` for download from /api/admin/profiles.
     """
+    try:
+        options = PayloadOptions.parse(request.query, request.sections, request.columns,
+                                       request.page_size, request.cursor, request.max_points,
+                                       request.downsample)
+    except PayloadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    scope = _profile_scope(http_request, request.query)
+    arrived = time.time()
+    started = time.perf_counter()
     try:
         logger.info(f"Processing query: {request.query}")
 
-        # Import graph engine
-        from graph_engine import process_query as engine_process_query
-
-        # Process query through agent orchestration
-        result = engine_process_query(request.query)
-
-        # Convert to response model
-        response = QueryResponse(
-            answer=result["answer"],
-            reasoning_trace=[
-                ReasoningStep(**step) for step in result["reasoning_trace"]
-            ],
-            graph_path=result.get("graph_path"),
-            confidence=result["confidence"],
-            data=result.get("data")
-        )
+        with scope as profile:
+            # Import graph engine
+            from graph_engine import process_query as engine_process_query
+
+            # Process query through agent orchestration (cursor pages reuse the cached result)
+            cache_key = options.cursor["k"] if options.cursor else None
+            result = result_cache.get(cache_key) if cache_key else None
+            if result is None:
+                result = engine_process_query(request.query)
+                if cache_key:
+                    result_cache.put(result, cache_key)
+            intent = http_request.state.intent = result.get("intent", "unknown")
+
+            # Serialize the response
+            with Stage("response", "API", intent):
+                shaped = options.apply(result, request.query, cache_key) if options.active else result
+                response = render_query_response(shaped)
+                if response is None:
+                    model = QueryResponse(
+                        answer=shaped["answer"],
+                        reasoning_trace=[
+                            ReasoningStep(**step) for step in shaped["reasoning_trace"]
+                        ],
+                        graph_path=shaped.get("graph_path"),
+                        confidence=shaped["confidence"],
+                        data=shaped.get("data")
+                    )
+                    response = Response(model.model_dump_json(), media_type="application/json")
 
+        if profile is not None:
+            response.headers["X-Profile-Id"] = profile.id
+        seconds = time.perf_counter() - started
+        response.headers["Server-Timing"] = f"app;dur={seconds * 1000:.2f}"
+        query_capture.record(request.query, arrived, seconds, 200, result)
         return response
 
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
+        query_capture.record(request.query, arrived, time.perf_counter() - started, 500)
         raise HTTPException(status_code=500, detail=str(e))
 
 # Database status endpoint
@@ -133,6 +268,156 @@ async def database_status():
             "message": f"Error: {str(e)}"
         }
 
+# Prepared statement metrics endpoint
+@app.get("/api/status/statements")
+async def statement_status():
+    """Execution counts, SQL plan-cache hit rates and Cypher time to first record"""
+    from database.statements import statements
+
+    return statements.stats()
+
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage latency histograms and pool, cache and index gauges"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Stored request profiles
+@app.get("/api/admin/profiles")
+async def list_profiles(http_request: Request):
+    """Most recent request profiles, newest first"""
+    _require_admin(http_request)
+    return {"profiles": profiler.list()}
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, http_request: Request, format: str = "speedscope"):
+    """Download a profile as speedscope JSON or folded stacks (format=folded)"""
+    _require_admin(http_request)
+    profile = profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    if format == "folded":
+        return PlainTextResponse(
+            profile.folded(),
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'}
+        )
+    if format != "speedscope":
+        raise HTTPException(status_code=400, detail="format must be speedscope or folded")
+    return JSONResponse(
+        profile.speedscope(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'}
+    )
+
+# Slow statement log
+@app.get("/api/admin/slow-statements")
+async def slow_statement_log(
+    http_request: Request,
+    store: Optional[str] = None,
+    statement: Optional[str] = None,
+    limit: int = 50
+):
+    """Recent statements over SLOW_STATEMENT_MS with their captured plans"""
+    _require_admin(http_request)
+    from database.slow_statements import slow_statements
+
+    return {
+        "threshold_ms": slow_statements.threshold * 1000,
+        "records": slow_statements.recent(store, statement, limit)
+    }
+
+# Query capture status (replay the log with benchmarks.replay)
+@app.get("/api/admin/capture")
+async def capture_status(http_request: Request):
+    """Query capture settings and written/dropped record counts"""
+    _require_admin(http_request)
+    return query_capture.stats()
+
+def _telemetry_refusal(connection) -> Optional[str]:
+    """Why a telemetry client is refused (None when its token matches TELEMETRY_TOKEN)"""
+    expected = os.getenv("TELEMETRY_TOKEN")
+    if not expected:
+        return "Telemetry ingestion is disabled (TELEMETRY_TOKEN not set)"
+    # Browsers cannot set WebSocket headers, so the stream also takes ?token=
+    supplied = connection.headers.get("x-telemetry-token") or connection.query_params.get("token", "")
+    if not hmac.compare_digest(supplied.encode(), expected.encode()):
+        return "Invalid telemetry token"
+    return None
+
+# Streaming telemetry ingestion (message format: telemetry.buffers.TelemetryStore.ingest)
+@app.websocket("/api/telemetry/stream")
+async def telemetry_stream(websocket: WebSocket):
+    """One JSON message per frame; every frame is acknowledged with its counts"""
+    refusal = _telemetry_refusal(websocket)
+    if refusal:
+        await websocket.close(code=1008, reason=refusal)
+        return
+    await websocket.accept()
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            try:
+                ack = live_telemetry.ingest_json(frame.get("bytes") or frame.get("text") or "")
+            except TelemetryError as e:
+                ack = {"accepted": 0, "rejected": 0, "errors": [str(e)]}
+            await websocket.send_json(ack)
+    except WebSocketDisconnect:
+        pass
+
+@app.post("/api/telemetry")
+async def ingest_telemetry(http_request: Request):
+    """
+    Newline-delimited JSON messages; a chunked body is ingested line by line
+    as it arrives
+    """
+    refusal = _telemetry_refusal(http_request)
+    if refusal:
+        raise HTTPException(status_code=403, detail=refusal)
+
+    totals: Dict[str, Any] = {"messages": 0, "accepted": 0, "rejected": 0, "errors": []}
+
+    def ingest_line(line: bytes) -> None:
+        if not line.strip():
+            return
+        totals["messages"] += 1
+        try:
+            ack = live_telemetry.ingest_json(line)
+        except TelemetryError as e:
+            ack = {"accepted": 0, "rejected": 1, "errors": [f"message {totals['messages']}: {str(e)}"]}
+        totals["accepted"] += ack["accepted"]
+        totals["rejected"] += ack["rejected"]
+        totals["errors"].extend(ack["errors"][:5 - len(totals["errors"])])
+
+    pending = bytearray()
+    async for chunk in http_request.stream():
+        pending += chunk
+        end = chunk.rfind(b"\n")
+        if end >= 0:
+            end += len(pending) - len(chunk)
+            for line in bytes(pending[:end]).split(b"\n"):
+                ingest_line(line)
+            del pending[:end + 1]
+        if len(pending) > MAX_MESSAGE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Telemetry message over {MAX_MESSAGE_BYTES} bytes")
+    ingest_line(bytes(pending))
+    return totals
+
+@app.get("/api/telemetry/status")
+async def telemetry_status():
+    """Live telemetry buffers and persistence state"""
+    return {"buffers": live_telemetry.stats(), "writer": telemetry_writer.stats()}
+
+@app.get("/api/telemetry/anomalies")
+async def telemetry_anomalies():
+    """Sensors flagged by the anomaly detector and recent incident candidates"""
+    return {
+        "flagged": anomaly_detector.flagged_sensors(),
+        "candidates": list(anomaly_writeback.recent),
+        "detector": anomaly_detector.stats(),
+        "writeback": anomaly_writeback.stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
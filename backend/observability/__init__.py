@@ -0,0 +1,14 @@
+"""
+Observability: request stage timings, metrics export and request profiling
+"""
+from .metrics import metrics, Stage, mark_outcome
+from .gauges import collect_runtime_gauges
+from .profiler import profiler
+
+__all__ = [
+    "metrics",
+    "Stage",
+    "mark_outcome",
+    "collect_runtime_gauges",
+    "profiler"
+]
@@ -0,0 +1,203 @@
+"""
+Query Capture
+Append-only log of /api/query traffic for replay (benchmarks.replay)
+
+Each captured request is one compact JSON line: arrival time, query text,
+the parsed plan (intent, retrievers, entities), per-stage timings from the
+reasoning trace, total latency, status, and the answer with its
+confidence and result counts. Lines are queued by the request and written
+by a background thread, so capture adds no file I/O to the request path;
+when the queue is full, records are dropped and counted rather than
+blocking. The file rotates to `<path>.1` at QUERY_CAPTURE_MAX_MB.
+
+Every worker of a host can capture to the same path: writes and rotation
+happen under an flock on `<path>.lock`, and a worker whose file has been
+rotated by another one reopens the path before writing, so no worker
+keeps appending to (and later rotates over) the rotated file.
+"""
+import os
+import gzip
+import json
+import fcntl
+import queue
+import random
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the record layout changes; replay checks it
+CAPTURE_VERSION = 1
+
+
+class QueryCapture:
+    """
+    Background writer for captured queries
+
+    Settings: QUERY_CAPTURE_ENABLED (default false), QUERY_CAPTURE_PATH,
+    QUERY_CAPTURE_SAMPLE_RATE (fraction of requests, default 1.0),
+    QUERY_CAPTURE_MAX_MB (rotation size) and QUERY_CAPTURE_ANSWER_CHARS
+    (answers are truncated to this length for the answer diff).
+    """
+
+    def __init__(self):
+        self._load_settings()
+        self.written = 0
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=10000)
+        self._thread: Optional[threading.Thread] = None
+
+    def _load_settings(self) -> None:
+        self.enabled = os.getenv("QUERY_CAPTURE_ENABLED", "false").lower() == "true"
+        self.path = os.getenv("QUERY_CAPTURE_PATH", "logs/query_capture.jsonl")
+        self.sample_rate = float(os.getenv("QUERY_CAPTURE_SAMPLE_RATE", "1.0"))
+        self.max_bytes = int(float(os.getenv("QUERY_CAPTURE_MAX_MB", "256")) * 1024 * 1024)
+        self.answer_chars = int(os.getenv("QUERY_CAPTURE_ANSWER_CHARS", "2000"))
+
+    def start(self) -> None:
+        """Start the writer thread (no-op when capture is disabled)"""
+        if self._thread is not None:
+            return
+        # Settings are read again here, after the app has loaded .env
+        self._load_settings()
+        if not self.enabled:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="query-capture", daemon=True)
+        self._thread.start()
+        logger.info(f"Capturing {self.sample_rate:.0%} of queries to {self.path}")
+
+    def stop(self) -> None:
+        """Flush queued records and stop the writer"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def record(self, query: str, started: float, seconds: float, status: int,
+               result: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Queue one request for the log
+
+        Args:
+            query: Query text as received
+            started: Arrival time (epoch seconds)
+            seconds: Time to produce the response
+            status: HTTP status returned
+            result: Orchestrator result, None when the request failed
+        """
+        if self._thread is None or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            return
+
+        entry: Dict[str, Any] = {
+            "v": CAPTURE_VERSION,
+            "ts": round(started, 3),
+            "query": query,
+            "status": status,
+            "ms": round(seconds * 1000, 2)
+        }
+        if result is not None:
+            data = result.get("data") or {}
+            entry.update(
+                intent=result.get("intent", "unknown"),
+                plan=result.get("plan", []),
+                entities={k: v for k, v in (result.get("entities") or {}).items() if v},
+                stages=[
+                    {"agent": step["agent"], "ms": step.get("duration_ms"), "outcome": step.get("outcome")}
+                    for step in result.get("reasoning_trace", [])
+                ],
+                answer=(result.get("answer") or "")[:self.answer_chars],
+                answer_truncated=len(result.get("answer") or "") > self.answer_chars,
+                confidence=result.get("confidence"),
+                rows={store.split("_")[0]: len(data.get(store) or []) for store in
+                      ("sql_results", "graph_results", "vector_results")}
+            )
+        try:
+            self._queue.put_nowait(json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        f = open(self.path, "a", encoding="utf-8")
+        lock = open(self.path + ".lock", "a")
+        try:
+            while True:
+                line = self._queue.get()
+                if line is None:
+                    break
+                lines = [line]
+                # Write whatever else is queued in the same call
+                while len(lines) < 500:
+                    try:
+                        line = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if line is None:
+                        self._queue.put(None)
+                        break
+                    lines.append(line)
+                f = self._write(f, lock, lines)
+                self.written += len(lines)
+        except Exception as e:
+            logger.error(f"Query capture stopped: {str(e)}")
+        finally:
+            f.close()
+            lock.close()
+
+    def _write(self, f, lock, lines):
+        """Append lines under the lock, rotating when due; returns the file to use next"""
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            try:
+                rotated = os.fstat(f.fileno()).st_ino != os.stat(self.path).st_ino
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                # Another worker rotated the file since our last write
+                f.close()
+                f = open(self.path, "a", encoding="utf-8")
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            if os.fstat(f.fileno()).st_size >= self.max_bytes:
+                f.close()
+                os.replace(self.path, self.path + ".1")
+                f = open(self.path, "a", encoding="utf-8")
+            return f
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "sample_rate": self.sample_rate,
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize()
+        }
+
+
+def read_capture(path: str):
+    """Yield captured records from a capture file (plain or .gz), oldest first"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line from a crash; skip it
+                logger.warning(f"{path}:{number}: unreadable capture line skipped")
+                continue
+            if entry.get("v") != CAPTURE_VERSION:
+                logger.warning(f"{path}:{number}: capture version {entry.get('v')} skipped")
+                continue
+            yield entry
+
+
+query_capture = QueryCapture()
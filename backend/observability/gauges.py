@@ -0,0 +1,154 @@
+"""
+Runtime Gauges
+Pool, cache, index and telemetry state sampled when /metrics is scraped
+
+Nothing here creates a pool, client or index: components that have not
+been used yet are simply absent from the scrape. Totals that only grow
+(lookups, readings, transitions, writes) are counters named *_total, so
+rate() and increase() handle process restarts; point-in-time values stay
+gauges.
+"""
+import sys
+import time
+from typing import List
+
+from observability.metrics import GaugeFamily
+
+
+def collect_runtime_gauges() -> List[GaugeFamily]:
+    families: List[GaugeFamily] = []
+    families.extend(_pool_gauges())
+    families.extend(_cache_gauges())
+    families.extend(_statement_gauges())
+    families.extend(_telemetry_gauges())
+    return families
+
+
+def _pool_gauges() -> List[GaugeFamily]:
+    families = []
+    from database.connections import postgres_pool_stats
+    pool = postgres_pool_stats()
+    if pool is not None:
+        families.append((
+            "oilfield_postgres_pool_connections", "gauge", "PostgreSQL pool connections by state",
+            [({"state": "in_use"}, pool["in_use"]), ({"state": "idle"}, pool["idle"]), ({"state": "max"}, pool["max"])]
+        ))
+
+    engine = sys.modules.get("graph_engine")
+    if engine is not None:
+        executor = engine._retrieval_pool
+        families.append((
+            "oilfield_retrieval_pool", "gauge", "Retriever thread pool size and queued tasks",
+            [({"state": "workers"}, executor._max_workers), ({"state": "queued"}, executor._work_queue.qsize())]
+        ))
+    return families
+
+
+def _cache_gauges() -> List[GaugeFamily]:
+    families = []
+    embeddings = sys.modules.get("retrieval.embeddings")
+    embedder = embeddings._embedder if embeddings is not None else None
+    if embedder is not None:
+        stats = embedder.cache_stats()
+        families.append((
+            "oilfield_query_embedding_cache", "gauge", "Query embedding LRU cache entries",
+            [({"state": "size"}, stats["size"]), ({"state": "capacity"}, stats["capacity"])]
+        ))
+        families.append((
+            "oilfield_query_embedding_cache_lookups_total", "counter", "Query embedding cache lookups by result",
+            [({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])]
+        ))
+
+    snapshot_module = sys.modules.get("assets.snapshot")
+    if snapshot_module is not None:
+        manager = snapshot_module.asset_snapshot
+        samples = [({"state": "fresh"}, 1.0 if manager.current() is not None else 0.0)]
+        if manager.snapshot is not None:
+            samples.append(({"state": "nodes"}, len(manager.snapshot)))
+            samples.append(({"state": "age_seconds"}, time.monotonic() - manager.refreshed_at))
+        if manager.shared is not None:
+            samples.append(({"state": "shared_version"}, manager.version))
+            samples.append(({"state": "shared_leader"}, 1.0 if manager.shared.leader else 0.0))
+        families.append(("oilfield_asset_snapshot", "gauge", "In-process asset snapshot state", samples))
+
+    payload = sys.modules.get("query_payload")
+    if payload is not None:
+        stats = payload.result_cache.stats()
+        families.append((
+            "oilfield_query_page_cache", "gauge", "Paged /api/query result cache entries",
+            [({"state": "size"}, stats["size"])]
+        ))
+        families.append((
+            "oilfield_query_page_cache_lookups_total", "counter", "Paged /api/query result cache lookups by result",
+            [({"result": "hit"}, stats["hits"]), ({"result": "shared_hit"}, stats["shared_hits"]),
+             ({"result": "miss"}, stats["misses"])]
+        ))
+
+    hybrid = sys.modules.get("retrieval.hybrid")
+    index = hybrid.lexical_index.current() if hybrid is not None else None
+    if index is not None:
+        stats = index.stats()
+        families.append((
+            "oilfield_lexical_index", "gauge", "BM25 index documents, postings and segments",
+            [({"state": "documents"}, stats["documents"]), ({"state": "postings"}, stats["postings"]),
+             ({"state": "segments"}, stats["segments"])]
+        ))
+    return families
+
+
+def _statement_gauges() -> List[GaugeFamily]:
+    from database.statements import statements
+    stats = statements.stats()
+    samples = [
+        ({"store": "sql", "statement": name}, s["hit_rate"])
+        for name, s in stats["sql"].items()
+        if s["executions"]
+    ]
+    latency = [
+        ({"statement": name}, s["avg_available_after_ms"])
+        for name, s in stats["cypher"].items()
+        if s["avg_available_after_ms"] is not None
+    ]
+    return [("oilfield_statement_plan_cache_hit_ratio", "gauge",
+             "Share of SQL executions that reused a prepared statement", samples),
+            ("oilfield_cypher_available_after_ms", "gauge",
+             "Mean Neo4j time to first record per statement, including planning", latency)]
+
+
+def _telemetry_gauges() -> List[GaugeFamily]:
+    buffers = sys.modules.get("telemetry.buffers")
+    if buffers is None:
+        return []
+    store = buffers.live_telemetry.stats()
+    writer = sys.modules["telemetry.writer"].telemetry_writer.stats()
+    return [
+        ("oilfield_telemetry_series", "gauge", "Live telemetry ring buffers by kind",
+         [({"kind": "well"}, store["wells"]), ({"kind": "sensor"}, store["sensors"])]),
+        ("oilfield_telemetry_pending_readings", "gauge", "Telemetry readings waiting to be persisted",
+         [({}, writer["pending_rows"])]),
+        ("oilfield_telemetry_readings_total", "counter", "Streamed telemetry readings by state",
+         [({"state": "ingested"}, store["readings"]), ({"state": "persisted"}, writer["written_rows"]),
+          ({"state": "dropped"}, writer["dropped_rows"])]),
+        ("oilfield_telemetry_rejected_blocks_total", "counter", "Telemetry blocks rejected as malformed",
+         [({}, store["rejected_blocks"])])
+    ] + _anomaly_gauges()
+
+
+def _anomaly_gauges() -> List[GaugeFamily]:
+    anomaly = sys.modules.get("telemetry.anomaly")
+    if anomaly is None:
+        return []
+    detector = anomaly.anomaly_detector.stats()
+    writeback = anomaly.anomaly_writeback.stats()
+    return [
+        ("oilfield_anomaly_flagged_sensors", "gauge", "Sensors currently flagged by the telemetry anomaly detector",
+         [({}, detector["flagged"])]),
+        ("oilfield_anomaly_transitions_total", "counter", "Anomaly flag transitions",
+         [({}, detector["transitions"])]),
+        ("oilfield_anomaly_graph_pending", "gauge", "Anomaly flags and incident candidates queued for the graph",
+         [({"kind": "flag"}, writeback["pending_flags"]), ({"kind": "candidate"}, writeback["pending_candidates"])]),
+        ("oilfield_anomaly_graph_writes_total", "counter", "Anomaly flags and incident candidates by write-back result",
+         [({"kind": "flag", "state": "written"}, writeback["written_flags"]),
+          ({"kind": "candidate", "state": "written"}, writeback["written_candidates"]),
+          ({"kind": "candidate", "state": "dropped"}, writeback["dropped_candidates"])])
+    ]
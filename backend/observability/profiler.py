@@ -0,0 +1,255 @@
+"""
+Request Profiler
+On-demand sampling profiler for single requests
+
+A flagged request is sampled by a background thread that reads the stacks
+of only the threads working on it: the request's own thread plus pool
+threads while they run one of its stages (Stage attaches them). Finished
+profiles are kept in memory and exported as speedscope JSON or folded
+stacks (flamegraph.pl, inferno, speedscope all read the latter).
+
+Nothing runs unless a request asks for it: unflagged requests pay one
+header lookup, and stages one ContextVar read.
+"""
+import os
+import sys
+import time
+import uuid
+import logging
+import threading
+from collections import Counter, OrderedDict, deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# (qualified name, file, first line) from root to leaf
+Frame = Tuple[str, str, int]
+
+_active_profile: ContextVar[Optional["Profile"]] = ContextVar("active_profile", default=None)
+
+
+class ProfilerBusy(RuntimeError):
+    """A profile is already running or the rate limit is used up"""
+
+
+class Profile:
+    """Stack samples of the threads attached to one request"""
+
+    def __init__(self, name: str, interval: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.interval = interval
+        self.started_at = time.time()
+        self.seconds: Optional[float] = None
+        # (thread label, stack) -> samples
+        self.samples: Counter = Counter()
+        self._threads: Dict[int, List[Any]] = {}  # ident -> [label, attach count]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def attach(self) -> None:
+        """Include the calling thread in the samples until detach()"""
+        ident = threading.get_ident()
+        with self._lock:
+            entry = self._threads.get(ident)
+            if entry is None:
+                self._threads[ident] = [threading.current_thread().name, 1]
+            else:
+                entry[1] += 1
+
+    def detach(self) -> None:
+        ident = threading.get_ident()
+        with self._lock:
+            entry = self._threads.get(ident)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._threads[ident]
+
+    def start(self) -> None:
+        # A busy request thread only yields the GIL every switch interval
+        # (5ms by default); shorten it so samples land on schedule
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval / 2))
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{self.id}", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        sys.setswitchinterval(self._switch_interval)
+        self.seconds = time.perf_counter() - self._started
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = [(ident, entry[0]) for ident, entry in self._threads.items()]
+            for ident, label in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[(label, _stack(frame))] += 1
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self.samples.values())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": None if self.seconds is None else round(self.seconds * 1000, 2),
+            "interval_ms": self.interval * 1000,
+            "samples": self.sample_count
+        }
+
+    def folded(self) -> str:
+        """Folded stacks, one `thread;outer;...;inner count` line per stack"""
+        lines = []
+        for (label, stack), count in sorted(self.samples.items()):
+            names = [label] + [f"{name} ({os.path.basename(file)}:{line})" for name, file, line in stack]
+            lines.append(f"{';'.join(names)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Speedscope file with one sampled profile per thread"""
+        frame_index: Dict[Frame, int] = {}
+        frames = []
+        per_thread: Dict[str, Tuple[List[List[int]], List[float]]] = {}
+        weight = round(self.interval * 1000, 3)
+        for (label, stack), count in self.samples.items():
+            indices = []
+            for frame in stack:
+                i = frame_index.get(frame)
+                if i is None:
+                    i = frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indices.append(i)
+            samples, weights = per_thread.setdefault(label, ([], []))
+            samples.append(indices)
+            weights.append(weight * count)
+
+        profiles = []
+        for label, (samples, weights) in sorted(per_thread.items()):
+            profiles.append({
+                "type": "sampled",
+                "name": label,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights
+            })
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": self.name,
+            "exporter": "oilfield-backend",
+            "shared": {"frames": frames},
+            "profiles": profiles
+        }
+
+
+def _stack(frame) -> Tuple[Frame, ...]:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def attach_current_thread() -> Optional[Profile]:
+    """
+    Add the calling thread to the request's profile, if one is running
+
+    Returns:
+        The profile to detach from when the work is done, or None
+    """
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.attach()
+    return profile
+
+
+class RequestProfiler:
+    """
+    Starts rate-limited profiles and keeps the most recent ones
+
+    Settings: PROFILER_INTERVAL_MS (sampling period), PROFILER_MAX_PER_MINUTE
+    and PROFILER_KEEP (profiles held for download).
+    """
+
+    def __init__(self):
+        self.interval = float(os.getenv("PROFILER_INTERVAL_MS", "5")) / 1000
+        self.max_per_minute = int(os.getenv("PROFILER_MAX_PER_MINUTE", "6"))
+        self.keep = int(os.getenv("PROFILER_KEEP", "20"))
+        self.profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._recent = deque()
+        self._running = False
+        self._lock = threading.Lock()
+
+    def profile(self, name: str) -> "_ProfileScope":
+        """
+        Context manager profiling the calling thread and its stages
+
+        Raises:
+            ProfilerBusy: If another profile is running or the rate limit is reached
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if self._running:
+                raise ProfilerBusy("Another request is being profiled")
+            if len(self._recent) >= self.max_per_minute:
+                raise ProfilerBusy(f"Profiling limited to {self.max_per_minute} requests per minute")
+            self._recent.append(now)
+            self._running = True
+        return _ProfileScope(self, Profile(name, self.interval))
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self.profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [profile.summary() for profile in reversed(self.profiles.values())]
+
+    def _finish(self, profile: Profile) -> None:
+        with self._lock:
+            self._running = False
+            self.profiles[profile.id] = profile
+            while len(self.profiles) > self.keep:
+                self.profiles.popitem(last=False)
+        logger.info(f"Profile {profile.id} ({profile.name}): {profile.sample_count} samples "
+                    f"in {profile.seconds * 1000:.1f}ms")
+
+
+class _ProfileScope:
+    def __init__(self, profiler: RequestProfiler, profile: Profile):
+        self.profiler = profiler
+        self.profile = profile
+
+    def __enter__(self) -> Profile:
+        self._token = _active_profile.set(self.profile)
+        self.profile.attach()
+        self.profile.start()
+        return self.profile
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.profile.stop()
+        self.profile.detach()
+        _active_profile.reset(self._token)
+        self.profiler._finish(self.profile)
+
+
+profiler = RequestProfiler()
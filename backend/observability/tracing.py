@@ -0,0 +1,177 @@
+"""
+Request Tracing
+OpenTelemetry spans for requests, orchestrator stages, database statements
+and the LLM call
+
+Tracing is off unless TRACING_ENABLED=true, and then only a sampled share
+of requests (TRACING_SAMPLE_RATIO) is recorded; an incoming sampled
+`traceparent` is always honoured. Spans go to every exporter named in
+TRACING_EXPORTERS: "otlp" (OTEL_EXPORTER_OTLP_ENDPOINT), "console", or
+"file" (JSON lines at TRACING_FILE_PATH), so traces can be read without a
+collector.
+
+The span context lives in contextvars: it follows awaits within a
+request, and work handed to a thread pool must run in a copy of the
+caller's context (`contextvars.copy_context().run`) to stay in the trace.
+"""
+import os
+import logging
+from contextlib import nullcontext
+from typing import Optional
+
+try:
+    from opentelemetry import trace, propagate
+except ImportError:
+    trace = None
+    propagate = None
+
+try:
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+except ImportError:
+    TracerProvider = None
+
+logger = logging.getLogger(__name__)
+
+# Set by configure_tracing; None means tracing is off and span() is free
+_tracer = None
+_provider = None
+
+
+def configure_tracing() -> bool:
+    """
+    Install the tracer provider from environment settings
+
+    Returns:
+        True if tracing is on
+    """
+    global _tracer, _provider
+    if os.getenv("TRACING_ENABLED", "false").lower() != "true":
+        return False
+    if trace is None or TracerProvider is None:
+        logger.warning("opentelemetry-sdk not installed. Tracing disabled.")
+        return False
+
+    ratio = float(os.getenv("TRACING_SAMPLE_RATIO", "0.1"))
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "oilfield-backend")}),
+        sampler=ParentBased(TraceIdRatioBased(ratio))
+    )
+    exporters = [e.strip() for e in os.getenv("TRACING_EXPORTERS", "otlp").split(",") if e.strip()]
+    for name in exporters:
+        exporter = _exporter(name)
+        if exporter is not None:
+            provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _provider = provider
+    _tracer = trace.get_tracer("oilfield")
+    logger.info(f"Tracing enabled: sample ratio {ratio}, exporters {exporters}")
+    return True
+
+
+def shutdown_tracing() -> None:
+    """Flush and stop the exporters"""
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = _provider = None
+
+
+def _exporter(name: str):
+    if name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("opentelemetry-exporter-otlp-proto-http not installed. OTLP export disabled.")
+            return None
+        return OTLPSpanExporter()
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "file":
+        out = open(os.getenv("TRACING_FILE_PATH", "traces.jsonl"), "a", encoding="utf-8")
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    logger.warning(f"Unknown trace exporter: {name}")
+    return None
+
+
+def span(name: str, **attributes):
+    """
+    Context manager for a child span of the current one
+
+    Yields the span, or None when tracing is off (then nothing is
+    allocated), so callers guard attribute updates with set_attributes.
+    """
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def set_attributes(current, **attributes) -> None:
+    """Set attributes on a span from span(); a no-op for None"""
+    if current is not None:
+        current.set_attributes(attributes)
+
+
+def current_trace_id() -> Optional[str]:
+    """Hex id of the current sampled trace, if any"""
+    if _tracer is None:
+        return None
+    context = trace.get_current_span().get_span_context()
+    return format(context.trace_id, "032x") if context.trace_flags.sampled else None
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per HTTP request
+
+    Continues the caller's trace from a W3C `traceparent` header and
+    returns the trace id of sampled requests in `x-trace-id`. When a server
+    span is already open around the app (FastAPI versions with native
+    OpenTelemetry support start one), that span is reused instead of
+    nesting a second one.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if _tracer is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if trace.get_current_span().is_recording():
+            await self.app(scope, receive, self._with_trace_id(send, current_trace_id()))
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        with _tracer.start_as_current_span(
+            f"{scope['method']} {scope['path']}",
+            context=propagate.extract(headers),
+            kind=trace.SpanKind.SERVER,
+            attributes={"http.request.method": scope["method"], "url.path": scope["path"]}
+        ) as server_span:
+            send_traced = self._with_trace_id(send, current_trace_id())
+
+            async def send_recorded(message):
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    server_span.set_attribute("http.response.status_code", status)
+                    if status >= 500:
+                        server_span.set_status(trace.Status(trace.StatusCode.ERROR))
+                await send_traced(message)
+
+            await self.app(scope, receive, send_recorded)
+
+    @staticmethod
+    def _with_trace_id(send, trace_id: Optional[str]):
+        if trace_id is None:
+            return send
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-trace-id", trace_id.encode())]}
+            await send(message)
+
+        return send_with_header
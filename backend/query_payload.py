@@ -0,0 +1,321 @@
+"""
+Query Payload Options
+Section selection, column projection, downsampling and cursor paging for
+/api/query data
+
+Clients that render only the answer and a chart can ask for less than the
+full `data` payload:
+
+    sections   data sections to return, e.g. ["sql_results"]
+    columns    columns to keep per section, e.g. {"sql_results": ["timestamp", "production_rate"]}
+    max_points rows to keep per time series (per well or sensor) of each
+               section, chosen to preserve the chart (analytics.downsample);
+               sections that are not time series are unchanged
+    downsample "lttb" (default) or "minmax"
+    page_size  rows per section; longer sections are cut and described in
+               data["pages"] with a `next_cursor`
+    cursor     a `next_cursor` value: returns the next page of that section
+
+Downsampling runs before paging and column projection, and sections it
+shortened are described in data["downsampled"]. Without options the
+payload is unchanged. The result behind a paged response is kept in a
+small TTL cache, so following a cursor does not run the query again. With
+SHARED_STATE_DIR set, the cache is also written there as JSON and every
+worker on the host can serve the cursor; when the entry has expired the
+query is re-run and paging continues at the cursor's offset.
+"""
+import os
+import re
+import json
+import time
+import base64
+import logging
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+from analytics.downsample import DOWNSAMPLE_MODES, downsample_rows
+from assets.shared import private_directory
+from query_response import ORJSON_AVAILABLE, encode
+
+if ORJSON_AVAILABLE:
+    import orjson
+
+logger = logging.getLogger(__name__)
+
+DATA_SECTIONS = ("sql_results", "graph_results", "vector_results")
+MAX_PAGE_SIZE = int(os.getenv("QUERY_MAX_PAGE_SIZE", "10000"))
+# Fewest points a downsampled series can have: its first, its last and one between
+MIN_POINTS = 3
+
+CURSOR_VERSION = 1
+
+# Cache keys are file names in the shared directory; cursors are client input
+_CACHE_KEY = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+class PayloadError(ValueError):
+    """Invalid payload options (reported as 400)"""
+
+
+class ResultCache:
+    """
+    LRU cache of paged results, entries expire after QUERY_PAGE_CACHE_TTL_SECONDS
+
+    With a shared directory, entries are also written to files there as
+    the JSON of the response (one per key, replaced atomically, at most
+    QUERY_PAGE_CACHE_SIZE kept), so a cursor that reaches another worker of
+    the host is still a hit. An entry read back has datetimes and decimals
+    as the strings the response would carry, which page and downsample the
+    same way. The directory must be private to the service user
+    (assets.shared.private_directory), otherwise results are not shared.
+    """
+
+    def __init__(self, shared_dir: Optional[str] = None):
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.configure(shared_dir)
+
+    def configure(self, shared_dir: Optional[str] = None) -> None:
+        """Read the settings (again, once the app has loaded .env)"""
+        self.size = int(os.getenv("QUERY_PAGE_CACHE_SIZE", "32"))
+        self.ttl = float(os.getenv("QUERY_PAGE_CACHE_TTL_SECONDS", "300"))
+        shared_dir = shared_dir or os.getenv("SHARED_STATE_DIR")
+        self.shared_path = os.path.join(shared_dir, "query_results") if shared_dir else None
+        if self.shared_path:
+            try:
+                private_directory(shared_dir)
+                private_directory(self.shared_path)
+            except OSError as e:
+                logger.warning(f"Paged results not shared between workers: {str(e)}")
+                self.shared_path = None
+
+    def put(self, result: Dict[str, Any], key: Optional[str] = None) -> str:
+        key = key or secrets.token_urlsafe(9)
+        self._remember(key, result, time.monotonic() + self.ttl)
+        if self.shared_path and _CACHE_KEY.fullmatch(key):
+            try:
+                self._write_shared(key, result)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Paged result not shared with other workers: {str(e)}")
+        return key
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+        shared = self._read_shared(key) if self.shared_path and _CACHE_KEY.fullmatch(key) else None
+        if shared is None:
+            self.misses += 1
+            return None
+        expires_at, result = shared
+        self._remember(key, result, expires_at)
+        self.shared_hits += 1
+        return result
+
+    def _remember(self, key: str, result: Dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def _write_shared(self, key: str, result: Dict[str, Any]) -> None:
+        temp = os.path.join(self.shared_path, f".{key}.{os.getpid()}")
+        with open(temp, "wb") as f:
+            f.write(encode(result))
+        os.replace(temp, os.path.join(self.shared_path, key))
+        # Drop expired entries, then the oldest beyond the size limit
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.shared_path):
+            if entry.name.startswith("."):
+                continue
+            mtime = entry.stat().st_mtime
+            if mtime + self.ttl < now:
+                _unlink(entry.path)
+            else:
+                entries.append((mtime, entry.path))
+        for _, path in sorted(entries)[:max(len(entries) - self.size, 0)]:
+            _unlink(path)
+
+    def _read_shared(self, key: str) -> Optional[tuple]:
+        """(monotonic expiry, result) of a shared entry, None when missing or expired"""
+        path = os.path.join(self.shared_path, key)
+        try:
+            with open(path, "rb") as f:
+                remaining = os.fstat(f.fileno()).st_mtime + self.ttl - time.time()
+                if remaining <= 0:
+                    return None
+                data = f.read()
+            return time.monotonic() + remaining, orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Shared paged result {key} unreadable: {str(e)}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._entries), "capacity": self.size, "hits": self.hits,
+                "shared_hits": self.shared_hits, "misses": self.misses, "shared": self.shared_path is not None}
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+result_cache = ResultCache()
+
+
+class PayloadOptions:
+    """Validated payload options of one request"""
+
+    def __init__(self, sections: Optional[List[str]] = None, columns: Optional[Dict[str, List[str]]] = None,
+                 page_size: Optional[int] = None, cursor: Optional[Dict[str, Any]] = None,
+                 max_points: Optional[int] = None, downsample: Optional[str] = None):
+        self.sections = sections
+        self.columns = columns or {}
+        self.page_size = page_size
+        self.cursor = cursor
+        self.max_points = max_points
+        self.downsample = downsample or "lttb"
+
+    @classmethod
+    def parse(cls, query: str, sections: Optional[List[str]], columns: Optional[Dict[str, List[str]]],
+              page_size: Optional[int], cursor: Optional[str], max_points: Optional[int] = None,
+              downsample: Optional[str] = None) -> "PayloadOptions":
+        """
+        Validate request options
+
+        A cursor carries the downsampling of the request that started the
+        paging, so its pages come from the same rows.
+
+        Raises:
+            PayloadError: Unknown section, empty column list, page size or
+                point count out of range, unknown downsampling mode, or a
+                cursor that is malformed or from another query
+        """
+        for name in (sections or []) + list(columns or {}):
+            if name not in DATA_SECTIONS:
+                raise PayloadError(f"Unknown data section '{name}'; expected one of {', '.join(DATA_SECTIONS)}")
+        for name, keep in (columns or {}).items():
+            if not keep:
+                raise PayloadError(f"Empty column list for '{name}'")
+        if page_size is not None and not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise PayloadError(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+        if max_points is not None and max_points < MIN_POINTS:
+            raise PayloadError(f"max_points must be at least {MIN_POINTS}")
+        if downsample is not None and downsample not in DOWNSAMPLE_MODES:
+            raise PayloadError(f"Unknown downsample mode '{downsample}'; expected one of {', '.join(DOWNSAMPLE_MODES)}")
+        if cursor:
+            decoded = _decode_cursor(cursor, query)
+            return cls(sections, columns, page_size, decoded, decoded.get("p"), decoded.get("m"))
+        return cls(sections, columns, page_size, None, max_points, downsample)
+
+    @property
+    def active(self) -> bool:
+        return bool(self.sections is not None or self.columns or self.page_size or self.cursor or self.max_points)
+
+    def apply(self, result: Dict[str, Any], query: str, cache_key: Optional[str] = None,
+              cache: ResultCache = result_cache) -> Dict[str, Any]:
+        """
+        The result with its data cut down to the requested sections, columns and page
+
+        Args:
+            result: Orchestrator result (not modified)
+            query: Query text (cursors are bound to it)
+            cache_key: Cache entry already holding `result` (cursor requests);
+                it is replaced by the downsampled result, so later pages do
+                not downsample again
+            cache: Where to keep the result when a next page exists
+
+        Returns:
+            A shallow copy of the result with new `data`
+        """
+        data = result.get("data") or {}
+        if self.cursor is not None:
+            names = [self.cursor["s"]]
+            offset, size = self.cursor["o"], self.cursor["n"]
+        else:
+            names = [name for name in data if self.sections is None or name in self.sections]
+            offset, size = 0, self.page_size
+
+        downsampled: Dict[str, Any] = {}
+        if self.max_points:
+            data = dict(data)
+            for name in names:
+                rows, summary = downsample_rows(data.get(name) or [], self.max_points, self.downsample)
+                if summary is not None:
+                    data[name] = rows
+                    downsampled[name] = summary
+            if downsampled:
+                result = {**result, "data": data}
+                if cache_key:
+                    cache.put(result, cache_key)
+
+        shaped: Dict[str, Any] = {}
+        pages: Dict[str, Any] = {}
+        for name in names:
+            rows = data.get(name) or []
+            if size is not None and (offset or len(rows) > size):
+                end = min(offset + size, len(rows))
+                next_cursor = None
+                if end < len(rows):
+                    cache_key = cache_key or cache.put(result)
+                    next_cursor = _encode_cursor(cache_key, query, name, end, size,
+                                                 self.max_points, self.downsample)
+                pages[name] = {"offset": offset, "count": end - offset, "total": len(rows), "next_cursor": next_cursor}
+                rows = rows[offset:end]
+            keep = self.columns.get(name)
+            if keep:
+                rows = [{k: row[k] for k in keep if k in row} if isinstance(row, dict) else row for row in rows]
+            shaped[name] = rows
+        if pages:
+            shaped["pages"] = pages
+        if downsampled:
+            shaped["downsampled"] = downsampled
+        return {**result, "data": shaped}
+
+
+def _query_hash(query: str) -> str:
+    return hashlib.sha1(query.strip().encode("utf-8")).hexdigest()[:12]
+
+
+def _encode_cursor(key: str, query: str, section: str, offset: int, size: int,
+                   points: Optional[int] = None, mode: Optional[str] = None) -> str:
+    payload = {"v": CURSOR_VERSION, "k": key, "h": _query_hash(query), "s": section, "o": offset, "n": size}
+    if points:
+        payload.update(p=points, m=mode)
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _decode_cursor(token: str, query: str) -> Dict[str, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        cursor = json.loads(raw)
+        valid = (cursor.get("v") == CURSOR_VERSION and cursor.get("s") in DATA_SECTIONS
+                 and isinstance(cursor.get("o"), int) and cursor["o"] >= 0
+                 and isinstance(cursor.get("n"), int) and 1 <= cursor["n"] <= MAX_PAGE_SIZE
+                 and isinstance(cursor.get("k"), str)
+                 and (cursor.get("p") is None or isinstance(cursor["p"], int) and cursor["p"] >= MIN_POINTS)
+                 and cursor.get("m") in (None,) + DOWNSAMPLE_MODES)
+    except (ValueError, TypeError, AttributeError):
+        valid = False
+    if not valid:
+        raise PayloadError("Malformed cursor")
+    if cursor.get("h") != _query_hash(query):
+        raise PayloadError("Cursor belongs to a different query")
+    return cursor
@@ -0,0 +1,150 @@
+"""
+Query Response Rendering
+/api/query responses serialized straight from the orchestrator result
+
+The default path builds QueryResponse from the result, then FastAPI
+validates it again and serializes it, walking every row of `data` in
+both steps. Here the small envelope fields are checked and coerced the way
+the model would coerce them, `data` (typed Any in the model, so validation
+never changes it) is passed through untouched, and the body is encoded with
+orjson, which handles datetime, date, UUID and Enum natively; Decimal is
+written as its string, as pydantic does.
+
+The output is byte-for-byte what FastAPI would have sent. Values orjson
+encodes differently from pydantic (bytes, timedelta, sets, non-string
+keys, integers over 64 bits) make that piece fall back to pydantic's
+encoder, and results whose envelope does not have the model's types go
+through the model (the caller's fallback), so invalid results still fail
+as before.
+
+Responses with at least RESPONSE_STREAM_MIN_ROWS rows are streamed:
+`data` lists are encoded RESPONSE_STREAM_CHUNK_ROWS rows at a time, so the
+first bytes leave before the last rows are encoded and the whole body is
+never held in memory at once. FAST_RESPONSE_ENABLED=false restores the
+model path.
+"""
+import os
+import logging
+from decimal import Decimal
+from typing import Any, Dict, Iterator, Optional
+
+from fastapi.responses import Response, StreamingResponse
+from pydantic import TypeAdapter
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    logger.warning("orjson not installed. Query responses use pydantic serialization")
+
+FAST_RESPONSE_ENABLED = os.getenv("FAST_RESPONSE_ENABLED", "true").lower() == "true"
+STREAM_MIN_ROWS = int(os.getenv("RESPONSE_STREAM_MIN_ROWS", "5000"))
+STREAM_CHUNK_ROWS = int(os.getenv("RESPONSE_STREAM_CHUNK_ROWS", "1000"))
+
+_any = TypeAdapter(Any)
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError
+
+
+def encode(value: Any) -> bytes:
+    """JSON bytes identical to pydantic's serialization of an Any-typed value"""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(value, default=_default, option=orjson.OPT_UTC_Z)
+        except orjson.JSONEncodeError:
+            # A type orjson writes differently (or not at all); pydantic decides
+            pass
+    return _any.dump_json(value)
+
+
+def _envelope(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The QueryResponse fields other than `data`, coerced as the model would
+
+    Returns:
+        The fields in model order, or None when a value needs the model's
+        validation (wrong type, missing key)
+    """
+    answer = result.get("answer")
+    confidence = result.get("confidence")
+    trace = result.get("reasoning_trace")
+    graph_path = result.get("graph_path")
+    data = result.get("data")
+    if (type(answer) is not str or type(confidence) not in (float, int) or type(trace) is not list
+            or not (data is None or (type(data) is dict and all(type(k) is str for k in data)))):
+        return None
+    if graph_path is not None and not (type(graph_path) is list and all(type(p) is str for p in graph_path)):
+        return None
+
+    steps = []
+    for step in trace:
+        if type(step) is not dict or type(step.get("step")) is not int:
+            return None
+        if type(step.get("agent")) is not str or type(step.get("action")) is not str:
+            return None
+        result_text, outcome, duration = step.get("result"), step.get("outcome"), step.get("duration_ms")
+        if not (result_text is None or type(result_text) is str) or not (outcome is None or type(outcome) is str):
+            return None
+        if not (duration is None or type(duration) in (float, int)):
+            return None
+        steps.append({
+            "step": step["step"],
+            "agent": step["agent"],
+            "action": step["action"],
+            "result": result_text,
+            "duration_ms": None if duration is None else float(duration),
+            "outcome": outcome
+        })
+    return {"answer": answer, "reasoning_trace": steps, "graph_path": graph_path, "confidence": float(confidence)}
+
+
+def _stream(head: bytes, data: Dict[str, Any], chunk_rows: int) -> Iterator[bytes]:
+    """The body in pieces: envelope, then each data list a chunk of rows at a time"""
+    yield head + b',"data":{'
+    for i, (key, value) in enumerate(data.items()):
+        prefix = (b"," if i else b"") + encode(key) + b":"
+        if type(value) is not list or len(value) <= chunk_rows:
+            yield prefix + encode(value)
+            continue
+        yield prefix + b"["
+        for start in range(0, len(value), chunk_rows):
+            # Elements encode independently, so joining chunk interiors gives the list's bytes
+            chunk = encode(value[start:start + chunk_rows])[1:-1]
+            yield chunk if start == 0 else b"," + chunk
+        yield b"]"
+    yield b"}}"
+
+
+def render_query_response(result: Dict[str, Any], stream: bool = True) -> Optional[Response]:
+    """
+    The /api/query response for an orchestrator result
+
+    Args:
+        result: Result of graph_engine.process_query
+        stream: Stream results over RESPONSE_STREAM_MIN_ROWS rows
+
+    Returns:
+        A JSON Response (or StreamingResponse for large results) with the
+        bytes FastAPI would produce from QueryResponse, or None when the
+        result has to go through the model
+    """
+    envelope = _envelope(result) if FAST_RESPONSE_ENABLED else None
+    if envelope is None:
+        return None
+
+    data = result.get("data")
+    head = encode(envelope)[:-1]
+    if data is None:
+        return Response(head + b',"data":null}', media_type="application/json")
+    rows = sum(len(value) for value in data.values() if type(value) is list)
+    if stream and rows >= STREAM_MIN_ROWS:
+        return StreamingResponse(_stream(head, data, STREAM_CHUNK_ROWS), media_type="application/json")
+    return Response(head + b',"data":' + encode(data) + b"}", media_type="application/json")
+
@@ -0,0 +1,19 @@
+"""
+Document retrieval: embeddings and report search support
+"""
+from .embeddings import TextEmbedder, get_text_embedder
+from .local_store import LocalVectorStore, LocalVectorStoreWriter, get_local_vector_store
+from .bm25 import BM25Index
+from .hybrid import LexicalIndexManager, reciprocal_rank_fusion, lexical_index
+
+__all__ = [
+    "TextEmbedder",
+    "get_text_embedder",
+    "LocalVectorStore",
+    "LocalVectorStoreWriter",
+    "get_local_vector_store",
+    "BM25Index",
+    "LexicalIndexManager",
+    "reciprocal_rank_fusion",
+    "lexical_index"
+]
@@ -0,0 +1,499 @@
+"""
+BM25 Index
+In-memory inverted index over incident descriptions and report chunks
+"""
+import re
+import math
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Hyphenated words stay whole, so "G-40", "PUMP-45" and "INC-2024-045" are
+# single tokens
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were what when where which who why with any all did do does how".split()
+)
+
+MISSING_DATE = np.iinfo(np.int64).min
+
+DOCUMENT_KINDS = {"report": 0, "incident": 1}
+
+
+def tokenize(text: str, query: bool = False) -> List[str]:
+    """
+    Lower-cased terms of a text
+
+    Identifier-like tokens (hyphenated with a digit, e.g. "w-12") are also
+    indexed without separators ("w12"). Documents additionally index the
+    parts of hyphenated tokens, so "pump-station" matches "pump"; queries
+    keep identifiers whole, so "G-40" does not match every "40".
+    """
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if "-" in token or "_" in token:
+            parts = re.split(r"[-_]", token)
+            identifier = any(c.isdigit() for c in token)
+            if identifier:
+                terms.append("".join(parts))
+            if not query or not identifier:
+                terms.extend(p for p in parts if p not in STOPWORDS)
+    return terms
+
+
+def _epoch(value) -> int:
+    if value is None:
+        return MISSING_DATE
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+# Queries whose postings cover less than 1/SPARSE_FRACTION of all documents
+# are scored sparsely
+SPARSE_FRACTION = 8
+
+# Binary-search lookups of candidates into a postings list cost roughly this
+# many sequential posting updates each
+LOOKUP_COST = 16
+
+# Segments beyond which the smallest adjacent run is merged even across tiers
+MAX_SEGMENTS = 32
+
+# Postings copied per step when merging segments, bounding temporary memory
+MERGE_BLOCK = 1 << 22
+
+
+class _Segment:
+    """
+    Immutable postings, CSR by term: docs of terms[i] are
+    docs[offsets[i]:offsets[i + 1]]
+
+    Each posting stores its BM25 term-frequency factor (the "impact"), so a
+    query only multiplies by the current idf. Doc ids ascend within a term,
+    and the largest impact of each term is kept as its score upper bound.
+    """
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, docs: np.ndarray, impacts: np.ndarray):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.impacts = impacts
+        self.max_impacts = (
+            np.maximum.reduceat(impacts, offsets[:-1]) if len(impacts) else np.zeros(0, dtype=np.float32)
+        )
+
+    @classmethod
+    def from_postings(cls, term_ids: np.ndarray, doc_ids: np.ndarray, impacts: np.ndarray) -> "_Segment":
+        # Stable, so postings of a term keep the input (doc) order
+        order = np.argsort(term_ids, kind="stable")
+        term_ids = term_ids[order]
+        terms, starts = np.unique(term_ids, return_index=True)
+        return cls(
+            terms,
+            np.append(starts, len(term_ids)).astype(np.int64),
+            doc_ids[order].astype(np.int32),
+            impacts[order].astype(np.float32)
+        )
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def postings(self, term_id: int) -> Optional[Tuple[np.ndarray, np.ndarray, float]]:
+        """Doc ids, impacts and largest impact of a term, or None"""
+        i = int(np.searchsorted(self.terms, term_id))
+        if i == len(self.terms) or self.terms[i] != term_id:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.docs[start:end], self.impacts[start:end], float(self.max_impacts[i])
+
+
+def _merge_segments(segments: List[_Segment], alive: np.ndarray) -> _Segment:
+    """
+    Merge adjacent CSR segments into one, dropping postings of dead documents
+
+    Segments are given in doc id order, so each term's doc ids stay sorted.
+
+    Postings are written straight into the output arrays block by block,
+    so temporary memory stays bounded by MERGE_BLOCK rather than growing
+    with the total number of postings.
+    """
+    terms = np.unique(np.concatenate([s.terms for s in segments]))
+    per_segment = []
+    totals = np.zeros(len(terms), dtype=np.int64)
+    for s in segments:
+        live_counts = np.zeros(len(s.terms), dtype=np.int64)
+        for start in range(0, len(s), MERGE_BLOCK):
+            stop = min(start + MERGE_BLOCK, len(s))
+            term_index = np.searchsorted(s.offsets, np.arange(start, stop), side="right") - 1
+            live = alive[s.docs[start:stop]]
+            live_counts += np.bincount(term_index[live], minlength=len(s.terms))
+        position = np.searchsorted(terms, s.terms)
+        per_segment.append((position, live_counts))
+        totals[position] += live_counts
+
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(totals, out=offsets[1:])
+    docs = np.empty(offsets[-1], dtype=np.int32)
+    impacts = np.empty(offsets[-1], dtype=np.float32)
+    cursor = offsets[:-1].copy()
+
+    for s, (position, live_counts) in zip(segments, per_segment):
+        # Destination of the k-th live posting of local term i:
+        # cursor[position[i]] + k
+        written = np.zeros(len(s.terms), dtype=np.int64)
+        for start in range(0, len(s), MERGE_BLOCK):
+            stop = min(start + MERGE_BLOCK, len(s))
+            block_docs = s.docs[start:stop]
+            live = alive[block_docs]
+            term_index = (np.searchsorted(s.offsets, np.arange(start, stop), side="right") - 1)[live]
+            if not len(term_index):
+                continue
+            # Rank of each posting among the live postings of its term in this block
+            first = np.searchsorted(term_index, term_index, side="left")
+            rank = np.arange(len(term_index)) - first
+            dest = cursor[position[term_index]] + written[term_index] + rank
+            docs[dest] = block_docs[live]
+            impacts[dest] = s.impacts[start:stop][live]
+            written += np.bincount(term_index, minlength=len(s.terms))
+        cursor[position] += live_counts
+
+    keep = totals > 0
+    return _Segment(terms[keep], np.append(offsets[:-1][keep], offsets[-1]), docs, impacts)
+
+
+def _kth_best(scores: np.ndarray, k: int) -> float:
+    if len(scores) < k:
+        return 0.0
+    return float(np.partition(scores, len(scores) - k)[len(scores) - k])
+
+
+class BM25Index:
+    """
+    Okapi BM25 over documents keyed by string, with incremental updates
+
+    Each `add` call becomes an immutable postings segment, and segments of
+    similar size are merged as they accumulate (tiered, like an LSM tree),
+    so a small update never rewrites the large segments. Re-adding a key
+    replaces the document and `remove` tombstones it; document frequencies
+    are counted over live postings at query time, so tombstones never skew
+    scores. Term-frequency factors are computed at index time against the
+    average length then, which drifts only slowly. Scoring is vectorized
+    per query term, and documents carry well/rig/date columns so the
+    vector-search filters apply here too.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, merge_factor: int = 4):
+        """
+        Args:
+            k1: BM25 term-frequency saturation
+            b: BM25 length normalization
+            merge_factor: Segments of one size tier that trigger a merge
+        """
+        self.k1 = k1
+        self.b = b
+        self.merge_factor = merge_factor
+        self.has_deletes = False
+        self.terms: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.doc_of: Dict[str, int] = {}
+        self.wells: Dict[str, int] = {}
+        self.rigs: Dict[str, int] = {}
+        self.segments: List[_Segment] = []
+        self.live_docs = 0
+        self.total_length = 0
+        self._columns = {
+            "length": np.zeros(0, dtype=np.int32),
+            "alive": np.zeros(0, dtype=bool),
+            "well": np.zeros(0, dtype=np.int32),
+            "rig": np.zeros(0, dtype=np.int32),
+            "date": np.zeros(0, dtype=np.int64),
+            "kind": np.zeros(0, dtype=np.int8)
+        }
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.live_docs
+
+    def add(self, documents: List[Dict[str, Any]]) -> None:
+        """
+        Index (or replace) documents
+
+        Args:
+            documents: Dicts with key, text and optionally kind ("report"
+                or "incident"), well, rig and report_date
+        """
+        if not documents:
+            return
+        counts = [Counter(tokenize(d.get("text") or "")) for d in documents]
+
+        with self._lock:
+            self._remove_locked([d["key"] for d in documents if d["key"] in self.doc_of])
+            first = len(self.keys)
+            n = len(documents)
+            lengths = np.array([sum(c.values()) for c in counts], dtype=np.int32)
+
+            def code(table, value):
+                return -1 if value is None else table.setdefault(value, len(table))
+
+            added = {
+                "length": lengths,
+                "alive": np.ones(n, dtype=bool),
+                "well": np.array([code(self.wells, d.get("well")) for d in documents], dtype=np.int32),
+                "rig": np.array([code(self.rigs, d.get("rig")) for d in documents], dtype=np.int32),
+                "date": np.array([_epoch(d.get("report_date")) for d in documents], dtype=np.int64),
+                "kind": np.array([DOCUMENT_KINDS[d.get("kind", "report")] for d in documents], dtype=np.int8)
+            }
+            columns = {name: np.concatenate([self._columns[name], added[name]]) for name in added}
+            for i, d in enumerate(documents):
+                self.doc_of[d["key"]] = first + i
+                self.keys.append(d["key"])
+
+            self.live_docs += n
+            self.total_length += int(lengths.sum())
+            avgdl = self.total_length / max(self.live_docs, 1)
+
+            term_ids, doc_ids, tfs = [], [], []
+            for i, c in enumerate(counts):
+                term_ids.extend(self.terms.setdefault(t, len(self.terms)) for t in c)
+                doc_ids.extend([first + i] * len(c))
+                tfs.extend(c.values())
+            doc_ids = np.array(doc_ids, dtype=np.int32)
+            tfs = np.array(tfs, dtype=np.float32)
+            norm = self.k1 * (1.0 - self.b + self.b * columns["length"][doc_ids] / max(avgdl, 1.0))
+            segment = _Segment.from_postings(
+                np.array(term_ids, dtype=np.int64), doc_ids, tfs * (self.k1 + 1.0) / (tfs + norm)
+            )
+
+            # Readers hold references to the previous columns and segment
+            # list, so both are replaced rather than mutated in place; the
+            # columns go first so a reader never sees postings for doc ids
+            # its columns do not cover
+            self._columns = columns
+            self.segments = self.segments + [segment]
+            self._merge_locked()
+
+    def remove(self, keys: List[str]) -> None:
+        """Tombstone documents by key"""
+        with self._lock:
+            self._remove_locked(keys)
+
+    def _remove_locked(self, keys: List[str]) -> None:
+        docs = [self.doc_of.pop(k) for k in keys if k in self.doc_of]
+        if not docs:
+            return
+        docs = np.array(docs)
+        self.live_docs -= len(docs)
+        self.total_length -= int(self._columns["length"][docs].sum())
+        self._columns["alive"][docs] = False
+        self.has_deletes = True
+
+    def _merge_locked(self, everything: bool = False) -> None:
+        """Merge adjacent segments of one size tier (or all), dropping dead postings"""
+        while len(self.segments) > 1:
+            window = (0, len(self.segments)) if everything else self._merge_window()
+            if window is None:
+                return
+            start, stop = window
+            merged = _merge_segments(self.segments[start:stop], self._columns["alive"])
+            self.segments = self.segments[:start] + [merged] + self.segments[stop:]
+            if everything:
+                self.has_deletes = False
+                return
+
+    def _merge_window(self) -> Optional[Tuple[int, int]]:
+        # Only adjacent segments merge, keeping the list (and so every
+        # term's postings) in doc id order
+        f = self.merge_factor
+        tiers = [int(math.log(max(len(s), 1), f)) for s in self.segments]
+        for start in range(len(tiers) - f + 1):
+            if len(set(tiers[start:start + f])) == 1:
+                return start, start + f
+        if len(self.segments) > MAX_SEGMENTS:
+            sizes = [len(s) for s in self.segments]
+            start = min(range(len(sizes) - f + 1), key=lambda i: sum(sizes[i:i + f]))
+            return start, start + f
+        return None
+
+    def optimize(self) -> None:
+        """Merge everything into one segment (e.g. after a bulk load)"""
+        with self._lock:
+            self._merge_locked(everything=True)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        boost_terms: Optional[Dict[str, float]] = None,
+        wells: Optional[List[str]] = None,
+        rigs: Optional[List[str]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        kinds: Optional[List[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Top documents for a query by BM25 score
+
+        Args:
+            query: Free-text query
+            limit: Number of results
+            boost_terms: Extra weight per query term (e.g. recognized asset ids)
+            wells, rigs, since, until: Same filters as the vector search
+            kinds: Only these document kinds
+
+        Returns:
+            (key, score) pairs, best first
+        """
+        weights: Dict[str, float] = {}
+        for term in tokenize(query, query=True):
+            weights[term] = weights.get(term, 0.0) + 1.0
+        for term, boost in (boost_terms or {}).items():
+            weights[term] = weights.get(term, 1.0) * boost
+
+        segments = self.segments  # before the columns, see add()
+        columns = self._columns
+        n_docs = max(self.live_docs, 1)
+        alive = columns["alive"]
+
+        terms = []
+        for term, weight in weights.items():
+            term_id = self.terms.get(term)
+            if term_id is None:
+                continue
+            postings = [p for p in (s.postings(term_id) for s in segments) if p is not None]
+            df = sum(len(docs) for docs, _, _ in postings)
+            if self.has_deletes:
+                df = sum(int(np.count_nonzero(alive[docs])) for docs, _, _ in postings)
+            if df:
+                idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+                factor = np.float32(weight * idf)
+                terms.append((postings, factor, float(factor) * max(p[2] for p in postings)))
+        if not terms:
+            return []
+
+        def valid(candidates):
+            mask = self._filter_mask(columns, candidates, wells, rigs, since, until, kinds)
+            if self.has_deletes:
+                mask = alive[candidates] if mask is None else mask & alive[candidates]
+            return mask
+
+        # MaxScore: terms go in order of their largest possible contribution.
+        # Once the k-th best score so far beats everything the remaining
+        # terms could add, no unseen document can make the top k, and the
+        # remaining terms only top up existing candidates.
+        terms.sort(key=lambda t: -t[2])
+        remaining = np.cumsum([t[2] for t in terms][::-1])[::-1].tolist() + [0.0]
+
+        # A document has at most one posting per term, so scores add up
+        # without collisions. Selective queries score only their postings;
+        # broad ones accumulate into a dense array, which beats sorting
+        # millions of doc ids.
+        total = sum(len(docs) for postings, _, _ in terms for docs, _, _ in postings)
+        sparse = total * SPARSE_FRACTION < len(alive)
+        dense = None if sparse else np.zeros(len(alive), dtype=np.float32)
+        ids, contributions = [], []
+
+        def collect():
+            if sparse:
+                candidates, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+                return candidates, np.bincount(inverse, weights=np.concatenate(contributions)).astype(np.float32)
+            candidates = np.flatnonzero(dense)
+            return candidates, dense[candidates]
+
+        # Lower bound on the final k-th best score. In dense mode it comes
+        # from the documents the last term touched, which avoids scanning
+        # the whole score array; scores only grow, so it stays a bound.
+        threshold = 0.0
+        split, bound = len(terms), 0.0
+        for j, (postings, factor, upper) in enumerate(terms):
+            if threshold > remaining[j]:
+                split = j
+                break
+            for docs, impacts, _ in postings:
+                if sparse:
+                    ids.append(docs)
+                    contributions.append(impacts * factor)
+                else:
+                    dense[docs] += impacts * factor
+            bound += upper
+            if bound > remaining[j + 1] > 0.0:
+                if sparse:
+                    touched, touched_scores = collect()
+                else:
+                    touched = np.concatenate([docs for docs, _, _ in postings])
+                    touched_scores = dense[touched]
+                mask = valid(touched)
+                best = _kth_best(touched_scores if mask is None else touched_scores[mask], limit)
+                threshold = max(threshold, best)
+
+        candidates, scores = collect()
+        mask = valid(candidates)
+        if mask is not None:
+            candidates, scores = candidates[mask], scores[mask]
+        for postings, factor, _ in terms[split:]:
+            keep = scores + remaining[split] >= threshold
+            candidates, scores = candidates[keep], scores[keep]
+            split += 1
+            for docs, impacts, _ in postings:
+                if not sparse and len(candidates) * LOOKUP_COST > len(docs):
+                    dense[docs] += impacts * factor
+                    continue
+                position = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+                hit = docs[position] == candidates
+                if sparse:
+                    scores[hit] += impacts[position[hit]] * factor
+                else:
+                    dense[candidates[hit]] += impacts[position[hit]] * factor
+            if not sparse:
+                scores = dense[candidates]
+            threshold = _kth_best(scores, limit)
+
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(self.keys[int(candidates[j])], float(scores[j])) for j in order]
+
+    def _filter_mask(self, columns, ids, wells, rigs, since, until, kinds) -> Optional[np.ndarray]:
+        mask = None
+
+        def both(a, b):
+            return b if a is None else a & b
+
+        if wells:
+            mask = both(mask, np.isin(columns["well"][ids], [self.wells[w] for w in wells if w in self.wells]))
+        if rigs:
+            mask = both(mask, np.isin(columns["rig"][ids], [self.rigs[r] for r in rigs if r in self.rigs]))
+        if since or until:
+            dates = columns["date"][ids]
+            in_range = dates != MISSING_DATE
+            if since:
+                in_range &= dates >= _epoch(since)
+            if until:
+                in_range &= dates <= _epoch(until)
+            mask = both(mask, in_range)
+        if kinds:
+            mask = both(mask, np.isin(columns["kind"][ids], [DOCUMENT_KINDS[k] for k in kinds]))
+        return mask
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": self.live_docs,
+            "terms": len(self.terms),
+            "segments": len(self.segments),
+            "has_deletes": self.has_deletes,
+            "postings": sum(len(s) for s in self.segments)
+        }
@@ -0,0 +1,92 @@
+"""
+HSE Report Collection
+Qdrant collection layout and payload filters for report chunks
+
+Every point is one chunk of a report, with payload:
+    report_id, title, text, well, rig, report_date (RFC 3339), source, chunk, etag,
+    indexed_at (epoch seconds of the upsert, for incremental lexical indexing)
+"""
+import os
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from qdrant_client import models
+except ImportError:
+    models = None
+
+HSE_COLLECTION = os.getenv("QDRANT_HSE_COLLECTION", "hse_reports")
+
+# Payload fields searches (and re-ingestion by source, lexical indexing by
+# indexed_at) filter on; each gets a payload index
+FILTER_FIELDS = {
+    "well": "keyword",
+    "rig": "keyword",
+    "report_date": "datetime",
+    "source": "keyword",
+    "indexed_at": "float"
+}
+
+
+def ensure_hse_collection(client, dimension: int, collection: str = HSE_COLLECTION) -> bool:
+    """
+    Create the report collection and any missing payload indexes
+
+    Args:
+        client: Qdrant client
+        dimension: Embedding dimension
+        collection: Collection name
+
+    Returns:
+        True if the collection was created
+    """
+    created = False
+    if client.collection_exists(collection):
+        info = client.get_collection(collection)
+        size = info.config.params.vectors.size
+        if size != dimension:
+            raise ValueError(
+                f"Collection {collection} holds {size}-d vectors but the embedder produces {dimension}-d"
+            )
+        indexed = set(info.payload_schema or {})
+    else:
+        client.create_collection(
+            collection_name=collection,
+            vectors_config=models.VectorParams(size=dimension, distance=models.Distance.COSINE)
+        )
+        logger.info(f"Created Qdrant collection {collection} ({dimension}-d)")
+        indexed = set()
+        created = True
+
+    for field, schema in FILTER_FIELDS.items():
+        if field not in indexed:
+            client.create_payload_index(collection_name=collection, field_name=field, field_schema=schema)
+    return created
+
+
+def build_report_filter(
+    wells: Optional[List[str]] = None,
+    rigs: Optional[List[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """
+    Payload filter for report searches (None when unfiltered)
+
+    Args:
+        wells: Match any of these wells
+        rigs: Match any of these rigs
+        since: Earliest report date
+        until: Latest report date
+    """
+    must = []
+    if wells:
+        must.append(models.FieldCondition(key="well", match=models.MatchAny(any=list(wells))))
+    if rigs:
+        must.append(models.FieldCondition(key="rig", match=models.MatchAny(any=list(rigs))))
+    if since or until:
+        must.append(models.FieldCondition(key="report_date", range=models.DatetimeRange(gte=since, lte=until)))
+    return models.Filter(must=must) if must else None
@@ -0,0 +1,178 @@
+"""
+Text Embeddings
+Local, CPU-only sentence embeddings for HSE report search
+"""
+import os
+import re
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from fastembed import TextEmbedding
+except ImportError:
+    TextEmbedding = None
+
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+
+# Dimension of the hashing fallback. Deliberately different from the ONNX
+# models so vectors from the two embedders can never be mixed in one
+# collection without Qdrant rejecting the search.
+HASHING_DIMENSION = 256
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+class TextEmbedder:
+    """
+    Embeds text on the CPU with a small ONNX model (fastembed)
+
+    When fastembed is not installed, falls back to a hashing embedder
+    (word and word-bigram feature hashing), which needs no model download
+    and is deterministic across processes. Query embeddings are kept in an
+    LRU cache, since dashboards tend to repeat the same questions.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, cache_size: int = 1024, threads: Optional[int] = None):
+        """
+        Args:
+            model_name: fastembed model name
+            cache_size: Number of query embeddings to keep
+            threads: ONNX runtime threads (defaults to all cores)
+        """
+        self.model_name = model_name or os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+        self.cache_size = cache_size
+        self._model = None
+        self._dimension: Optional[int] = None
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if TextEmbedding is not None:
+            try:
+                self._model = TextEmbedding(model_name=self.model_name, threads=threads)
+                logger.info(f"Embedding model {self.model_name} loaded")
+            except Exception as e:
+                logger.warning(f"Embedding model not available: {str(e)}. Using hashing embedder.")
+        else:
+            logger.warning("fastembed not installed. Using hashing embedder.")
+        if self._model is None:
+            self.model_name = f"hashing-{HASHING_DIMENSION}"
+            self._dimension = HASHING_DIMENSION
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = int(self.embed_documents(["dimension probe"]).shape[1])
+        return self._dimension
+
+    def embed_documents(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """
+        Embed document chunks
+
+        Args:
+            texts: Texts to embed
+            batch_size: Texts per model call
+
+        Returns:
+            float32 array of shape (len(texts), dimension), L2-normalized
+        """
+        if not texts:
+            return np.empty((0, self._dimension or 0), dtype=np.float32)
+        if self._model is None:
+            return _hash_embed(texts)
+        vectors = np.asarray(list(self._model.embed(texts, batch_size=batch_size)), dtype=np.float32)
+        return _normalize(vectors)
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed search queries, serving repeats from the cache
+
+        Cache misses are embedded together in one model call.
+
+        Args:
+            queries: Query strings
+
+        Returns:
+            float32 array of shape (len(queries), dimension), L2-normalized
+        """
+        keys = [" ".join(q.lower().split()) for q in queries]
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    found[key] = vector
+        missing = list(dict.fromkeys(k for k in keys if k not in found))
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            if self._model is None:
+                vectors = _hash_embed(missing)
+            else:
+                vectors = _normalize(np.asarray(list(self._model.query_embed(missing)), dtype=np.float32))
+            with self._lock:
+                for key, vector in zip(missing, vectors):
+                    found[key] = vector
+                    self._cache[key] = vector
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return np.stack([found[k] for k in keys]).astype(np.float32, copy=False)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a single search query"""
+        return self.embed_queries([query])[0]
+
+    def cache_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "size": len(self._cache),
+            "capacity": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None
+        }
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _hash_embed(texts: List[str]) -> np.ndarray:
+    """Signed feature hashing of words and word bigrams"""
+    vectors = np.zeros((len(texts), HASHING_DIMENSION), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = _TOKEN.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        if not features:
+            continue
+        hashes = np.fromiter((zlib.crc32(f.encode()) for f in features), dtype=np.uint32, count=len(features))
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(vectors[row], hashes % HASHING_DIMENSION, signs)
+    return _normalize(vectors)
+
+
+_embedder: Optional[TextEmbedder] = None
+_embedder_lock = threading.Lock()
+
+
+def get_text_embedder() -> TextEmbedder:
+    """Get the process-wide embedder (the model is loaded once)"""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = TextEmbedder(cache_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "1024")))
+    return _embedder
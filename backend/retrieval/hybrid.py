@@ -0,0 +1,248 @@
+"""
+Hybrid Retrieval
+BM25 index over incidents and report chunks, fused with vector search by
+reciprocal rank
+
+Operators search for exact identifiers ("G-40", "PUMP-45",
+"INC-2024-045") that embeddings blur together; the lexical index catches
+those, the vector index catches paraphrases, and reciprocal rank fusion
+combines both rankings without calibrating their scores against each other.
+"""
+import os
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+from database.connections import get_shared_neo4j_driver, get_shared_qdrant_client
+from database.statements import statements
+from retrieval.bm25 import BM25Index, tokenize
+from retrieval.collection import HSE_COLLECTION
+
+try:
+    from qdrant_client import models
+except ImportError:
+    models = None
+
+logger = logging.getLogger(__name__)
+
+# Standard RRF damping constant: ranks beyond the first few contribute
+# almost equally
+RRF_K = 60
+
+# Query-term weight for recognized asset and incident ids
+ID_BOOST = 3.0
+
+SCROLL_BATCH = 2048
+
+# Incremental chunk scans start this far before the watermark: batches are
+# stamped when upserted and may become visible after a later-stamped batch
+CHUNK_OVERLAP_SECONDS = 120.0
+
+# Chunk payload fields the lexical index needs
+_CHUNK_FIELDS = ["title", "text", "well", "rig", "report_date", "indexed_at"]
+
+INCIDENT_PREFIX = "incident:"
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[str]],
+    weights: Optional[List[float]] = None,
+    k: int = RRF_K
+) -> List[Tuple[str, float]]:
+    """
+    Fuse rankings by summing weight / (k + rank) per key
+
+    Args:
+        rankings: Keys in rank order, one list per retriever
+        weights: Weight per ranking (default 1.0 each)
+        k: Damping constant
+
+    Returns:
+        (key, fused score) pairs, best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights or [1.0] * len(rankings)):
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def id_boosts(ids: List[str], boost: float = ID_BOOST) -> Dict[str, float]:
+    """BM25 query-term boosts for asset and incident ids recognized by the parser"""
+    boosts = {}
+    for asset_id in ids:
+        for term in tokenize(asset_id, query=True):
+            if any(c.isdigit() for c in term):
+                boosts[term] = boost
+    return boosts
+
+
+class LexicalIndexManager:
+    """
+    Builds the BM25 index from Neo4j incidents and Qdrant report chunks and
+    keeps it fresh
+
+    Refreshes are incremental: incidents whose `updated_at` and chunks
+    whose `indexed_at` are newer than the last watermark are re-added,
+    replacing their previous version. Deletions leave no timestamp, so a
+    full rebuild also runs every `full_reload_seconds`; it builds a new
+    index and swaps it in, so searches never wait for it.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: Optional[float] = None,
+        full_reload_seconds: Optional[float] = None,
+        collection: str = HSE_COLLECTION
+    ):
+        self.refresh_seconds = refresh_seconds or float(os.getenv("LEXICAL_INDEX_REFRESH_SECONDS", "60"))
+        self.full_reload_seconds = full_reload_seconds or float(os.getenv("LEXICAL_INDEX_FULL_RELOAD_SECONDS", "3600"))
+        self.collection = collection
+        self.index: Optional[BM25Index] = None
+        # Incident key -> result payload; incidents are few and small
+        self.incidents: Dict[str, Dict[str, Any]] = {}
+        self.incident_watermark = None
+        self.chunk_watermark: Optional[float] = None
+        self.full_loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def current(self) -> Optional[BM25Index]:
+        """The index, or None before the first successful load"""
+        return self.index
+
+    def incident(self, key: str) -> Optional[Dict[str, Any]]:
+        """Result payload of an incident key"""
+        return self.incidents.get(key)
+
+    def load(self) -> None:
+        """Build a new index from all incidents and chunks"""
+        with self._lock:
+            index = BM25Index()
+            incidents: Dict[str, Dict[str, Any]] = {}
+            incident_watermark = self._add_incidents(index, incidents, since=None)
+            chunk_watermark = self._add_chunks(index, since=None)
+            index.optimize()
+            self.index, self.incidents = index, incidents
+            self.incident_watermark, self.chunk_watermark = incident_watermark, chunk_watermark
+            self.full_loaded_at = time.monotonic()
+            logger.info(f"Lexical index loaded: {index.stats()}")
+
+    def refresh(self) -> None:
+        """Index incidents and chunks changed since the last watermarks"""
+        if self.index is None or time.monotonic() - self.full_loaded_at > self.full_reload_seconds:
+            self.load()
+            return
+
+        with self._lock:
+            before = len(self.index)
+            self.incident_watermark = self._add_incidents(self.index, self.incidents, self.incident_watermark)
+            self.chunk_watermark = self._add_chunks(self.index, self.chunk_watermark)
+            if len(self.index) != before:
+                logger.info(f"Lexical index refreshed: {self.index.stats()}")
+
+    def start(self) -> None:
+        """Load now and keep refreshing in a background thread"""
+        try:
+            self.load()
+        except Exception as e:
+            logger.warning(f"Lexical index not loaded, using vector search only: {str(e)}")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="lexical-index", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Lexical index refresh failed: {str(e)}")
+
+    def _add_incidents(self, index: BM25Index, incidents: Dict[str, Dict[str, Any]], since):
+        """Index incidents updated after `since`; returns the new watermark"""
+        try:
+            driver = get_shared_neo4j_driver()
+            with driver.session() as session:
+                watermark = statements.run_cypher(session, "snapshot_clock")[0]["now"]
+                rows = statements.run_cypher(session, "lexical_incidents", since=since)
+        except Exception as e:
+            logger.warning(f"Incidents not indexed: {str(e)}")
+            return since
+
+        documents = []
+        for row in rows:
+            key = INCIDENT_PREFIX + row["incident_id"]
+            related = [r for r in row["related"] if r]
+            incidents[key] = {
+                "report_id": row["incident_id"],
+                "title": f"Incident {row['incident_id']} ({row['severity']})",
+                "well": row["well"],
+                "rig": row["rig"],
+                "report_date": row["timestamp"],
+                "snippet": row["description"] or "",
+                "related": related
+            }
+            documents.append({
+                "key": key,
+                "kind": "incident",
+                "text": " ".join([row["incident_id"], row["description"] or "", *related]),
+                "well": row["well"],
+                "rig": row["rig"],
+                "report_date": row["timestamp"]
+            })
+        index.add(documents)
+        return watermark
+
+    def _add_chunks(self, index: BM25Index, since: Optional[float]) -> Optional[float]:
+        """Index report chunks ingested after `since`; returns the new watermark"""
+        try:
+            client = get_shared_qdrant_client()
+            if not client.collection_exists(self.collection):
+                return since
+            condition = None
+            if since is not None:
+                condition = models.Filter(must=[
+                    models.FieldCondition(key="indexed_at", range=models.Range(gt=since - CHUNK_OVERLAP_SECONDS))
+                ])
+            watermark = since
+            offset = None
+            while True:
+                points, offset = client.scroll(
+                    collection_name=self.collection,
+                    scroll_filter=condition,
+                    limit=SCROLL_BATCH,
+                    offset=offset,
+                    with_payload=_CHUNK_FIELDS,
+                    with_vectors=False
+                )
+                documents = []
+                for point in points:
+                    payload = point.payload or {}
+                    documents.append({
+                        "key": str(point.id),
+                        "kind": "report",
+                        "text": f"{payload.get('title') or ''} {payload.get('text') or ''}",
+                        "well": payload.get("well"),
+                        "rig": payload.get("rig"),
+                        "report_date": payload.get("report_date")
+                    })
+                    indexed_at = payload.get("indexed_at")
+                    if indexed_at is not None and (watermark is None or indexed_at > watermark):
+                        watermark = indexed_at
+                index.add(documents)
+                if offset is None:
+                    return watermark
+        except Exception as e:
+            logger.warning(f"Report chunks not indexed: {str(e)}")
+            return since
+
+
+lexical_index = LexicalIndexManager()
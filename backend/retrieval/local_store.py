@@ -0,0 +1,440 @@
+"""
+Local Vector Store
+Embedded, memory-mapped report index for when Qdrant is down or absent
+
+A store is a directory of flat files, all opened with np.memmap so several
+worker processes share one page-cache copy:
+    meta.json           dimension, count, quantization, well/rig dictionaries
+    vectors.f32         float32 (N, D) unit vectors, or
+    vectors.i8 + scales.f32   int8 (N, D) codes and one scale per vector
+    well.i32, rig.i32   dictionary codes per vector (-1 when missing)
+    report_date.i64     epoch seconds per vector (MISSING_DATE when missing)
+    payloads.jsonl + payload_offsets.i64   payload of vector i at byte range i
+    ivf_centroids.f32, ivf_order.i32, ivf_offsets.i64   optional IVF index
+
+Run from the backend directory:
+    python -m retrieval.local_store /data/hse_store --quantize --ivf
+"""
+import os
+import json
+import shutil
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, NamedTuple
+
+import numpy as np
+
+from retrieval.collection import HSE_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+MISSING_DATE = np.iinfo(np.int64).min
+
+# Below this many vectors an exact scan is as fast as probing an IVF index
+IVF_MIN_VECTORS = 50000
+
+# Rows scored per matrix multiply during exact search
+SCAN_ROWS = 65536
+
+
+class LocalHit(NamedTuple):
+    """Search hit with the attributes VectorAgent reads from Qdrant points"""
+    id: int
+    score: float
+    payload: Dict[str, Any]
+
+
+def _epoch(value) -> int:
+    """RFC 3339 string or datetime -> epoch seconds (naive times are UTC, as in Qdrant)"""
+    if value is None:
+        return MISSING_DATE
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+class LocalVectorStoreWriter:
+    """
+    Appends vectors and payloads to a new store, then finalizes it
+
+    Vectors are streamed to disk as they arrive, so building from a large
+    Qdrant export does not hold the collection in memory. The store is
+    written to a temporary directory and swapped in by `finish`.
+    """
+
+    def __init__(self, path: str, dimension: int, quantize: bool = False):
+        """
+        Args:
+            path: Store directory (replaced when finished)
+            dimension: Embedding dimension
+            quantize: Keep int8 codes instead of float32 vectors
+        """
+        self.path = path
+        self.dimension = dimension
+        self.quantize = quantize
+        self.temp = f"{path}.building-{os.getpid()}"
+        shutil.rmtree(self.temp, ignore_errors=True)
+        os.makedirs(self.temp)
+        self.count = 0
+        self._wells: Dict[str, int] = {}
+        self._rigs: Dict[str, int] = {}
+        self._files = {
+            name: open(os.path.join(self.temp, name), "wb")
+            for name in (["vectors.i8", "scales.f32"] if quantize else ["vectors.f32"])
+            + ["well.i32", "rig.i32", "report_date.i64", "payloads.jsonl", "payload_offsets.i64"]
+        }
+        self._offset = 0
+        self._files["payload_offsets.i64"].write(np.int64(0).tobytes())
+
+    def add(self, vectors: np.ndarray, payloads: List[Dict[str, Any]]) -> None:
+        """Append a batch of vectors (N, D) with one payload each"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        if self.quantize:
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+            codes = np.round(vectors / scales[:, None]).astype(np.int8)
+            self._files["vectors.i8"].write(codes.tobytes())
+            self._files["scales.f32"].write(scales.astype(np.float32).tobytes())
+        else:
+            self._files["vectors.f32"].write(vectors.tobytes())
+
+        def code(table: Dict[str, int], value) -> int:
+            return -1 if value is None else table.setdefault(value, len(table))
+
+        self._files["well.i32"].write(
+            np.array([code(self._wells, p.get("well")) for p in payloads], dtype=np.int32).tobytes()
+        )
+        self._files["rig.i32"].write(
+            np.array([code(self._rigs, p.get("rig")) for p in payloads], dtype=np.int32).tobytes()
+        )
+        self._files["report_date.i64"].write(
+            np.array([_epoch(p.get("report_date")) for p in payloads], dtype=np.int64).tobytes()
+        )
+        ends = []
+        for payload in payloads:
+            data = json.dumps(payload, default=str).encode() + b"\n"
+            self._files["payloads.jsonl"].write(data)
+            self._offset += len(data)
+            ends.append(self._offset)
+        self._files["payload_offsets.i64"].write(np.array(ends, dtype=np.int64).tobytes())
+        self.count += len(payloads)
+
+    def finish(self, ivf_lists: Optional[int] = None, seed: int = 0) -> "LocalVectorStore":
+        """
+        Write metadata, optionally train an IVF index, and swap the store in
+
+        Args:
+            ivf_lists: Number of IVF lists (0 = none; None = sqrt(N) when the
+                store is large enough to benefit)
+            seed: Random seed for k-means initialization
+
+        Returns:
+            The opened store
+        """
+        for f in self._files.values():
+            f.close()
+        meta = {
+            "version": STORE_VERSION,
+            "count": self.count,
+            "dimension": self.dimension,
+            "quantized": self.quantize,
+            "wells": list(self._wells),
+            "rigs": list(self._rigs),
+            "ivf_lists": 0
+        }
+        if ivf_lists is None:
+            ivf_lists = int(np.sqrt(self.count)) if self.count >= IVF_MIN_VECTORS else 0
+        if ivf_lists:
+            store = LocalVectorStore(self.temp, _meta={**meta})
+            centroids, order, offsets = _train_ivf(store, ivf_lists, seed)
+            centroids.tofile(os.path.join(self.temp, "ivf_centroids.f32"))
+            order.tofile(os.path.join(self.temp, "ivf_order.i32"))
+            offsets.tofile(os.path.join(self.temp, "ivf_offsets.i64"))
+            meta["ivf_lists"] = int(ivf_lists)
+        with open(os.path.join(self.temp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        previous = f"{self.path}.previous-{os.getpid()}"
+        if os.path.exists(self.path):
+            os.rename(self.path, previous)
+        os.rename(self.temp, self.path)
+        shutil.rmtree(previous, ignore_errors=True)
+        logger.info(f"Built local vector store at {self.path}: {self.count} vectors, IVF lists={ivf_lists}")
+        return LocalVectorStore(self.path)
+
+
+class LocalVectorStore:
+    """
+    Read-only, memory-mapped report index with Qdrant-equivalent filters
+
+    Small stores are searched exactly: rows are scored in blocks with one
+    matrix multiply per block for a whole batch of queries. Large stores
+    with an IVF index probe the `nprobe` nearest lists; when a selective
+    filter leaves too few candidates there, the search falls back to an
+    exact scan of the rows that pass the filter.
+    """
+
+    def __init__(self, path: str, nprobe: int = 16, _meta: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            path: Store directory
+            nprobe: IVF lists probed per query
+        """
+        self.path = path
+        self.nprobe = nprobe
+        if _meta is None:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                _meta = json.load(f)
+        self.meta = _meta
+        self.count = _meta["count"]
+        self.dimension = _meta["dimension"]
+        self.quantized = _meta["quantized"]
+        self.well_codes = {w: i for i, w in enumerate(_meta["wells"])}
+        self.rig_codes = {r: i for i, r in enumerate(_meta["rigs"])}
+
+        def load(name, dtype, shape=None):
+            if self.count == 0:
+                return np.zeros(shape or (0,), dtype=dtype)
+            return np.memmap(os.path.join(path, name), dtype=dtype, mode="r", shape=shape)
+
+        if self.quantized:
+            self.vectors = load("vectors.i8", np.int8, (self.count, self.dimension))
+            self.scales = load("scales.f32", np.float32)
+        else:
+            self.vectors = load("vectors.f32", np.float32, (self.count, self.dimension))
+            self.scales = None
+        self.wells = load("well.i32", np.int32)
+        self.rigs = load("rig.i32", np.int32)
+        self.report_dates = load("report_date.i64", np.int64)
+        self.payload_offsets = np.fromfile(os.path.join(path, "payload_offsets.i64"), dtype=np.int64)
+        self.payload_bytes = load("payloads.jsonl", np.uint8)
+
+        self.ivf_lists = _meta.get("ivf_lists", 0)
+        if self.ivf_lists:
+            self.centroids = np.fromfile(os.path.join(path, "ivf_centroids.f32"), dtype=np.float32)
+            self.centroids = self.centroids.reshape(self.ivf_lists, self.dimension)
+            self.ivf_order = load("ivf_order.i32", np.int32)
+            self.ivf_offsets = np.fromfile(os.path.join(path, "ivf_offsets.i64"), dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def payload(self, i: int) -> Dict[str, Any]:
+        start, end = self.payload_offsets[i], self.payload_offsets[i + 1]
+        return json.loads(bytes(self.payload_bytes[start:end]))
+
+    def search_batch(
+        self,
+        vectors: np.ndarray,
+        filters: List[Dict[str, Any]],
+        limits: List[int]
+    ) -> List[List[LocalHit]]:
+        """
+        Top-k search for a batch of query vectors
+
+        Args:
+            vectors: (B, D) query vectors
+            filters: Per query, dict with optional wells, rigs, since, until
+                (same meaning as the Qdrant report filter)
+            limits: Per query, number of hits
+
+        Returns:
+            Per query, hits ordered by descending cosine similarity
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        if self.count == 0:
+            return [[] for _ in limits]
+        masks = [self._filter_mask(f) for f in filters]
+
+        if self.ivf_lists:
+            results = [
+                self._search_ivf(vector, mask, limit)
+                for vector, mask, limit in zip(vectors, masks, limits)
+            ]
+        else:
+            results = self._search_exact(vectors, masks, limits)
+
+        return [
+            [LocalHit(int(i), float(s), self.payload(int(i))) for i, s in zip(ids, scores)]
+            for ids, scores in results
+        ]
+
+    def _filter_mask(self, f: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Boolean row mask for a filter, or None when unfiltered"""
+        mask = None
+
+        def both(a, b):
+            return b if a is None else a & b
+
+        if f.get("wells"):
+            codes = [self.well_codes[w] for w in f["wells"] if w in self.well_codes]
+            mask = both(mask, np.isin(self.wells, codes))
+        if f.get("rigs"):
+            codes = [self.rig_codes[r] for r in f["rigs"] if r in self.rig_codes]
+            mask = both(mask, np.isin(self.rigs, codes))
+        if f.get("since") or f.get("until"):
+            dates = np.asarray(self.report_dates)
+            in_range = dates != MISSING_DATE
+            if f.get("since"):
+                in_range &= dates >= _epoch(f["since"])
+            if f.get("until"):
+                in_range &= dates <= _epoch(f["until"])
+            mask = both(mask, in_range)
+        return mask
+
+    def _scores(self, rows, vectors: np.ndarray) -> np.ndarray:
+        """(len(rows), B) similarities for a block or index array of rows"""
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        scores = block @ vectors.T
+        if self.quantized:
+            scores *= np.asarray(self.scales[rows])[:, None]
+        return scores
+
+    def _rows(self, rows) -> np.ndarray:
+        """Stored vectors as float32 (dequantized when needed)"""
+        block = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.quantized:
+            block *= np.asarray(self.scales[rows])[:, None]
+        return block
+
+    def _search_exact(self, vectors, masks, limits):
+        best_ids = [np.empty(0, dtype=np.int64) for _ in limits]
+        best_scores = [np.empty(0, dtype=np.float32) for _ in limits]
+        for start in range(0, self.count, SCAN_ROWS):
+            rows = slice(start, min(start + SCAN_ROWS, self.count))
+            scores = self._scores(rows, vectors)
+            for q, (mask, limit) in enumerate(zip(masks, limits)):
+                column = scores[:, q]
+                ids = np.arange(rows.start, rows.stop)
+                if mask is not None:
+                    keep = mask[rows]
+                    column, ids = column[keep], ids[keep]
+                best_ids[q], best_scores[q] = _top_k(
+                    np.concatenate([best_ids[q], ids]), np.concatenate([best_scores[q], column]), limit
+                )
+        return list(zip(best_ids, best_scores))
+
+    def _search_ivf(self, vector, mask, limit):
+        probe = np.argsort(-(self.centroids @ vector))[:self.nprobe]
+        candidates = np.concatenate([
+            self.ivf_order[self.ivf_offsets[c]:self.ivf_offsets[c + 1]] for c in probe
+        ]).astype(np.int64)
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+            if len(candidates) < limit:
+                # Selective filter: scan every row that passes it instead
+                candidates = np.nonzero(mask)[0]
+        candidates.sort()  # sequential reads from the memory map
+        scores = self._scores(candidates, vector[None, :])[:, 0]
+        return _top_k(candidates, scores, limit)
+
+
+def _top_k(ids: np.ndarray, scores: np.ndarray, k: int):
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[keep], scores[keep]
+    order = np.argsort(-scores, kind="stable")
+    return ids[order], scores[order]
+
+
+def _train_ivf(store: LocalVectorStore, lists: int, seed: int, iterations: int = 10):
+    """Spherical k-means on a sample, then assign every vector to its nearest list"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(store.count, lists * 256)
+    sample = np.sort(rng.choice(store.count, sample_size, replace=False))
+    data = store._rows(sample)
+    data /= np.maximum(np.linalg.norm(data, axis=1, keepdims=True), 1e-12)
+    centroids = data[rng.choice(sample_size, lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        empty = np.bincount(assignment, minlength=lists) == 0
+        sums[empty] = data[rng.choice(sample_size, int(empty.sum()))]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+    assignment = np.empty(store.count, dtype=np.int64)
+    for start in range(0, store.count, SCAN_ROWS):
+        rows = slice(start, min(start + SCAN_ROWS, store.count))
+        assignment[rows] = np.argmax(store._scores(rows, centroids), axis=1)
+    order = np.argsort(assignment, kind="stable").astype(np.int32)
+    offsets = np.zeros(lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignment, minlength=lists), out=offsets[1:])
+    return centroids.astype(np.float32), order, offsets
+
+
+def export_from_qdrant(
+    client,
+    path: str,
+    collection: str = HSE_COLLECTION,
+    quantize: bool = False,
+    ivf_lists: Optional[int] = None,
+    batch_size: int = 1024
+) -> LocalVectorStore:
+    """
+    Copy a Qdrant report collection into a local store
+
+    Args:
+        client: Qdrant client
+        path: Store directory
+        collection: Collection to copy
+        quantize: Store int8 codes
+        ivf_lists: IVF lists (see LocalVectorStoreWriter.finish)
+        batch_size: Points per scroll request
+
+    Returns:
+        The opened store
+    """
+    dimension = client.get_collection(collection).config.params.vectors.size
+    writer = LocalVectorStoreWriter(path, dimension, quantize)
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection, limit=batch_size, offset=offset,
+            with_payload=True, with_vectors=True
+        )
+        if points:
+            writer.add(np.array([p.vector for p in points], dtype=np.float32), [p.payload for p in points])
+        if offset is None:
+            break
+    return writer.finish(ivf_lists)
+
+
+_local_store: Optional[LocalVectorStore] = None
+
+
+def get_local_vector_store() -> Optional[LocalVectorStore]:
+    """The store at LOCAL_VECTOR_STORE_PATH, opened once (None if not configured)"""
+    global _local_store
+    path = os.getenv("LOCAL_VECTOR_STORE_PATH")
+    if _local_store is None and path and os.path.exists(os.path.join(path, "meta.json")):
+        _local_store = LocalVectorStore(path, nprobe=int(os.getenv("LOCAL_VECTOR_STORE_NPROBE", "16")))
+        logger.info(f"Opened local vector store at {path} ({len(_local_store)} vectors)")
+    return _local_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the Qdrant report collection into a local store")
+    parser.add_argument("path", help="store directory")
+    parser.add_argument("--collection", default=HSE_COLLECTION)
+    parser.add_argument("--quantize", action="store_true", help="store int8 codes")
+    parser.add_argument("--ivf", type=int, nargs="?", const=-1, default=0,
+                        help="build an IVF index, with this many lists or sqrt(N) if omitted")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    from database.connections import get_qdrant_client
+
+    lists = None if args.ivf == -1 else args.ivf
+    store = export_from_qdrant(get_qdrant_client(), args.path, args.collection, args.quantize, lists)
+    print(json.dumps({"path": args.path, "vectors": len(store), "ivf_lists": store.ivf_lists}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
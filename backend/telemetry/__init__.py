@@ -0,0 +1,20 @@
+"""
+Live telemetry: streamed readings in ring buffers, persisted in batches,
+checked for sensor anomalies
+"""
+from .buffers import RingBuffer, TelemetryStore, TelemetryError, live_telemetry
+from .writer import TelemetryWriter, telemetry_writer
+from .anomaly import SensorAnomalyDetector, AnomalyWriteBack, anomaly_detector, anomaly_writeback
+
+__all__ = [
+    "RingBuffer",
+    "TelemetryStore",
+    "TelemetryError",
+    "live_telemetry",
+    "TelemetryWriter",
+    "telemetry_writer",
+    "SensorAnomalyDetector",
+    "AnomalyWriteBack",
+    "anomaly_detector",
+    "anomaly_writeback"
+]
@@ -0,0 +1,451 @@
+"""
+Telemetry Anomaly Detection
+Online per-sensor anomaly flags from streamed readings, written back to the graph
+
+Each sensor keeps a fixed set of statistics in preallocated arrays: an
+exponentially weighted mean and variance of its value and of its rate of
+change, the last reading and the flag state. A reading is anomalous when
+its z-score against the value statistics or the rate statistics exceeds
+the threshold. A sensor is flagged after ANOMALY_CONFIRM_READINGS
+anomalous readings in a row and cleared after ANOMALY_CLEAR_READINGS
+normal ones, so a single spike does not flap the flag.
+
+A batch is processed as a (sensors x readings) matrix. The EWMA
+recurrences m_k = b*m_{k-1} + a*x_k have the closed form
+m_k = b^k * (m_0 + a * sum_j b^-j * x_j), so every column of a chunk of
+readings is computed with one cumulative sum instead of a Python loop per
+reading. Chunks are at most CHUNK_READINGS wide to keep b^-j well inside
+float64 range.
+
+Flag transitions are written to the Sensor nodes (last_reading_anomaly,
+anomaly_detected_at, last_reading) and every new flag raises an
+(:IncidentCandidate) linked to the sensor and its well. Writes are
+batched by a background thread every ANOMALY_FLUSH_SECONDS, and applied to
+the in-process asset snapshot once written, so find_faulty_equipment sees
+them without waiting for the next snapshot refresh.
+"""
+import os
+import sys
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from database.connections import get_shared_neo4j_driver
+from database.statements import statements
+
+logger = logging.getLogger(__name__)
+
+CHUNK_READINGS = 128
+
+# Rule codes of an anomalous reading
+RULES = {1: "level", 2: "rate", 3: "level+rate"}
+
+
+class SensorAnomalyDetector:
+    """
+    EWMA z-score and rate-of-change detector over all streaming sensors
+
+    Settings: ANOMALY_DETECTION_ENABLED (default true), ANOMALY_EWMA_ALPHA,
+    ANOMALY_Z_THRESHOLD, ANOMALY_RATE_Z_THRESHOLD, ANOMALY_WARMUP_READINGS
+    (readings before a sensor can be flagged), ANOMALY_CONFIRM_READINGS and
+    ANOMALY_CLEAR_READINGS. Readings older than a sensor's last observed
+    reading are ignored.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("ANOMALY_DETECTION_ENABLED", "true").lower() == "true"
+        self.alpha = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.05"))
+        self.z_threshold = float(os.getenv("ANOMALY_Z_THRESHOLD", "4.0"))
+        self.rate_threshold = float(os.getenv("ANOMALY_RATE_Z_THRESHOLD", "6.0"))
+        self.warmup = int(os.getenv("ANOMALY_WARMUP_READINGS", "30"))
+        self.confirm = int(os.getenv("ANOMALY_CONFIRM_READINGS", "3"))
+        self.clear = int(os.getenv("ANOMALY_CLEAR_READINGS", "20"))
+        # Standard deviations never go below this share of the level, so a
+        # perfectly flat signal does not flag on rounding noise
+        self.noise_floor = 1e-3
+        # Shortest interval a rate is computed over (seconds)
+        self.min_interval = 1e-3
+
+        self.sensors: List[str] = []
+        self.wells: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._allocate(1024)
+        self.transitions = 0
+        self._lock = threading.Lock()
+
+    def _allocate(self, capacity: int) -> None:
+        fields = {
+            "mean": np.float64, "var": np.float64, "rate_mean": np.float64, "rate_var": np.float64,
+            "last_value": np.float64, "last_ts": np.float64, "flagged_at": np.float64,
+            "count": np.int64, "run_length": np.int64, "run_anomalous": np.bool_, "flagged": np.bool_
+        }
+        for name, dtype in fields.items():
+            current = getattr(self, name, None)
+            array = np.zeros(capacity, dtype=dtype)
+            if name in ("last_value", "last_ts", "flagged_at"):
+                array[:] = np.nan if name != "last_ts" else -np.inf
+            if current is not None:
+                array[:len(current)] = current
+            setattr(self, name, array)
+
+    def _slot(self, sensor: str, well: Optional[str]) -> int:
+        slot = self._slots.get(sensor)
+        if slot is None:
+            slot = self._slots[sensor] = len(self.sensors)
+            self.sensors.append(sensor)
+            self.wells.append(well)
+            if slot >= len(self.mean):
+                self._allocate(len(self.mean) * 2)
+        elif well:
+            self.wells[slot] = well
+        return slot
+
+    def observe(self, blocks: List[Tuple[str, Optional[str], np.ndarray, np.ndarray]]) -> List[Dict[str, Any]]:
+        """
+        Update the sensors of a batch and report flag transitions
+
+        Args:
+            blocks: (sensor_id, well, ts, values) per sensor block; ts in
+                epoch seconds, NaN values are skipped
+
+        Returns:
+            Transitions in reading order per sensor (also queued for the graph)
+        """
+        if not self.enabled or not blocks:
+            return []
+        with self._lock:
+            transitions = self._observe(blocks)
+        if transitions:
+            self.transitions += len(transitions)
+            anomaly_writeback.submit(transitions)
+        return transitions
+
+    def _observe(self, blocks) -> List[Dict[str, Any]]:
+        grouped: Dict[int, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        for sensor, well, ts, values in blocks:
+            grouped.setdefault(self._slot(sensor, well), []).append((ts, values))
+
+        series = []
+        for slot, parts in grouped.items():
+            ts = np.concatenate([p[0] for p in parts]) if len(parts) > 1 else parts[0][0]
+            x = np.concatenate([p[1] for p in parts]) if len(parts) > 1 else parts[0][1]
+            if len(ts) > 1 and np.any(ts[1:] < ts[:-1]):
+                order = np.argsort(ts, kind="stable")
+                ts, x = ts[order], x[order]
+            keep = ~np.isnan(x) & (ts > self.last_ts[slot])
+            if keep.any():
+                series.append((slot, ts[keep], x[keep]))
+        if not series:
+            return []
+
+        slots = np.array([s[0] for s in series])
+        n = np.array([len(s[1]) for s in series])
+        T = np.zeros((len(series), n.max()))
+        X = np.zeros_like(T)
+        for row, (_, ts, x) in enumerate(series):
+            T[row, :len(ts)] = ts
+            X[row, :len(x)] = x
+        anomalous, scores, rules = self._score(slots, n, T, X)
+        return self._apply_hysteresis(slots, n, T, X, anomalous, scores, rules)
+
+    def _score(self, slots: np.ndarray, n: np.ndarray, T: np.ndarray,
+               X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Per-reading anomaly flags, scores and rule codes; updates the sensor statistics"""
+        m, v = self.mean[slots], self.var[slots]
+        rm, rv = self.rate_mean[slots], self.rate_var[slots]
+        last_x, last_t = self.last_value[slots], self.last_ts[slots]
+        count = self.count[slots]
+        anomalous = np.zeros(X.shape, dtype=bool)
+        scores = np.zeros(X.shape)
+        rules = np.zeros(X.shape, dtype=np.int8)
+
+        for start in range(0, X.shape[1], CHUNK_READINGS):
+            x, t = X[:, start:start + CHUNK_READINGS], T[:, start:start + CHUNK_READINGS]
+            width = x.shape[1]
+            columns = np.arange(width)
+            active = columns[None, :] < (n - start)[:, None]
+            warm = active & ((count[:, None] + columns[None, :]) >= self.warmup)
+            # A sensor's first reading seeds its mean
+            m = np.where((count == 0) & active[:, 0], x[:, 0], m)
+            means, variances, before, spread = self._ewma(m, v, x, active, warm, self.z_threshold)
+            z = np.where(active, x - before, 0.0) / spread
+
+            x_prev = np.concatenate((last_x[:, None], x[:, :-1]), axis=1)
+            t_prev = np.concatenate((last_t[:, None], t[:, :-1]), axis=1)
+            has_rate = active & (t > t_prev) & ~np.isnan(x_prev)
+            # No rate for a sensor's first reading or a repeated timestamp: the rate statistics skip it
+            rate = np.where(has_rate, (x - x_prev) / np.maximum(t - t_prev, self.min_interval), 0.0)
+            floor = self.noise_floor * np.abs(before) + 1e-9
+            rate_means, rate_vars, rate_before, rate_spread = self._ewma(
+                rm, rv, rate, has_rate, warm & has_rate, self.rate_threshold, floor)
+            zr = np.where(has_rate, rate - rate_before, 0.0) / rate_spread
+
+            level_hit = np.abs(z) > self.z_threshold
+            rate_hit = has_rate & (np.abs(zr) > self.rate_threshold)
+            span = slice(start, start + width)
+            anomalous[:, span] = warm & (level_hit | rate_hit)
+            scores[:, span] = np.maximum(np.abs(z), np.abs(zr))
+            rules[:, span] = level_hit * 1 + rate_hit * 2
+
+            last = np.minimum(n - start, width) - 1
+            rows = np.flatnonzero(last >= 0)
+            k = last[rows]
+            m[rows], v[rows] = means[rows, k], variances[rows, k]
+            rm[rows], rv[rows] = rate_means[rows, k], rate_vars[rows, k]
+            last_x[rows], last_t[rows] = x[rows, k], t[rows, k]
+            count[rows] += k + 1
+
+        self.mean[slots], self.var[slots] = m, v
+        self.rate_mean[slots], self.rate_var[slots] = rm, rv
+        self.last_value[slots], self.last_ts[slots] = last_x, last_t
+        self.count[slots] = count
+        return anomalous, scores, rules
+
+    def _ewma(self, m: np.ndarray, v: np.ndarray, x: np.ndarray, active: np.ndarray, clamp: np.ndarray,
+              limit: float, floor: Optional[np.ndarray] = None) -> Tuple[np.ndarray, ...]:
+        """
+        EWMA mean and variance over a chunk of readings
+
+        Readings outside `active` leave the statistics unchanged. Readings in `clamp` are limited to `limit` deviations from the mean
+        before they update it, so an anomaly does not inflate the variance
+        that judges the readings after it. Clamping depends on the statistics
+        before each reading, so it is solved by repeating the closed form until
+        no clamped value changes; every pass settles at least one more reading.
+
+        Returns:
+            (means after, variances after, mean before, deviation before) per reading
+        """
+        a, b = self.alpha, 1.0 - self.alpha
+        # Running product of the decays; an inactive reading's decay is 1
+        p = np.cumprod(np.where(active, b, 1.0), axis=1)
+        q = 1.0 / p
+        effective = x
+        while True:
+            means = p * (m[:, None] + a * np.cumsum(np.where(active, effective, 0.0) * q, axis=1))
+            before = np.concatenate((m[:, None], means[:, :-1]), axis=1)
+            d = np.where(active, effective - before, 0.0)
+            variances = p * (v[:, None] + a * b * np.cumsum(d * d * q, axis=1))
+            var_before = np.concatenate((v[:, None], variances[:, :-1]), axis=1)
+            spread = np.sqrt(var_before) + (self.noise_floor * np.abs(before) + 1e-9 if floor is None else floor)
+            clamped = np.where(clamp, np.clip(x, before - limit * spread, before + limit * spread), x)
+            if np.array_equal(clamped, effective):
+                return means, variances, before, spread
+            effective = clamped
+
+    def _apply_hysteresis(self, slots, n, T, X, anomalous, scores, rules) -> List[Dict[str, Any]]:
+        transitions = []
+        walk = anomalous.any(axis=1) | self.flagged[slots] | self.run_anomalous[slots]
+        # Sensors that were and stay normal only extend their normal run
+        quiet = slots[~walk]
+        self.run_length[quiet] += n[~walk]
+
+        for row in np.flatnonzero(walk):
+            slot = slots[row]
+            flags = anomalous[row, :n[row]]
+            changes = np.flatnonzero(flags[1:] != flags[:-1]) + 1
+            flagged, run_anomalous, run_length = self.flagged[slot], self.run_anomalous[slot], self.run_length[slot]
+            for start, end in zip(np.concatenate(([0], changes)), np.concatenate((changes, [len(flags)]))):
+                value = bool(flags[start])
+                carried = run_length if value == run_anomalous else 0
+                total = carried + end - start
+                needed = self.confirm if value else self.clear
+                if value != flagged and total >= needed:
+                    at = start + max(needed - carried, 1) - 1
+                    flagged = value
+                    transitions.append(self._transition(slot, value, T[row, at], X[row, at],
+                                                        scores[row, start:at + 1].max(), rules[row, at]))
+                run_anomalous, run_length = value, total
+            self.flagged[slot], self.run_anomalous[slot], self.run_length[slot] = flagged, run_anomalous, run_length
+        return transitions
+
+    def _transition(self, slot: int, anomaly: bool, ts: float, reading: float, score: float,
+                    rule: int) -> Dict[str, Any]:
+        if anomaly:
+            self.flagged_at[slot] = ts
+        return {
+            "sensor": self.sensors[slot],
+            "well": self.wells[slot],
+            "anomaly": anomaly,
+            "detected_at": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+            "reading": round(float(reading), 4),
+            "score": round(float(score), 2),
+            "rule": RULES.get(int(rule)) if anomaly else None
+        }
+
+    def flagged_sensors(self) -> List[Dict[str, Any]]:
+        """Sensors currently flagged by the detector"""
+        with self._lock:
+            slots = np.flatnonzero(self.flagged[:len(self.sensors)])
+            return [
+                {"sensor": self.sensors[i], "well": self.wells[i],
+                 "since": datetime.fromtimestamp(self.flagged_at[i], timezone.utc).isoformat(),
+                 "reading": round(float(self.last_value[i]), 4)}
+                for i in slots
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sensors": len(self.sensors),
+            "flagged": int(self.flagged[:len(self.sensors)].sum()),
+            "transitions": self.transitions
+        }
+
+
+class AnomalyWriteBack:
+    """
+    Batched graph writes of flag transitions and incident candidates
+
+    Only the latest transition per sensor is kept between flushes. Failed
+    writes are retried with backoff; candidates beyond
+    ANOMALY_MAX_PENDING_CANDIDATES are dropped and counted.
+    """
+
+    def __init__(self):
+        self._load_settings()
+        self._flags: Dict[str, Dict[str, Any]] = {}
+        self._candidates: List[Dict[str, Any]] = []
+        self.recent: deque = deque(maxlen=int(os.getenv("ANOMALY_CANDIDATE_HISTORY", "200")))
+        self.written_flags = 0
+        self.written_candidates = 0
+        self.dropped = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _load_settings(self) -> None:
+        self.enabled = os.getenv("ANOMALY_GRAPH_WRITEBACK", "true").lower() == "true"
+        self.flush_seconds = float(os.getenv("ANOMALY_FLUSH_SECONDS", "1.0"))
+        self.max_candidates = int(os.getenv("ANOMALY_MAX_PENDING_CANDIDATES", "10000"))
+
+    def start(self) -> None:
+        """Start the flush thread (no-op when write-back is disabled)"""
+        if self._thread is not None:
+            return
+        self._load_settings()
+        if not self.enabled:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="anomaly-writeback", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write what is queued and stop the thread"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join(timeout=30)
+        self._thread = None
+
+    def submit(self, transitions: List[Dict[str, Any]]) -> None:
+        """Queue transitions; each new flag also becomes an incident candidate"""
+        candidates = [_candidate(t) for t in transitions if t["anomaly"]]
+        with self._lock:
+            self.recent.extendleft(candidates)
+            if self._thread is None:
+                return
+            for transition in transitions:
+                self._flags[transition["sensor"]] = transition
+            self._candidates.extend(candidates)
+            overflow = len(self._candidates) - self.max_candidates
+            if overflow > 0:
+                del self._candidates[:overflow]
+                self.dropped += overflow
+
+    def _run(self) -> None:
+        retry_in = self.flush_seconds
+        while not self._stopping.is_set():
+            self._wake.wait(retry_in)
+            self._wake.clear()
+            retry_in = min(retry_in * 2, 30.0) if self.flush() < 0 else self.flush_seconds
+        self.flush()
+
+    def flush(self) -> int:
+        """
+        Write queued flags and candidates to Neo4j
+
+        Returns:
+            Flags and candidates written, or -1 when the write failed (they
+            stay queued unless newer transitions replaced them)
+        """
+        with self._lock:
+            flags, self._flags = self._flags, {}
+            candidates, self._candidates = self._candidates, []
+        if not flags and not candidates:
+            return 0
+
+        rows = list(flags.values())
+        try:
+            driver = get_shared_neo4j_driver()
+            with driver.session() as session:
+                if rows:
+                    statements.run_cypher(session, "sensor_anomaly_flags", rows=rows)
+                if candidates:
+                    statements.run_cypher(session, "incident_candidates", rows=candidates)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.warning(f"Anomaly write-back of {len(rows)} flags failed, will retry: {str(e)}")
+            with self._lock:
+                for sensor, transition in flags.items():
+                    self._flags.setdefault(sensor, transition)
+                self._candidates[:0] = candidates
+            return -1
+
+        self.written_flags += len(rows)
+        self.written_candidates += len(candidates)
+        _patch_snapshot(rows)
+        return len(rows) + len(candidates)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self._thread is not None,
+            "pending_flags": len(self._flags),
+            "pending_candidates": len(self._candidates),
+            "written_flags": self.written_flags,
+            "written_candidates": self.written_candidates,
+            "dropped_candidates": self.dropped,
+            "failed_flushes": self.failures,
+            "last_error": self.last_error
+        }
+
+
+def _candidate(transition: Dict[str, Any]) -> Dict[str, Any]:
+    score = transition["score"]
+    return {
+        "id": f"CAND-{transition['sensor']}-{transition['detected_at'][:19].replace(':', '').replace('-', '')}",
+        "sensor": transition["sensor"],
+        "well": transition["well"],
+        "severity": "HIGH" if score >= 8 else "MEDIUM" if score >= 6 else "LOW",
+        "rule": transition["rule"],
+        "score": score,
+        "reading": transition["reading"],
+        "detected_at": transition["detected_at"]
+    }
+
+
+def _patch_snapshot(rows: List[Dict[str, Any]]) -> None:
+    """Apply written flags to the asset snapshot, if one is loaded"""
+    module = sys.modules.get("assets.snapshot")
+    if module is None:
+        return
+    updates = {}
+    for row in rows:
+        props = {"last_reading_anomaly": row["anomaly"], "last_reading": row["reading"]}
+        if row["anomaly"]:
+            props["anomaly_detected_at"] = datetime.fromisoformat(row["detected_at"])
+        updates[row["sensor"]] = props
+    module.asset_snapshot.patch_properties("Sensor", updates)
+
+
+anomaly_writeback = AnomalyWriteBack()
+anomaly_detector = SensorAnomalyDetector()
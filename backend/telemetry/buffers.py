@@ -0,0 +1,426 @@
+"""
+Telemetry Ring Buffers
+Recent readings per well and per sensor in fixed-size numpy arrays
+
+Every series keeps its last TELEMETRY_BUFFER_CAPACITY readings in arrays
+allocated once (epoch-second timestamps as float64, values as float32)
+and overwritten in place with wraparound, so memory does not grow with
+traffic. Readings arrive as columnar blocks - one list per field for a
+well or sensor - and a block is appended with a few array copies, with
+no per-reading Python work.
+
+Sensor blocks of every message are also passed to the anomaly detector
+(telemetry.anomaly). Production trends for recent windows are computed
+from the well buffers when every well of the rig is buffered back to the
+start of the moving-average lookback; otherwise the caller queries PostgreSQL, where
+telemetry.writer persists every accepted reading. Buffered values are
+float32, exact to the columns' two decimals below 100,000; the writer
+persists the values as received.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+import numpy as np
+
+from telemetry.anomaly import anomaly_detector
+from telemetry.writer import telemetry_writer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _DECODE_ERRORS = (orjson.JSONDecodeError,)
+except ImportError:
+    _loads = json.loads
+    _DECODE_ERRORS = (json.JSONDecodeError, UnicodeDecodeError)
+
+# Values of a well reading, in production_data column order
+WELL_FIELDS = ("production_rate", "pressure", "temperature")
+
+# DECIMAL(10, 2) columns hold magnitudes below this
+WELL_VALUE_LIMIT = 1e8
+
+# Year 10000; later timestamps cannot be stored
+MAX_EPOCH_SECONDS = 253402300800.0
+
+MAX_MESSAGE_BYTES = int(float(os.getenv("TELEMETRY_MAX_MESSAGE_MB", "16")) * 1024 * 1024)
+
+
+class TelemetryError(ValueError):
+    """Malformed telemetry message or block"""
+
+
+class RingBuffer:
+    """
+    Fixed-capacity series of timestamped readings
+
+    Appends overwrite the oldest readings once the buffer is full. Readings
+    are expected in time order; late readings are accepted, and reads sort
+    until the out-of-order ones have been overwritten.
+    """
+
+    def __init__(self, capacity: int, fields: int = 1):
+        """
+        Args:
+            capacity: Readings kept
+            fields: Values per reading
+        """
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, fields), dtype=np.float32)
+        self.head = 0
+        self.count = 0
+        self.total = 0
+        self.last_ts = -np.inf
+        # Readings up to this total may be out of order
+        self._unordered_until = -1
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def ordered(self) -> bool:
+        return self.total - self.capacity >= self._unordered_until
+
+    def append(self, ts: np.ndarray, values: np.ndarray) -> None:
+        """
+        Args:
+            ts: Epoch seconds, shape (n,)
+            values: Readings, shape (n, fields); NaN for missing values
+        """
+        n = len(ts)
+        if n == 0:
+            return
+        capacity = self.capacity
+        with self._lock:
+            if ts[0] < self.last_ts or (n > 1 and np.any(ts[1:] < ts[:-1])):
+                self._unordered_until = self.total + n
+            self.last_ts = max(self.last_ts, float(ts.max()))
+            self.total += n
+            if n > capacity:
+                ts, values = ts[-capacity:], values[-capacity:]
+                n = capacity
+            first = min(n, capacity - self.head)
+            self.ts[self.head:self.head + first] = ts[:first]
+            self.values[self.head:self.head + first] = values[:first]
+            if first < n:
+                self.ts[:n - first] = ts[first:]
+                self.values[:n - first] = values[first:]
+            self.head = (self.head + n) % capacity
+            self.count = min(self.count + n, capacity)
+
+    def oldest(self) -> Optional[float]:
+        """Earliest buffered timestamp, None when empty"""
+        with self._lock:
+            if self.count == 0:
+                return None
+            if self.ordered:
+                return float(self.ts[(self.head - self.count) % self.capacity])
+            return float(self.ts[:self.count].min() if self.count < self.capacity else self.ts.min())
+
+    def window(self, since: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Readings at or after `since`, oldest first
+
+        Returns:
+            (ts, values) copies
+        """
+        with self._lock:
+            if self.count < self.capacity:
+                ts, values = self.ts[:self.count].copy(), self.values[:self.count].copy()
+            else:
+                ts = np.concatenate((self.ts[self.head:], self.ts[:self.head]))
+                values = np.concatenate((self.values[self.head:], self.values[:self.head]))
+            ordered = self.ordered
+        if not ordered:
+            order = np.argsort(ts, kind="stable")
+            ts, values = ts[order], values[order]
+        start = np.searchsorted(ts, since, side="left")
+        return ts[start:], values[start:]
+
+
+class TelemetryStore:
+    """
+    Ring buffers for every streaming well and sensor
+
+    Wells are placed under their rig and basin from the first block that
+    names them (or from the asset snapshot), so trends can be answered
+    per rig. TELEMETRY_MAX_SERIES bounds the number of buffers.
+    """
+
+    def __init__(self):
+        self.capacity = int(os.getenv("TELEMETRY_BUFFER_CAPACITY", "8192"))
+        self.max_series = int(os.getenv("TELEMETRY_MAX_SERIES", "50000"))
+        self._wells: Dict[str, RingBuffer] = {}
+        self._sensors: Dict[str, RingBuffer] = {}
+        self._placement: Dict[str, Tuple[str, Optional[str]]] = {}
+        self._rig_wells: Dict[str, set] = {}
+        self._sensor_wells: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self.readings = 0
+        self.rejected = 0
+
+    def ingest(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Buffer and queue for persistence one message of readings
+
+        A message holds columnar blocks; timestamps are epoch seconds and
+        missing or null values are stored as NULL:
+
+            {"wells": [{"well": "Well W-12", "rig": "Rig Alpha", "basin": "Permian",
+                        "ts": [...], "production_rate": [...], "pressure": [...], "temperature": [...]}],
+             "sensors": [{"sensor_id": "P-101", "well": "Well W-12", "ts": [...], "value": [...]}]}
+
+        Args:
+            message: Decoded message
+
+        Returns:
+            Accepted readings, rejected blocks and the first few block errors
+
+        Raises:
+            TelemetryError: The message is not an object of block lists
+        """
+        if not isinstance(message, dict):
+            raise TelemetryError("Telemetry message must be a JSON object")
+        wells = message.get("wells") or []
+        sensors = message.get("sensors") or []
+        if not isinstance(wells, list) or not isinstance(sensors, list):
+            raise TelemetryError("'wells' and 'sensors' must be lists of blocks")
+
+        accepted = rejected = 0
+        errors: List[str] = []
+        observed: List[tuple] = []
+        for blocks, ingest_block in ((wells, self._ingest_well),
+                                     (sensors, lambda block: self._ingest_sensor(block, observed))):
+            for block in blocks:
+                try:
+                    accepted += ingest_block(block)
+                except TelemetryError as e:
+                    rejected += 1
+                    if len(errors) < 5:
+                        errors.append(str(e))
+        self.readings += accepted
+        self.rejected += rejected
+        try:
+            anomaly_detector.observe(observed)
+        except Exception as e:
+            # Detection must never cost readings that are already buffered
+            logger.error(f"Anomaly detection failed for a telemetry message: {str(e)}")
+        return {"accepted": accepted, "rejected": rejected, "errors": errors}
+
+    def ingest_json(self, raw: Union[bytes, str]) -> Dict[str, Any]:
+        """
+        Decode and ingest one JSON message
+
+        Raises:
+            TelemetryError: The message is not valid JSON, too large, or not
+                an object of block lists
+        """
+        if len(raw) > MAX_MESSAGE_BYTES:
+            raise TelemetryError(f"Telemetry message over {MAX_MESSAGE_BYTES} bytes")
+        try:
+            message = _loads(raw)
+        except _DECODE_ERRORS as e:
+            raise TelemetryError(f"Telemetry message is not valid JSON: {str(e)}")
+        return self.ingest(message)
+
+    def _ingest_well(self, block: Any) -> int:
+        well = _block_key(block, "well")
+        ts, values = _columns(block, WELL_FIELDS, well, WELL_VALUE_LIMIT)
+        rig, basin = block.get("rig"), block.get("basin")
+        placement = self._placement.get(well)
+        if placement is None or (rig and rig != placement[0]) or (basin and basin != placement[1]):
+            placement = self._place(well, rig, basin, placement)
+        self._buffer(self._wells, well, len(WELL_FIELDS)).append(ts, values)
+        telemetry_writer.enqueue_production(ts, placement[0], well, placement[1], values)
+        return len(ts)
+
+    def _ingest_sensor(self, block: Any, observed: List[tuple]) -> int:
+        sensor = _block_key(block, "sensor_id")
+        ts, values = _columns(block, ("value",), sensor)
+        well = block.get("well")
+        if well and self._sensor_wells.get(sensor) != well:
+            self._sensor_wells[sensor] = well
+        well = self._sensor_wells.get(sensor)
+        self._buffer(self._sensors, sensor, 1).append(ts, values)
+        telemetry_writer.enqueue_sensor(ts, sensor, well, values[:, 0])
+        observed.append((sensor, well, ts, values[:, 0]))
+        return len(ts)
+
+    def _place(self, well: str, rig: Optional[str], basin: Optional[str],
+               placement: Optional[Tuple[str, Optional[str]]]) -> Tuple[str, Optional[str]]:
+        if placement is not None:
+            rig, basin = rig or placement[0], basin or placement[1]
+        elif not rig:
+            rig, basin = _snapshot_placement(well, basin)
+            if not rig:
+                raise TelemetryError(f"{well}: 'rig' is required for a well not in the asset hierarchy")
+        with self._lock:
+            if placement is not None:
+                self._rig_wells.get(placement[0], set()).discard(well)
+            self._rig_wells.setdefault(rig, set()).add(well)
+            self._placement[well] = (rig, basin)
+        return rig, basin
+
+    def _buffer(self, series: Dict[str, RingBuffer], key: str, fields: int) -> RingBuffer:
+        buffer = series.get(key)
+        if buffer is None:
+            with self._lock:
+                buffer = series.get(key)
+                if buffer is None:
+                    if len(self._wells) + len(self._sensors) >= self.max_series:
+                        raise TelemetryError(f"{key}: series limit ({self.max_series}) reached")
+                    buffer = series[key] = RingBuffer(self.capacity, fields)
+        return buffer
+
+    def production_trends(self, rig_name: str, hours: float, window_hours: float,
+                          now: Optional[float] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        The production_trends statement's rows, computed from the buffers
+
+        Args:
+            rig_name: Name of the rig
+            hours: Length of the interval ending now
+            window_hours: Width of the moving-average window
+            now: Interval end (epoch seconds), defaults to the current time
+
+        Returns:
+            Rows ordered by timestamp (newest first) then well, or None when
+            a well of the rig is not buffered back to the start of the
+            lookback
+        """
+        wells = self._rig_wells.get(rig_name)
+        if not wells:
+            return None
+        now = time.time() if now is None else now
+        start = now - hours * 3600
+        since = start - window_hours * 3600
+
+        names = sorted(set(wells) | _snapshot_wells(rig_name))
+        parts = []
+        for rank, well in enumerate(names):
+            buffer = self._wells.get(well)
+            oldest = buffer.oldest() if buffer is not None else None
+            if oldest is None or oldest > since:
+                return None
+            ts, values = buffer.window(since)
+            values = np.round(values.astype(np.float64), 2)
+            rates = values[:, 0]
+            # AVG(...) OVER (RANGE window PRECEDING AND CURRENT ROW): peers
+            # included, NULLs skipped
+            valid = ~np.isnan(rates)
+            sums = np.concatenate(([0.0], np.cumsum(np.where(valid, rates, 0.0))))
+            counts = np.concatenate(([0], np.cumsum(valid)))
+            left = np.searchsorted(ts, ts - window_hours * 3600, side="left")
+            right = np.searchsorted(ts, ts, side="right")
+            n = counts[right] - counts[left]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                moving = np.where(n > 0, (sums[right] - sums[left]) / n, np.nan)
+            keep = ts >= start
+            parts.append((ts[keep], np.full(int(keep.sum()), rank), rates[keep], np.round(moving[keep], 6),
+                          values[keep, 1], values[keep, 2]))
+        if not parts:
+            return []
+
+        ts, rank, rates, moving, pressure, temperature = (np.concatenate(c) for c in zip(*parts))
+        order = np.lexsort((rank, -ts))
+        stamps = np.round(ts[order] * 1e6).astype("datetime64[us]").astype(object)
+        columns = [_nullable(c[order]) for c in (rates, moving, pressure, temperature)]
+        return [
+            {"timestamp": stamp, "well_name": names[r], "production_rate": rate, "moving_avg": avg,
+             "pressure": p, "temperature": t}
+            for stamp, r, rate, avg, p, t in zip(stamps, rank[order].tolist(), *columns)
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "wells": len(self._wells),
+            "sensors": len(self._sensors),
+            "rigs": len(self._rig_wells),
+            "capacity": self.capacity,
+            "readings": self.readings,
+            "rejected_blocks": self.rejected
+        }
+
+
+def _block_key(block: Any, name: str) -> str:
+    if not isinstance(block, dict):
+        raise TelemetryError("Telemetry blocks must be JSON objects")
+    key = block.get(name)
+    if not isinstance(key, str) or not key:
+        raise TelemetryError(f"Block without '{name}'")
+    return key
+
+
+def _columns(block: Dict[str, Any], fields: Tuple[str, ...], key: str,
+             limit: float = np.inf) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Timestamps and an (n, fields) value array from a block's lists
+
+    Values the database would reject (infinite, or `limit` and over in
+    magnitude) reject the block here, so they never fail a COPY batch.
+    """
+    try:
+        ts = np.atleast_1d(np.asarray(block.get("ts"), dtype=np.float64))
+        values = np.full((len(ts), len(fields)), np.nan)
+        columns = [(j, block.get(name)) for j, name in enumerate(fields)]
+        for j, column in columns:
+            if column is not None:
+                column = np.atleast_1d(np.asarray(column, dtype=np.float64))
+                if column.shape != ts.shape:
+                    raise TelemetryError(f"{key}: '{fields[j]}' has {column.size} values for {ts.size} timestamps")
+                values[:, j] = column
+    except TelemetryError:
+        raise
+    except (ValueError, TypeError):
+        raise TelemetryError(f"{key}: 'ts' and values must be numbers or lists of numbers")
+    if ts.ndim != 1 or ts.size == 0 or not ((ts >= 0) & (ts < MAX_EPOCH_SECONDS)).all():
+        raise TelemetryError(f"{key}: 'ts' must be a non-empty list of epoch seconds")
+    if (np.abs(values) >= limit).any():
+        raise TelemetryError(f"{key}: values must be finite and below {limit:g} in magnitude")
+    return ts, values
+
+
+def _nullable(column: np.ndarray) -> List[Optional[float]]:
+    values = column.tolist()
+    if np.isnan(column).any():
+        values = [None if v != v else v for v in values]
+    return values
+
+
+def _current_snapshot():
+    module = sys.modules.get("assets.snapshot")
+    return module.asset_snapshot.current() if module is not None else None
+
+
+def _snapshot_wells(rig_name: str) -> set:
+    """Wells of the rig in the asset hierarchy (empty without a fresh snapshot)"""
+    snapshot = _current_snapshot()
+    rig = snapshot.lookup("Rig", rig_name) if snapshot is not None else None
+    if rig is None:
+        return set()
+    return {snapshot.asset_id(i) for i in snapshot.children(rig, "Well")}
+
+
+def _snapshot_placement(well: str, basin: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(rig, basin) of a well from the asset hierarchy"""
+    snapshot = _current_snapshot()
+    i = snapshot.lookup("Well", well) if snapshot is not None else None
+    if i is None:
+        return None, basin
+    for rig in snapshot.parents(i):
+        if snapshot.label(rig) == "Rig":
+            if basin is None:
+                basin = next((snapshot.asset_id(b) for b in snapshot.parents(rig) if snapshot.label(b) == "Basin"), None)
+            return snapshot.asset_id(rig), basin
+    return None, basin
+
+
+live_telemetry = TelemetryStore()
@@ -0,0 +1,218 @@
+"""
+Telemetry Writer
+Batched persistence of streamed readings to PostgreSQL
+
+Ingestion queues the arrays of every accepted block; a background thread
+loads everything queued with one COPY per table, at least every
+TELEMETRY_FLUSH_SECONDS and as soon as TELEMETRY_FLUSH_ROWS readings are
+waiting. Timestamps are formatted by numpy for the whole block, and
+missing values are written as `nan`, which the COPY reads as NULL. A
+failed COPY is rolled back and its readings are retried with backoff;
+beyond TELEMETRY_MAX_PENDING_ROWS the oldest blocks are dropped and
+counted, so a database outage cannot exhaust memory.
+"""
+import io
+import os
+import time
+import logging
+import threading
+from collections import deque
+from itertools import repeat
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from database.connections import get_pooled_postgres_connection
+
+logger = logging.getLogger(__name__)
+
+PRODUCTION_COPY = (
+    "COPY production_data (timestamp, rig_name, well_name, basin, production_rate, pressure, temperature) "
+    "FROM STDIN WITH (FORMAT csv, NULL 'nan')"
+)
+SENSOR_COPY = "COPY sensor_readings (timestamp, sensor_id, well_name, value) FROM STDIN WITH (FORMAT csv, NULL 'nan')"
+
+
+class TelemetryWriter:
+    """
+    Background COPY loader for buffered readings
+
+    Settings: TELEMETRY_PERSIST (default true), TELEMETRY_FLUSH_SECONDS,
+    TELEMETRY_FLUSH_ROWS and TELEMETRY_MAX_PENDING_ROWS. Blocks queued while
+    the writer is not running are not persisted.
+    """
+
+    def __init__(self):
+        self._load_settings()
+        # (table, rows, block) in arrival order
+        self._pending: deque = deque()
+        self.pending_rows = 0
+        self.written = 0
+        self.dropped = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_flush_ms: Optional[float] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _load_settings(self) -> None:
+        self.enabled = os.getenv("TELEMETRY_PERSIST", "true").lower() == "true"
+        self.flush_seconds = float(os.getenv("TELEMETRY_FLUSH_SECONDS", "1.0"))
+        self.flush_rows = int(os.getenv("TELEMETRY_FLUSH_ROWS", "50000"))
+        self.max_pending_rows = int(os.getenv("TELEMETRY_MAX_PENDING_ROWS", "2000000"))
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        """Start the flush thread (no-op when persistence is disabled)"""
+        if self._thread is not None:
+            return
+        # Settings are read again here, after the app has loaded .env
+        self._load_settings()
+        if not self.enabled:
+            logger.info("Telemetry persistence disabled; readings are kept in buffers only")
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Flush what is queued and stop the thread"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join(timeout=30)
+        self._thread = None
+
+    def enqueue_production(self, ts: np.ndarray, rig: str, well: str, basin: Optional[str],
+                           values: np.ndarray) -> None:
+        """Queue a well block (values in production_rate, pressure, temperature order)"""
+        self._enqueue("production_data", len(ts), (ts, rig, well, basin, values))
+
+    def enqueue_sensor(self, ts: np.ndarray, sensor_id: str, well: Optional[str], values: np.ndarray) -> None:
+        """Queue a sensor block"""
+        self._enqueue("sensor_readings", len(ts), (ts, sensor_id, well, values))
+
+    def _enqueue(self, table: str, rows: int, block: tuple) -> None:
+        if self._thread is None:
+            return
+        with self._lock:
+            self._pending.append((table, rows, block))
+            self.pending_rows += rows
+            self._trim()
+            full = self.pending_rows >= self.flush_rows
+        if full:
+            self._wake.set()
+
+    def _trim(self) -> None:
+        # Caller holds the lock
+        while self.pending_rows > self.max_pending_rows and len(self._pending) > 1:
+            _, rows, _ = self._pending.popleft()
+            self.pending_rows -= rows
+            self.dropped += rows
+
+    def _run(self) -> None:
+        retry_in = self.flush_seconds
+        while not self._stopping.is_set():
+            self._wake.wait(retry_in)
+            self._wake.clear()
+            if self.flush() < 0:
+                retry_in = min(retry_in * 2, 30.0)
+            else:
+                retry_in = self.flush_seconds
+        self.flush()
+
+    def flush(self) -> int:
+        """
+        COPY everything queued
+
+        Returns:
+            Readings written, or -1 when the COPY failed (the readings stay
+            queued)
+        """
+        with self._lock:
+            batch = list(self._pending)
+            self._pending.clear()
+            rows = self.pending_rows
+            self.pending_rows = 0
+        if not batch:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            with get_pooled_postgres_connection() as conn:
+                copy_readings(batch, conn)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.warning(f"Telemetry flush of {rows} readings failed, will retry: {str(e)}")
+            with self._lock:
+                self._pending.extendleft(reversed(batch))
+                self.pending_rows += rows
+                self._trim()
+            return -1
+        self.written += rows
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "pending_rows": self.pending_rows,
+            "written_rows": self.written,
+            "dropped_rows": self.dropped,
+            "failed_flushes": self.failures,
+            "last_flush_ms": self.last_flush_ms,
+            "last_error": self.last_error
+        }
+
+
+def copy_readings(batch: List[tuple], conn) -> None:
+    """
+    Load queued blocks with one COPY per table, in one transaction
+
+    Args:
+        batch: (table, rows, block) entries from the writer queue
+        conn: PostgreSQL connection
+    """
+    production = [block for table, _, block in batch if table == "production_data"]
+    sensors = [block for table, _, block in batch if table == "sensor_readings"]
+    try:
+        with conn.cursor() as cur:
+            if production:
+                cur.copy_expert(PRODUCTION_COPY, io.StringIO(_csv(production)))
+            if sensors:
+                cur.copy_expert(SENSOR_COPY, io.StringIO(_csv(sensors)))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _stamps(ts: np.ndarray) -> List[str]:
+    """Epoch seconds as ISO timestamps (UTC, microseconds)"""
+    return np.datetime_as_string(np.round(ts * 1e6).astype("datetime64[us]"), unit="us").tolist()
+
+
+def _text(value: Optional[str]) -> str:
+    # Quoted, so a name spelled "nan" is not read as NULL
+    return "nan" if value is None else '"' + value.replace('"', '""') + '"'
+
+
+def _csv(blocks: List[tuple]) -> str:
+    """CSV lines for blocks of (ts, text columns..., values (n,) or (n, k))"""
+    parts = []
+    for ts, *names, values in blocks:
+        prefix = ",".join(_text(name) for name in names)
+        columns = [list(map(repr, column)) for column in values.reshape(len(ts), -1).T.tolist()]
+        parts.append("\n".join(map(",".join, zip(_stamps(ts), repeat(prefix), *columns))) + "\n")
+    return "".join(parts)
+
+
+telemetry_writer = TelemetryWriter()
@@ -0,0 +1,6 @@
+"""Shared test setup: backend modules import as top-level packages"""
+import sys
+import os
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,191 @@
+"""Anomaly detector: chunked EWMA and batch hysteresis against a per-reading reference"""
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from telemetry.anomaly import CHUNK_READINGS, RULES, SensorAnomalyDetector
+
+STATE = ("mean", "var", "rate_mean", "rate_var")
+FLAGS = ("count", "run_length", "run_anomalous", "flagged")
+
+
+def detector(**settings):
+    found = SensorAnomalyDetector()
+    found.enabled = True
+    found.alpha, found.z_threshold, found.rate_threshold = 0.05, 4.0, 6.0
+    found.warmup, found.confirm, found.clear = 10, 3, 5
+    for name, value in settings.items():
+        setattr(found, name, value)
+    return found
+
+
+class ReferenceDetector:
+    """The detector's recurrences, one reading at a time"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.sensors = {}
+
+    def ewma(self, m, v, x, clamp, limit, floor):
+        a, b = self.settings.alpha, 1.0 - self.settings.alpha
+        spread = math.sqrt(v) + floor
+        if clamp:
+            x = min(max(x, m - limit * spread), m + limit * spread)
+        return b * m + a * x, b * v + a * b * (x - m) ** 2, spread
+
+    def score(self, s, t, x):
+        cfg = self.settings
+        warm = s["count"] >= cfg.warmup
+        if s["count"] == 0:
+            s["mean"] = x
+        before = s["mean"]
+        floor = cfg.noise_floor * abs(before) + 1e-9
+        s["mean"], s["var"], spread = self.ewma(before, s["var"], x, warm, cfg.z_threshold, floor)
+        z = (x - before) / spread
+
+        has_rate = t > s["last_ts"] and not math.isnan(s["last_value"])
+        zr = 0.0
+        if has_rate:
+            rate_before = s["rate_mean"]
+            rate = (x - s["last_value"]) / max(t - s["last_ts"], cfg.min_interval)
+            s["rate_mean"], s["rate_var"], rate_spread = self.ewma(
+                rate_before, s["rate_var"], rate, warm, cfg.rate_threshold, floor)
+            zr = (rate - rate_before) / rate_spread
+
+        level_hit = abs(z) > cfg.z_threshold
+        rate_hit = has_rate and abs(zr) > cfg.rate_threshold
+        s["last_value"], s["last_ts"] = x, t
+        s["count"] += 1
+        return warm and (level_hit or rate_hit), max(abs(z), abs(zr)), level_hit * 1 + rate_hit * 2
+
+    def observe(self, blocks):
+        grouped = {}
+        for sensor, well, ts, values in blocks:
+            grouped.setdefault(sensor, []).append((ts, values))
+        transitions = []
+        for sensor, parts in grouped.items():
+            ts = np.concatenate([p[0] for p in parts])
+            x = np.concatenate([p[1] for p in parts])
+            order = np.argsort(ts, kind="stable")
+            s = self.sensors.setdefault(sensor, {
+                "mean": 0.0, "var": 0.0, "rate_mean": 0.0, "rate_var": 0.0, "last_value": math.nan,
+                "last_ts": -math.inf, "count": 0, "run_length": 0, "run_anomalous": False, "flagged": False
+            })
+            keep = [i for i in order if not math.isnan(x[i]) and ts[i] > s["last_ts"]]
+            # Scores of the current run within this batch
+            run_scores = []
+            for i in keep:
+                anomalous, score, rule = self.score(s, float(ts[i]), float(x[i]))
+                if anomalous == s["run_anomalous"]:
+                    s["run_length"] += 1
+                else:
+                    s["run_anomalous"], s["run_length"], run_scores = anomalous, 1, []
+                run_scores.append(score)
+                needed = self.settings.confirm if anomalous else self.settings.clear
+                if anomalous != s["flagged"] and s["run_length"] >= needed:
+                    s["flagged"] = anomalous
+                    transitions.append({
+                        "sensor": sensor, "anomaly": anomalous,
+                        "detected_at": datetime.fromtimestamp(ts[i], timezone.utc).isoformat(),
+                        "reading": round(float(x[i]), 4), "score": round(max(run_scores), 2),
+                        "rule": RULES.get(int(rule)) if anomalous else None
+                    })
+        return transitions
+
+
+def readings(rng, sensors, length):
+    """Noisy levels with spikes, steps, NaNs and repeated timestamps"""
+    series = {}
+    for k in range(sensors):
+        ts = 1.7e9 + np.cumsum(rng.choice([0.0, 1.0, 5.0, 60.0], size=length, p=[0.03, 0.47, 0.3, 0.2]))
+        level = rng.uniform(-50, 500) if k else 100.0
+        x = level + rng.normal(0, 0 if k == 0 else rng.uniform(0.1, 5), length)
+        for start in rng.integers(0, length, size=length // 25):
+            x[start:start + rng.integers(1, 8)] += rng.choice([-1, 1]) * rng.uniform(5, 100) * (abs(level) + 1)
+        x[rng.integers(length // 2, length)] += level
+        x[rng.random(length) < 0.03] = np.nan
+        series[f"S-{k}"] = (ts, x)
+    return series
+
+
+def batches(rng, series):
+    """Random splits of every series; a sensor may appear in several blocks per batch"""
+    position = {sensor: 0 for sensor in series}
+    while any(position[s] < len(series[s][0]) for s in series):
+        blocks = []
+        for sensor, (ts, x) in series.items():
+            start = position[sensor]
+            end = min(start + int(rng.choice([0, 1, 7, 40, CHUNK_READINGS + 30])), len(ts))
+            cut = int(rng.integers(start, end + 1))
+            for lo, hi in ((cut, end), (start, cut)) if rng.random() < 0.5 else ((start, cut), (cut, end)):
+                if hi > lo:
+                    blocks.append((sensor, "W-1", ts[lo:hi], x[lo:hi]))
+            position[sensor] = end
+        rng.shuffle(blocks)
+        yield blocks
+
+
+def compare(found, reference):
+    for sensor, s in reference.sensors.items():
+        slot = found._slots[sensor]
+        for name in STATE:
+            assert getattr(found, name)[slot] == pytest.approx(s[name], rel=1e-9, abs=1e-9), (sensor, name)
+        for name in FLAGS:
+            assert getattr(found, name)[slot] == s[name], (sensor, name)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_batches_match_per_reading_reference(seed):
+    rng = np.random.default_rng(seed)
+    found = detector()
+    reference = ReferenceDetector(found)
+    seen, expected = [], []
+    for blocks in batches(rng, readings(rng, 5, 600)):
+        seen += found._observe(blocks)
+        expected += reference.observe(blocks)
+        compare(found, reference)
+
+    def by_sensor(transitions):
+        return sorted(({k: t[k] for k in ("sensor", "anomaly", "detected_at", "reading", "rule")}
+                       for t in transitions), key=lambda t: (t["sensor"], t["detected_at"]))
+
+    assert expected, "series should produce flags"
+    assert by_sensor(seen) == by_sensor(expected)
+    scores = sorted((t["sensor"], t["detected_at"], t["score"]) for t in seen)
+    for (_, _, score), (_, _, want) in zip(scores, sorted((t["sensor"], t["detected_at"], t["score"])
+                                                          for t in expected)):
+        assert score == pytest.approx(want, abs=0.011)
+
+
+def block(ts, values):
+    return [("S-1", "W-1", np.asarray(ts, dtype=float), np.asarray(values, dtype=float))]
+
+
+def test_confirm_and_clear_counts_carry_across_batches():
+    # Level rule only: a spike's way back down is not a rate anomaly here
+    found = detector(rate_threshold=1e9)
+    rng = np.random.default_rng(7)
+    t = list(range(1, 31))
+    assert found._observe(block(t, 100 + rng.normal(0, 1, 30))) == []
+
+    # Two anomalous readings, then the third in the next batch confirms
+    assert found._observe(block([31, 32], [1000, 1000])) == []
+    assert (found.run_anomalous[0], found.run_length[0], found.flagged[0]) == (True, 2, False)
+    flagged = found._observe(block([33, 34, 35], [1000, 100, 100]))
+    assert [(f["anomaly"], f["reading"]) for f in flagged] == [(True, 1000.0)]
+    assert flagged[0]["detected_at"] == datetime.fromtimestamp(33, timezone.utc).isoformat()
+    assert (found.run_anomalous[0], found.run_length[0], found.flagged[0]) == (False, 2, True)
+
+    # Two normal readings above and two more; the fifth, in the next batch, clears it
+    assert found._observe(block([36, 37], [100, 100])) == []
+    cleared = found._observe(block([38, 39, 40], [100, 100, 100]))
+    assert [(c["anomaly"], c["rule"]) for c in cleared] == [(False, None)]
+    assert cleared[0]["detected_at"] == datetime.fromtimestamp(38, timezone.utc).isoformat()
+    assert (found.run_length[0], found.flagged[0]) == (7, False)
+
+    # A run interrupted at a batch boundary starts over
+    found._observe(block([41, 42], [1000, 1000]))
+    assert found._observe(block([43, 44, 45], [100, 1000, 1000])) == []
+    assert (found.run_anomalous[0], found.run_length[0], found.flagged[0]) == (True, 2, False)
@@ -0,0 +1,117 @@
+"""BM25 index: MaxScore top-k against exhaustive scoring of every document"""
+import math
+import random
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from retrieval import bm25
+from retrieval.bm25 import BM25Index, tokenize
+
+VOCABULARY = [f"w{i}" for i in range(300)]
+
+
+def exhaustive(index, query, wells=None, kinds=None):
+    """Score of every live document that matches the filters, from the index's postings"""
+    weights = {}
+    for term in tokenize(query, query=True):
+        weights[term] = weights.get(term, 0.0) + 1.0
+    alive = index._columns["alive"]
+    scores = np.zeros(len(alive))
+    n_docs = max(index.live_docs, 1)
+    for term, weight in weights.items():
+        term_id = index.terms.get(term)
+        postings = [p for p in (s.postings(term_id) for s in index.segments) if p is not None] if term_id is not None else []
+        df = sum(int(alive[docs].sum()) for docs, _, _ in postings)
+        if not df:
+            continue
+        idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        for docs, impacts, _ in postings:
+            scores[docs] += impacts * np.float32(weight * idf)
+    keep = alive & (scores > 0)
+    if wells:
+        keep &= np.isin(index._columns["well"], [index.wells[w] for w in wells])
+    if kinds:
+        keep &= np.isin(index._columns["kind"], [bm25.DOCUMENT_KINDS[k] for k in kinds])
+    return {index.keys[i]: scores[i] for i in np.flatnonzero(keep)}
+
+
+def corpus(rng, start, count):
+    docs = []
+    for i in range(start, start + count):
+        # Zipf-like term frequencies, so queries mix common and rare terms
+        words = [VOCABULARY[min(int(rng.paretovariate(1.1)) - 1, len(VOCABULARY) - 1)]
+                 for _ in range(rng.randint(5, 60))]
+        docs.append({"key": f"d{i}", "text": " ".join(words), "well": f"W{i % 7}",
+                     "kind": "incident" if i % 3 == 0 else "report"})
+    return docs
+
+
+@pytest.fixture(scope="module")
+def index():
+    rng = random.Random(11)
+    index = BM25Index(merge_factor=2)
+    # Several adds build and merge segments; re-adds and removes leave tombstones
+    for batch in range(6):
+        index.add(corpus(rng, batch * 300, 300))
+    index.add(corpus(rng, 0, 50))
+    index.remove([f"d{i}" for i in range(400, 520)])
+    assert len(index.segments) > 1 and index.has_deletes
+    return index
+
+
+# Most of these stop adding new candidates after a few terms (MaxScore pruning)
+QUERIES = ["w0 w1", "w0 w17 w250", "w3 w3 w90", "w299", "w5 w6 w7 w8 w9 w120", "w1 nothing-here",
+           "w0 w1 w2 w3 w4 w5 w6 w7 w8 w9 w10 w11"]
+
+
+@pytest.mark.parametrize("sparse_fraction", [0, 10 ** 9])
+@pytest.mark.parametrize("query", QUERIES)
+def test_maxscore_matches_exhaustive(index, query, sparse_fraction, monkeypatch):
+    # 0 forces the sparse path, a huge fraction the dense one
+    monkeypatch.setattr(bm25, "SPARSE_FRACTION", sparse_fraction)
+    expected = exhaustive(index, query)
+    results = index.search(query, limit=10)
+    best = sorted(expected.values(), reverse=True)[:10]
+    np.testing.assert_allclose([score for _, score in results], best, rtol=1e-5)
+    for key, score in results:
+        assert expected[key] == pytest.approx(score, rel=1e-5)
+
+
+@pytest.mark.parametrize("sparse_fraction", [0, 10 ** 9])
+def test_filters_match_exhaustive(index, sparse_fraction, monkeypatch):
+    monkeypatch.setattr(bm25, "SPARSE_FRACTION", sparse_fraction)
+    expected = exhaustive(index, "w0 w2 w40", wells=["W3"], kinds=["incident"])
+    results = index.search("w0 w2 w40", limit=5, wells=["W3"], kinds=["incident"])
+    np.testing.assert_allclose([score for _, score in results], sorted(expected.values(), reverse=True)[:5],
+                               rtol=1e-5)
+    assert all(key in expected for key, _ in results)
+
+
+def test_removed_and_replaced_documents():
+    index = BM25Index()
+    index.add([{"key": "a", "text": "pump failure G-40"}, {"key": "b", "text": "valve leak"}])
+    assert [key for key, _ in index.search("G-40")] == ["a"]
+    index.add([{"key": "a", "text": "valve inspection"}])
+    assert index.search("G-40") == []
+    assert {key for key, _ in index.search("valve")} == {"a", "b"}
+    index.remove(["b"])
+    assert [key for key, _ in index.search("valve")] == ["a"]
+    assert len(index) == 1
+
+
+def test_date_filter():
+    index = BM25Index()
+    index.add([
+        {"key": "old", "text": "gas leak", "report_date": "2023-01-05T00:00:00Z"},
+        {"key": "new", "text": "gas leak", "report_date": "2024-06-01T00:00:00Z"},
+        {"key": "undated", "text": "gas leak"},
+    ])
+    since = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert [key for key, _ in index.search("gas", since=since)] == ["new"]
+
+
+def test_identifiers_stay_whole_in_queries():
+    assert tokenize("G-40", query=True) == ["g-40", "g40"]
+    assert tokenize("pump-station G-40") == ["pump-station", "pump", "station", "g-40", "g40", "g", "40"]
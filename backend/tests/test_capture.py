@@ -0,0 +1,36 @@
+"""Query capture: several workers writing and rotating the same capture path"""
+import json
+
+from observability.capture import QueryCapture, read_capture
+
+
+def lines(n, worker):
+    return [json.dumps({"v": 1, "ts": i, "query": f"{worker}-{i}"}) for i in range(n)]
+
+
+def queries(path):
+    return [entry["query"] for entry in read_capture(str(path))]
+
+
+def test_writer_reopens_a_file_rotated_by_another_worker(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    workers = []
+    for _ in range(2):
+        capture = QueryCapture()
+        capture.path, capture.max_bytes = str(path), 2000
+        workers.append((capture, open(path, "a", encoding="utf-8"), open(str(path) + ".lock", "a")))
+    (a, fa, lock_a), (b, fb, lock_b) = workers
+
+    fb = b._write(fb, lock_b, lines(3, "b"))
+    # A fills the file past the limit and rotates it
+    fa = a._write(fa, lock_a, lines(60, "a"))
+    rotated = queries(str(path) + ".1")
+    assert rotated[:3] == ["b-0", "b-1", "b-2"] and len(rotated) == 63
+
+    # B's old handle points at the rotated file: it must write to the new one
+    fb = b._write(fb, lock_b, lines(2, "b2"))
+    fa = a._write(fa, lock_a, lines(1, "a2"))
+    assert queries(path) == ["b2-0", "b2-1", "a2-0"]
+    assert queries(str(path) + ".1") == rotated
+    for f in (fa, fb, lock_a, lock_b):
+        f.close()
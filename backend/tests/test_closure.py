@@ -0,0 +1,131 @@
+"""Closure index on a DAG, checked against shortest paths over the parent sets"""
+import random
+from collections import deque
+
+import pytest
+
+from assets.closure import ClosureIndex
+from assets.snapshot import AssetSnapshot, KEY_PROPERTIES
+
+BASIN = ("Basin", "Permian")
+RIG_A, RIG_B = ("Rig", "Alpha"), ("Rig", "Bravo")
+WELL_A, WELL_B = ("Well", "A-1"), ("Well", "B-1")
+PUMP = ("Equipment", "P-7")
+
+
+def expected_ancestors(index, key):
+    """Breadth-first walk up the parent sets: ancestor -> shortest depth"""
+    depths, queue = {}, deque([(key, 0)])
+    while queue:
+        node, depth = queue.popleft()
+        for parent in index.parents[node]:
+            if parent not in depths:
+                depths[parent] = depth + 1
+                queue.append((parent, depth + 1))
+    return depths
+
+
+def assert_consistent(index):
+    for key in index.parents:
+        assert index.ancestors[key] == expected_ancestors(index, key)
+        below = {d: depth for bucket in index.descendants[key].values() for d, depth in bucket.items()}
+        assert below == {s: a[key] for s, a in index.ancestors.items() if key in a}
+
+
+def build():
+    index = ClosureIndex()
+    index.insert(BASIN)
+    index.insert(RIG_A, [BASIN])
+    index.insert(RIG_B, [BASIN])
+    index.insert(WELL_A, [RIG_A])
+    index.insert(WELL_B, [RIG_B])
+    # Shared equipment below two wells
+    index.insert(PUMP, [WELL_A, WELL_B])
+    return index
+
+
+def test_shared_equipment_keeps_both_parents():
+    index = build()
+    assert_consistent(index)
+    ancestors = {(row["asset_type"], row["asset_id"]): row["depth"] for row in index.ancestors_of("P-7")}
+    assert ancestors == {WELL_A: 1, WELL_B: 1, RIG_A: 2, RIG_B: 2, BASIN: 3}
+    assert [row["asset_id"] for row in index.descendants_of("Bravo", "Equipment")] == ["P-7"]
+    assert [row["depth"] for row in index.descendants_of("Permian", "Equipment")] == [3]
+
+
+def test_move_and_unlink_on_dag():
+    index = build()
+    index.move(WELL_B, RIG_A)
+    assert_consistent(index)
+    assert index.descendants_of("Bravo") == []
+    assert {row["asset_id"] for row in index.descendants_of("Alpha", "Well")} == {"A-1", "B-1"}
+
+    index.remove_parent(PUMP, WELL_A)
+    assert_consistent(index)
+    assert [row["asset_id"] for row in index.ancestors_of("P-7", "Well")] == ["B-1"]
+
+
+def test_remove_keeps_descendants_with_another_parent():
+    index = build()
+    index.remove(RIG_A)
+    assert_consistent(index)
+    assert RIG_A not in index and WELL_A not in index
+    assert PUMP in index
+    assert {row["asset_id"] for row in index.ancestors_of("P-7")} == {"B-1", "Bravo", "Permian"}
+
+    _, dirty, removed = index.take_changes()
+    assert removed == {RIG_A, WELL_A}
+    assert PUMP in dirty
+
+
+def test_same_id_under_different_labels():
+    index = build()
+    index.insert(("Well", "Alpha"), [RIG_B])
+    assert_consistent(index)
+    assert {row["asset_type"] for row in index.descendants_of("Bravo", "Well")} == {"Well"}
+    assert len(index.descendants_of("Bravo", "Well")) == 2
+    assert index.ancestors_of("Alpha", label="Well")[0]["asset_id"] == "Bravo"
+    assert index.ancestors_of("Alpha", label="Rig") == [{"asset_id": "Permian", "asset_type": "Basin", "depth": 1}]
+
+
+def test_cycle_and_unknown_parent_are_rejected():
+    index = build()
+    with pytest.raises(ValueError):
+        index.move(RIG_A, WELL_A)
+    with pytest.raises(KeyError):
+        index.insert(("Well", "X-1"), [("Rig", "Missing")])
+    assert_consistent(index)
+
+
+def test_random_operations_stay_consistent():
+    rng = random.Random(7)
+    index = ClosureIndex()
+    keys = [("Node", f"n{i}") for i in range(40)]
+    for i, key in enumerate(keys):
+        index.insert(key, rng.sample(keys[:i], min(i, rng.randint(0, 2))))
+    for _ in range(200):
+        key = rng.choice(keys)
+        if key not in index:
+            continue
+        # Only earlier keys as parents, so no cycles
+        earlier = [k for k in keys[:keys.index(key)] if k in index]
+        op = rng.random()
+        if op < 0.6:
+            index.set_parents(key, rng.sample(earlier, min(len(earlier), rng.randint(0, 3))))
+        elif op < 0.9 and earlier:
+            index.add_parent(key, rng.choice(earlier))
+        else:
+            index.remove(key)
+        assert_consistent(index)
+
+
+def test_from_snapshot_matches_incremental_build():
+    nodes = [
+        {"node_id": f"n{i}", "label": label, "props": {KEY_PROPERTIES[label]: name}}
+        for i, (label, name) in enumerate([BASIN, RIG_A, RIG_B, WELL_A, WELL_B, PUMP])
+    ]
+    edges = [("n0", "CONTAINS", "n1"), ("n0", "CONTAINS", "n2"), ("n1", "HAS_WELL", "n3"),
+             ("n2", "HAS_WELL", "n4"), ("n3", "HAS_EQUIPMENT", "n5"), ("n4", "HAS_EQUIPMENT", "n5")]
+    index = ClosureIndex.from_snapshot(AssetSnapshot(nodes, edges))
+    assert index.ancestors == build().ancestors
+    assert_consistent(index)
@@ -0,0 +1,92 @@
+"""Incident/anomaly interval join against a brute-force join"""
+import numpy as np
+import pytest
+
+from analytics.correlation import IncidentAnomalyCorrelator, correlate_records
+
+LOOKBACK_HOURS, LOOKAHEAD_HOURS = 48, 6
+
+
+def brute_force(incident_wells, incident_times, anomaly_wells, anomaly_times, weights):
+    """Every (incident, anomaly, lag, score) on the same well within the window"""
+    lookback, lookahead = LOOKBACK_HOURS * 3600, LOOKAHEAD_HOURS * 3600
+    pairs = []
+    for i in range(len(incident_times)):
+        for a in range(len(anomaly_times)):
+            lag = int(incident_times[i] - anomaly_times[a])
+            if incident_wells[i] == anomaly_wells[a] and -lookahead <= lag <= lookback:
+                side = lookback if lag >= 0 else lookahead
+                pairs.append((i, a, lag, weights[i] * (1.0 - abs(lag) / side)))
+    return pairs
+
+
+@pytest.fixture
+def events():
+    rng = np.random.default_rng(3)
+    span = 30 * 86400
+    return {
+        "incident_wells": rng.integers(0, 12, 300),
+        "incident_times": rng.integers(0, span, 300),
+        "anomaly_wells": rng.integers(0, 12, 800),
+        "anomaly_times": rng.integers(0, span, 800),
+        "anomaly_groups": rng.integers(0, 3, 800),
+        "incident_weights": rng.choice([1.0, 2.0, 3.0, 4.0], 300),
+    }
+
+
+@pytest.mark.parametrize("chunk_size", [7, 100000])
+def test_join_matches_brute_force(events, chunk_size):
+    correlator = IncidentAnomalyCorrelator(LOOKBACK_HOURS, LOOKAHEAD_HOURS, top_k=25, chunk_size=chunk_size)
+    result = correlator.correlate(**events)
+    expected = brute_force(events["incident_wells"], events["incident_times"], events["anomaly_wells"],
+                           events["anomaly_times"], events["incident_weights"])
+
+    assert result["total_pairs"] == len(expected)
+    # Top-k scores, and every returned pair is a real match with its lag
+    top = sorted((p[3] for p in expected), reverse=True)[:25]
+    np.testing.assert_allclose(result["score"], top)
+    matches = {(i, a): lag for i, a, lag, _ in expected}
+    for i, a, lag in zip(result["incident_index"], result["anomaly_index"], result["lag_seconds"]):
+        assert matches[(int(i), int(a))] == lag
+
+
+def test_lag_stats_match_brute_force(events):
+    correlator = IncidentAnomalyCorrelator(LOOKBACK_HOURS, LOOKAHEAD_HOURS, chunk_size=50)
+    stats = {row["group"]: row for row in correlator.correlate(**events)["lag_stats"]}
+    expected = brute_force(events["incident_wells"], events["incident_times"], events["anomaly_wells"],
+                           events["anomaly_times"], events["incident_weights"])
+    for group in range(3):
+        lags = np.array([lag for _, a, lag, _ in expected if events["anomaly_groups"][a] == group])
+        assert stats[group]["pairs"] == len(lags)
+        assert stats[group]["min_lag_hours"] == round(lags.min() / 3600, 2)
+        assert stats[group]["max_lag_hours"] == round(lags.max() / 3600, 2)
+        assert stats[group]["mean_lag_hours"] == pytest.approx(lags.mean() / 3600, abs=0.01)
+
+
+def test_window_edges_are_inclusive():
+    correlator = IncidentAnomalyCorrelator(LOOKBACK_HOURS, LOOKAHEAD_HOURS)
+    t = 10 * 86400
+    result = correlator.correlate(
+        [0], [t], [0, 0, 0, 0, 1],
+        [t - LOOKBACK_HOURS * 3600, t + LOOKAHEAD_HOURS * 3600,
+         t - LOOKBACK_HOURS * 3600 - 1, t + LOOKAHEAD_HOURS * 3600 + 1, t]
+    )
+    assert result["total_pairs"] == 2
+    assert sorted(result["anomaly_index"].tolist()) == [0, 1]
+
+
+def test_correlate_records_ranks_by_severity():
+    incidents = [
+        {"incident": "I-1", "severity": "LOW", "well": "W1", "incident_time": "t1", "incident_epoch": 7200},
+        {"incident": "I-2", "severity": "critical", "well": "W2", "incident_time": "t2", "incident_epoch": 7200},
+    ]
+    anomalies = [
+        {"sensor": "S-1", "type": "Pressure", "well": "W1", "anomaly_time": "a1", "anomaly_epoch": 3600},
+        {"sensor": "S-2", "type": "Pressure", "well": "W2", "anomaly_time": "a2", "anomaly_epoch": 3600},
+        {"sensor": "S-3", "type": "Vibration", "well": "W3", "anomaly_time": "a3", "anomaly_epoch": 3600},
+    ]
+    result = correlate_records(incidents, anomalies)
+    assert [c["incident"] for c in result["correlations"]] == ["I-2", "I-1"]
+    assert result["correlations"][0]["lag_hours"] == 1.0
+    assert result["total_pairs"] == 2
+    assert [row["type"] for row in result["lag_stats"]] == ["Pressure"]
@@ -0,0 +1,124 @@
+"""LTTB and min/max downsampling against sequential reference implementations"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from analytics.downsample import downsample_rows, lttb_indices, minmax_indices
+
+
+def reference_lttb(x, y, points):
+    """Textbook single-series LTTB with the same bucket edges"""
+    n = len(x)
+    if n <= points:
+        return list(range(n))
+    every = (n - 2) / (points - 2)
+    edges = [int(np.floor(j * every)) + 1 for j in range(points - 1)]
+    edges[-1] = n - 1
+    kept, a = [0], 0
+    for j in range(points - 2):
+        lo, hi = (edges[j + 1], edges[j + 2]) if j + 2 < len(edges) else (n - 1, n)
+        mean_x, mean_y = np.mean(x[lo:hi]), np.mean(y[lo:hi])
+        best, best_area = None, -1.0
+        for b in range(edges[j], edges[j + 1]):
+            area = abs((x[a] - mean_x) * (y[b] - y[a]) - (x[a] - x[b]) * (mean_y - y[a]))
+            if area > best_area:
+                best, best_area = b, area
+        kept.append(best)
+        a = best
+    return kept + [n - 1]
+
+
+def reference_minmax(x, y, points):
+    """First lowest and highest point of every bucket of equal time span, plus the ends"""
+    n = len(x)
+    if n <= points:
+        return list(range(n))
+    buckets = max((points - 2) // 2, 1)
+    bucket = np.minimum(((x - x[0]) / (x[-1] - x[0]) * buckets).astype(int), buckets - 1)
+    kept = {0, n - 1}
+    for j in range(buckets):
+        members = np.flatnonzero(bucket == j)
+        if len(members):
+            kept.add(int(members[np.argmin(y[members])]))
+            kept.add(int(members[np.argmax(y[members])]))
+    return sorted(kept)
+
+
+def series(rng, lengths):
+    xs, ys = [], []
+    for n in lengths:
+        # Uneven spacing, so equal-count and equal-span buckets differ
+        xs.append(np.cumsum(rng.uniform(1, 100, n)))
+        ys.append(np.cumsum(rng.normal(0, 5, n)))
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    return np.concatenate(xs), np.concatenate(ys), offsets
+
+
+@pytest.mark.parametrize("points", [3, 4, 17, 100])
+def test_lttb_matches_reference_per_series(points):
+    rng = np.random.default_rng(1)
+    x, y, offsets = series(rng, [1000, 5, points, points + 1, 333])
+    kept = lttb_indices(x, y, offsets, points)
+    expected = [s + i for s, e in zip(offsets[:-1], offsets[1:])
+                for i in reference_lttb(x[s:e], y[s:e], points)]
+    assert kept.tolist() == expected
+
+
+@pytest.mark.parametrize("points", [3, 4, 17, 100])
+def test_minmax_matches_reference_per_series(points):
+    rng = np.random.default_rng(2)
+    x, y, offsets = series(rng, [1000, 5, points, points + 1, 333])
+    kept = minmax_indices(x, y, offsets, points)
+    expected = [s + i for s, e in zip(offsets[:-1], offsets[1:])
+                for i in reference_minmax(x[s:e], y[s:e], points)]
+    assert kept.tolist() == expected
+
+
+@pytest.mark.parametrize("select", [lttb_indices, minmax_indices])
+def test_endpoints_kept_and_count_bounded(select):
+    rng = np.random.default_rng(3)
+    lengths = [2000, 50, 7, 400]
+    x, y, offsets = series(rng, lengths)
+    y[rng.integers(0, len(y), 40)] = np.nan
+    kept = select(x, y, offsets, 20)
+    for s, e in zip(offsets[:-1], offsets[1:]):
+        mine = kept[(kept >= s) & (kept < e)]
+        assert mine[0] == s and mine[-1] == e - 1
+        assert len(mine) <= 20
+        if select is lttb_indices:
+            assert len(mine) == min(e - s, 20)
+        if e - s <= 20:
+            assert mine.tolist() == list(range(s, e))
+
+
+def test_minmax_keeps_every_extreme():
+    rng = np.random.default_rng(4)
+    x, y, offsets = series(rng, [5000, 800])
+    y[10], y[4000], y[5500] = 1e6, -1e6, 2e6
+    kept = set(minmax_indices(x, y, offsets, 10).tolist())
+    for s, e in zip(offsets[:-1], offsets[1:]):
+        assert s + int(np.argmin(y[s:e])) in kept
+        assert s + int(np.argmax(y[s:e])) in kept
+
+
+@pytest.mark.parametrize("mode", ["lttb", "minmax"])
+def test_downsample_rows_keeps_row_order(mode):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rng = np.random.default_rng(5)
+    rows = [{"timestamp": start + timedelta(minutes=i), "well_name": well, "production_rate": float(v)}
+            for i, v in enumerate(rng.normal(100, 10, 300)) for well in ("W-1", "W-2")]
+    # Newest first, as the trend statements return them
+    rows.reverse()
+    kept, summary = downsample_rows(rows, 30, mode)
+    positions = [rows.index(row) for row in kept]
+    assert positions == sorted(positions)
+    assert summary["series"] == 2 and summary["returned"] == len(kept)
+    for well in ("W-1", "W-2"):
+        mine = [row for row in kept if row["well_name"] == well]
+        assert len(mine) <= 30
+        assert mine[0]["timestamp"] == start + timedelta(minutes=299)
+        assert mine[-1]["timestamp"] == start
+
+    # Short enough already: returned as is
+    assert downsample_rows(kept, 30, mode) == (kept, None)
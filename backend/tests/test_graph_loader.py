@@ -0,0 +1,78 @@
+"""Graph bulk loader: relationship sync of per-child parent sets"""
+import pytest
+
+from ingestion.graph_loader import GraphBulkLoader
+
+
+class FakeGraph:
+    """Hierarchy links per type, read and written the way the sync statements do"""
+
+    def __init__(self, links):
+        self.links = {rel: set(pairs) for rel, pairs in links.items()}
+        self.writes = []
+
+    def read(self, name):
+        rel = name[len("sync_parents_"):].upper()
+        return [{"parent": p, "child": c} for p, c in sorted(self.links.get(rel, ()))]
+
+    def write(self, name, batches):
+        for batch in batches:
+            for row in batch:
+                action, rel = name[len("sync_"):].split("_", 1)
+                self.writes.append((action, rel.upper(), row["parent"], row["child"]))
+                pair = (row["parent"], row["child"])
+                if action == "link":
+                    self.links.setdefault(rel.upper(), set()).add(pair)
+                else:
+                    self.links[rel.upper()].discard(pair)
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    graph = FakeGraph({
+        "HAS_WELL": {("Alpha", "W-1"), ("Alpha", "W-2")},
+        "HAS_EQUIPMENT": {("W-1", "P-7")},
+        "HAS_SENSOR": {("W-1", "S-1"), ("W-1", "S-9")},
+    })
+    monkeypatch.setattr(GraphBulkLoader, "_read", lambda self, name: graph.read(name))
+    monkeypatch.setattr(GraphBulkLoader, "_write_batches", lambda self, name, batches: graph.write(name, batches))
+    return graph
+
+
+def rel(parent, rel_type, child):
+    return {"parent": parent, "rel_type": rel_type, "child": child}
+
+
+REGISTER = [
+    rel("Alpha", "HAS_WELL", "W-1"), rel("Alpha", "HAS_WELL", "W-2"),
+    # Shared equipment below two wells
+    rel("W-1", "HAS_EQUIPMENT", "P-7"), rel("W-2", "HAS_EQUIPMENT", "P-7"),
+    # A move
+    rel("W-2", "HAS_SENSOR", "S-1"),
+]
+
+
+def test_shared_equipment_keeps_both_wells(graph):
+    loader = GraphBulkLoader(batch_size=2, driver=object())
+    assert loader._load_relationships(REGISTER) == (3, 3)
+    assert graph.links["HAS_EQUIPMENT"] == {("W-1", "P-7"), ("W-2", "P-7")}
+    # Moved, and a sensor missing from the register is left alone
+    assert graph.links["HAS_SENSOR"] == {("W-2", "S-1"), ("W-1", "S-9")}
+    assert sorted(graph.writes) == [("link", "HAS_EQUIPMENT", "W-2", "P-7"), ("link", "HAS_SENSOR", "W-2", "S-1"),
+                                    ("unlink", "HAS_SENSOR", "W-1", "S-1")]
+
+
+def test_unchanged_dag_is_a_no_op(graph):
+    loader = GraphBulkLoader(driver=object())
+    loader._load_relationships(REGISTER)
+    graph.writes.clear()
+    assert loader._load_relationships(REGISTER) == (0, 5)
+    assert graph.writes == []
+
+
+def test_dropping_one_parent_unlinks_only_it(graph):
+    graph.links["HAS_EQUIPMENT"].add(("W-2", "P-7"))
+    loader = GraphBulkLoader(driver=object())
+    assert loader._load_relationships([rel("W-2", "HAS_EQUIPMENT", "P-7")]) == (1, 1)
+    assert graph.writes == [("unlink", "HAS_EQUIPMENT", "W-1", "P-7")]
+    assert graph.links["HAS_EQUIPMENT"] == {("W-2", "P-7")}
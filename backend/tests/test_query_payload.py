@@ -0,0 +1,135 @@
+"""Payload options of /api/query: sections, columns and cursor paging"""
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from query_payload import PayloadOptions, PayloadError, ResultCache
+
+QUERY = "Show production for Rig Alpha"
+
+
+def make_result(rows=25):
+    return {
+        "answer": "ok",
+        "data": {
+            "sql_results": [{"timestamp": i, "well_name": f"W{i % 3}", "production_rate": float(i)} for i in range(rows)],
+            "graph_results": [{"sensor": "S-1", "status": "FAULTY"}],
+        }
+    }
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.delenv("SHARED_STATE_DIR", raising=False)
+    return ResultCache()
+
+
+def follow(result, cache, cursor, query=QUERY):
+    """Serve a cursor request the way main.query does"""
+    options = PayloadOptions.parse(query, None, None, None, cursor)
+    key = options.cursor["k"]
+    cached = cache.get(key)
+    assert cached is not None
+    return options.apply(cached, query, cache_key=key, cache=cache)
+
+
+def test_without_options_the_payload_is_unchanged():
+    options = PayloadOptions.parse(QUERY, None, None, None, None)
+    assert not options.active
+    result = make_result()
+    assert options.apply(result, QUERY)["data"] == result["data"]
+
+
+def test_sections_and_columns():
+    options = PayloadOptions.parse(QUERY, ["sql_results"], {"sql_results": ["timestamp"]}, None, None)
+    data = options.apply(make_result(3), QUERY)["data"]
+    assert list(data) == ["sql_results"]
+    assert data["sql_results"] == [{"timestamp": 0}, {"timestamp": 1}, {"timestamp": 2}]
+
+
+def test_cursor_round_trip_covers_every_row_once(cache):
+    result = make_result(25)
+    options = PayloadOptions.parse(QUERY, ["sql_results"], None, 10, None)
+    page = options.apply(result, QUERY, cache=cache)["data"]
+    rows = list(page["sql_results"])
+    cursor = page["pages"]["sql_results"]["next_cursor"]
+    offsets = [page["pages"]["sql_results"]["offset"]]
+    while cursor:
+        page = follow(result, cache, cursor)["data"]
+        rows.extend(page["sql_results"])
+        offsets.append(page["pages"]["sql_results"]["offset"])
+        cursor = page["pages"]["sql_results"]["next_cursor"]
+    assert rows == result["data"]["sql_results"]
+    assert offsets == [0, 10, 20]
+    assert page["pages"]["sql_results"] == {"offset": 20, "count": 5, "total": 25, "next_cursor": None}
+
+
+def test_short_sections_are_not_paged(cache):
+    options = PayloadOptions.parse(QUERY, None, None, 10, None)
+    data = options.apply(make_result(25), QUERY, cache=cache)["data"]
+    assert list(data["pages"]) == ["sql_results"]
+    assert data["graph_results"] == [{"sensor": "S-1", "status": "FAULTY"}]
+
+
+def test_cursor_from_another_query_is_rejected(cache):
+    options = PayloadOptions.parse(QUERY, None, None, 10, None)
+    cursor = options.apply(make_result(25), QUERY, cache=cache)["data"]["pages"]["sql_results"]["next_cursor"]
+    with pytest.raises(PayloadError, match="different query"):
+        PayloadOptions.parse("Show production for Rig Bravo", None, None, None, cursor)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "e30", "eyJ2IjoxfQ", ""])
+def test_malformed_cursor_is_rejected(cursor):
+    if not cursor:
+        # An empty cursor means "no cursor"
+        assert PayloadOptions.parse(QUERY, None, None, None, cursor).cursor is None
+        return
+    with pytest.raises(PayloadError, match="Malformed"):
+        PayloadOptions.parse(QUERY, None, None, None, cursor)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"sections": ["nope"]},
+    {"columns": {"sql_results": []}},
+    {"page_size": 0},
+])
+def test_invalid_options_are_rejected(kwargs):
+    args = {"sections": None, "columns": None, "page_size": None, "cursor": None, **kwargs}
+    with pytest.raises(PayloadError):
+        PayloadOptions.parse(QUERY, args["sections"], args["columns"], args["page_size"], args["cursor"])
+
+
+def test_cache_expires_and_evicts(cache):
+    cache.ttl = -1.0
+    key = cache.put({"data": {}})
+    assert cache.get(key) is None
+    cache.ttl, cache.size = 60.0, 2
+    keys = [cache.put({"n": i}) for i in range(3)]
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == {"n": 2}
+
+
+def test_shared_entries_are_json_served_by_another_worker(tmp_path):
+    shared = tmp_path / "shared"
+    writer, reader = ResultCache(str(shared)), ResultCache(str(shared))
+    result = {"data": {"sql_results": [{"timestamp": datetime(2024, 1, 1, tzinfo=timezone.utc),
+                                        "production_rate": Decimal("1.50"), "well_name": "W-1"}]}}
+    key = writer.put(result)
+    # What the response would have carried, not the Python objects
+    assert (shared / "query_results" / key).read_bytes().startswith(b'{"data":')
+    assert reader.get(key) == {"data": {"sql_results": [
+        {"timestamp": "2024-01-01T00:00:00Z", "production_rate": "1.50", "well_name": "W-1"}]}}
+    assert reader.shared_hits == 1
+    assert oct(os.stat(shared / "query_results").st_mode & 0o777) == "0o700"
+
+
+def test_shared_directory_open_to_others_is_refused(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o700)
+    os.chmod(shared, 0o770)
+    cache = ResultCache(str(shared))
+    assert cache.shared_path is None
+    assert not (shared / "query_results").exists()
+    assert cache.get(cache.put({"n": 1})) == {"n": 1}
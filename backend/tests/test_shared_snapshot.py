@@ -0,0 +1,211 @@
+"""Mapped asset snapshots: hot property columns, decoded-props cache, closure and publishing"""
+import time
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from assets.closure import ClosureIndex
+from assets.shared import SharedProps, SharedSnapshotStore, SnapshotClosure, open_snapshot, write_snapshot
+from assets.snapshot import AssetSnapshot, AssetSnapshotManager, HIERARCHY_LABELS, KEY_PROPERTIES
+
+NODES = [
+    ("Basin", "Permian", {}),
+    ("Rig", "Alpha", {}),
+    ("Well", "A-1", {"status": "ACTIVE"}),
+    ("Well", "A-2", {}),
+    ("Sensor", "S-1", {"sensor_type": "Pressure", "status": "faulty", "last_reading": 91.5}),
+    ("Sensor", "S-2", {"sensor_type": "Vibration", "status": "OK", "last_reading_anomaly": True,
+                       "anomaly_detected_at": datetime(2024, 3, 1, tzinfo=timezone.utc)}),
+    ("Sensor", "S-3", {"sensor_type": "Flow", "status": None}),
+    ("Equipment", "P-7", {"name": "Pump 7", "tags": ["critical"]}),
+]
+EDGES = [("n0", "CONTAINS", "n1"), ("n1", "HAS_WELL", "n2"), ("n1", "HAS_WELL", "n3"),
+         ("n2", "HAS_SENSOR", "n4"), ("n2", "HAS_SENSOR", "n5"), ("n3", "HAS_SENSOR", "n6"),
+         ("n2", "HAS_EQUIPMENT", "n7"), ("n3", "HAS_EQUIPMENT", "n7")]
+
+
+def make_snapshot():
+    nodes = [{"node_id": f"n{i}", "label": label, "props": {KEY_PROPERTIES[label]: key, **props}}
+             for i, (label, key, props) in enumerate(NODES)]
+    return AssetSnapshot(nodes, EDGES)
+
+
+@pytest.fixture
+def pair(tmp_path):
+    snapshot = make_snapshot()
+    write_snapshot(snapshot, str(tmp_path / "v1"), 1)
+    return snapshot, open_snapshot(str(tmp_path / "v1"))
+
+
+def test_mapped_snapshot_answers_like_the_original(pair):
+    snapshot, mapped = pair
+    assert isinstance(mapped.props, SharedProps)
+    for i in range(len(snapshot)):
+        assert mapped.props[i] == snapshot.props[i]
+        assert mapped.asset_id(i) == snapshot.asset_id(i)
+        assert mapped.display_name(i) == snapshot.display_name(i)
+        for name in ("name", "status", "sensor_type", "last_reading", "tags", "missing"):
+            assert mapped.prop(i, name, "-") == snapshot.prop(i, name, "-")
+    assert mapped.faulty_equipment("Alpha") == snapshot.faulty_equipment("Alpha")
+    assert mapped.equipment_by_basin("Permian") == snapshot.equipment_by_basin("Permian")
+    assert [r["sensor"] for r in mapped.faulty_equipment("Alpha")] == ["S-1", "S-2"]
+
+
+def test_rows_from_hot_columns_decode_no_dicts(pair):
+    _, mapped = pair
+    mapped.equipment_by_basin("Permian")
+    assert [mapped.asset_id(i) for i in range(len(mapped))] == [key for _, key, _ in NODES]
+    assert len(mapped.props._cache) == 0
+    # last_reading is not hot: only the faulty sensors' dicts are decoded
+    mapped.faulty_equipment("Alpha")
+    assert sorted(mapped.props._cache) == [4, 5]
+
+
+def test_decoded_props_cache_is_bounded(pair):
+    _, mapped = pair
+    mapped.props.cache_size = 2
+    for i in range(len(mapped)):
+        assert mapped.props[i] is mapped.props[i]
+    assert list(mapped.props._cache) == [len(mapped) - 2, len(mapped) - 1]
+
+
+def test_overlay_wins_over_hot_columns(pair):
+    _, mapped = pair
+    i = mapped.lookup("Sensor", "S-3")
+    mapped.props[i] = {**mapped.props[i], "status": "faulty", "last_reading": 3.0}
+    assert mapped.prop(i, "status") == "faulty"
+    assert [r["sensor"] for r in mapped.faulty_equipment("Alpha")] == ["S-1", "S-2", "S-3"]
+
+
+def rows(found):
+    return sorted((row["asset_type"], row["asset_id"], row["depth"]) for row in found)
+
+
+def test_snapshot_closure_follows_every_parent(pair):
+    _, mapped = pair
+    closure = SnapshotClosure(mapped)
+    assert rows(closure.ancestors_of("P-7")) == [("Basin", "Permian", 3), ("Rig", "Alpha", 2),
+                                                ("Well", "A-1", 1), ("Well", "A-2", 1)]
+    assert [row["depth"] for row in closure.ancestors_of("P-7")] == [1, 1, 2, 3]
+    assert rows(closure.descendants_of("Alpha", "Equipment")) == [("Equipment", "P-7", 2)]
+    assert ("Well", "A-2") in closure and ("Rig", "A-2") not in closure
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_snapshot_closure_matches_closure_index(tmp_path, seed):
+    rng = random.Random(seed)
+    nodes, edges = [], []
+    for i in range(20 * len(HIERARCHY_LABELS)):
+        level = i // 20
+        label = HIERARCHY_LABELS[level]
+        # Ids reused across labels, so lookups by id alone have several anchors
+        nodes.append({"node_id": f"n{i}", "label": label, "props": {KEY_PROPERTIES[label]: f"a{i % 37}"}})
+        if level:
+            for p in rng.sample(range((level - 1) * 20, level * 20), rng.choice([1, 1, 2])):
+                edges.append((f"n{p}", "CONTAINS", f"n{i}"))
+    snapshot = AssetSnapshot(nodes, edges)
+    index = ClosureIndex.from_snapshot(snapshot)
+    write_snapshot(snapshot, str(tmp_path / "v1"), 1)
+    closure = SnapshotClosure(open_snapshot(str(tmp_path / "v1")))
+    for asset_id in {f"a{i}" for i in range(37)}:
+        for label in (None, "Rig", "Sensor"):
+            for asset_type in (None, "Well", "Equipment"):
+                assert rows(closure.descendants_of(asset_id, asset_type, label)) == \
+                    rows(index.descendants_of(asset_id, asset_type, label))
+                assert rows(closure.ancestors_of(asset_id, asset_type, label)) == \
+                    rows(index.ancestors_of(asset_id, asset_type, label))
+
+
+class FakePatchLog:
+    def compact(self, before):
+        pass
+
+
+class FakeStore:
+    leader = True
+    root = "/tmp/fake"
+    patches = FakePatchLog()
+
+    def __init__(self):
+        self.published = 0
+        self.heartbeats = 0
+
+    def publish(self, snapshot, data_at=0.0):
+        self.published += 1
+        return self.published
+
+    def heartbeat(self, version):
+        self.heartbeats += 1
+
+
+def test_property_only_changes_are_coalesced(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("assets.snapshot.time.monotonic", lambda: clock[0])
+    manager = AssetSnapshotManager()
+    manager.shared, manager.republish_seconds = FakeStore(), 60.0
+    manager.snapshot = make_snapshot()
+
+    manager._publish(structural=True)
+    assert manager.shared.published == 1
+    for _ in range(5):
+        clock[0] += 10
+        manager._publish(structural=False, props_changed=True)
+    assert manager.shared.published == 1 and manager.shared.heartbeats == 5
+
+    # Due: the pending changes go out even on a refresh that saw none
+    clock[0] += 20
+    manager._publish(structural=False)
+    assert manager.shared.published == 2
+    clock[0] += 120
+    manager._publish(structural=False)
+    assert manager.shared.published == 2
+
+    manager._publish(structural=True)
+    assert manager.shared.published == 3
+
+
+def faulty(manager):
+    return [row["sensor"] for row in manager.snapshot.faulty_equipment("Alpha")]
+
+
+def test_patched_flag_reaches_every_worker_within_a_poll(tmp_path):
+    leader = AssetSnapshotManager()
+    leader.shared = SharedSnapshotStore(str(tmp_path))
+    assert leader.shared.try_lead()
+    leader.snapshot, leader.data_at = make_snapshot(), time.time()
+    leader._publish(structural=True)
+    workers = []
+    for _ in range(2):
+        worker = AssetSnapshotManager()
+        worker.shared = SharedSnapshotStore(str(tmp_path))
+        assert not worker.shared.try_lead() and worker.follow()
+        workers.append(worker)
+    detecting, other = workers
+
+    before_patch = time.time()
+    detected_at = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+    detecting.patch_properties("Sensor", {"S-3": {"last_reading_anomaly": True, "last_reading": 7.5,
+                                                  "anomaly_detected_at": detected_at}})
+    # One poll of the others (no new version: the leader has not refreshed)
+    other.follow()
+    leader._apply_shared_patches()
+    for manager in (leader, detecting, other):
+        assert faulty(manager) == ["S-1", "S-2", "S-3"]
+    i = other.snapshot.lookup("Sensor", "S-3")
+    assert other.snapshot.prop(i, "anomaly_detected_at") == detected_at
+
+    # A version whose data was read before the patch still gets it
+    leader.snapshot, leader.data_at = make_snapshot(), before_patch
+    leader._publish(structural=True)
+    assert other.follow() and other.version == 2
+    assert faulty(other) == ["S-1", "S-2", "S-3"]
+
+    # Data read after the patch (the flag cleared since) wins, and the leader drops old patches
+    leader.snapshot, leader.data_at = make_snapshot(), time.time() + 1
+    leader._publish(structural=True)
+    leader._publish(structural=True)
+    assert other.follow() and faulty(other) == ["S-1", "S-2"]
+    assert leader.shared.patches.read(reset=True) == []
+    for manager in (leader, *workers):
+        manager.shared.release()
@@ -0,0 +1,93 @@
+"""Slow statement log: plan capture never executes a write statement again"""
+import importlib
+
+import pytest
+
+import database.connections
+import database.statements
+from database import slow_statements
+from database.slow_statements import SlowStatementLog
+from database.statements import StatementRegistry, statements
+
+
+class FakeSummary:
+    plan = {"operatorType": "ProduceResults@neo4j", "args": {"Details": "estimated"}, "children": []}
+    profile = {"operatorType": "ProduceResults@neo4j", "args": {}, "rows": 3, "dbHits": 9, "children": []}
+
+
+class FakeResult:
+    def consume(self):
+        return FakeSummary()
+
+
+class FakeSession:
+    def __init__(self, ran):
+        self.ran = ran
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, text, params):
+        self.ran.append(text)
+        return FakeResult()
+
+
+class FakeDriver:
+    def __init__(self):
+        self.ran = []
+
+    def session(self):
+        return FakeSession(self.ran)
+
+
+@pytest.fixture
+def driver(monkeypatch):
+    driver = FakeDriver()
+    monkeypatch.setattr(database.connections, "get_shared_neo4j_driver", lambda: driver)
+    return driver
+
+
+@pytest.mark.parametrize("name, prefix, kind", [
+    ("sensor_anomaly_flags", "EXPLAIN ", "estimated"),
+    ("incident_candidates", "EXPLAIN ", "estimated"),
+    ("faulty_equipment", "PROFILE ", "actual"),
+])
+def test_writes_are_explained_not_profiled(driver, name, prefix, kind):
+    log = SlowStatementLog()
+    record = {"plan": None, "plan_status": "pending", "plan_kind": None}
+    log._pending = 1
+    log._capture(record, "cypher", name, {})
+    assert driver.ran == [prefix + statements.cypher_text(name)]
+    assert record["plan_status"] == "captured"
+    assert record["plan_kind"] == kind
+    if kind == "actual":
+        assert (record["plan"]["rows"], record["plan"]["db_hits"]) == (3, 9)
+    else:
+        assert record["plan"]["details"] == "estimated"
+
+
+def test_loader_writes_are_registered():
+    # Registers the sync statements
+    importlib.import_module("ingestion.graph_loader")
+    assert statements.is_write("cypher", "sync_upsert_well")
+    assert statements.is_write("cypher", "sync_link_has_sensor")
+    assert not statements.is_write("cypher", "sync_hashes_well")
+    assert not statements.is_write("sql", "sensor_anomaly_flags")
+
+
+def test_sql_writes_skip_analyze(monkeypatch):
+    seen = []
+    monkeypatch.setattr(slow_statements, "_explain_sql", lambda name, params, actual=True: seen.append(actual) or [])
+    # A registry of its own, so the test statement does not leak into the process-wide one
+    registry = StatementRegistry()
+    registry.register_sql("test_touch_wells", "UPDATE wells SET updated_at = now()", write=True)
+    registry.register_sql("test_read_wells", "SELECT well_name FROM wells")
+    monkeypatch.setattr(database.statements, "statements", registry)
+    log = SlowStatementLog()
+    log._pending = 2
+    log._capture({}, "sql", "test_touch_wells", ())
+    log._capture({}, "sql", "test_read_wells", ())
+    assert seen == [False, True]
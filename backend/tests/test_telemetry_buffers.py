@@ -0,0 +1,99 @@
+"""Telemetry ring buffers and buffered production trends"""
+import random
+from collections import deque
+from datetime import timezone
+
+import numpy as np
+import pytest
+
+from telemetry.buffers import RingBuffer, TelemetryStore, TelemetryError
+
+
+def test_wraparound_matches_a_bounded_deque():
+    rng = random.Random(5)
+    buffer = RingBuffer(capacity=50, fields=2)
+    expected = deque(maxlen=50)
+    t = 0.0
+    for _ in range(200):
+        # Blocks smaller than, equal to and larger than the capacity
+        n = rng.choice([1, 3, 17, 49, 50, 51, 120])
+        ts = t + np.arange(n, dtype=np.float64)
+        values = np.column_stack((ts * 2, -ts)).astype(np.float32)
+        buffer.append(ts, values)
+        expected.extend(zip(ts.tolist(), values.tolist()))
+        t += n
+
+        got_ts, got_values = buffer.window(-np.inf)
+        assert got_ts.tolist() == [e[0] for e in expected]
+        assert got_values.tolist() == [e[1] for e in expected]
+        assert len(buffer) == len(expected)
+        assert buffer.oldest() == expected[0][0]
+
+
+def test_window_starts_at_since():
+    buffer = RingBuffer(capacity=8)
+    buffer.append(np.arange(20, dtype=np.float64), np.arange(20, dtype=np.float32)[:, None])
+    ts, values = buffer.window(15.0)
+    assert ts.tolist() == [15.0, 16.0, 17.0, 18.0, 19.0]
+    assert values[:, 0].tolist() == [15.0, 16.0, 17.0, 18.0, 19.0]
+
+
+def test_late_readings_are_sorted_until_overwritten():
+    buffer = RingBuffer(capacity=4)
+    buffer.append(np.array([10.0, 11.0]), np.zeros((2, 1), dtype=np.float32))
+    buffer.append(np.array([5.0]), np.zeros((1, 1), dtype=np.float32))
+    assert not buffer.ordered
+    assert buffer.window(-np.inf)[0].tolist() == [5.0, 10.0, 11.0]
+    assert buffer.oldest() == 5.0
+
+    buffer.append(np.array([12.0, 13.0, 14.0, 15.0]), np.zeros((4, 1), dtype=np.float32))
+    assert buffer.ordered
+    assert buffer.window(-np.inf)[0].tolist() == [12.0, 13.0, 14.0, 15.0]
+
+
+def test_ingest_rejects_bad_blocks_and_keeps_good_ones():
+    store = TelemetryStore()
+    result = store.ingest({
+        "wells": [
+            {"well": "W-1", "rig": "Rig A", "ts": [1.0, 2.0], "production_rate": [10, 11]},
+            {"well": "W-2", "rig": "Rig A", "ts": [1.0, 2.0], "production_rate": [1]},
+            {"well": "W-3", "ts": [1.0]},
+        ],
+        "sensors": [{"sensor_id": "S-1", "ts": [1.0], "value": [float("inf")]}]
+    })
+    assert result["accepted"] == 2
+    assert result["rejected"] == 3
+    assert len(result["errors"]) == 3
+    with pytest.raises(TelemetryError):
+        store.ingest_json(b"[1, 2")
+
+
+def test_production_trends_match_a_naive_moving_average():
+    store = TelemetryStore()
+    hour = 3600.0
+    now = 100 * hour
+    rng = np.random.default_rng(2)
+    for well in ("W-1", "W-2"):
+        ts = np.arange(60, 101) * hour
+        rates = np.round(rng.uniform(50, 150, len(ts)), 2)
+        rates[5] = np.nan
+        store.ingest({"wells": [{"well": well, "rig": "Rig A", "ts": ts.tolist(),
+                                 "production_rate": [None if np.isnan(r) else r for r in rates],
+                                 "pressure": [1.0] * len(ts), "temperature": [2.0] * len(ts)}]})
+
+    rows = store.production_trends("Rig A", hours=24, window_hours=6, now=now)
+    assert len(rows) == 2 * 25
+    # Newest first, then by well
+    assert [r["well_name"] for r in rows[:2]] == ["W-1", "W-2"]
+    for well in ("W-1", "W-2"):
+        ts, values = store._wells[well].window(-np.inf)
+        rates = np.round(values[:, 0].astype(np.float64), 2)
+        for row in (r for r in rows if r["well_name"] == well):
+            # Naive UTC datetimes, as the production_trends statement returns them
+            t = row["timestamp"].replace(tzinfo=timezone.utc).timestamp()
+            window = rates[(ts >= t - 6 * hour) & (ts <= t)]
+            assert row["moving_avg"] == pytest.approx(np.nanmean(window), abs=1e-6)
+
+    # Not buffered back to the start of the lookback: the caller must query PostgreSQL
+    assert store.production_trends("Rig A", hours=48, window_hours=6, now=now) is None
+    assert store.production_trends("Rig B", hours=24, window_hours=6, now=now) is None
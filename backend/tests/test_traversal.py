@@ -0,0 +1,49 @@
+"""Bounded impact traversal: paging and the truncation flag"""
+from assets.traversal import bounded_impact_traversal
+
+# child -> parents: equipment below two wells, one rig, one basin
+PARENTS = {
+    "pump": [("w1", "Well"), ("w2", "Well")],
+    "w1": [("rig", "Rig")],
+    "w2": [("rig", "Rig")],
+    "rig": [("basin", "Basin")],
+}
+
+
+def expand(frontier):
+    return [(child, parent, label, parent) for child in frontier for parent, label in PARENTS.get(child, [])]
+
+
+def test_complete_result_is_not_truncated():
+    page = bounded_impact_traversal("pump", "pump", expand, max_hops=3)
+    assert [a["asset_name"] for a in page["assets"]] == ["w1", "w2", "rig", "basin"]
+    assert page["has_more"] is False
+
+
+def test_page_ending_on_the_last_asset_is_not_truncated():
+    page = bounded_impact_traversal("pump", "pump", expand, max_hops=3, limit=4)
+    assert len(page["assets"]) == 4
+    assert page["has_more"] is False
+
+
+def test_page_ending_on_a_level_with_no_further_parents():
+    # The basin level is reached within the page and has no parents
+    page = bounded_impact_traversal("pump", "pump", expand, max_hops=5, limit=3, offset=1)
+    assert [a["asset_name"] for a in page["assets"]] == ["w2", "rig", "basin"]
+    assert page["has_more"] is False
+
+
+def test_truncated_page_and_next_page():
+    first = bounded_impact_traversal("pump", "pump", expand, max_hops=3, limit=2)
+    assert [a["asset_name"] for a in first["assets"]] == ["w1", "w2"]
+    assert first["has_more"] is True
+    second = bounded_impact_traversal("pump", "pump", expand, max_hops=3, limit=2, offset=2)
+    assert [a["asset_name"] for a in second["assets"]] == ["rig", "basin"]
+    assert second["has_more"] is False
+
+
+def test_each_asset_once_along_a_shortest_path():
+    page = bounded_impact_traversal("pump", "pump", expand, max_hops=3)
+    rig = next(a for a in page["assets"] if a["asset_name"] == "rig")
+    assert rig["hops"] == 2
+    assert rig["path_nodes"] == ["pump", "w1", "rig"]
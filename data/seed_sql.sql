@@ -14,6 +14,16 @@ CREATE TABLE IF NOT EXISTS production_data (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Create sensor_readings table (streamed sensor values, see backend/telemetry)
+CREATE TABLE IF NOT EXISTS sensor_readings (
+    id BIGSERIAL PRIMARY KEY,
+    timestamp TIMESTAMP NOT NULL,
+    sensor_id VARCHAR(100) NOT NULL,
+    well_name VARCHAR(100),
+    value DOUBLE PRECISION,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Create maintenance_schedule table
 CREATE TABLE IF NOT EXISTS maintenance_schedule (
     id SERIAL PRIMARY KEY,
@@ -36,6 +46,18 @@ CREATE TABLE IF NOT EXISTS incidents (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Create asset_closure table (ancestor/descendant pairs of the asset
+-- hierarchy, maintained from Neo4j by the backend asset snapshot)
+CREATE TABLE IF NOT EXISTS asset_closure (
+    ancestor_id VARCHAR(100) NOT NULL,
+    ancestor_type VARCHAR(50) NOT NULL,
+    descendant_id VARCHAR(100) NOT NULL,
+    descendant_type VARCHAR(50) NOT NULL,
+    depth SMALLINT NOT NULL,
+    -- Asset ids are unique per type only, so both types are part of the key
+    PRIMARY KEY (ancestor_id, descendant_type, descendant_id, ancestor_type)
+);
+
 -- Insert sample production data for Rig Alpha
 INSERT INTO production_data (timestamp, rig_name, well_name, basin, production_rate, pressure, temperature) VALUES
 ('2024-12-30 10:00:00', 'Rig Alpha', 'Well W-12', 'Permian', 850.5, 2500, 180),
@@ -72,8 +94,10 @@ INSERT INTO incidents (incident_id, severity, description, location, timestamp)
 CREATE INDEX IF NOT EXISTS idx_production_rig_timestamp ON production_data(rig_name, timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_production_well ON production_data(well_name);
 CREATE INDEX IF NOT EXISTS idx_production_basin ON production_data(basin);
+CREATE INDEX IF NOT EXISTS idx_sensor_readings_sensor_timestamp ON sensor_readings(sensor_id, timestamp DESC);
 CREATE INDEX IF NOT EXISTS idx_maintenance_equipment ON maintenance_schedule(equipment_id);
 CREATE INDEX IF NOT EXISTS idx_incidents_timestamp ON incidents(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_asset_closure_descendant ON asset_closure(descendant_id, ancestor_type);
 
 -- Grant permissions
 GRANT ALL PRIVILEGES ON ALL TABLES IN SCHEMA public TO oilfield_user;